@@ -13,6 +13,11 @@ from .geo_models import (
     RouteRequest,
     RouteSegment,
     OptimalRoute,
+    BatchRouteRequest,
+    BatchRouteItem,
+    BatchRouteResponse,
+    MatrixRequest,
+    MatrixResponse,
     SidewalkAccessibility,
     ObstaclesResponse
 )
@@ -32,6 +37,11 @@ __all__ = [
     "RouteRequest",
     "RouteSegment",
     "OptimalRoute",
+    "BatchRouteRequest",
+    "BatchRouteItem",
+    "BatchRouteResponse",
+    "MatrixRequest",
+    "MatrixResponse",
     "SidewalkAccessibility",
     "ObstaclesResponse"
 ]
\ No newline at end of file
@@ -129,6 +129,30 @@ class OptimalRoute(BaseModel):
     average_accessibility_score: float
     geometry: GeoJSONLineString
 
+class BatchRouteRequest(BaseModel):
+    """Varias rutas a calcular en una sola petición"""
+    routes: List[RouteRequest] = Field(..., min_length=1, max_length=5000)
+
+class BatchRouteItem(BaseModel):
+    route: Optional[OptimalRoute] = None
+    error: Optional[str] = None  # Motivo si la ruta no pudo calcularse
+
+class BatchRouteResponse(BaseModel):
+    routes: List[BatchRouteItem]  # En el mismo orden que la petición
+
+class MatrixRequest(BaseModel):
+    """Matriz origen-destino con un mismo perfil de accesibilidad"""
+    origins: List[Coordinate] = Field(..., min_length=1, max_length=1000)
+    destinations: List[Coordinate] = Field(..., min_length=1, max_length=1000)
+    accessibility_priority: float = Field(1.0, ge=0, le=1.0, description="0=fastest, 1=most accessible")
+    avoid_obstacles: List[ObstacleType] = []
+
+class MatrixResponse(BaseModel):
+    """Matrices [origen][destino]; null si el par no tiene ruta"""
+    costs: List[List[Optional[float]]]
+    distances_meters: List[List[Optional[float]]]
+    durations_seconds: List[List[Optional[float]]]
+
 # Modelos para el mapa de calor de accesibilidad
 class SidewalkAccessibility(BaseModel):
     """Vereda con información de accesibilidad para mapa de calor"""
@@ -145,4 +169,5 @@ class ObstaclesResponse(BaseModel):
     city: str
     total_obstacles: int
     sidewalks: List[SidewalkAccessibility]
-    last_updated: Optional[str] = None
\ No newline at end of file
+    last_updated: Optional[str] = None
+    data_version: Optional[str] = None  # Versión del feed labelClusters usada
\ No newline at end of file
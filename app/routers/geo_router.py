@@ -1,13 +1,145 @@
-from fastapi import APIRouter, HTTPException, Path, Query
-from typing import List, Optional
-from app.models import CityPolygon, StreetAxis, SidewalkSegment, RouteRequest, OptimalRoute, ObstaclesResponse
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from typing import Dict, List, Optional
+from app.models import (
+    CityPolygon, StreetAxis, SidewalkSegment, RouteRequest, OptimalRoute, ObstaclesResponse,
+    BatchRouteRequest, BatchRouteResponse, MatrixRequest, MatrixResponse
+)
+from app.services.concurrency import EndpointLimiter, Overloaded
 from app.services.geo_service import GeoService
 from app.services.obstacle_service import ObstacleService
+from app.services.response_cache import ResponseCache
+from app.services.sidewalk_grid import GRID_LEVELS
+from app.services.simplification import simplify_level
+from app.services.spatial_order import check_cursor_version
+from app.services.vector_tiles import VectorTileService
 
 router = APIRouter(prefix="/api/v1", tags=["Geospatial Data"])
 
 geo_service = GeoService()
-obstacle_service = ObstacleService()
+obstacle_service = ObstacleService(worker_pool=geo_service.worker_pool)
+response_cache = ResponseCache()
+vector_tile_service = VectorTileService()
+
+# Trabajo síncrono pesado fuera del event loop, con límites por endpoint (en ejecución, en cola).
+# Cada ruta se calcula en un thread del proceso, sin depender del pool de procesos; lotes y
+# matrices reparten el cálculo en ese pool desde su thread (o lo hacen ahí mismo si el pool
+# no está disponible), así que se admiten pocos a la vez.
+limiters = {
+    "streets": EndpointLimiter("streets", max_concurrent=4, max_queue=64),
+    "sidewalks": EndpointLimiter("sidewalks", max_concurrent=4, max_queue=64),
+    "obstacles": EndpointLimiter("obstacles", max_concurrent=2, max_queue=64),
+    "route": EndpointLimiter("route", max_concurrent=4, max_queue=32),
+    "routes_batch": EndpointLimiter("routes_batch", max_concurrent=1, max_queue=4),
+    "matrix": EndpointLimiter("matrix", max_concurrent=1, max_queue=4),
+    "tiles": EndpointLimiter("tiles", max_concurrent=2, max_queue=64),
+    "tiles_pregenerate": EndpointLimiter("tiles_pregenerate", max_concurrent=1, max_queue=4)
+}
+
+logger = logging.getLogger(__name__)
+
+# Pregeneraciones de teselas en curso (referencias para que no se recolecten)
+pregenerating = set()
+
+async def pregenerate_tiles(city: str, snapshot):
+    """Pregenerar en un thread las teselas de zoom bajo de un snapshot recién publicado"""
+    try:
+        await limiters["tiles_pregenerate"].run(
+            vector_tile_service.pregenerate, city, snapshot.version, snapshot.response.sidewalks,
+            previous_version=snapshot.previous_version, changed_ids=snapshot.changed_sidewalk_ids
+        )
+    except Exception:
+        logger.exception("No se pudieron pregenerar las teselas de '%s'", city)
+
+def schedule_tile_pregeneration(city: str, snapshot):
+    task = asyncio.ensure_future(pregenerate_tiles(city, snapshot))
+    pregenerating.add(task)
+    task.add_done_callback(pregenerating.discard)
+
+# Cada snapshot nuevo de obstáculos deja pregeneradas las teselas de zoom bajo (en segundo
+# plano, sin demorar la publicación); si se recalculó por diferencias, solo se regeneran
+# las que tocan veredas cambiadas
+obstacle_service.add_snapshot_listener(schedule_tile_pregeneration)
+
+# Serializadores de las respuestas pesadas (se usan fuera de response_model)
+streets_json = TypeAdapter(List[StreetAxis])
+sidewalks_json = TypeAdapter(List[SidewalkSegment])
+
+# Parámetros comunes para reducir geometrías en vistas alejadas
+SIMPLIFY_DESCRIPTION = ("Tolerancia de simplificación en metros (Douglas–Peucker); se usa el nivel "
+                        "precalculado más cercano por debajo: 1, 5, 10, 25, 50 o 100")
+PRECISION_DESCRIPTION = "Decimales de las coordenadas (p. ej. 5 ≈ 1 m)"
+CURSOR_DESCRIPTION = "Cursor de la página siguiente (encabezado X-Next-Cursor de la respuesta anterior)"
+
+# Formatos de streaming de /obstacles: nombre en ?format= -> media type
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "geojson-seq": "application/geo+json-seq"
+}
+
+def stream_format(accept: str) -> Optional[str]:
+    """Formato de streaming pedido en Accept (los media types con q=0 no cuentan)"""
+    accepted = set()
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(media_type.strip().lower())
+    return next((name for name, media_type in STREAM_MEDIA_TYPES.items() if media_type in accepted), None)
+
+def check_cursor(cursor: Optional[str], version: str):
+    """400 si el cursor no es uno entregado por la API para esta versión de los datos"""
+    if cursor is not None:
+        try:
+            check_cursor_version(cursor, version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def page_json(adapter: TypeAdapter, items: List, next_cursor: Optional[str]):
+    """Cuerpo de una página y, si hay más, el encabezado con el cursor siguiente"""
+    return adapter.dump_json(items), {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+async def run_limited(endpoint: str, fn, *args, **kwargs):
+    """Ejecutar una llamada síncrona al servicio en el pool del endpoint (503 si su cola está llena)"""
+    try:
+        return await limiters[endpoint].run(fn, *args, **kwargs)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+async def cached_build(endpoint: str, key, build):
+    """Respuesta en caché de `key`; si falta, se construye (y se calcula su ETag) en el pool del endpoint"""
+    encoded = response_cache.lookup(key)
+    if encoded is None:
+        encoded = await run_limited(endpoint, lambda: response_cache.store(key, build()))
+    return encoded
+
+async def respond_cached(endpoint: str, request: Request, encoded, cache: ResponseCache = response_cache,
+                         headers: Optional[Dict[str, str]] = None):
+    """Responder con `encoded`; la primera compresión de cada codificación también va al pool del endpoint"""
+    encoding = cache.negotiate_encoding(request, encoded)
+    if not encoded.has_variant(encoding):
+        await run_limited(endpoint, encoded.variant, encoding)
+    return cache.respond(request, encoded, headers)
+
+@router.on_event("startup")
+async def start_background_tasks():
+    """Preparar el pool de procesos y precalcular y refrescar periódicamente los snapshots de obstáculos"""
+    # Los procesos del pool abren las ciudades y arman sus índices mientras ya se atienden peticiones
+    geo_service.worker_pool.start()
+    obstacle_service.start_background_refresh()
+
+@router.on_event("shutdown")
+async def close_services():
+    """Cerrar conexiones HTTP compartidas y el pool de procesos al apagar la aplicación"""
+    await obstacle_service.aclose()
+    # Esperar a que salgan los procesos sin bloquear el loop
+    await asyncio.to_thread(geo_service.worker_pool.shutdown)
+    for limiter in limiters.values():
+        limiter.shutdown()
 
 @router.get("/cities", response_model=List[str])
 async def get_available_cities():
@@ -16,21 +148,30 @@ async def get_available_cities():
 
 @router.get("/cities/{city}/polygons", response_model=CityPolygon)
 async def get_city_polygons(
-    city: str = Path(..., description="Nombre de la ciudad (santiago, rancagua)")
+    city: str = Path(..., description="Nombre de la ciudad (santiago, rancagua)"),
+    simplify_tolerance: Optional[float] = Query(None, ge=0, description=SIMPLIFY_DESCRIPTION),
+    precision: Optional[int] = Query(None, ge=0, le=15, description=PRECISION_DESCRIPTION)
 ):
     """Obtener polígonos de límites de la ciudad"""
     try:
-        return geo_service.get_city_polygon(city)
+        return geo_service.get_city_polygon(city, simplify_tolerance, precision)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/cities/{city}/streets", response_model=List[StreetAxis])
 async def get_street_network(
+    request: Request,
     city: str = Path(..., description="Nombre de la ciudad"),
     bbox: Optional[str] = Query(None, description="Bounding box: 'min_lng,min_lat,max_lng,max_lat'"),
-    limit: Optional[int] = Query(100, description="Número máximo de calles a retornar")
+    limit: Optional[int] = Query(100, ge=1, description="Número máximo de calles a retornar"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    simplify_tolerance: Optional[float] = Query(None, ge=0, description=SIMPLIFY_DESCRIPTION),
+    precision: Optional[int] = Query(None, ge=0, le=15, description=PRECISION_DESCRIPTION)
 ):
-    """Obtener red de calles con ejes y veredas"""
+    """
+    Obtener red de calles con ejes y veredas, paginada en orden espacial.
+    Si hay más calles, el cursor de la página siguiente va en `X-Next-Cursor`.
+    """
     try:
         bbox_coords = None
         if bbox:
@@ -38,19 +179,35 @@ async def get_street_network(
             if len(coords) != 4:
                 raise HTTPException(status_code=400, detail="Bbox debe tener formato: min_lng,min_lat,max_lng,max_lat")
             bbox_coords = coords
+        version = geo_service.get_data_version(city)
+        check_cursor(cursor, version)
         
-        return geo_service.get_street_network(city, bbox_coords, limit)
+        key = ("streets", city.lower(), version,
+               tuple(bbox_coords) if bbox_coords else None, limit, cursor,
+               simplify_level(simplify_tolerance), precision)
+        encoded = await cached_build("streets", key, lambda: page_json(streets_json, *geo_service.get_street_page(
+            city, bbox_coords, limit, cursor, simplify_tolerance, precision
+        )))
+        return await respond_cached("streets", request, encoded)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/cities/{city}/sidewalks", response_model=List[SidewalkSegment])
 async def get_sidewalk_segments(
+    request: Request,
     city: str = Path(..., description="Nombre de la ciudad"),
     street_name: Optional[str] = Query(None, description="Filtrar por nombre de calle"),
     min_accessibility_score: Optional[float] = Query(0, ge=0, le=100, description="Score mínimo de accesibilidad"),
-    bbox: Optional[str] = Query(None, description="Bounding box: 'min_lng,min_lat,max_lng,max_lat'")
+    bbox: Optional[str] = Query(None, description="Bounding box: 'min_lng,min_lat,max_lng,max_lat'"),
+    limit: Optional[int] = Query(None, ge=1, description="Número máximo de veredas a retornar (sin límite por defecto)"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    simplify_tolerance: Optional[float] = Query(None, ge=0, description=SIMPLIFY_DESCRIPTION),
+    precision: Optional[int] = Query(None, ge=0, le=15, description=PRECISION_DESCRIPTION)
 ):
-    """Obtener segmentos de veredas con información de accesibilidad"""
+    """
+    Obtener segmentos de veredas con información de accesibilidad, paginados en orden
+    espacial. Si hay más veredas, el cursor de la página siguiente va en `X-Next-Cursor`.
+    """
     try:
         bbox_coords = None
         if bbox:
@@ -58,13 +215,23 @@ async def get_sidewalk_segments(
             if len(coords) != 4:
                 raise HTTPException(status_code=400, detail="Bbox debe tener formato: min_lng,min_lat,max_lng,max_lat")
             bbox_coords = coords
+        version = geo_service.get_data_version(city)
+        check_cursor(cursor, version)
             
-        return geo_service.get_sidewalk_segments(
+        key = ("sidewalks", city.lower(), version, street_name,
+               min_accessibility_score, tuple(bbox_coords) if bbox_coords else None, limit, cursor,
+               simplify_level(simplify_tolerance), precision)
+        encoded = await cached_build("sidewalks", key, lambda: page_json(sidewalks_json, *geo_service.get_sidewalk_page(
             city, 
             street_name=street_name,
             min_accessibility_score=min_accessibility_score,
-            bbox=bbox_coords
-        )
+            bbox=bbox_coords,
+            limit=limit,
+            cursor=cursor,
+            simplify_tolerance=simplify_tolerance,
+            precision=precision
+        )))
+        return await respond_cached("sidewalks", request, encoded)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -75,12 +242,54 @@ async def calculate_optimal_route(
 ):
     """Calcular ruta óptima entre dos puntos considerando accesibilidad"""
     try:
-        return geo_service.calculate_optimal_route(city, route_request)
+        return await run_limited("route", geo_service.calculate_optimal_route, city, route_request)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculando ruta: {str(e)}")
 
+@router.post("/cities/{city}/routes:batch", response_model=BatchRouteResponse)
+async def calculate_routes_batch(
+    city: str = Path(..., description="Nombre de la ciudad"),
+    batch_request: BatchRouteRequest = ...
+):
+    """
+    Calcular muchas rutas en una sola petición.
+    
+    Los puntos repetidos se proyectan una sola vez y las rutas se reparten entre
+    procesos. Cada elemento de la respuesta trae `route` o `error`, en el mismo orden.
+    """
+    try:
+        routes = await run_limited("routes_batch", geo_service.calculate_routes_batch, city, batch_request.routes)
+        return BatchRouteResponse(routes=routes)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando rutas: {str(e)}")
+
+@router.post("/cities/{city}/matrix", response_model=MatrixResponse)
+async def calculate_matrix(
+    city: str = Path(..., description="Nombre de la ciudad"),
+    matrix_request: MatrixRequest = ...
+):
+    """
+    Matriz origen-destino de costos, distancias (metros) y duraciones (segundos).
+    
+    Se ejecuta un Dijkstra uno-a-muchos por origen, repartiendo los orígenes entre procesos.
+    """
+    try:
+        return await run_limited("matrix", geo_service.calculate_matrix, city, matrix_request)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando matriz: {str(e)}")
+
 @router.get("/cities/{city}/streets/{street_id}/segments", response_model=List[SidewalkSegment])
 async def get_street_sidewalk_segments(
     city: str = Path(..., description="Nombre de la ciudad"),
@@ -94,7 +303,18 @@ async def get_street_sidewalk_segments(
 
 @router.get("/cities/{city}/obstacles", response_model=ObstaclesResponse)
 async def get_obstacles_with_accessibility(
-    city: str = Path(..., description="Nombre de la ciudad (santiago, rancagua)")
+    request: Request,
+    city: str = Path(..., description="Nombre de la ciudad (santiago, rancagua)"),
+    output_format: Optional[str] = Query(
+        None, alias="format",
+        description="'ndjson' o 'geojson-seq' para recibir una Feature por vereda en streaming"
+    ),
+    simplify_tolerance: Optional[float] = Query(None, ge=0, description=SIMPLIFY_DESCRIPTION),
+    precision: Optional[int] = Query(None, ge=0, le=15, description=PRECISION_DESCRIPTION),
+    grid_level: int = Query(
+        0, ge=0, lt=GRID_LEVELS,
+        description="Nivel de la cuadrícula: celdas de ~100 m × 2^nivel por lado (niveles altos para zoom alejado)"
+    )
 ):
     """
     Obtener obstáculos asociados a veredas con scores de accesibilidad
@@ -109,18 +329,97 @@ async def get_obstacles_with_accessibility(
     - 25-49: Baja accesibilidad
     - 0-24: Muy inaccesible
     
+    Los resultados se sirven desde un snapshot precalculado por ciudad que se refresca
+    en segundo plano; la cabecera `Age` indica su antigüedad en segundos y `data_version`
+    la versión del feed de origen. Soporta `If-None-Match` (ETag) y compresión gzip/brotli.
+    
     **Uso para mapa de calor:**
     Los datos retornados están listos para crear un mapa de calor:
     - `accessibility_score`: Usar para el color del mapa (verde=100, rojo=0)
     - `geometry`: Coordenadas de la vereda para dibujar en el mapa
     - `obstacles`: Lista detallada de obstáculos en cada vereda
     - `severity_breakdown`: Distribución de obstáculos por severidad
+    
+    **Streaming:** con `?format=ndjson` (o `Accept: application/x-ndjson`) se envía una
+    Feature GeoJSON por vereda y por línea, a medida que se generan; con
+    `?format=geojson-seq` (o `Accept: application/geo+json-seq`) cada registro además
+    va precedido del separador RS (RFC 8142). La versión del feed va en `X-Data-Version`.
+    
+    **Vistas alejadas:** `simplify_tolerance` (metros) y `precision` (decimales) reducen
+    las geometrías de las veredas; los scores y obstáculos no cambian.
+    
+    **Cuadrícula:** las veredas son celdas fijas de una cuadrícula global, con ids
+    estables (`sidewalk_{nivel}_{fila}_{columna}`) entre versiones del feed. Con
+    `grid_level` se piden celdas más grandes, cada una agrupa 2^nivel × 2^nivel
+    celdas del nivel 0, para vistas alejadas.
     """
+    if output_format is None:
+        output_format = stream_format(request.headers.get("accept", ""))
+    if output_format is not None and output_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Formato debe ser uno de: {', '.join(STREAM_MEDIA_TYPES)}")
+    
     try:
+        if output_format is not None:
+            stream = await obstacle_service.open_sidewalk_stream(city, simplify_tolerance, precision, grid_level)
+            headers = {"X-Data-Version": stream.version}
+            if stream.age is not None:
+                headers["Age"] = str(int(stream.age))
+            return StreamingResponse(
+                stream.lines(record_separator=output_format == "geojson-seq"),
+                media_type=STREAM_MEDIA_TYPES[output_format],
+                headers=headers
+            )
+        
         # Obtener geometrías de veredas reales si están disponibles
         # Por ahora usamos una cuadrícula automática
-        return await obstacle_service.get_obstacles_with_sidewalks(city)
+        snapshot = await obstacle_service.get_snapshot(city)
+        level_snapshot = await obstacle_service.grid_level_snapshot(snapshot, grid_level)
+        key = ("obstacles", city.lower(), snapshot.version, grid_level, simplify_level(simplify_tolerance), precision)
+        encoded = await cached_build(
+            "obstacles", key, lambda: level_snapshot.response_json(simplify_tolerance, precision)
+        )
+        return await respond_cached("obstacles", request, encoded, headers={"Age": str(int(snapshot.age()))})
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo obstáculos: {str(e)}")
+
+@router.get("/cities/{city}/tiles/{z}/{x}/{y}.mvt")
+async def get_accessibility_tile(
+    request: Request,
+    city: str = Path(..., description="Nombre de la ciudad (santiago, rancagua)"),
+    z: int = Path(..., description="Nivel de zoom"),
+    x: int = Path(..., description="Columna de la tesela"),
+    y: int = Path(..., description="Fila de la tesela")
+):
+    """
+    Tesela vectorial (Mapbox Vector Tile) del mapa de calor de accesibilidad
+    
+    Capa `sidewalks` con las veredas recortadas y simplificadas según el zoom, y los
+    atributos `sidewalk_id`, `accessibility_score` y `obstacle_count`. Se genera desde
+    el mismo snapshot puntuado de `/obstacles`; las teselas de zoom bajo se pregeneran
+    y todas quedan en caché (ETag, gzip/brotli).
+    """
+    if not 0 <= z <= 22 or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=400, detail=f"Tesela {z}/{x}/{y} fuera de rango")
+    
+    try:
+        snapshot = await obstacle_service.get_snapshot(city)
+        key = vector_tile_service.tile_key(city.lower(), snapshot.version, z, x, y)
+        encoded = vector_tile_service.cache.lookup(key)
+        if encoded is None:
+            # La tesela falta: se genera en el pool de teselas, fuera del event loop
+            encoded = await run_limited(
+                "tiles", vector_tile_service.get_tile, city.lower(), snapshot.version,
+                snapshot.response.sidewalks, z, x, y
+            )
+        return await respond_cached("tiles", request, encoded, cache=vector_tile_service.cache,
+                                    headers={"Age": str(int(snapshot.age()))})
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo obstáculos: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generando tesela: {str(e)}")
@@ -0,0 +1,109 @@
+import hashlib
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.models import CityPolygon, SidewalkSegment, StreetAxis
+from app.services.name_index import NameIndex
+from app.services.routing_graph import SidewalkGraph
+from app.services.simplification import GeometryLevels
+from app.services.spatial_order import SpatialOrder
+from app.services.spatial_index import LineIndex
+
+# Campos de StreetAxis con veredas, en el orden en que se indexan
+SIDEWALK_FIELDS = ("sidewalk_west", "sidewalk_east", "sidewalk_north", "sidewalk_south")
+
+
+class CityData:
+    """
+    Datos de una ciudad en memoria junto con los índices que se arman al cargarla:
+    calles por id, veredas en una lista plana, índices espaciales,
+    geometrías simplificadas por nivel y el grafo de ruteo.
+    """
+
+    def __init__(self, polygon: CityPolygon, streets: List[StreetAxis], version: Optional[str] = None):
+        self.polygon = polygon
+        self.streets = streets
+        self.version = version or self._compute_version()
+
+        # Calles por id (si un id se repite, gana la primera) y por nombre (ver app/services/name_index.py)
+        self.streets_by_id: Dict[str, int] = {}
+        for position, street in enumerate(streets):
+            self.streets_by_id.setdefault(street.id, position)
+        self.name_index = NameIndex.from_names([street.name for street in streets])
+
+        # Veredas en una lista plana y, por calle, (campo, posición en esa lista)
+        self.sidewalk_entries: List[Tuple[StreetAxis, SidewalkSegment]] = []
+        self.street_sidewalks: List[List[Tuple[str, int]]] = []
+        for street in streets:
+            fields = []
+            for field in SIDEWALK_FIELDS:
+                segment = getattr(street, field)
+                if segment:
+                    fields.append((field, len(self.sidewalk_entries)))
+                    self.sidewalk_entries.append((street, segment))
+            self.street_sidewalks.append(fields)
+
+        # Índices espaciales para las consultas por bbox; las geometrías exactas
+        # (y los trigramas de los nombres) también se preparan al cargar, no en la primera consulta
+        self.street_index = LineIndex([street.geometry.coordinates for street in streets])
+        self.sidewalk_index = LineIndex([segment.geometry.coordinates for _, segment in self.sidewalk_entries])
+        self.street_index.geometries
+        self.sidewalk_index.geometries
+        self.name_index.postings
+        # Orden de Hilbert para paginar (ver app/services/spatial_order.py)
+        self.street_order = SpatialOrder(self.street_index, self.version)
+        self.sidewalk_order = SpatialOrder(self.sidewalk_index, self.version)
+
+        # Geometrías simplificadas por nivel de tolerancia (ver app/services/simplification.py)
+        self.geometry_levels: Dict[str, GeometryLevels] = {
+            "streets": GeometryLevels([street.geometry.coordinates for street in streets]),
+            "sidewalks": GeometryLevels([segment.geometry.coordinates for _, segment in self.sidewalk_entries]),
+            "polygon": GeometryLevels([polygon.geometry.coordinates], kind="polygon")
+        }
+
+        # Grafo de veredas, construido una sola vez
+        self.graph = SidewalkGraph.from_streets(streets)
+
+    @classmethod
+    def from_parts(cls, polygon: CityPolygon, streets: Sequence[StreetAxis], version: str,
+                   streets_by_id: Mapping[str, int], name_index: NameIndex,
+                   sidewalk_entries: Sequence[Tuple[StreetAxis, SidewalkSegment]],
+                   street_sidewalks: Sequence[List[Tuple[str, int]]], street_index: LineIndex,
+                   sidewalk_index: LineIndex, geometry_levels: Dict[str, GeometryLevels],
+                   graph: SidewalkGraph) -> "CityData":
+        """
+        CityData con los índices ya armados, sin recorrer los modelos
+        (p. ej. al abrir un snapshot, ver app/services/city_snapshot.py)
+        """
+        data = cls.__new__(cls)
+        data.polygon = polygon
+        data.streets = streets
+        data.version = version
+        data.streets_by_id = streets_by_id
+        data.name_index = name_index
+        data.sidewalk_entries = sidewalk_entries
+        data.street_sidewalks = street_sidewalks
+        data.street_index = street_index
+        data.sidewalk_index = sidewalk_index
+        data.street_order = SpatialOrder(street_index, version)
+        data.sidewalk_order = SpatialOrder(sidewalk_index, version)
+        data.geometry_levels = geometry_levels
+        data.graph = graph
+        return data
+
+    def _compute_version(self) -> str:
+        """Hash del contenido de la ciudad"""
+        digest = hashlib.sha1(self.polygon.model_dump_json().encode())
+        for street in self.streets:
+            digest.update(street.model_dump_json().encode())
+        return digest.hexdigest()[:16]
+
+    def sidewalks_named(self, query: str) -> List[int]:
+        """Posiciones (ordenadas) de las veredas de las calles cuyo nombre contiene `query`"""
+        street_sidewalks = self.street_sidewalks
+        return [position for street in self.name_index.search(query).tolist()
+                for _, position in street_sidewalks[street]]
+
+    def street(self, street_id: str) -> Optional[StreetAxis]:
+        """Calle por id (None si no existe)"""
+        position = self.streets_by_id.get(street_id)
+        return None if position is None else self.streets[position]
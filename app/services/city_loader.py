@@ -0,0 +1,427 @@
+"""
+Carga de datos reales de ciudades desde archivos GeoJSON o GeoPackage.
+
+Cada ciudad es un subdirectorio de `directory` (el nombre del directorio es el
+nombre de la ciudad en la API) con tres capas, en GeoJSON (`.geojson`/`.json`)
+o GeoPackage (`.gpkg`):
+
+    <ciudad>/polygon.geojson    Límite de la ciudad (Polygon/MultiPolygon; si hay
+                                varias features, p. ej. unidades vecinales, se unen)
+    <ciudad>/streets.geojson    Ejes de calle (LineString/MultiLineString)
+    <ciudad>/sidewalks.geojson  Veredas (LineString/MultiLineString)
+
+Propiedades reconocidas (todas opcionales):
+
+    polygon:   city_name, population
+    streets:   id, name, orientation ("norte_sur"/"este_oeste"), intersections
+    sidewalks: id, street_id, side, start_intersection, end_intersection,
+               accessibility_score, width_meters, surface_type
+
+Lo que falta se deriva de la geometría: la orientación por el rumbo del eje, las
+intersecciones con un índice espacial, la calle de una vereda por cercanía y el
+lado por la posición de la vereda respecto del eje. Las capas en otro sistema de
+referencia (p. ej. SIRGAS 2000, EPSG:4674) se reproyectan a WGS84.
+
+Los GeoJSON se leen por trozos con el parser incremental, sin cargar el
+documento completo; los GeoPackage se leen con geopandas.
+"""
+import hashlib
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.models import CityPolygon, GeoJSONLineString, GeoJSONPolygon, SidewalkSegment, StreetAxis
+from app.services.geodesy import haversine_distances
+from app.services.json_stream import FeatureStreamParser
+
+logger = logging.getLogger(__name__)
+
+LAYERS = ("polygon", "streets", "sidewalks")
+EXTENSIONS = (".geojson", ".json", ".gpkg")
+# Tamaño de los trozos al leer un GeoJSON
+READ_CHUNK_BYTES = 1 << 20
+# Distancia (metros) a la que se buscan calles candidatas para una vereda sin street_id
+SIDEWALK_SEARCH_METERS = 50.0
+# Sistemas de referencia que ya están en longitud/latitud WGS84
+WGS84_NAMES = {"EPSG:4326", "OGC:CRS84", "urn:ogc:def:crs:OGC:1.3:CRS84", "urn:ogc:def:crs:EPSG::4326"}
+
+# Lados de vereda aceptados -> campo de StreetAxis
+SIDE_FIELDS = {
+    "poniente": "sidewalk_west", "oeste": "sidewalk_west", "west": "sidewalk_west", "w": "sidewalk_west",
+    "oriente": "sidewalk_east", "este": "sidewalk_east", "east": "sidewalk_east", "e": "sidewalk_east",
+    "norte": "sidewalk_north", "north": "sidewalk_north", "n": "sidewalk_north",
+    "sur": "sidewalk_south", "south": "sidewalk_south", "s": "sidewalk_south",
+}
+# Campo de StreetAxis -> valor de `side` en SidewalkSegment
+FIELD_SIDES = {"sidewalk_west": "poniente", "sidewalk_east": "oriente",
+               "sidewalk_north": "norte", "sidewalk_south": "sur"}
+
+
+class FeatureTable:
+    """Geometrías (shapely, en WGS84) y propiedades de una capa"""
+
+    def __init__(self, geometries: np.ndarray, properties: List[Dict[str, Any]]):
+        self.geometries = geometries
+        self.properties = properties
+
+    def __len__(self) -> int:
+        return len(self.geometries)
+
+
+def load_cities(directory: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Cargar todas las ciudades de `directory`.
+    Retorna {ciudad: {"polygon": CityPolygon, "streets": [StreetAxis], "version": str}}.
+    """
+    cities = {city: load_city(city_dir) for city, city_dir in city_directories(directory).items()}
+    if not cities:
+        raise ValueError(f"No se encontraron ciudades en '{directory}'")
+    return cities
+
+
+def city_directories(directory: str) -> Dict[str, str]:
+    """Directorio de cada ciudad de `directory` (las que tienen capa 'polygon'), por nombre en minúsculas"""
+    cities = {}
+    for name in sorted(os.listdir(directory)):
+        city_dir = os.path.join(directory, name)
+        if os.path.isdir(city_dir) and _layer_path(city_dir, "polygon"):
+            cities[name.lower()] = city_dir
+    return cities
+
+
+def city_version(city_dir: str) -> str:
+    """Versión de los datos de una ciudad (la misma que entrega `load_city`) sin procesar los archivos"""
+    digest = hashlib.sha1()
+    for layer in LAYERS:
+        path = _layer_path(city_dir, layer)
+        if path:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def load_city(city_dir: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Cargar una ciudad desde su directorio (ver el formato al inicio del módulo)"""
+    name = name or os.path.basename(os.path.normpath(city_dir))
+    paths = {layer: _layer_path(city_dir, layer) for layer in LAYERS}
+    if paths["polygon"] is None:
+        raise ValueError(f"Falta la capa 'polygon' de la ciudad en '{city_dir}'")
+
+    digest = hashlib.sha1()
+    tables = {}
+    for layer, path in paths.items():
+        tables[layer] = read_features(path, layer, digest) if path else None
+
+    polygon = build_city_polygon(tables["polygon"], name)
+    streets = build_streets(name.lower(), tables["streets"], tables["sidewalks"]) if tables["streets"] else []
+    return {"polygon": polygon, "streets": streets, "version": digest.hexdigest()[:16]}
+
+
+def _layer_path(city_dir: str, layer: str) -> Optional[str]:
+    for extension in EXTENSIONS:
+        path = os.path.join(city_dir, layer + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# --- Lectura y reproyección ---
+
+def read_features(path: str, layer: Optional[str] = None, digest=None) -> FeatureTable:
+    """
+    Leer una capa GeoJSON o GeoPackage y reproyectarla a WGS84.
+    Si se pasa `digest` (hashlib), se actualiza con el contenido del archivo.
+    """
+    if path.lower().endswith(".gpkg"):
+        if digest is not None:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+        return _read_geopackage(path, layer)
+    return _read_geojson(path, digest)
+
+
+def _read_geojson(path: str, digest=None) -> FeatureTable:
+    geometries: List[Any] = []
+    properties: List[Dict[str, Any]] = []
+
+    def collect(feature: Dict[str, Any]):
+        geometry = feature.get("geometry") if isinstance(feature, dict) else None
+        if not geometry:
+            return
+        geometries.append(shapely.geometry.shape(geometry))
+        properties.append(feature.get("properties") or {})
+
+    parser = FeatureStreamParser(transform=collect)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            if digest is not None:
+                digest.update(chunk)
+            parser.feed(chunk)
+    parser.close()
+
+    crs = parser.members.get("crs")
+    crs_name = crs.get("properties", {}).get("name") if isinstance(crs, dict) else None
+    return FeatureTable(to_wgs84(np.array(geometries, dtype=object), crs_name), properties)
+
+
+def _read_geopackage(path: str, layer: Optional[str]) -> FeatureTable:
+    import geopandas
+
+    frame = geopandas.read_file(path, layer=layer)
+    if frame.crs is not None and not frame.crs.equals("EPSG:4326"):
+        frame = frame.to_crs("EPSG:4326")
+    frame = frame[~frame.geometry.isna()]
+    columns = [column for column in frame.columns if column != frame.geometry.name]
+    records = frame[columns].astype(object).where(frame[columns].notna(), None).to_dict("records")
+    return FeatureTable(np.asarray(frame.geometry.values, dtype=object), records)
+
+
+def to_wgs84(geometries: np.ndarray, crs: Optional[str]) -> np.ndarray:
+    """Reproyectar geometrías desde `crs` (None: ya están en WGS84)"""
+    if not crs or crs in WGS84_NAMES or not len(geometries):
+        return geometries
+    from pyproj import CRS, Transformer
+
+    source = CRS.from_user_input(crs)
+    if source.equals(CRS.from_epsg(4326)):
+        return geometries
+    transformer = Transformer.from_crs(source, "EPSG:4326", always_xy=True)
+
+    def transform(xy: np.ndarray) -> np.ndarray:
+        lngs, lats = transformer.transform(xy[:, 0], xy[:, 1])
+        return np.column_stack((lngs, lats))
+
+    return shapely.transform(geometries, transform)
+
+
+# --- Construcción de modelos ---
+
+def build_city_polygon(table: FeatureTable, name: str) -> CityPolygon:
+    """Límite de la ciudad: unión de todas las features (la parte más grande si quedan varias)"""
+    from pyproj import Geod
+
+    union = shapely.union_all(table.geometries)
+    parts = [part for part in shapely.get_parts(union) if part.geom_type == "Polygon"]
+    if not parts:
+        raise ValueError(f"La capa 'polygon' de '{name}' no contiene polígonos")
+    if len(parts) > 1:
+        logger.warning("El límite de '%s' tiene %d partes; se usa la más grande", name, len(parts))
+    polygon = max(parts, key=lambda part: part.area)
+
+    area_m2, _ = Geod(ellps="WGS84").geometry_area_perimeter(polygon)
+    populations = [p.get("population") for p in table.properties if p.get("population") is not None]
+    city_name = next((p["city_name"] for p in table.properties if p.get("city_name")), name.title())
+
+    rings = [polygon.exterior] + list(polygon.interiors)
+    return CityPolygon(
+        city_name=city_name,
+        geometry=GeoJSONPolygon(coordinates=[shapely.get_coordinates(ring).tolist() for ring in rings]),
+        area_km2=round(abs(area_m2) / 1e6, 3),
+        population=int(sum(populations)) if populations else None
+    )
+
+
+def build_streets(city: str, streets: FeatureTable,
+                  sidewalks: Optional[FeatureTable] = None) -> List[StreetAxis]:
+    """Ejes de calle con sus veredas asociadas"""
+    lines, line_properties, ids = _explode_lines(streets, f"{city}_calle")
+    if not len(lines):
+        return []
+
+    # Plano local en metros aproximados para rumbos, cercanía y lados
+    origin_lat = float(np.mean(shapely.get_coordinates(lines)[:, 1]))
+    planar = _to_local_plane(lines, origin_lat)
+
+    names = [str(p.get("name") or "Sin nombre") for p in line_properties]
+    orientations = [p.get("orientation") or _orientation(line) for p, line in zip(line_properties, planar)]
+    intersections = _intersections(planar, ids, line_properties)
+
+    fields: List[Dict[str, SidewalkSegment]] = [{} for _ in range(len(lines))]
+    if sidewalks is not None and len(sidewalks):
+        _attach_sidewalks(city, sidewalks, lines, planar, ids, names, orientations, origin_lat, fields)
+
+    return [
+        StreetAxis(
+            id=ids[i],
+            name=names[i],
+            geometry=GeoJSONLineString(coordinates=shapely.get_coordinates(lines[i]).tolist()),
+            orientation=orientations[i],
+            intersections=intersections[i],
+            **fields[i]
+        )
+        for i in range(len(lines))
+    ]
+
+
+def _explode_lines(table: FeatureTable, id_prefix: str) -> Tuple[np.ndarray, List[Dict[str, Any]], List[str]]:
+    """
+    Líneas simples de una capa: las MultiLineString se unen con line_merge y, si
+    siguen teniendo varias partes, cada parte pasa a ser una línea con id `<id>_<k>`.
+    """
+    geometries = table.geometries
+    multi = shapely.get_type_id(geometries) == shapely.GeometryType.MULTILINESTRING
+    if multi.any():
+        geometries = geometries.copy()
+        geometries[multi] = shapely.line_merge(geometries[multi])
+    parts, owners = shapely.get_parts(geometries, return_index=True)
+    keep = (shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING) & (shapely.get_num_points(parts) >= 2)
+    parts, owners = parts[keep], owners[keep]
+
+    part_counts = np.bincount(owners, minlength=len(geometries))
+    seen: Dict[int, int] = {}
+    properties, ids = [], []
+    for owner in owners.tolist():
+        props = table.properties[owner]
+        base_id = str(props["id"]) if props.get("id") is not None else f"{id_prefix}_{owner}"
+        k = seen[owner] = seen.get(owner, 0) + 1
+        ids.append(base_id if part_counts[owner] == 1 else f"{base_id}_{k}")
+        properties.append(props)
+    return parts, properties, ids
+
+
+def _to_local_plane(geometries: np.ndarray, origin_lat: float) -> np.ndarray:
+    """Proyección equirectangular local (metros aproximados) para comparar distancias"""
+    scale_x = 111_320.0 * math.cos(math.radians(origin_lat))
+
+    def transform(xy: np.ndarray) -> np.ndarray:
+        return np.column_stack((xy[:, 0] * scale_x, xy[:, 1] * 111_320.0))
+
+    return shapely.transform(geometries, transform)
+
+
+def _orientation(line) -> str:
+    """'norte_sur' o 'este_oeste' según el rumbo entre los extremos del eje"""
+    coords = shapely.get_coordinates(line)
+    dx, dy = coords[-1] - coords[0]
+    return "este_oeste" if abs(dx) >= abs(dy) else "norte_sur"
+
+
+def _intersections(planar: np.ndarray, ids: List[str], properties: List[Dict[str, Any]]) -> List[List[str]]:
+    """Ids de las calles que cruzan o tocan cada eje (salvo que vengan en los datos)"""
+    tree = STRtree(planar)
+    left, right = tree.query(planar, predicate="intersects")
+    found: List[List[str]] = [[] for _ in range(len(planar))]
+    for a, b in zip(left.tolist(), right.tolist()):
+        if a != b:
+            found[a].append(ids[b])
+
+    result = []
+    for props, computed in zip(properties, found):
+        given = props.get("intersections")
+        if isinstance(given, str):
+            given = [item.strip() for item in given.split(",") if item.strip()]
+        result.append([str(item) for item in given] if given else computed)
+    return result
+
+
+def _attach_sidewalks(city: str, table: FeatureTable, lines: np.ndarray, planar: np.ndarray,
+                      ids: List[str], names: List[str], orientations: List[str], origin_lat: float,
+                      fields: List[Dict[str, SidewalkSegment]]):
+    """Asociar cada vereda a su calle y lado; completar `fields` por calle"""
+    sidewalks, properties, sidewalk_ids = _explode_lines(table, f"{city}_vereda")
+    if not len(sidewalks):
+        return
+    sidewalk_planar = _to_local_plane(sidewalks, origin_lat)
+    midpoints = shapely.line_interpolate_point(sidewalk_planar, 0.5, normalized=True)
+
+    # Calle de cada vereda: la indicada en `street_id` o la más cercana
+    street_positions = {street_id: i for i, street_id in reversed(list(enumerate(ids)))}
+    owners = np.full(len(sidewalks), -1, dtype=np.int64)
+    for i, props in enumerate(properties):
+        street_id = props.get("street_id")
+        if street_id is not None:
+            owners[i] = street_positions.get(str(street_id), -1)
+    missing = np.flatnonzero(owners < 0)
+    if len(missing):
+        owners[missing] = _nearest_streets(sidewalk_planar[missing], planar)
+
+    # Lado: el indicado en `side` o la posición del punto medio respecto del eje
+    on_axis = shapely.line_interpolate_point(planar[owners], shapely.line_locate_point(planar[owners], midpoints))
+    offsets = shapely.get_coordinates(midpoints) - shapely.get_coordinates(on_axis)
+
+    lengths = _lengths_meters(sidewalks)
+    grouped: Dict[Tuple[int, str], List[int]] = {}
+    for i, props in enumerate(properties):
+        owner = int(owners[i])
+        field = SIDE_FIELDS.get(str(props.get("side") or "").strip().lower())
+        if field is None:
+            dx, dy = offsets[i]
+            if orientations[owner] == "norte_sur":
+                field = "sidewalk_east" if dx >= 0 else "sidewalk_west"
+            else:
+                field = "sidewalk_north" if dy >= 0 else "sidewalk_south"
+        grouped.setdefault((owner, field), []).append(i)
+
+    dropped = 0
+    for (owner, field), members in grouped.items():
+        # Una calle tiene una vereda por lado: los tramos de un mismo lado se unen
+        # y, si no forman una sola línea, se conserva la más larga
+        if len(members) == 1:
+            chosen, geometry = members[0], sidewalks[members[0]]
+        else:
+            merged = shapely.line_merge(shapely.union_all(sidewalks[members]))
+            chosen = max(members, key=lambda i: lengths[i])
+            if merged.geom_type == "LineString":
+                geometry = merged
+            else:
+                geometry = sidewalks[chosen]
+                dropped += len(members) - 1
+        props = properties[chosen]
+        length = lengths[chosen] if geometry is sidewalks[chosen] else float(_lengths_meters(np.array([geometry]))[0])
+        score = props.get("accessibility_score")
+        fields[owner][field] = SidewalkSegment(
+            id=sidewalk_ids[chosen],
+            street_name=names[owner],
+            side=FIELD_SIDES[field],
+            start_intersection=str(props.get("start_intersection") or ""),
+            end_intersection=str(props.get("end_intersection") or ""),
+            geometry=GeoJSONLineString(coordinates=shapely.get_coordinates(geometry).tolist()),
+            length_meters=round(length, 2),
+            accessibility_score=100.0 if score is None else float(score),
+            width_meters=None if props.get("width_meters") is None else float(props["width_meters"]),
+            surface_type=props.get("surface_type")
+        )
+    if dropped:
+        logger.warning("%s: %d veredas descartadas por repetir calle y lado sin formar una línea continua",
+                       city, dropped)
+
+
+def _nearest_streets(sidewalks: np.ndarray, streets: np.ndarray) -> np.ndarray:
+    """
+    Calle más cercana a cada vereda (en el plano local): la de menor distancia
+    media a cinco puntos de la vereda, entre las calles a menos de
+    `SIDEWALK_SEARCH_METERS`; así una vereda que termina en un cruce no se asigna
+    a la calle transversal. Si no hay ninguna a esa distancia, la más cercana.
+    """
+    tree = STRtree(streets)
+    samples = np.stack([shapely.line_interpolate_point(sidewalks, f, normalized=True)
+                        for f in np.linspace(0, 1, 5)], axis=1)
+    owners = np.full(len(sidewalks), -1, dtype=np.int64)
+
+    sidewalk_index, street_index = tree.query(sidewalks, predicate="dwithin", distance=SIDEWALK_SEARCH_METERS)
+    if len(sidewalk_index):
+        cost = shapely.distance(samples[sidewalk_index], streets[street_index][:, None]).mean(axis=1)
+        order = np.lexsort((cost, sidewalk_index))
+        first = np.concatenate(([True], sidewalk_index[order][1:] != sidewalk_index[order][:-1]))
+        owners[sidewalk_index[order][first]] = street_index[order][first]
+
+    far = np.flatnonzero(owners < 0)
+    if len(far):
+        nearest = tree.query_nearest(sidewalks[far], all_matches=False)
+        owners[far[nearest[0]]] = nearest[1]
+    return owners
+
+
+def _lengths_meters(lines: np.ndarray) -> np.ndarray:
+    """Largo geodésico (haversine) de cada línea"""
+    coords, owners = shapely.get_coordinates(lines, return_index=True)
+    same_line = owners[1:] == owners[:-1]
+    steps = haversine_distances(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0])
+    return np.bincount(owners[1:][same_line], weights=steps[same_line], minlength=len(lines))
@@ -0,0 +1,302 @@
+"""
+Snapshot binario de una ciudad ya indexada, para que un worker arranque en
+milisegundos en vez de volver a leer y procesar el GeoJSON/GeoPackage.
+
+El archivo tiene un encabezado JSON (formato, versión de los datos, polígono,
+tabla de arrays) seguido de los arrays numéricos alineados a 64 bytes:
+coordenadas de calles y veredas, niveles de simplificación, grafo de ruteo y
+los modelos de cada calle como JSON (sin las coordenadas). Al abrirlo los arrays se mapean en memoria
+(mmap, solo lectura) y los modelos Pydantic se construyen recién cuando se piden,
+así que el costo de arranque no depende del tamaño de la ciudad y los procesos
+que comparten el archivo comparten también sus páginas.
+
+Los STRtree de shapely (LineIndex de calles y veredas, y el de aristas del grafo)
+no se pueden serializar ni mapear, así que no van en el archivo: los de calles y
+veredas se reconstruyen al abrir a partir de los arrays mapeados (~35 ms para
+58 mil veredas) y el del grafo recién en el primer snap de ruteo.
+
+Generación: python precompute.py snapshot <directorio_salida>
+"""
+import json
+import logging
+import mmap
+import os
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.models import CityPolygon, SidewalkSegment, StreetAxis
+from app.services.city_data import SIDEWALK_FIELDS, CityData
+from app.services.name_index import NameIndex
+from app.services.routing_graph import SidewalkGraph
+from app.services.simplification import GeometryLevels
+from app.services.spatial_index import CoordinateColumn, LineIndex
+
+logger = logging.getLogger(__name__)
+
+# Formato del archivo (cambiar si cambia su contenido)
+FORMAT_VERSION = 2
+MAGIC = b"DCSNAP01"
+ALIGNMENT = 64
+# Campos que no se repiten en el JSON de cada calle
+RECORD_EXCLUDE = {"geometry": {"coordinates"}, **{field: {"geometry": {"coordinates"}} for field in SIDEWALK_FIELDS}}
+
+
+class StringColumn(Sequence):
+    """Textos UTF-8 concatenados en un solo array de bytes más los límites de cada uno"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: List[str]) -> "StringColumn":
+        encoded = [text.encode() for text in strings]
+        counts = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, np.concatenate(([0], np.cumsum(counts))))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return self.blob[self.offsets[position]:self.offsets[position + 1]].tobytes().decode()
+
+
+class LazyStreets(Sequence):
+    """
+    Calles que se validan la primera vez que se piden, desde su JSON sin coordenadas
+    más las coordenadas de la calle y de sus veredas (que ya están en los arrays)
+    """
+
+    def __init__(self, records: StringColumn, street_lines: CoordinateColumn,
+                 sidewalk_lines: CoordinateColumn, street_sidewalks: "LazyStreetSidewalks"):
+        self.records = records
+        self.street_lines = street_lines
+        self.sidewalk_lines = sidewalk_lines
+        self.street_sidewalks = street_sidewalks
+        self._cache: Dict[int, StreetAxis] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, position: int) -> StreetAxis:
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        street = self._cache.get(position)
+        if street is None:
+            record = json.loads(self.records[position])
+            record["geometry"]["coordinates"] = self.street_lines[position]
+            for field, sidewalk_position in self.street_sidewalks[position]:
+                record[field]["geometry"]["coordinates"] = self.sidewalk_lines[sidewalk_position]
+            street = self._cache[position] = StreetAxis.model_validate(record)
+        return street
+
+
+class LazySidewalkEntries(Sequence):
+    """(calle, vereda) de la lista plana de veredas, a partir de la calle y el campo de cada una"""
+
+    def __init__(self, streets: LazyStreets, sidewalk_street: np.ndarray, sidewalk_field: np.ndarray):
+        self.streets = streets
+        self.sidewalk_street = sidewalk_street
+        self.sidewalk_field = sidewalk_field
+
+    def __len__(self) -> int:
+        return len(self.sidewalk_street)
+
+    def __getitem__(self, position: int) -> Tuple[StreetAxis, SidewalkSegment]:
+        street = self.streets[int(self.sidewalk_street[position])]
+        return street, getattr(street, SIDEWALK_FIELDS[self.sidewalk_field[position]])
+
+
+class LazyStreetSidewalks(Sequence):
+    """(campo, posición) de las veredas de cada calle, que ocupan un rango contiguo de la lista plana"""
+
+    def __init__(self, offsets: np.ndarray, sidewalk_field: np.ndarray):
+        self.offsets = offsets
+        self.sidewalk_field = sidewalk_field
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> List[Tuple[str, int]]:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return [(SIDEWALK_FIELDS[field], start + k) for k, field in enumerate(self.sidewalk_field[start:end].tolist())]
+
+
+class LazyIdIndex(Mapping):
+    """Posición de cada calle por id (si un id se repite, gana la primera); se arma en el primer uso"""
+
+    def __init__(self, ids: StringColumn):
+        self.ids = ids
+        self._index: Optional[Dict[str, int]] = None
+
+    @property
+    def index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {}
+            for position, street_id in enumerate(self.ids):
+                self._index.setdefault(street_id, position)
+        return self._index
+
+    def __getitem__(self, street_id: str) -> int:
+        return self.index[street_id]
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+def snapshot_path(directory: str, city: str) -> str:
+    """Ruta del snapshot de una ciudad"""
+    return os.path.join(directory, f"{city}.snapshot")
+
+
+def find_snapshots(directory: str) -> Dict[str, str]:
+    """Snapshots de `directory` por ciudad"""
+    suffix = ".snapshot"
+    return {name[:-len(suffix)].lower(): os.path.join(directory, name)
+            for name in sorted(os.listdir(directory)) if name.endswith(suffix)}
+
+
+def _snapshot_arrays(data: CityData) -> Dict[str, np.ndarray]:
+    """Arrays que se guardan en el snapshot, por nombre"""
+    arrays: Dict[str, np.ndarray] = {}
+
+    def add_strings(name: str, strings: List[str]):
+        column = StringColumn.from_strings(strings)
+        arrays[f"{name}.blob"], arrays[f"{name}.offsets"] = column.blob, column.offsets
+
+    def add_lines(name: str, lines: List[List[List[float]]]):
+        column = CoordinateColumn.from_lists(lines)
+        arrays[f"{name}.vertices"], arrays[f"{name}.offsets"] = column.vertices, column.offsets
+
+    # Modelos sin coordenadas: se reponen desde street_lines/sidewalk_lines al validarlos
+    streets = data.streets
+    add_strings("street_records", [street.model_dump_json(exclude=RECORD_EXCLUDE) for street in streets])
+    add_strings("street_ids", [street.id for street in streets])
+    add_strings("street_names", list(data.name_index.names))
+    arrays["street_name_codes"] = data.name_index.codes
+    add_lines("street_lines", [street.geometry.coordinates for street in streets])
+    add_lines("sidewalk_lines", [segment.geometry.coordinates for _, segment in data.sidewalk_entries])
+
+    # Veredas: calle y campo de cada una; las de una calle son contiguas
+    counts = [len(fields) for fields in data.street_sidewalks]
+    arrays["sidewalk_street"] = np.repeat(np.arange(len(streets), dtype=np.int64), counts)
+    arrays["sidewalk_field"] = np.array([
+        SIDEWALK_FIELDS.index(field) for fields in data.street_sidewalks for field, _ in fields
+    ], dtype=np.uint8)
+    arrays["street_sidewalk_offsets"] = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    for name, array in data.graph.to_arrays().items():
+        arrays[f"graph.{name}"] = array
+    add_strings("graph.sidewalk_ids", list(data.graph.sidewalk_ids))
+
+    for layer in ("streets", "sidewalks"):
+        for level, (vertices, bounds) in data.geometry_levels[layer].line_levels().items():
+            arrays[f"levels.{layer}.{level!r}.vertices"] = vertices
+            arrays[f"levels.{layer}.{level!r}.bounds"] = bounds
+    return arrays
+
+
+def save_snapshot(data: CityData, path: str):
+    """Guardar el snapshot de una ciudad (se escribe en un temporal y se reemplaza)"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in _snapshot_arrays(data).items()}
+    table, offset = {}, 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "version": data.version,
+        "polygon": data.polygon.model_dump(mode="json"),
+        "obstacle_types": list(data.graph.obstacle_types),
+        "levels": {layer: list(data.geometry_levels[layer].line_levels()) for layer in ("streets", "sidewalks")},
+        "arrays": table
+    }).encode()
+    start = _data_start(len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(b"\0" * (start - len(MAGIC) - 8 - len(header)))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % ALIGNMENT))
+    os.replace(tmp_path, path)
+
+
+def _data_start(header_length: int) -> int:
+    return -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+
+def open_snapshot(path: str) -> Optional[CityData]:
+    """
+    Abrir un snapshot mapeándolo en memoria; None si el formato no coincide.
+    
+    Lo único que se construye acá son los STRtree de `street_index` y `sidewalk_index`
+    (a partir de las coordenadas mapeadas), el resto queda perezoso.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        logger.warning("'%s' no es un snapshot de ciudad; se ignora", path)
+        return None
+    header_length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    header: Dict[str, Any] = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+    if header.get("format_version") != FORMAT_VERSION:
+        logger.warning("Snapshot en '%s' tiene un formato distinto; se ignora", path)
+        return None
+    start = _data_start(header_length)
+
+    def array(name: str) -> np.ndarray:
+        spec = header["arrays"][name]
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        count = int(np.prod(shape))
+        if not count:
+            return np.empty(shape, dtype=dtype)
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=start + spec["offset"]).reshape(shape)
+
+    def strings(name: str) -> StringColumn:
+        return StringColumn(array(f"{name}.blob"), array(f"{name}.offsets"))
+
+    def lines(name: str) -> CoordinateColumn:
+        return CoordinateColumn(array(f"{name}.vertices"), array(f"{name}.offsets"))
+
+    polygon = CityPolygon.model_validate(header["polygon"])
+    sidewalk_field = array("sidewalk_field")
+    street_sidewalks = LazyStreetSidewalks(array("street_sidewalk_offsets"), sidewalk_field)
+    street_lines, sidewalk_lines = lines("street_lines"), lines("sidewalk_lines")
+    streets = LazyStreets(strings("street_records"), street_lines, sidewalk_lines, street_sidewalks)
+
+    geometry_levels = {
+        layer: GeometryLevels(column, precomputed={
+            level: (array(f"levels.{layer}.{level!r}.vertices"), array(f"levels.{layer}.{level!r}.bounds"))
+            for level in header["levels"][layer]
+        })
+        for layer, column in (("streets", street_lines), ("sidewalks", sidewalk_lines))
+    }
+    geometry_levels["polygon"] = GeometryLevels([polygon.geometry.coordinates], kind="polygon")
+
+    graph = SidewalkGraph.from_arrays(
+        {name: array(f"graph.{name}") for name in SidewalkGraph.ARRAY_FIELDS},
+        strings("graph.sidewalk_ids"), header["obstacle_types"]
+    )
+    return CityData.from_parts(
+        polygon, streets, header["version"],
+        streets_by_id=LazyIdIndex(strings("street_ids")),
+        name_index=NameIndex(strings("street_names"), array("street_name_codes")),
+        sidewalk_entries=LazySidewalkEntries(streets, array("sidewalk_street"), sidewalk_field),
+        street_sidewalks=street_sidewalks,
+        street_index=LineIndex(street_lines),
+        sidewalk_index=LineIndex(sidewalk_lines),
+        geometry_levels=geometry_levels,
+        graph=graph
+    )
@@ -0,0 +1,95 @@
+"""
+Límites de concurrencia por endpoint para las llamadas síncronas a los servicios.
+
+Cada endpoint pesado (rutas, consultas por bbox) ejecuta su trabajo fuera del
+event loop, en un pool de threads propio de tamaño fijo o en un executor dado
+(p. ej. el pool de procesos, para trabajo en Python puro que retiene el GIL), así
+el loop sigue atendiendo las demás peticiones mientras tanto. Las llamadas que
+exceden el límite esperan en una cola acotada; con la cola llena se rechazan de
+inmediato (Overloaded) en vez de acumular latencia, con un Retry-After estimado
+a partir de la duración reciente de las llamadas.
+"""
+import asyncio
+import functools
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Union
+
+
+class Overloaded(RuntimeError):
+    """La cola de un endpoint está llena; `retry_after` son los segundos sugeridos para reintentar"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"Servicio '{name}' saturado, reintentar en {retry_after} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class EndpointLimiter:
+    """
+    A lo más `max_concurrent` llamadas en ejecución y `max_queue` en espera. Sin
+    `executor` las llamadas corren en un pool de threads propio; `executor` puede ser
+    también una función que lo devuelve, para no crearlo hasta la primera llamada.
+    """
+
+    # Peso de la última llamada en el promedio móvil de duración
+    DURATION_SMOOTHING = 0.2
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 executor: Optional[Union[Executor, Callable[[], Executor]]] = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.mean_duration = 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._shared_executor = executor
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> Executor:
+        """Executor dado o pool de threads del endpoint (se crea en el primer uso)"""
+        if self._shared_executor is not None:
+            return self._shared_executor() if callable(self._shared_executor) else self._shared_executor
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix=self.name)
+        return self._executor
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se vacíe la cola actual (al menos 1)"""
+        pending = self.running + self.waiting
+        return max(1, math.ceil(pending * self.mean_duration / self.max_concurrent))
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Ejecutar fn(*args, **kwargs) en el pool del endpoint; Overloaded si la cola está llena"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            duration = time.perf_counter() - start
+            self.mean_duration += self.DURATION_SMOOTHING * (duration - self.mean_duration)
+            self.running -= 1
+            self._semaphore.release()
+
+    def shutdown(self):
+        """Terminar los threads del pool propio (un executor dado lo cierra su dueño)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from app.services.json_stream import FeatureStreamParser
+
+
+class FeedEntry:
+    """Copia en memoria de un feed descargado junto a sus validadores HTTP"""
+
+    def __init__(self, payload: Any, version: str, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        self.payload = payload
+        self.version = version
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+    def age(self) -> float:
+        """Segundos desde la última descarga o revalidación"""
+        return time.monotonic() - self.fetched_at
+
+
+class FeedCache:
+    """
+    Caché por ciudad de feeds remotos (labelClusters).
+
+    - Cada entrada vive `ttl_seconds`; al expirar se revalida con
+      If-None-Match / If-Modified-Since y un 304 solo renueva la entrada.
+    - Un único `httpx.AsyncClient` con pool de conexiones se comparte durante
+      toda la vida de la aplicación (cerrar con `aclose`).
+    - Single-flight: peticiones concurrentes por la misma clave esperan la
+      misma descarga en vez de lanzar una cada una.
+    - El cuerpo se procesa a medida que llega (`aiter_bytes`): `parser` crea un
+      objeto con `feed(bytes)` y `close() -> payload`, de modo que nunca se
+      guardan juntos el cuerpo completo y su versión decodificada.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, timeout: float = 30.0,
+                 parser: Callable[[], Any] = FeatureStreamParser,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.parser = parser
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._entries: Dict[str, FeedEntry] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente HTTP compartido (se crea en el primer uso)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self._transport
+            )
+        return self._client
+
+    def peek(self, key: str) -> Optional[FeedEntry]:
+        """Entrada actual sin revalidar (puede estar expirada)"""
+        return self._entries.get(key)
+
+    async def get(self, key: str, url: str, parser: Optional[Callable[[], Any]] = None) -> FeedEntry:
+        """
+        Obtener el feed de `key`, descargándolo o revalidándolo si expiró.
+        `parser` reemplaza al parser por defecto para esta clave.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.age() < self.ttl_seconds:
+            return entry
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(key, url, entry, parser or self.parser))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield: si un cliente cancela su petición, la descarga compartida continúa
+        return await asyncio.shield(future)
+
+    async def _refresh(self, key: str, url: str, entry: Optional[FeedEntry],
+                       parser: Callable[[], Any]) -> FeedEntry:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and entry is not None:
+                entry.fetched_at = time.monotonic()
+                return entry
+
+            response.raise_for_status()
+            body_parser = parser()
+            digest = hashlib.sha1()
+            async for chunk in response.aiter_bytes():
+                digest.update(chunk)
+                body_parser.feed(chunk)
+
+            new_entry = FeedEntry(
+                payload=body_parser.close(),
+                version=digest.hexdigest()[:16],
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        self._entries[key] = new_entry
+        return new_entry
+
+    def invalidate(self, key: Optional[str] = None):
+        """Descartar una entrada (o todas)"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def aclose(self):
+        """Cerrar el cliente HTTP compartido"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
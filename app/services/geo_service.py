@@ -1,147 +1,426 @@
-import math
 from typing import List, Optional, Tuple, Dict, Any
 from app.models import (
     CityPolygon, StreetAxis, SidewalkSegment, RouteRequest, 
-    OptimalRoute, Coordinate, GeoJSONLineString, Obstacle,
-    ObstacleType, SeverityLevel, RouteSegment
+    OptimalRoute, Coordinate, GeoJSONLineString, GeoJSONPolygon,
+    ObstacleType, RouteSegment, BatchRouteItem,
+    MatrixRequest, MatrixResponse
 )
 from app.data.mock_data import get_mock_data
+from app.services.city_data import CityData
+from app.services.city_loader import city_directories, city_version, load_city
+from app.services.city_snapshot import find_snapshots, open_snapshot, save_snapshot, snapshot_path
+from app.services.landmarks import LandmarkIndex, landmarks_path
+from app.services.routing_graph import PathResult, SidewalkGraph, SnapPoint
+from app.services.simplification import simplify_level
+from app.services.spatial_order import SpatialOrder
+from app.services.worker_pool import WorkerPool, chunked
+import logging
+import numpy as np
+import os
+import tempfile
 import uuid
-import heapq
+
+logger = logging.getLogger(__name__)
+
+# Servicio usado por los procesos del pool (lo arma `_init_worker_service` al iniciar cada proceso)
+_worker_service: Optional["GeoService"] = None
+
+
+def _init_worker_service(snapshots: Dict[str, str], landmarks: Dict[str, str]):
+    """
+    Initializer de los procesos del pool: servicio con las ciudades del padre, abiertas
+    desde sus snapshots (mapeados en memoria, así los procesos comparten las páginas)
+    """
+    global _worker_service
+    cities = {city: open_snapshot(path) for city, path in snapshots.items()}
+    for data in cities.values():
+        # Índices del grafo que arma la primera ruta, aquí para no demorarla
+        data.graph.adjacency
+        data.graph.edge_tree
+    indexes = {city: LandmarkIndex.load(path, cities[city].graph) for city, path in landmarks.items()}
+    _worker_service = GeoService.from_cities(
+        cities, {city: index for city, index in indexes.items() if index is not None}
+    )
+
+
+def _get_worker_service() -> "GeoService":
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = GeoService()
+    return _worker_service
+
+
+def _route_chunk(city: str, route_requests: List[RouteRequest]) -> List[BatchRouteItem]:
+    return _get_worker_service()._route_many(city, route_requests)
+
+
+def _matrix_chunk(city: str, matrix_request: MatrixRequest, origins: List[int]):
+    return _get_worker_service()._matrix_rows(city, matrix_request, origins)
+
 
 class GeoService:
-    def __init__(self):
-        self.mock_data = get_mock_data()
+    # Lotes más pequeños que esto se calculan en el proceso actual
+    PARALLEL_MIN_TASKS = 16
+    # Posiciones que se revisan de una vez al armar una página
+    PAGE_SCAN_CHUNK = 256
+    
+    def __init__(self, data_dir: Optional[str] = None, snapshot_dir: Optional[str] = None):
+        # Datos reales (GeoJSON/GeoPackage, ver app/services/city_loader.py) y/o snapshots
+        # (ver app/services/city_snapshot.py) si hay directorios configurados; si no, los datos mock
+        data_dir = data_dir or os.environ.get("DEEPCITY_DATA_DIR")
+        snapshot_dir = snapshot_dir or os.environ.get("DEEPCITY_SNAPSHOT_DIR")
+        # Preprocesamiento ALT opcional (ver app/services/landmarks.py)
+        self.landmarks: Dict[str, LandmarkIndex] = {}
+        # Datos e índices por ciudad, construidos una sola vez al iniciar
+        self.cities: Dict[str, CityData] = {}
+        # Snapshot de cada ciudad abierta desde uno (lo reabren los procesos del pool)
+        self.snapshot_paths: Dict[str, str] = {}
+        self._worker_files: Optional[tempfile.TemporaryDirectory] = None
+        if data_dir or snapshot_dir:
+            self.load_cities(data_dir, snapshot_dir)
+        else:
+            for city, data in get_mock_data().items():
+                self.add_city(city, data["polygon"], data["streets"])
+        landmarks_dir = os.environ.get("DEEPCITY_LANDMARKS_DIR")
+        if landmarks_dir:
+            self.load_landmarks(landmarks_dir)
+        # Los procesos del pool reciben las ciudades cargadas al momento de crearlo (primer uso)
+        self.worker_pool = WorkerPool(initializer=_init_worker_service, initargs=self._worker_state)
+    
+    @classmethod
+    def from_cities(cls, cities: Dict[str, CityData], landmarks: Dict[str, LandmarkIndex]) -> "GeoService":
+        """Servicio con ciudades ya construidas, sin cargar datos (el de los procesos del pool)"""
+        service = cls.__new__(cls)
+        service.cities = cities
+        service.landmarks = landmarks
+        service.snapshot_paths = {}
+        service._worker_files = None
+        service.worker_pool = WorkerPool(1)
+        return service
+    
+    def _worker_state(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Argumentos de `_init_worker_service`: snapshot y landmarks de cada ciudad. Las
+        ciudades que no se abrieron desde un snapshot (y los landmarks) se guardan en un
+        directorio temporal que vive lo mismo que el servicio.
+        """
+        if self._worker_files is None:
+            self._worker_files = tempfile.TemporaryDirectory(prefix="deepcity-pool-")
+        directory = self._worker_files.name
+        snapshots = {}
+        for city, data in self.cities.items():
+            snapshots[city] = self.snapshot_paths.get(city) or snapshot_path(directory, city)
+            if city not in self.snapshot_paths:
+                save_snapshot(data, snapshots[city])
+        landmarks = {}
+        for city, index in self.landmarks.items():
+            landmarks[city] = landmarks_path(directory, city)
+            index.save(landmarks[city])
+        return snapshots, landmarks
+    
+    def add_city(self, city: str, polygon: CityPolygon, streets: List[StreetAxis],
+                 version: Optional[str] = None) -> CityData:
+        """Registrar (o reemplazar) una ciudad y construir sus índices"""
+        data = CityData(polygon, streets, version)
+        self.cities[city.lower()] = data
+        self.snapshot_paths.pop(city.lower(), None)
+        # Los landmarks de un grafo anterior ya no sirven
+        self.landmarks.pop(city.lower(), None)
+        return data
+    
+    def load_cities(self, data_dir: Optional[str], snapshot_dir: Optional[str] = None):
+        """
+        Cargar las ciudades de `data_dir` y de los snapshots de `snapshot_dir`.
+        El snapshot de una ciudad se usa si corresponde a la versión de sus archivos
+        (o si la ciudad no está en `data_dir`); si no, la ciudad se procesa desde los archivos.
+        """
+        sources = city_directories(data_dir) if data_dir else {}
+        snapshots = find_snapshots(snapshot_dir) if snapshot_dir else {}
+        for city in sorted(set(sources) | set(snapshots)):
+            data = open_snapshot(snapshots[city]) if city in snapshots else None
+            if city in sources and (data is None or data.version != city_version(sources[city])):
+                if data is not None:
+                    logger.warning("Snapshot de '%s' no corresponde a sus datos; se procesan los archivos", city)
+                loaded = load_city(sources[city])
+                self.add_city(city, loaded["polygon"], loaded["streets"], loaded["version"])
+            elif data is not None:
+                self.cities[city] = data
+                self.snapshot_paths[city] = snapshots[city]
+                self.landmarks.pop(city, None)
+        if not self.cities:
+            raise ValueError(f"No se encontraron ciudades en '{data_dir or snapshot_dir}'")
+    
+    def _shape_sidewalk(self, city: str, position: int, simplify_tolerance: Optional[float],
+                        precision: Optional[int]) -> SidewalkSegment:
+        """Vereda en la posición `position` con su geometría simplificada/cuantizada"""
+        data = self.cities[city]
+        segment = data.sidewalk_entries[position][1]
+        if simplify_level(simplify_tolerance) is None and precision is None:
+            return segment
+        coordinates = data.geometry_levels["sidewalks"].coordinates(position, simplify_tolerance, precision)
+        return segment.model_copy(update={"geometry": GeoJSONLineString(coordinates=coordinates)})
+    
+    def _shape_street(self, city: str, position: int, simplify_tolerance: Optional[float],
+                      precision: Optional[int]) -> StreetAxis:
+        """Calle en la posición `position` (y sus veredas) con geometrías simplificadas/cuantizadas"""
+        data = self.cities[city]
+        street = data.streets[position]
+        if simplify_level(simplify_tolerance) is None and precision is None:
+            return street
+        coordinates = data.geometry_levels["streets"].coordinates(position, simplify_tolerance, precision)
+        update: Dict[str, Any] = {"geometry": GeoJSONLineString(coordinates=coordinates)}
+        for field, sidewalk_position in data.street_sidewalks[position]:
+            update[field] = self._shape_sidewalk(city, sidewalk_position, simplify_tolerance, precision)
+        return street.model_copy(update=update)
     
     def get_available_cities(self) -> List[str]:
         """Obtener ciudades disponibles"""
-        return list(self.mock_data.keys())
+        return list(self.cities.keys())
+    
+    def load_landmarks(self, directory: str):
+        """Cargar landmarks precalculados de las ciudades que los tengan en `directory`"""
+        for city, data in self.cities.items():
+            path = landmarks_path(directory, city)
+            if os.path.exists(path):
+                index = LandmarkIndex.load(path, data.graph)
+                if index is not None:
+                    self.landmarks[city] = index
     
-    def get_city_polygon(self, city: str) -> CityPolygon:
-        """Obtener polígono de límites de la ciudad"""
+    def build_landmarks(self, city: str, num_landmarks: int = 8) -> LandmarkIndex:
+        """Calcular landmarks de una ciudad en memoria"""
         city = city.lower()
-        if city not in self.mock_data:
+        if city not in self.cities:
             raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        return self.mock_data[city]["polygon"]
+        self.landmarks[city] = LandmarkIndex.build(self.cities[city].graph, num_landmarks)
+        return self.landmarks[city]
     
-    def get_street_network(self, city: str, bbox: Optional[List[float]] = None, limit: int = 100) -> List[StreetAxis]:
-        """Obtener red de calles con filtros opcionales"""
+    def get_data_version(self, city: str) -> str:
+        """Versión de los datos cargados de una ciudad (cambia si cambian los datos)"""
         city = city.lower()
-        if city not in self.mock_data:
+        if city not in self.cities:
             raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        streets = self.mock_data[city]["streets"]
+        return self.cities[city].version
+    
+    def get_city_polygon(self, city: str, simplify_tolerance: Optional[float] = None,
+                         precision: Optional[int] = None) -> CityPolygon:
+        """
+        Obtener polígono de límites de la ciudad
+        
+        `simplify_tolerance` (metros) y `precision` (decimales) reducen la geometría
+        para vistas alejadas; ver app/services/simplification.py.
+        """
+        city = city.lower()
+        if city not in self.cities:
+            raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        # Aplicar filtro de bounding box si se proporciona
+        polygon = self.cities[city].polygon
+        if simplify_level(simplify_tolerance) is None and precision is None:
+            return polygon
+        coordinates = self.cities[city].geometry_levels["polygon"].coordinates(0, simplify_tolerance, precision)
+        return polygon.model_copy(update={"geometry": GeoJSONPolygon(coordinates=coordinates)})
+    
+    def get_street_network(self, city: str, bbox: Optional[List[float]] = None, limit: Optional[int] = 100,
+                           simplify_tolerance: Optional[float] = None,
+                           precision: Optional[int] = None) -> List[StreetAxis]:
+        """Obtener red de calles con filtros opcionales (primera página, ver `get_street_page`)"""
+        return self.get_street_page(city, bbox, limit, simplify_tolerance=simplify_tolerance,
+                                    precision=precision)[0]
+    
+    def get_street_page(self, city: str, bbox: Optional[List[float]] = None, limit: Optional[int] = 100,
+                        cursor: Optional[str] = None, simplify_tolerance: Optional[float] = None,
+                        precision: Optional[int] = None) -> Tuple[List[StreetAxis], Optional[str]]:
+        """
+        Página de calles en orden de Hilbert (ver app/services/spatial_order.py) a partir
+        de `cursor`, junto con el cursor de la página siguiente (None si es la última)
+        """
+        city = city.lower()
+        if city not in self.cities:
+            raise ValueError(f"Ciudad '{city}' no encontrada")
+        
+        # Candidatos: todas las calles, o solo las que intersectan el bbox según el índice
+        data = self.cities[city]
+        candidates = None
         if bbox:
             min_lng, min_lat, max_lng, max_lat = bbox
-            filtered_streets = []
-            
-            for street in streets:
-                # Verificar si la calle intersecta con el bbox
-                if self._street_intersects_bbox(street, min_lng, min_lat, max_lng, max_lat):
-                    filtered_streets.append(street)
-            
-            streets = filtered_streets
+            candidates = data.street_index.query_intersects(min_lng, min_lat, max_lng, max_lat)
         
-        # Aplicar límite
-        return streets[:limit]
+        positions, next_cursor = self._page(data.street_order, candidates, cursor, limit)
+        return [self._shape_street(city, position, simplify_tolerance, precision) for position in positions], next_cursor
     
     def get_sidewalk_segments(self, city: str, street_name: Optional[str] = None, 
                             min_accessibility_score: float = 0, 
-                            bbox: Optional[List[float]] = None) -> List[SidewalkSegment]:
-        """Obtener segmentos de veredas con filtros"""
+                            bbox: Optional[List[float]] = None,
+                            simplify_tolerance: Optional[float] = None,
+                            precision: Optional[int] = None) -> List[SidewalkSegment]:
+        """Obtener segmentos de veredas con filtros (todas, ver `get_sidewalk_page`)"""
+        return self.get_sidewalk_page(city, street_name, min_accessibility_score, bbox, limit=None,
+                                      simplify_tolerance=simplify_tolerance, precision=precision)[0]
+    
+    def get_sidewalk_page(self, city: str, street_name: Optional[str] = None,
+                          min_accessibility_score: float = 0,
+                          bbox: Optional[List[float]] = None, limit: Optional[int] = None,
+                          cursor: Optional[str] = None, simplify_tolerance: Optional[float] = None,
+                          precision: Optional[int] = None) -> Tuple[List[SidewalkSegment], Optional[str]]:
+        """
+        Página de veredas filtradas en orden de Hilbert a partir de `cursor`, junto con
+        el cursor de la página siguiente (None si es la última)
+        """
         city = city.lower()
-        if city not in self.mock_data:
+        if city not in self.cities:
             raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        # Obtener todos los segmentos de veredas de todas las calles
-        segments = []
-        for street in self.mock_data[city]["streets"]:
-            # Filtrar por nombre de calle si se especifica
-            if street_name and street_name.lower() not in street.name.lower():
-                continue
-            
-            # Agregar segmentos de veredas de esta calle
-            if street.sidewalk_west:
-                segments.append(street.sidewalk_west)
-            if street.sidewalk_east:
-                segments.append(street.sidewalk_east)
-            if street.sidewalk_north:
-                segments.append(street.sidewalk_north)
-            if street.sidewalk_south:
-                segments.append(street.sidewalk_south)
-        
-        # Filtrar por score de accesibilidad
-        segments = [s for s in segments if s and s.accessibility_score >= min_accessibility_score]
-        
-        # Filtrar por bbox si se proporciona
+        # Candidatos: todas las veredas, las de calles con ese nombre (índice de nombres)
+        # y/o las que intersectan el bbox según el índice espacial
+        data = self.cities[city]
+        candidates = None
+        if street_name:
+            candidates = data.sidewalks_named(street_name)
         if bbox:
             min_lng, min_lat, max_lng, max_lat = bbox
-            filtered_segments = []
-            
-            for segment in segments:
-                if self._segment_intersects_bbox(segment, min_lng, min_lat, max_lng, max_lat):
-                    filtered_segments.append(segment)
-            
-            segments = filtered_segments
+            in_bbox = data.sidewalk_index.query_intersects(min_lng, min_lat, max_lng, max_lat)
+            candidates = sorted(set(in_bbox).intersection(candidates)) if street_name else in_bbox
         
-        return segments
+        # Filtrar por score de accesibilidad solo las veredas que se recorren
+        def accept(position: int) -> bool:
+            return data.sidewalk_entries[position][1].accessibility_score >= min_accessibility_score
+        
+        positions, next_cursor = self._page(data.sidewalk_order, candidates, cursor, limit,
+                                            accept if min_accessibility_score else None)
+        return [self._shape_sidewalk(city, position, simplify_tolerance, precision) for position in positions], next_cursor
+    
+    def _page(self, order: SpatialOrder, candidates: Optional[List[int]], cursor: Optional[str],
+              limit: Optional[int], accept=None) -> Tuple[List[int], Optional[str]]:
+        """
+        Hasta `limit` posiciones aceptadas, en orden espacial después de `cursor`, y el cursor
+        siguiente. Se recorre por bloques y solo hasta encontrar una más que el límite.
+        """
+        ordered = order.after(cursor, candidates)
+        selected: List[int] = []
+        for start in range(0, len(ordered), self.PAGE_SCAN_CHUNK):
+            for position in ordered[start:start + self.PAGE_SCAN_CHUNK].tolist():
+                if accept is not None and not accept(position):
+                    continue
+                if limit is not None and len(selected) == limit:
+                    return selected, order.cursor(selected[-1]) if selected else None
+                selected.append(position)
+        return selected, None
     
     def get_street_sidewalk_segments(self, city: str, street_id: str) -> List[SidewalkSegment]:
         """Obtener segmentos de vereda de una calle específica"""
         city = city.lower()
-        if city not in self.mock_data:
+        if city not in self.cities:
             raise ValueError(f"Ciudad '{city}' no encontrada")
         
         # Buscar la calle por ID
-        street = None
-        for s in self.mock_data[city]["streets"]:
-            if s.id == street_id:
-                street = s
-                break
+        data = self.cities[city]
+        position = data.streets_by_id.get(street_id)
         
-        if not street:
+        if position is None:
             raise ValueError(f"Calle con ID '{street_id}' no encontrada")
         
-        # Recopilar todos los segmentos de veredas
-        segments = []
-        if street.sidewalk_west:
-            segments.append(street.sidewalk_west)
-        if street.sidewalk_east:
-            segments.append(street.sidewalk_east)
-        if street.sidewalk_north:
-            segments.append(street.sidewalk_north)
-        if street.sidewalk_south:
-            segments.append(street.sidewalk_south)
-        
-        return segments
+        # Veredas de la calle (oeste, este, norte, sur), precalculadas al cargar
+        return [data.sidewalk_entries[sidewalk][1] for _, sidewalk in data.street_sidewalks[position]]
     
     def calculate_optimal_route(self, city: str, route_request: RouteRequest) -> OptimalRoute:
         """Calcular ruta óptima usando algoritmo de pathfinding"""
         city = city.lower()
-        if city not in self.mock_data:
+        if city not in self.cities:
             raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        # Obtener todos los segmentos de veredas
-        segments = self.get_sidewalk_segments(city)
+        return self._route_many(city, [route_request], raise_errors=True)[0].route
+    
+    def calculate_routes_batch(self, city: str, route_requests: List[RouteRequest],
+                               workers: Optional[int] = None) -> List[BatchRouteItem]:
+        """
+        Calcular muchas rutas compartiendo la proyección de puntos y los costos por perfil.
+        Los lotes grandes se reparten entre los procesos del pool.
+        """
+        city = city.lower()
+        if city not in self.cities:
+            raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        # Encontrar segmentos más cercanos al punto de inicio y fin
-        start_segment = self._find_nearest_segment(route_request.start.coordinate, segments)
-        end_segment = self._find_nearest_segment(route_request.end.coordinate, segments)
+        workers = workers or self.worker_pool.max_workers
+        if workers <= 1 or len(route_requests) < self.PARALLEL_MIN_TASKS or not self.worker_pool.available:
+            return self._route_many(city, route_requests)
         
-        if not start_segment or not end_segment:
-            raise ValueError("No se pudo encontrar segmentos de veredas cerca de los puntos especificados")
+        chunks = chunked(route_requests, workers * 4)
+        results = self.worker_pool.map(_route_chunk, [(city, chunk) for chunk in chunks])
+        return [item for chunk in results for item in chunk]
+    
+    def calculate_matrix(self, city: str, matrix_request: MatrixRequest,
+                         workers: Optional[int] = None) -> MatrixResponse:
+        """Matriz origen-destino: un Dijkstra uno-a-muchos por origen"""
+        city = city.lower()
+        if city not in self.cities:
+            raise ValueError(f"Ciudad '{city}' no encontrada")
         
-        # Usar algoritmo A* para encontrar la ruta óptima
-        route_segments = self._find_path_astar(
-            start_segment, 
-            end_segment, 
-            segments, 
-            route_request.accessibility_priority,
-            route_request.avoid_obstacles
+        origins = list(range(len(matrix_request.origins)))
+        workers = workers or self.worker_pool.max_workers
+        if workers <= 1 or len(origins) < self.PARALLEL_MIN_TASKS or not self.worker_pool.available:
+            rows = self._matrix_rows(city, matrix_request, origins)
+        else:
+            chunks = chunked(origins, workers * 4)
+            results = self.worker_pool.map(_matrix_chunk, [(city, matrix_request, chunk) for chunk in chunks])
+            rows = [row for chunk in results for row in chunk]
+        
+        return MatrixResponse(
+            costs=[[cell and cell[0] for cell in row] for row in rows],
+            distances_meters=[[cell and cell[1] for cell in row] for row in rows],
+            durations_seconds=[[cell and cell[2] for cell in row] for row in rows]
         )
+    
+    def _route_many(self, city: str, route_requests: List[RouteRequest],
+                    raise_errors: bool = False) -> List[BatchRouteItem]:
+        """Calcular rutas en serie reutilizando proyecciones y costos entre peticiones"""
+        graph = self.cities[city].graph
+        snaps: Dict[Tuple[float, float], Any] = {}
+        profiles: Dict[Tuple[float, Tuple[str, ...]], Any] = {}
+        
+        def snap(coordinate: Coordinate):
+            key = (coordinate.lat, coordinate.lng)
+            if key not in snaps:
+                snaps[key] = graph.snap(coordinate.lat, coordinate.lng)
+            return snaps[key]
+        
+        items = []
+        for route_request in route_requests:
+            try:
+                # Proyectar los puntos de inicio y fin sobre la vereda más cercana del grafo
+                start = snap(route_request.start.coordinate)
+                end = snap(route_request.end.coordinate)
+                if not start or not end:
+                    raise ValueError("No se pudo encontrar segmentos de veredas cerca de los puntos especificados")
+                
+                profile = (route_request.accessibility_priority,
+                           tuple(sorted(t.value for t in route_request.avoid_obstacles)))
+                if profile not in profiles:
+                    profiles[profile] = graph.edge_costs(route_request.accessibility_priority,
+                                                         route_request.avoid_obstacles)
+                costs = profiles[profile]
+                
+                items.append(BatchRouteItem(route=self._route(city, start, end, route_request, costs)))
+            except ValueError as e:
+                if raise_errors:
+                    raise
+                items.append(BatchRouteItem(error=str(e)))
+        return items
+    
+    def _route(self, city: str, start: SnapPoint, end: SnapPoint,
+               route_request: RouteRequest, costs: np.ndarray) -> OptimalRoute:
+        """Ruta óptima entre dos puntos ya proyectados sobre el grafo"""
+        graph = self.cities[city].graph
+        
+        # Usar algoritmo A* sobre el grafo de veredas con los costos del perfil pedido
+        heuristic = None
+        if city in self.landmarks:
+            heuristic = self.landmarks[city].heuristic(graph, end, costs, route_request.accessibility_priority)
+        path = graph.shortest_path(start, end, costs, heuristic)
+        if path is None:
+            raise ValueError("No existe una ruta por veredas entre los puntos especificados")
+        
+        route_segments = self._build_route_segments(graph, path, route_request.avoid_obstacles)
         
         # Calcular métricas de la ruta
         total_distance = sum(seg.distance_meters for seg in route_segments)
@@ -150,11 +429,9 @@ class GeoService:
         
         # Generar geometría de la ruta completa
         route_coordinates = []
-        for segment in route_segments:
-            route_coordinates.extend([
-                [segment.start_coordinate.lng, segment.start_coordinate.lat],
-                [segment.end_coordinate.lng, segment.end_coordinate.lat]
-            ])
+        for lat, lng in path.points:
+            if not route_coordinates or route_coordinates[-1] != [lng, lat]:
+                route_coordinates.append([lng, lat])
         
         return OptimalRoute(
             route_id=str(uuid.uuid4()),
@@ -165,103 +442,60 @@ class GeoService:
             geometry=GeoJSONLineString(coordinates=route_coordinates)
         )
     
-    def _street_intersects_bbox(self, street: StreetAxis, min_lng: float, min_lat: float, 
-                              max_lng: float, max_lat: float) -> bool:
-        """Verificar si una calle intersecta con un bounding box"""
-        for coord in street.geometry.coordinates:
-            lng, lat = coord[0], coord[1]
-            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
-                return True
-        return False
-    
-    def _segment_intersects_bbox(self, segment: SidewalkSegment, min_lng: float, min_lat: float,
-                               max_lng: float, max_lat: float) -> bool:
-        """Verificar si un segmento de vereda intersecta con un bounding box"""
-        for coord in segment.geometry.coordinates:
-            lng, lat = coord[0], coord[1]
-            if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat:
-                return True
-        return False
-    
-    def _find_nearest_segment(self, point: Coordinate, segments: List[SidewalkSegment]) -> Optional[SidewalkSegment]:
-        """Encontrar el segmento de vereda más cercano a un punto"""
-        min_distance = float('inf')
-        nearest_segment = None
-        
-        for segment in segments:
-            # Calcular distancia al punto medio del segmento
-            coords = segment.geometry.coordinates
-            if len(coords) >= 2:
-                mid_lng = (coords[0][0] + coords[-1][0]) / 2
-                mid_lat = (coords[0][1] + coords[-1][1]) / 2
-                
-                distance = self._calculate_distance(
-                    point.lat, point.lng,
-                    mid_lat, mid_lng
-                )
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_segment = segment
-        
-        return nearest_segment
-    
-    def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calcular distancia entre dos puntos usando fórmula de Haversine"""
-        R = 6371000  # Radio de la Tierra en metros
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lng / 2) ** 2)
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
+    def _matrix_rows(self, city: str, matrix_request: MatrixRequest,
+                     origins: List[int]) -> List[List[Optional[Tuple[float, float, float]]]]:
+        """Filas de la matriz para los orígenes indicados (por posición)"""
+        graph = self.cities[city].graph
+        costs = graph.edge_costs(matrix_request.accessibility_priority, matrix_request.avoid_obstacles)
+        times = graph.edge_times(matrix_request.avoid_obstacles)
+        destinations = [graph.snap(c.lat, c.lng) for c in matrix_request.destinations]
+        reachable = [i for i, d in enumerate(destinations) if d is not None]
+        
+        rows = []
+        for origin in origins:
+            row: List[Optional[Tuple[float, float, float]]] = [None] * len(destinations)
+            coordinate = matrix_request.origins[origin]
+            start = graph.snap(coordinate.lat, coordinate.lng)
+            if start is not None and reachable:
+                found = graph.one_to_many(start, [destinations[i] for i in reachable], costs, times)
+                for i, cell in zip(reachable, found):
+                    row[i] = cell
+            rows.append(row)
+        return rows
     
-    def _find_path_astar(self, start: SidewalkSegment, end: SidewalkSegment,
-                        all_segments: List[SidewalkSegment], accessibility_priority: float,
-                        avoid_obstacles: List[ObstacleType]) -> List[RouteSegment]:
-        """Algoritmo A* para encontrar ruta óptima"""
-        # Implementación simplificada - en producción usaríamos una librería como NetworkX
-        
-        # Por ahora, retornar ruta directa usando los segmentos más accesibles
-        # En una implementación completa, construiríamos un grafo de conectividad
+    def _build_route_segments(self, graph: SidewalkGraph, path: PathResult,
+                              avoid_obstacles: List[ObstacleType]) -> List[RouteSegment]:
+        """Agrupar las aristas recorridas en tramos de ruta por vereda"""
+        scores = graph.edge_scores(avoid_obstacles)
+        base_speed_mps = 1.4  # 1.4 m/s velocidad promedio caminando
         
         route_segments = []
-        
-        # Crear segmento de ruta para el segmento de inicio
-        start_coords = start.geometry.coordinates
-        start_coord = Coordinate(lat=start_coords[0][1], lng=start_coords[0][0])
-        end_coord = Coordinate(lat=start_coords[-1][1], lng=start_coords[-1][0])
-        
-        # Calcular penalización por obstáculos
-        obstacle_penalty = 0
-        for obstacle in start.obstacles:
-            if obstacle.obstacle_type in avoid_obstacles:
-                obstacle_penalty += 20  # Penalización por obstáculo a evitar
-            obstacle_penalty += {"bajo": 5, "medio": 15, "alto": 30, "critico": 50}[obstacle.severity.value]
-        
-        accessibility_score = max(0, start.accessibility_score - obstacle_penalty)
+        for i, (edge, fraction) in enumerate(zip(path.edges, path.edge_fractions)):
+            sidewalk = int(graph.edge_sidewalk[edge])
+            segment_id = graph.sidewalk_ids[sidewalk] if sidewalk >= 0 else "cruce"
+            distance = float(graph.edge_length[edge]) * fraction
+            start_lat, start_lng = path.points[i]
+            end_lat, end_lng = path.points[i + 1]
+            
+            if route_segments and route_segments[-1].sidewalk_segment_id == segment_id:
+                # Misma vereda que el tramo anterior: extenderlo
+                previous = route_segments[-1]
+                previous.end_coordinate = Coordinate(lat=end_lat, lng=end_lng)
+                previous.distance_meters += distance
+            elif distance > 0 or not route_segments:
+                route_segments.append(RouteSegment(
+                    sidewalk_segment_id=segment_id,
+                    start_coordinate=Coordinate(lat=start_lat, lng=start_lng),
+                    end_coordinate=Coordinate(lat=end_lat, lng=end_lng),
+                    distance_meters=distance,
+                    accessibility_score=float(scores[edge]),
+                    estimated_time_seconds=0.0
+                ))
         
         # Estimar tiempo basado en accesibilidad y velocidad de caminata
-        base_speed_mps = 1.4  # 1.4 m/s velocidad promedio caminando
-        accessibility_factor = accessibility_score / 100
-        adjusted_speed = base_speed_mps * (0.5 + 0.5 * accessibility_factor)  # 0.5-1.0 factor
-        
-        route_segment = RouteSegment(
-            sidewalk_segment_id=start.id,
-            start_coordinate=start_coord,
-            end_coordinate=end_coord,
-            distance_meters=start.length_meters,
-            accessibility_score=accessibility_score,
-            estimated_time_seconds=start.length_meters / adjusted_speed
-        )
-        
-        route_segments.append(route_segment)
+        for segment in route_segments:
+            accessibility_factor = segment.accessibility_score / 100
+            adjusted_speed = base_speed_mps * (0.5 + 0.5 * accessibility_factor)  # 0.5-1.0 factor
+            segment.estimated_time_seconds = segment.distance_meters / adjusted_speed
         
-        return route_segments
\ No newline at end of file
+        return route_segments
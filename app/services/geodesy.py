@@ -0,0 +1,172 @@
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Radio de la Tierra en metros
+EARTH_RADIUS_METERS = 6371000
+
+
+def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Calcular distancia en metros entre dos coordenadas usando fórmula de Haversine"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_METERS * c
+
+
+def haversine_distances(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Versión vectorizada de `haversine_distance`.
+    Acepta escalares o arrays y aplica las reglas de broadcasting de NumPy.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(np.subtract(lat2, lat1))
+    delta_lambda = np.radians(np.subtract(lng2, lng1))
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    # Evitar valores fuera de [0, 1] por redondeo
+    a = np.clip(a, 0.0, 1.0)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_METERS * c
+
+
+def haversine_matrix(lats_a, lngs_a, lats_b, lngs_b) -> np.ndarray:
+    """Matriz (N, M) de distancias entre N puntos y M puntos"""
+    lats_a = np.asarray(lats_a, dtype=np.float64)[:, None]
+    lngs_a = np.asarray(lngs_a, dtype=np.float64)[:, None]
+    lats_b = np.asarray(lats_b, dtype=np.float64)[None, :]
+    lngs_b = np.asarray(lngs_b, dtype=np.float64)[None, :]
+    return haversine_distances(lats_a, lngs_a, lats_b, lngs_b)
+
+
+def project_to_segments(lats, lngs, a_lats, a_lngs, b_lats, b_lngs) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Proyectar puntos sobre segmentos [A, B] en un plano equirectangular local
+    centrado en cada punto (preciso para distancias de calle, < pocos km).
+    Acepta escalares o arrays con broadcasting.
+
+    Retorna (distancias_en_metros, lat_proyectada, lng_proyectada).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    scale_y = np.pi / 180 * EARTH_RADIUS_METERS
+    scale_x = scale_y * np.cos(np.radians(lats))
+
+    # Coordenadas métricas de los extremos relativas al punto
+    ax = (np.asarray(a_lngs) - lngs) * scale_x
+    ay = (np.asarray(a_lats) - lats) * scale_y
+    dx = (np.asarray(b_lngs) - np.asarray(a_lngs)) * scale_x
+    dy = (np.asarray(b_lats) - np.asarray(a_lats)) * scale_y
+
+    length_sq = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+
+    px = ax + t * dx
+    py = ay + t * dy
+    distances = np.hypot(px, py)
+    proj_lats = np.asarray(a_lats) + t * (np.asarray(b_lats) - np.asarray(a_lats))
+    proj_lngs = np.asarray(a_lngs) + t * (np.asarray(b_lngs) - np.asarray(a_lngs))
+    return distances, proj_lats, proj_lngs
+
+
+class PolylineSet:
+    """
+    Conjunto de M polilíneas aplanado en arrays de segmentos [A, B].
+
+    La distancia de un punto a una polilínea es la distancia a su proyección
+    sobre el segmento más cercano (ver `project_to_segments`).
+    Las polilíneas con menos de dos vértices no tienen segmentos (distancia infinita).
+    Acepta listas de coordenadas o una CoordinateColumn (sin pasar por listas).
+    """
+
+    def __init__(self, lines: Sequence[List[List[float]]]):
+        if hasattr(lines, "vertices"):
+            # CoordinateColumn: segmentos entre vértices consecutivos de una misma línea
+            counts = np.maximum(lines.counts() - 1, 0)
+            segment_starts = np.ones(len(lines.vertices), dtype=bool)
+            segment_starts[lines.offsets[1:][lines.offsets[1:] > 0] - 1] = False
+            starts = lines.vertices[segment_starts]
+            ends = lines.vertices[np.flatnonzero(segment_starts) + 1]
+        else:
+            counts = np.array([max(len(coords) - 1, 0) for coords in lines], dtype=np.int64)
+            vertices = [coords for coords in lines if len(coords) >= 2]
+            starts = [c for coords in vertices for c in coords[:-1]]
+            ends = [c for coords in vertices for c in coords[1:]]
+            starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+            ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+
+        self.size = len(lines)
+        self.segment_counts = counts
+        self.segment_offsets = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(counts) else counts
+        self.a_lngs, self.a_lats = starts[:, 0], starts[:, 1]
+        self.b_lngs, self.b_lats = ends[:, 0], ends[:, 1]
+
+    def pair_distances(self, lats, lngs, line_positions) -> np.ndarray:
+        """
+        Distancia de cada punto i a la polilínea line_positions[i].
+        Todos los argumentos son arrays de igual largo P; retorna un array de largo P.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        line_positions = np.asarray(line_positions, dtype=np.int64)
+        result = np.full(len(line_positions), np.inf)
+
+        counts = self.segment_counts[line_positions]
+        valid = np.flatnonzero(counts > 0)
+        if not len(valid):
+            return result
+
+        # Expandir cada par (punto, línea) a filas (punto, segmento)
+        valid_counts = counts[valid]
+        group_starts = np.concatenate(([0], np.cumsum(valid_counts)[:-1]))
+        rows = np.repeat(valid, valid_counts)
+        within = np.arange(int(valid_counts.sum())) - np.repeat(group_starts, valid_counts)
+        segments = self.segment_offsets[line_positions[valid]].repeat(valid_counts) + within
+
+        distances, _, _ = project_to_segments(
+            lats[rows], lngs[rows],
+            self.a_lats[segments], self.a_lngs[segments],
+            self.b_lats[segments], self.b_lngs[segments]
+        )
+        result[valid] = np.minimum.reduceat(distances, group_starts)
+        return result
+
+    def distance_matrix(self, lats, lngs) -> np.ndarray:
+        """Matriz (N, M) de distancias entre N puntos y las M polilíneas"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        n, m = len(lats), self.size
+        points = np.repeat(np.arange(n), m)
+        lines = np.tile(np.arange(m), n)
+        return self.pair_distances(lats[points], lngs[points], lines).reshape(n, m)
+
+
+def nearest_per_point(
+    point_positions: np.ndarray,
+    line_positions: np.ndarray,
+    distances: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reducir pares (punto, línea, distancia) a la línea más cercana de cada punto.
+    Los empates se resuelven a favor de la línea con menor posición.
+    Retorna (puntos, líneas, distancias) con un elemento por punto presente.
+    """
+    if not len(point_positions):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+
+    order = np.lexsort((line_positions, distances, point_positions))
+    sorted_points = point_positions[order]
+    first = np.concatenate(([True], sorted_points[1:] != sorted_points[:-1]))
+    chosen = order[first]
+    return point_positions[chosen], line_positions[chosen], distances[chosen]
@@ -0,0 +1,149 @@
+import codecs
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class FeatureStreamParser:
+    """
+    Parser incremental de colecciones GeoJSON (`{"features": [...]}` o una lista).
+
+    Recibe el cuerpo por trozos (`feed`) a medida que llega de la red y entrega
+    cada feature apenas está completa, sin mantener el documento entero ni el
+    árbol de diccionarios en memoria: cada feature se pasa por `transform`
+    (por ejemplo, para convertirla a un modelo) y solo se conserva el resultado.
+    Las features para las que `transform` retorna None se descartan; los demás
+    miembros del objeto raíz (type, name, crs...) quedan en `members`.
+    """
+
+    def __init__(self, transform: Optional[Callable[[Any], Any]] = None, key: str = "features"):
+        self.transform = transform
+        self.key = key
+        self.items: List[Any] = []
+        self.members: Dict[str, Any] = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._final = False
+        self._state = "start"
+        self._top_level_list = False
+        self._current_key: Optional[str] = None
+
+    def feed(self, chunk: bytes):
+        """Agregar un trozo del cuerpo y procesar las features completas"""
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+        for item in self._parse():
+            self._append(item)
+
+    def close(self) -> List[Any]:
+        """Terminar el cuerpo y retornar las features (transformadas)"""
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(b"", final=True)
+        self._pos = 0
+        self._final = True
+        for item in self._parse():
+            self._append(item)
+        if self._state != "done":
+            raise ValueError("Cuerpo JSON incompleto: la colección de features no terminó")
+        return self.items
+
+    def _append(self, feature: Any):
+        item = self.transform(feature) if self.transform is not None else feature
+        if item is not None:
+            self.items.append(item)
+
+    def _decode_value(self) -> Any:
+        """
+        Decodificar el valor JSON que empieza en la posición actual.
+        Lanza _Incomplete si el buffer todavía no lo contiene completo.
+        """
+        try:
+            value, end = self._json.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as error:
+            if self._final:
+                raise ValueError(f"JSON inválido en el feed: {error}") from error
+            raise _Incomplete()
+        # Un número al final del buffer podría continuar en el siguiente trozo
+        if end == len(self._buffer) and not self._final:
+            raise _Incomplete()
+        self._pos = end
+        return value
+
+    def _expect(self, char: str, state: str):
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"JSON inválido en el feed: se esperaba '{char}' en la posición {self._pos}")
+        self._pos += 1
+        self._state = state
+
+    def _parse(self) -> Iterator[Any]:
+        buffer = self._buffer
+        while True:
+            self._pos = _WHITESPACE.match(buffer, self._pos).end()
+            if self._pos >= len(buffer):
+                return
+            char = buffer[self._pos]
+            state = self._state
+
+            try:
+                if state == "start":
+                    if char == "[":
+                        self._top_level_list = True
+                        self._pos += 1
+                        self._state = "item_or_end"
+                    else:
+                        self._expect("{", "key_or_end")
+                elif state in ("key_or_end", "key"):
+                    if char == "}" and state == "key_or_end":
+                        self._pos += 1
+                        self._state = "done"
+                    elif char == '"':
+                        self._current_key = self._decode_value()
+                        self._state = "colon"
+                    else:
+                        raise ValueError(f"JSON inválido en el feed: se esperaba una clave en la posición {self._pos}")
+                elif state == "colon":
+                    self._expect(":", "value")
+                elif state == "value":
+                    if self._current_key == self.key and char == "[":
+                        self._pos += 1
+                        self._state = "item_or_end"
+                    else:
+                        # Otros miembros (type, crs, metadata...) se guardan aparte
+                        self.members[self._current_key] = self._decode_value()
+                        self._state = "member_end"
+                elif state == "member_end":
+                    if char == ",":
+                        self._pos += 1
+                        self._state = "key"
+                    else:
+                        self._expect("}", "done")
+                elif state in ("item_or_end", "item"):
+                    if char == "]" and state == "item_or_end":
+                        self._close_array()
+                    else:
+                        item = self._decode_value()
+                        self._state = "item_end"
+                        yield item
+                elif state == "item_end":
+                    if char == ",":
+                        self._pos += 1
+                        self._state = "item"
+                    elif char == "]":
+                        self._close_array()
+                    else:
+                        raise ValueError(f"JSON inválido en el feed: se esperaba ',' o ']' en la posición {self._pos}")
+                else:
+                    raise ValueError(f"JSON inválido en el feed: contenido después del final en la posición {self._pos}")
+            except _Incomplete:
+                return
+
+    def _close_array(self):
+        self._pos += 1
+        self._state = "done" if self._top_level_list else "member_end"
+
+
+class _Incomplete(Exception):
+    """El buffer todavía no contiene el siguiente valor completo"""
@@ -0,0 +1,179 @@
+"""
+Preprocesamiento ALT (A*, Landmarks, desigualdad triangular) para el grafo de veredas.
+
+Para un conjunto pequeño de landmarks L se precalcula la distancia d(L, v) a todos
+los nodos, por cada perfil fijo de `accessibility_priority`. En un grafo no dirigido
+|d(L, t) - d(L, v)| es una cota inferior de d(v, t), mucho más ajustada que la
+distancia en línea recta cuando la ruta óptima rodea veredas poco accesibles.
+
+Los costos de arista crecen con `accessibility_priority` y con `avoid_obstacles`,
+así que las cotas de un perfil siguen siendo válidas para cualquier consulta con
+prioridad mayor o igual y cualquier lista de obstáculos a evitar.
+
+Generación: python precompute.py landmarks <directorio_salida>
+"""
+import hashlib
+import heapq
+import logging
+import os
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.geodesy import haversine_distance, haversine_distances
+from app.services.routing_graph import SidewalkGraph, SnapPoint
+
+logger = logging.getLogger(__name__)
+
+# Formato del archivo serializado (cambiar si cambia su contenido)
+FORMAT_VERSION = 1
+
+
+def graph_signature(graph: SidewalkGraph) -> str:
+    """Huella del grafo para no usar landmarks calculados sobre otro grafo"""
+    digest = hashlib.sha1()
+    for array in (graph.edge_u, graph.edge_v, graph.edge_length, graph.edge_sidewalk):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def dijkstra_all(graph: SidewalkGraph, source: int, costs: Sequence[float]) -> np.ndarray:
+    """Distancias desde `source` a todos los nodos (inf si no hay camino)"""
+    distances = [float("inf")] * graph.node_count
+    distances[source] = 0.0
+    adjacency = graph.adjacency
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > distances[node]:
+            continue
+        for neighbor, edge in adjacency[node]:
+            new_cost = cost + costs[edge]
+            if new_cost < distances[neighbor]:
+                distances[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+    return np.asarray(distances, dtype=np.float64)
+
+
+class LandmarkIndex:
+    """Distancias precalculadas desde los landmarks, por perfil de prioridad"""
+
+    # Perfiles de accessibility_priority precalculados
+    PROFILES = (0.0, 0.5, 1.0)
+    # Factor para que el redondeo a float32 nunca sobreestime la cota
+    SAFETY = 1 - 1e-5
+
+    def __init__(self, profiles: Sequence[float], landmarks: np.ndarray,
+                 distances: np.ndarray, signature: str):
+        self.profiles = list(profiles)
+        self.landmarks = landmarks  # (L,) ids de nodo
+        self.distances = distances  # (P, L, N) float32
+        self.signature = signature
+
+    @classmethod
+    def build(cls, graph: SidewalkGraph, num_landmarks: int = 8,
+              profiles: Sequence[float] = PROFILES) -> "LandmarkIndex":
+        """
+        Elegir landmarks por el método del punto más lejano (sobre distancias de red
+        del perfil más neutro) y precalcular sus distancias para cada perfil.
+        """
+        landmarks: List[int] = []
+        if graph.node_count:
+            base_costs = graph.edge_costs(profiles[0]).tolist()
+            # Primer landmark: el nodo más alejado del centro geográfico
+            center_lat, center_lng = graph.node_lats.mean(), graph.node_lngs.mean()
+            current = int(np.argmax(haversine_distances(center_lat, center_lng, graph.node_lats, graph.node_lngs)))
+            closest = np.full(graph.node_count, np.inf)
+            for _ in range(min(num_landmarks, graph.node_count)):
+                landmarks.append(current)
+                distances = dijkstra_all(graph, current, base_costs)
+                # Los nodos inalcanzables no sirven como landmark de esta componente
+                closest = np.minimum(closest, np.where(np.isfinite(distances), distances, -1.0))
+                closest[landmarks] = -1.0
+                current = int(np.argmax(closest))
+                if closest[current] <= 0:
+                    break
+
+        table = np.full((len(profiles), len(landmarks), graph.node_count), np.inf, dtype=np.float32)
+        for p, priority in enumerate(profiles):
+            costs = graph.edge_costs(priority).tolist()
+            for l, landmark in enumerate(landmarks):
+                table[p, l] = dijkstra_all(graph, landmark, costs)
+        return cls(profiles, np.asarray(landmarks, dtype=np.int64), table, graph_signature(graph))
+
+    def profile_for(self, accessibility_priority: float) -> Optional[int]:
+        """Perfil precalculado con mayor prioridad <= la pedida (sus cotas son válidas)"""
+        best = None
+        for index, priority in enumerate(self.profiles):
+            if priority <= accessibility_priority + 1e-9 and (best is None or priority > self.profiles[best]):
+                best = index
+        return best
+
+    def heuristic(self, graph: SidewalkGraph, end: SnapPoint, costs: np.ndarray,
+                  accessibility_priority: float) -> Optional[Callable[[int], float]]:
+        """
+        Heurística ALT para llegar al punto `end` con el perfil pedido, combinada
+        (máximo) con la distancia de Haversine. None si no hay perfil aplicable.
+
+        La cota se calcula al visitar cada nodo, leyendo su columna de la tabla: el
+        costo es proporcional a los nodos que explora A*, no al tamaño del grafo.
+        """
+        profile = self.profile_for(accessibility_priority)
+        if profile is None or not len(self.landmarks):
+            return None
+
+        columns = self.distances[profile].T  # (N, L), vista sin copiar
+        end_cost = float(costs[end.edge])
+        # Distancias de cada landmark a los extremos u y v de la arista de destino
+        to_u = columns[int(graph.edge_u[end.edge])].tolist()
+        to_v = columns[int(graph.edge_v[end.edge])].tolist()
+        offset_u, offset_v = end.fraction * end_cost, (1 - end.fraction) * end_cost
+        node_lats, node_lngs = graph.node_lats, graph.node_lngs
+        target_lat, target_lng = end.lat, end.lng
+        safety = self.SAFETY
+        inf = float("inf")
+
+        def heuristic(node: int) -> float:
+            lower_u = lower_v = 0.0
+            for a, b, distance in zip(to_u, to_v, columns[node].tolist()):
+                # Sin información si alguno de los dos es inalcanzable (inf o nan)
+                difference = abs(a - distance)
+                if lower_u < difference < inf:
+                    lower_u = difference
+                difference = abs(b - distance)
+                if lower_v < difference < inf:
+                    lower_v = difference
+            bound = min(lower_u * safety + offset_u, lower_v * safety + offset_v)
+            return max(bound, haversine_distance(node_lats[node], node_lngs[node], target_lat, target_lng))
+
+        return heuristic
+
+    def save(self, path: str):
+        """Guardar en disco (formato .npz de NumPy)"""
+        np.savez(
+            path,
+            format_version=np.int64(FORMAT_VERSION),
+            profiles=np.asarray(self.profiles, dtype=np.float64),
+            landmarks=self.landmarks,
+            distances=self.distances,
+            signature=np.asarray(self.signature)
+        )
+
+    @classmethod
+    def load(cls, path: str, graph: Optional[SidewalkGraph] = None) -> Optional["LandmarkIndex"]:
+        """Cargar desde disco; None si el formato o el grafo no coinciden"""
+        with np.load(path) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                logger.warning("Landmarks en '%s' tienen un formato distinto; se ignoran", path)
+                return None
+            index = cls(data["profiles"].tolist(), data["landmarks"], data["distances"], str(data["signature"]))
+        if graph is not None and index.signature != graph_signature(graph):
+            logger.warning("Landmarks en '%s' corresponden a otro grafo; se ignoran", path)
+            return None
+        return index
+
+
+def landmarks_path(directory: str, city: str) -> str:
+    """Ruta del archivo de landmarks de una ciudad"""
+    return os.path.join(directory, f"{city}.landmarks.npz")
+
@@ -0,0 +1,83 @@
+"""
+Índice de nombres de calle para filtrar por texto sin recorrer toda la red.
+
+Los nombres se normalizan una vez (minúsculas, sin tildes: "Ñuñoa" -> "nunoa") y se
+deduplican; cada nombre distinto se indexa por sus trigramas. Una búsqueda por
+subcadena intersecta las listas de los trigramas de la consulta y verifica solo
+esos candidatos, así que su costo depende de cuántos nombres comparten los
+trigramas y no del tamaño de la red.
+"""
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_name(text: str) -> str:
+    """Minúsculas y sin tildes ni diacríticos, para comparar nombres"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def trigrams(text: str) -> List[str]:
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class NameIndex:
+    """
+    Búsqueda por subcadena sobre los nombres de un conjunto de calles.
+    `names` son los nombres normalizados distintos y `codes` el nombre de cada calle.
+    """
+
+    def __init__(self, names: Sequence[str], codes: np.ndarray):
+        self.names = names
+        self.codes = codes
+
+        # Calles de cada nombre, contiguas en `_streets` (ordenadas por posición)
+        self._streets = np.argsort(codes, kind="stable")
+        self._offsets = np.searchsorted(codes[self._streets], np.arange(len(names) + 1))
+        self._postings: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def postings(self) -> Dict[str, np.ndarray]:
+        """Nombres (códigos ordenados) que contienen cada trigrama (se arman en el primer uso)"""
+        if self._postings is None:
+            postings: Dict[str, List[int]] = {}
+            for code, name in enumerate(self.names):
+                for gram in set(trigrams(name)):
+                    postings.setdefault(gram, []).append(code)
+            self._postings = {gram: np.array(members, dtype=np.int64) for gram, members in postings.items()}
+        return self._postings
+
+    @classmethod
+    def from_names(cls, names: Sequence[str]) -> "NameIndex":
+        """Índice para los nombres (sin normalizar) de las calles, en orden de posición"""
+        distinct: Dict[str, int] = {}
+        codes = np.array([distinct.setdefault(normalize_name(name), len(distinct)) for name in names],
+                         dtype=np.int64)
+        return cls(list(distinct), codes)
+
+    def matching_names(self, query: str) -> np.ndarray:
+        """Códigos (ordenados) de los nombres que contienen `query`"""
+        needle = normalize_name(query)
+        grams = set(trigrams(needle))
+        if not grams:
+            # Consultas de menos de tres letras: se revisan los nombres distintos
+            candidates = range(len(self.names))
+        else:
+            lists = sorted((self.postings.get(gram) for gram in grams), key=lambda l: 0 if l is None else len(l))
+            if lists[0] is None:
+                return np.array([], dtype=np.int64)
+            candidates = lists[0]
+            for other in lists[1:]:
+                candidates = np.intersect1d(candidates, other, assume_unique=True)
+            candidates = candidates.tolist()
+        return np.array([code for code in candidates if needle in self.names[code]], dtype=np.int64)
+
+    def search(self, query: str) -> np.ndarray:
+        """Posiciones (ordenadas) de las calles cuyo nombre contiene `query`"""
+        codes = self.matching_names(query)
+        if not len(codes):
+            return np.array([], dtype=np.int64)
+        ranges = [self._streets[self._offsets[code]:self._offsets[code + 1]] for code in codes.tolist()]
+        return np.sort(np.concatenate(ranges))
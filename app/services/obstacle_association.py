@@ -0,0 +1,120 @@
+"""
+Asociación de obstáculos a la vereda más cercana, en el proceso actual o repartida
+por teselas entre los procesos del WorkerPool.
+
+Modo particionado: los obstáculos se agrupan por tesela de una cuadrícula fija
+(`tile_degrees`) y las teselas se reparten, en orden de Hilbert, en partes con
+una cantidad similar de obstáculos. Cada parte lleva solo las veredas cuya
+envolvente toca el bbox de sus obstáculos ampliado en `max_distance_meters`
+(el halo): son todas las que la búsqueda en serie podría considerar para esos
+obstáculos, así que cada uno, también los del borde de una tesela, queda con la
+misma vereda globalmente más cercana que en serie (los empates se resuelven por
+posición y las partes conservan el orden de las veredas).
+"""
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+import shapely
+
+from app.services.geodesy import PolylineSet, nearest_per_point
+from app.services.spatial_index import CoordinateColumn, LineIndex, radius_to_bbox
+from app.services.spatial_order import hilbert_keys
+
+# Lado de las teselas de la partición (~1 km)
+TILE_DEGREES = 0.01
+
+
+def associate_points(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    lines: Union[CoordinateColumn, Sequence[List[List[float]]]],
+    max_distance_meters: float
+) -> np.ndarray:
+    """Posición de la vereda más cercana a cada punto dentro del rango (-1 si ninguna)"""
+    assignment = np.full(len(lats), -1, dtype=np.int64)
+
+    # Índice espacial sobre las envolventes de las veredas: cada obstáculo
+    # solo se compara con las veredas que pueden estar dentro del rango
+    index = LineIndex(lines)
+    polylines = PolylineSet(lines)
+
+    # Pares (obstáculo, vereda candidata) y sus distancias en un solo cálculo vectorizado
+    pair_points, pair_lines = index.query_radius_many(lats, lngs, max_distance_meters)
+    distances = polylines.pair_distances(lats[pair_points], lngs[pair_points], pair_lines)
+
+    # Vereda más cercana por obstáculo (empates a favor del orden original)
+    nearest_points, nearest_lines, min_distances = nearest_per_point(pair_points, pair_lines, distances)
+
+    # Asociar si está dentro del rango
+    within = min_distances <= max_distance_meters
+    assignment[nearest_points[within]] = nearest_lines[within]
+    return assignment
+
+
+def partition(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    lines: CoordinateColumn,
+    max_distance_meters: float,
+    parts: int,
+    tile_degrees: float = TILE_DEGREES
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Partición por teselas con halo: (índices de los puntos, posiciones ordenadas de
+    las veredas que necesitan) de cada parte, a lo más `parts`
+    """
+    if not len(lats):
+        return []
+    rows = np.floor(lats / tile_degrees).astype(np.int64)
+    columns = np.floor(lngs / tile_degrees).astype(np.int64)
+    rows -= rows.min()
+    columns -= columns.min()
+    width = int(columns.max()) + 1
+    tiles, tile_of_point = np.unique(rows * width + columns, return_inverse=True)
+
+    # Teselas en orden de Hilbert, para que cada parte quede compacta
+    tile_rows, tile_columns = np.divmod(tiles, width)
+    bits = max(int(max(tile_rows.max(), tile_columns.max())).bit_length(), 1)
+    tile_rank = np.empty(len(tiles), dtype=np.int64)
+    tile_rank[np.argsort(hilbert_keys(tile_columns, tile_rows, bits), kind="stable")] = np.arange(len(tiles))
+    point_order = np.lexsort((np.arange(len(lats)), tile_rank[tile_of_point]))
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(tile_rank[tile_of_point], minlength=len(tiles)))))
+
+    # Bbox de los puntos de cada tesela, ampliado con el mismo margen de radius_to_bbox
+    starts = offsets[:-1]
+    sorted_lats, sorted_lngs = lats[point_order], lngs[point_order]
+    min_lats, max_lats = np.minimum.reduceat(sorted_lats, starts), np.maximum.reduceat(sorted_lats, starts)
+    min_lngs, max_lngs = np.minimum.reduceat(sorted_lngs, starts), np.maximum.reduceat(sorted_lngs, starts)
+    far_lats = np.maximum(np.abs(min_lats), np.abs(max_lats))
+    _, low_lats, delta_lngs, _ = radius_to_bbox(far_lats, 0.0, max_distance_meters)
+    delta_lats = far_lats - low_lats
+
+    index = LineIndex(lines)
+    if len(index.positions):
+        tile_hits, line_hits = index.tree.query(shapely.box(
+            min_lngs - delta_lngs, min_lats - delta_lats, max_lngs + delta_lngs, max_lats + delta_lats
+        ))
+        line_positions = index.positions[line_hits]
+    else:
+        tile_hits = line_positions = np.array([], dtype=np.int64)
+
+    # Cortes entre teselas para que las partes tengan una cantidad similar de puntos
+    cuts = np.unique(np.searchsorted(offsets, np.linspace(0, len(lats), max(parts, 1) + 1), side="left"))
+    cuts[-1] = len(tiles)
+    result = []
+    for first, last in zip(cuts[:-1].tolist(), cuts[1:].tolist()):
+        if first >= last:
+            continue
+        points = point_order[offsets[first]:offsets[last]]
+        sidewalks = np.unique(line_positions[(tile_hits >= first) & (tile_hits < last)])
+        result.append((points, sidewalks))
+    return result
+
+
+def associate_part(lats: np.ndarray, lngs: np.ndarray, lines: CoordinateColumn,
+                   positions: np.ndarray, max_distance_meters: float) -> np.ndarray:
+    """Asociación de una parte contra sus veredas `lines` (posiciones globales `positions`)"""
+    if not len(positions):
+        return np.full(len(lats), -1, dtype=np.int64)
+    local = associate_points(lats, lngs, lines, max_distance_meters)
+    return np.where(local >= 0, positions[np.maximum(local, 0)], -1)
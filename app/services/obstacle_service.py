@@ -1,12 +1,181 @@
-import httpx
-from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
 from app.models import (
     Obstacle, ObstacleType, SeverityLevel, Coordinate,
     SidewalkAccessibility, ObstaclesResponse, GeoJSONLineString
 )
-import math
+from app.services.feed_cache import FeedCache, FeedEntry
+from app.services.obstacle_association import TILE_DEGREES, associate_part, associate_points, partition
+from app.services.obstacle_store import INT_NULL, SEVERITY_LEVELS, ObstacleStore, ObstacleStoreParser, diff_labels
+from app.services.sidewalk_grid import SidewalkGrid
+from app.services.simplification import GeometryLevels, shape_line, simplify_level
+from app.services.spatial_index import CoordinateColumn
+from app.services.worker_pool import WorkerPool
+import numpy as np
+from pydantic import TypeAdapter
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Serializador de listas de veredas (para armar el JSON de /obstacles por bloques)
+sidewalks_json = TypeAdapter(List[SidewalkAccessibility])
+
+
+class SidewalkScores:
+    """
+    Resultado del scoring por lotes, por grupo de veredas. `groups[p]` es el grupo
+    de la vereda en la posición p (la primera vereda con su id; -1 si no tiene id).
+    """
+    
+    def __init__(self, groups: np.ndarray, scores: List[float], obstacle_counts: np.ndarray,
+                 breakdown: np.ndarray, center_lats: np.ndarray, center_lngs: np.ndarray,
+                 order: np.ndarray, offsets: np.ndarray):
+        self.groups = groups.tolist()
+        self.scores = scores
+        self.obstacle_counts = obstacle_counts.tolist()
+        self.breakdown = breakdown.tolist()
+        self.center_lats = center_lats.tolist()
+        self.center_lngs = center_lngs.tolist()
+        self.order = order
+        self.offsets = offsets
+    
+    def obstacle_positions(self, group: int) -> np.ndarray:
+        """Posiciones en el store de los obstáculos del grupo, en el orden del feed"""
+        return self.order[self.offsets[group]:self.offsets[group + 1]]
+    
+    def severity_breakdown(self, group: int) -> Dict[str, int]:
+        """Conteo de obstáculos del grupo por nivel de severidad"""
+        return {level.value: count for level, count in zip(SEVERITY_LEVELS, self.breakdown[group])}
+
+
+class ScoredFeed:
+    """Entradas y asociación con que se calculó un snapshot, para recalcularlo por diferencias"""
+    
+    def __init__(self, obstacles: ObstacleStore, sidewalk_geometries: List[Dict[str, Any]],
+                 lines: Optional[CoordinateColumn], assignment: np.ndarray, grid: Optional[SidewalkGrid]):
+        self.obstacles = obstacles
+        self.sidewalk_geometries = sidewalk_geometries
+        # Veredas indexables para asociar (None con la cuadrícula por defecto, que asigna por celda)
+        self.lines = lines
+        self.assignment = assignment
+        # Cuadrícula por defecto de la que salen las veredas (None: geometrías dadas)
+        self.grid = grid
+
+
+class ObstaclesSnapshot:
+    """
+    Resultado materializado de /obstacles para una versión del feed.
+    
+    `changed_sidewalk_ids` son las veredas que cambiaron respecto del snapshot de
+    `previous_version` cuando se recalculó por diferencias (None: se recalculó todo),
+    para que las cachés derivadas (p. ej. teselas) invaliden solo esas.
+    """
+    
+    # Veredas por bloque al serializar la respuesta completa (`response_json`)
+    JSON_CHUNK_SIZE = 512
+    
+    def __init__(self, response: ObstaclesResponse, version: str, feed: Optional[ScoredFeed] = None,
+                 geometry_levels: Optional[GeometryLevels] = None, previous_version: Optional[str] = None,
+                 changed_sidewalk_ids: Optional[Set[str]] = None):
+        self.response = response
+        self.version = version
+        self.feed = feed
+        self.previous_version = previous_version
+        self.changed_sidewalk_ids = changed_sidewalk_ids
+        self.built_at = time.monotonic()
+        # Snapshots de los niveles más gruesos de la cuadrícula, calculados al pedirse
+        self.grid_levels: Dict[int, "ObstaclesSnapshot"] = {}
+        # Geometrías de las veredas simplificadas por nivel, para vistas alejadas
+        self.geometry_levels = geometry_levels or GeometryLevels(
+            [s.geometry.coordinates for s in response.sidewalks]
+        )
+    
+    def iter_sidewalks(self, simplify_tolerance: Optional[float] = None,
+                       precision: Optional[int] = None) -> Iterator[SidewalkAccessibility]:
+        """Veredas del snapshot con la geometría simplificada/cuantizada (copias creadas al recorrer)"""
+        if simplify_level(simplify_tolerance) is None and precision is None:
+            yield from self.response.sidewalks
+            return
+        for position, sidewalk in enumerate(self.response.sidewalks):
+            coordinates = self.geometry_levels.coordinates(position, simplify_tolerance, precision)
+            yield sidewalk.model_copy(update={"geometry": GeoJSONLineString(coordinates=coordinates)})
+    
+    def shaped_response(self, simplify_tolerance: Optional[float] = None,
+                        precision: Optional[int] = None) -> ObstaclesResponse:
+        """Respuesta del snapshot con las geometrías de las veredas simplificadas/cuantizadas"""
+        if simplify_level(simplify_tolerance) is None and precision is None:
+            return self.response
+        return self.response.model_copy(
+            update={"sidewalks": list(self.iter_sidewalks(simplify_tolerance, precision))}
+        )
+    
+    def response_json(self, simplify_tolerance: Optional[float] = None,
+                      precision: Optional[int] = None) -> bytes:
+        """
+        JSON de `shaped_response`, serializando las veredas en bloques: cada bloque es
+        una llamada corta a pydantic-core, así un thread que arma una respuesta grande
+        suelta el GIL entre bloques y el event loop sigue atendiendo.
+        """
+        head = self.response.model_dump_json(exclude={"sidewalks"}).encode()
+        sidewalks = self.iter_sidewalks(simplify_tolerance, precision)
+        chunks = []
+        while True:
+            chunk = list(itertools.islice(sidewalks, self.JSON_CHUNK_SIZE))
+            if not chunk:
+                break
+            chunks.append(sidewalks_json.dump_json(chunk)[1:-1])
+        return head[:-1] + b',"sidewalks":[' + b",".join(chunks) + b"]}"
+    
+    def age(self) -> float:
+        """Segundos desde que se construyó o confirmó el snapshot"""
+        return time.monotonic() - self.built_at
+
+
+class SidewalkStream:
+    """Veredas de /obstacles listas para enviarse una por línea (NDJSON / GeoJSON-seq)"""
+    
+    # Veredas serializadas entre cada cesión de control al event loop
+    CHUNK_SIZE = 256
+    
+    def __init__(self, version: str, sidewalks: Iterable[SidewalkAccessibility],
+                 age: Optional[float] = None):
+        self.version = version
+        self.sidewalks = sidewalks
+        self.age = age
+    
+    @staticmethod
+    def feature(sidewalk: SidewalkAccessibility) -> Dict[str, Any]:
+        """Vereda como Feature GeoJSON (la geometría sale de las propiedades)"""
+        properties = sidewalk.model_dump(mode="json", exclude={"geometry"})
+        return {
+            "type": "Feature",
+            "id": sidewalk.sidewalk_id,
+            "geometry": sidewalk.geometry.model_dump(mode="json"),
+            "properties": properties
+        }
+    
+    async def lines(self, record_separator: bool = False) -> AsyncIterator[bytes]:
+        """
+        Una Feature por línea. Con `record_separator` cada registro va precedido
+        de RS (0x1E), como exige application/geo+json-seq (RFC 8142).
+        """
+        prefix = b"\x1e" if record_separator else b""
+        chunk = []
+        for sidewalk in self.sidewalks:
+            chunk.append(prefix + json.dumps(self.feature(sidewalk), separators=(",", ":")).encode() + b"\n")
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield b"".join(chunk)
+                chunk = []
+                # Dejar atender otras peticiones entre bloques
+                await asyncio.sleep(0)
+        if chunk:
+            yield b"".join(chunk)
+
+
 class ObstacleService:
     """Servicio para obtener y procesar obstáculos de las APIs de sidewalk"""
     
@@ -37,20 +206,57 @@ class ObstacleService:
         5: 1.0    # Muy severo
     }
     
-    async def fetch_obstacles(self, city: str) -> List[Dict[str, Any]]:
-        """Obtener obstáculos desde la API de sidewalk"""
+    # Tiempo de vida de los feeds en caché antes de revalidar con el upstream
+    FEED_TTL_SECONDS = 300.0
+    
+    # Antigüedad a partir de la cual un snapshot materializado se refresca en segundo plano
+    SNAPSHOT_REFRESH_SECONDS = 300.0
+    
+    # Obstáculos a partir de los cuales la asociación se hace en el pool de procesos
+    PARALLEL_MIN_OBSTACLES = 5000
+    # Asociación particionada: procesos (None = los del pool), lado de las teselas
+    # y partes por proceso (más partes reparten mejor la carga entre procesos)
+    ASSOCIATION_WORKERS: Optional[int] = None
+    ASSOCIATION_TILE_DEGREES = TILE_DEGREES
+    PARTS_PER_WORKER = 4
+    
+    # Fracción de labels cambiados sobre la cual se recalcula todo en vez de por diferencias
+    INCREMENTAL_MAX_CHANGED = 0.5
+    
+    # Veredas armadas entre cada cesión de control al event loop
+    YIELD_EVERY = 64
+    
+    def __init__(self, feed_cache: Optional[FeedCache] = None, worker_pool: Optional[WorkerPool] = None):
+        self.feed_cache = feed_cache or FeedCache(ttl_seconds=self.FEED_TTL_SECONDS)
+        self.worker_pool = worker_pool or WorkerPool()
+        self._snapshots: Dict[str, ObstaclesSnapshot] = {}
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._snapshot_listeners: List[Callable[[str, ObstaclesSnapshot], Any]] = []
+    
+    async def fetch_feed(self, city: str) -> FeedEntry:
+        """Obtener el feed labelClusters de la ciudad (desde caché o revalidado)"""
         city = city.lower()
         if city not in self.SIDEWALK_APIS:
             raise ValueError(f"Ciudad '{city}' no soportada. Ciudades disponibles: {list(self.SIDEWALK_APIS.keys())}")
         
-        api_url = self.SIDEWALK_APIS[city]
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(api_url)
-            response.raise_for_status()
-            data = response.json()
-            
-        return data.get("features", []) if isinstance(data, dict) else data
+        return await self.feed_cache.get(city, self.SIDEWALK_APIS[city], parser=self._feed_parser)
+    
+    def _feed_parser(self) -> ObstacleStoreParser:
+        """Parser del feed: cada feature pasa a las columnas del store apenas termina de llegar"""
+        return ObstacleStoreParser(self._classify_label)
+    
+    async def fetch_obstacles(self, city: str) -> ObstacleStore:
+        """Obtener obstáculos desde la API de sidewalk (en forma columnar)"""
+        entry = await self.fetch_feed(city)
+        return entry.payload
+    
+    async def aclose(self):
+        """Detener el refresco en segundo plano y liberar el cliente HTTP compartido"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self.feed_cache.aclose()
     
     def _map_severity(self, severity_value: Optional[int]) -> SeverityLevel:
         """Mapear valor de severidad (1-5) a SeverityLevel"""
@@ -66,19 +272,9 @@ class ObstacleService:
         else:  # 5
             return SeverityLevel.CRITICAL
     
-    def _parse_obstacle(self, feature: Dict[str, Any]) -> Obstacle:
-        """Convertir feature de la API a modelo Obstacle"""
-        props = feature.get("properties", {})
-        geometry = feature.get("geometry", {})
-        coordinates = geometry.get("coordinates", [0, 0])
-        
-        # Extraer datos
-        label_id = props.get("label_id")
-        lat = coordinates[1] if len(coordinates) > 1 else 0
-        lng = coordinates[0] if len(coordinates) > 0 else 0
-        label_type_id = props.get("label_type_id")
-        severity_value = props.get("severity")
-        
+    def _classify_label(self, label_type_id: Optional[int],
+                        severity_value: Optional[int]) -> Tuple[ObstacleType, SeverityLevel, bool]:
+        """Tipo de obstáculo, nivel de severidad y si afecta la accesibilidad de un label"""
         # Mapear tipo de obstáculo
         obstacle_type = self.LABEL_TYPE_MAPPING.get(label_type_id, ObstacleType.OTHER)
         severity = self._map_severity(severity_value)
@@ -90,133 +286,50 @@ class ObstacleService:
             ObstacleType.SURFACE_PROBLEM,
             ObstacleType.NO_SIDEWALK
         ]
-        
-        return Obstacle(
-            id=f"obs_{label_id}",
-            position=Coordinate(lat=lat, lng=lng),
-            obstacle_type=obstacle_type,
-            severity=severity,
-            description=props.get("description"),
-            affects_accessibility=affects_accessibility,
-            label_id=label_id,
-            gsv_panorama_id=props.get("gsv_panorama_id"),
-            label_type_id=label_type_id,
-            photographer_heading=props.get("photographer_heading"),
-            heading=props.get("heading"),
-            pitch=props.get("pitch"),
-            zoom=props.get("zoom"),
-            canvas_x=props.get("canvas_x"),
-            canvas_y=props.get("canvas_y"),
-            canvas_width=props.get("canvas_width"),
-            canvas_height=props.get("canvas_height"),
-            severity_value=severity_value,
-            temporary=props.get("temporary"),
-            tags=props.get("tags"),
-            agree_count=props.get("agree_count"),
-            disagree_count=props.get("disagree_count"),
-            notsure_count=props.get("notsure_count")
-        )
-    
-    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calcular distancia en metros entre dos coordenadas usando fórmula de Haversine"""
-        R = 6371000  # Radio de la Tierra en metros
-        
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        
-        a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
-    
-    def _find_nearest_point_on_line(self, point: Coordinate, line_coords: List[List[float]]) -> Tuple[Coordinate, float]:
-        """
-        Encontrar el punto más cercano en una línea (vereda) a un punto dado (obstáculo)
-        Retorna: (punto_más_cercano, distancia_mínima)
-        """
-        min_distance = float('inf')
-        nearest_point = None
-        
-        # Revisar cada segmento de la línea
-        for i in range(len(line_coords) - 1):
-            p1_lng, p1_lat = line_coords[i]
-            p2_lng, p2_lat = line_coords[i + 1]
-            
-            # Calcular distancia al punto medio del segmento (simplificación)
-            mid_lat = (p1_lat + p2_lat) / 2
-            mid_lng = (p1_lng + p2_lng) / 2
-            
-            distance = self._haversine_distance(point.lat, point.lng, mid_lat, mid_lng)
-            
-            if distance < min_distance:
-                min_distance = distance
-                nearest_point = Coordinate(lat=mid_lat, lng=mid_lng)
-        
-        return nearest_point, min_distance
+        return obstacle_type, severity, affects_accessibility
     
-    def _associate_obstacles_to_sidewalks(
-        self, 
-        obstacles: List[Obstacle], 
-        sidewalk_geometries: List[Dict[str, Any]],
-        max_distance_meters: float = 50.0
-    ) -> Dict[str, List[Obstacle]]:
-        """
-        Asociar cada obstáculo a la vereda más cercana
+    async def _associate_points_async(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        lines: CoordinateColumn,
+        max_distance_meters: float = 50.0,
+        workers: Optional[int] = None,
+        tile_degrees: Optional[float] = None
+    ) -> np.ndarray:
+        """Vereda más cercana (-1 si ninguna) de cada punto, en el pool si son muchos"""
+        if len(lats) < self.PARALLEL_MIN_OBSTACLES:
+            return associate_points(lats, lngs, lines, max_distance_meters)
         
-        Args:
-            obstacles: Lista de obstáculos
-            sidewalk_geometries: Lista de diccionarios con {id, geometry}
-            max_distance_meters: Distancia máxima para asociar un obstáculo a una vereda
-            
-        Returns:
-            Diccionario {sidewalk_id: [obstáculos]}
-        """
-        sidewalk_obstacles: Dict[str, List[Obstacle]] = {
-            sw["id"]: [] for sw in sidewalk_geometries
-        }
+        workers = workers or self.ASSOCIATION_WORKERS or self.worker_pool.max_workers
+        parts, tasks = self._association_tasks(lats, lngs, lines, max_distance_meters, workers, tile_degrees)
+        results = await self.worker_pool.map_async(associate_part, tasks)
         
-        for obstacle in obstacles:
-            if not obstacle.affects_accessibility:
-                continue
-                
-            min_distance = float('inf')
-            nearest_sidewalk_id = None
-            
-            # Encontrar la vereda más cercana
-            for sidewalk in sidewalk_geometries:
-                line_coords = sidewalk["geometry"].coordinates
-                _, distance = self._find_nearest_point_on_line(obstacle.position, line_coords)
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_sidewalk_id = sidewalk["id"]
-            
-            # Asociar si está dentro del rango
-            if nearest_sidewalk_id and min_distance <= max_distance_meters:
-                sidewalk_obstacles[nearest_sidewalk_id].append(obstacle)
-        
-        return sidewalk_obstacles
+        # Unir las partes en el padre, cada resultado en las posiciones de sus puntos
+        assignment = np.full(len(lats), -1, dtype=np.int64)
+        for (points, _), result in zip(parts, results):
+            assignment[points] = result
+        return assignment
     
-    def _calculate_accessibility_score(self, obstacles: List[Obstacle]) -> float:
-        """
-        Calcular score de accesibilidad basado en obstáculos (0-100)
-        100 = perfecto (sin obstáculos)
-        0 = muy inaccesible
-        """
-        if not obstacles:
-            return 100.0
-        
-        # Calcular penalización total
-        total_penalty = 0.0
-        for obs in obstacles:
-            severity_weight = self.SEVERITY_WEIGHTS.get(obs.severity_value or 3, 0.6)
-            total_penalty += severity_weight * 10  # Cada obstáculo puede restar hasta 10 puntos según severidad
-        
-        # Calcular score (mínimo 0)
-        score = max(0.0, 100.0 - total_penalty)
-        return round(score, 2)
+    def _association_tasks(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        lines: CoordinateColumn,
+        max_distance_meters: float,
+        workers: int,
+        tile_degrees: Optional[float] = None
+    ) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], List[Tuple[Any, ...]]]:
+        """Partes de la asociación particionada y sus tareas (cada una con solo sus veredas)"""
+        parts = partition(
+            lats, lngs, lines, max_distance_meters,
+            workers * self.PARTS_PER_WORKER, tile_degrees or self.ASSOCIATION_TILE_DEGREES
+        )
+        tasks = [
+            (lats[points], lngs[points], lines.take(sidewalks), sidewalks, max_distance_meters)
+            for points, sidewalks in parts
+        ]
+        return parts, tasks
     
     def _get_severity_breakdown(self, obstacles: List[Obstacle]) -> Dict[str, int]:
         """Obtener conteo de obstáculos por nivel de severidad"""
@@ -234,6 +347,69 @@ class ObstacleService:
         
         return breakdown
     
+    def _score_sidewalks(
+        self,
+        obstacles: ObstacleStore,
+        sidewalk_geometries: List[Dict[str, Any]],
+        assignment: np.ndarray
+    ) -> "SidewalkScores":
+        """
+        Scoring por lotes de todas las veredas: score, desglose por severidad, cantidad
+        de obstáculos y centro, con reducciones agrupadas (np.bincount) en vez de un
+        recorrido por vereda. Da los mismos valores que sumar SEVERITY_WEIGHTS obstáculo
+        por obstáculo y que `_get_severity_breakdown`: las sumas se acumulan en el mismo orden.
+        
+        Como en la asociación por diccionario, las veredas con el mismo id comparten
+        obstáculos y las de id vacío no reciben ninguno.
+        """
+        count = len(sidewalk_geometries)
+        first_position: Dict[Any, int] = {}
+        groups = np.fromiter(
+            (first_position.setdefault(sw["id"], p) if sw["id"] else -1
+             for p, sw in enumerate(sidewalk_geometries)),
+            dtype=np.int64, count=count
+        )
+        
+        # Obstáculos asociados y el grupo (primera vereda con ese id) al que suman
+        assigned = np.flatnonzero(assignment >= 0)
+        obstacle_groups = groups[assignment[assigned]]
+        keep = obstacle_groups >= 0
+        assigned, obstacle_groups = assigned[keep], obstacle_groups[keep]
+        
+        # Penalización por obstáculo con los mismos pesos y valores por defecto
+        severity_values = obstacles.severity_value[assigned]
+        severity_keys = np.where((severity_values == INT_NULL) | (severity_values == 0), 3, severity_values)
+        weights = np.full(len(assigned), 0.6)
+        for severity_value, weight in self.SEVERITY_WEIGHTS.items():
+            weights[severity_keys == severity_value] = weight
+        total_penalty = np.bincount(obstacle_groups, weights=weights * 10, minlength=count)
+        scores = [round(score, 2) for score in np.maximum(0.0, 100.0 - total_penalty).tolist()]
+        
+        obstacle_counts = np.bincount(obstacle_groups, minlength=count)
+        breakdown = np.bincount(
+            obstacle_groups * len(SEVERITY_LEVELS) + obstacles.severity[assigned],
+            minlength=count * len(SEVERITY_LEVELS)
+        ).reshape(count, len(SEVERITY_LEVELS))
+        
+        # Centro de cada vereda: promedio de sus vértices
+        lines = [sw["geometry"].coordinates for sw in sidewalk_geometries]
+        vertex_counts = np.fromiter((len(coords) for coords in lines), dtype=np.int64, count=count)
+        owners = np.repeat(np.arange(count), vertex_counts)
+        vertices = np.asarray([c for coords in lines for c in coords], dtype=np.float64).reshape(-1, 2)
+        divisor = np.maximum(vertex_counts, 1)
+        center_lats = np.bincount(owners, weights=vertices[:, 1], minlength=count) / divisor
+        center_lngs = np.bincount(owners, weights=vertices[:, 0], minlength=count) / divisor
+        
+        # Obstáculos de cada grupo contiguos y en el orden del feed
+        order = assigned[np.argsort(obstacle_groups, kind="stable")]
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(obstacle_counts, out=offsets[1:])
+        
+        return SidewalkScores(
+            groups, scores, obstacle_counts, breakdown,
+            center_lats, center_lngs, order, offsets
+        )
+    
     async def get_obstacles_with_sidewalks(
         self, 
         city: str,
@@ -245,97 +421,295 @@ class ObstacleService:
         Args:
             city: Nombre de la ciudad
             sidewalk_geometries: Lista opcional de geometrías de veredas.
-                                 Si no se proporciona, se generará una cuadrícula básica.
+                                 Si no se proporciona, se generará una cuadrícula básica
+                                 y se sirve el snapshot materializado de la ciudad.
         """
-        # Obtener obstáculos de la API
-        features = await self.fetch_obstacles(city)
-        obstacles = [self._parse_obstacle(f) for f in features]
+        if sidewalk_geometries:
+            # Geometrías a medida: no se cachea
+            entry = await self.fetch_feed(city)
+            return await self._build_obstacles_response_async(city, entry.payload, sidewalk_geometries, entry.version)
         
-        # Si no se proporcionan geometrías de veredas, crear una cuadrícula básica
-        if not sidewalk_geometries:
-            sidewalk_geometries = self._generate_default_sidewalk_grid(obstacles)
+        snapshot = await self.get_snapshot(city)
+        return snapshot.response
+    
+    async def get_snapshot(self, city: str) -> ObstaclesSnapshot:
+        """
+        Obtener el último snapshot bueno de la ciudad (stale-while-revalidate).
+        Solo la primera petición de una ciudad espera el cálculo; después se sirve
+        el snapshot vigente y, si es antiguo, se refresca en segundo plano.
+        """
+        city = city.lower()
+        snapshot = self._snapshots.get(city)
+        if snapshot is None:
+            return await self.refresh_snapshot(city)
         
-        # Asociar obstáculos a veredas
-        sidewalk_obstacles = self._associate_obstacles_to_sidewalks(obstacles, sidewalk_geometries)
+        if snapshot.age() >= self.SNAPSHOT_REFRESH_SECONDS and city not in self._refreshing:
+            asyncio.ensure_future(self._refresh_quietly(city))
+        return snapshot
+    
+    async def refresh_snapshot(self, city: str) -> ObstaclesSnapshot:
+        """Recalcular el snapshot de la ciudad si cambió la versión del feed (single-flight)"""
+        city = city.lower()
+        future = self._refreshing.get(city)
+        if future is None:
+            future = asyncio.ensure_future(self._rebuild_snapshot(city))
+            self._refreshing[city] = future
+            future.add_done_callback(lambda _: self._refreshing.pop(city, None))
+        return await asyncio.shield(future)
+    
+    async def _rebuild_snapshot(self, city: str) -> ObstaclesSnapshot:
+        entry = await self.fetch_feed(city)
+        current = self._snapshots.get(city)
+        if current is not None and current.version == entry.version:
+            # Mismo feed: el resultado materializado sigue siendo válido
+            current.built_at = time.monotonic()
+            return current
         
-        # Crear respuesta con scores de accesibilidad
-        sidewalks_accessibility = []
-        for sidewalk in sidewalk_geometries:
-            sidewalk_id = sidewalk["id"]
-            geometry = sidewalk["geometry"]
-            obs_list = sidewalk_obstacles.get(sidewalk_id, [])
-            
-            # Calcular centro de la vereda
-            coords = geometry.coordinates
-            if coords:
-                center_lat = sum(c[1] for c in coords) / len(coords)
-                center_lng = sum(c[0] for c in coords) / len(coords)
-            else:
-                center_lat, center_lng = 0, 0
-            
-            sidewalk_acc = SidewalkAccessibility(
-                sidewalk_id=sidewalk_id,
-                geometry=geometry,
-                position=Coordinate(lat=center_lat, lng=center_lng),
-                accessibility_score=self._calculate_accessibility_score(obs_list),
-                obstacle_count=len(obs_list),
-                obstacles=obs_list,
-                severity_breakdown=self._get_severity_breakdown(obs_list)
-            )
-            sidewalks_accessibility.append(sidewalk_acc)
+        snapshot = None
+        if current is not None:
+            snapshot = await self._rebuild_incremental(city, entry.payload, entry.version, current)
+        if snapshot is None:
+            feed = await self._score_feed_async(entry.payload)
+            response = await self._build_response_async(city, feed, entry.version)
+            snapshot = ObstaclesSnapshot(response=response, version=entry.version, feed=feed)
+        # Reemplazo atómico: las peticiones en curso conservan el snapshot anterior
+        self._snapshots[city] = snapshot
+        for listener in self._snapshot_listeners:
+            try:
+                listener(city, snapshot)
+            except Exception:
+                logger.exception("Falló un listener del snapshot de obstáculos de '%s'", city)
+        return snapshot
+    
+    async def _rebuild_incremental(self, city: str, obstacles: ObstacleStore, version: str,
+                                   previous: ObstaclesSnapshot) -> Optional[ObstaclesSnapshot]:
+        """
+        Snapshot nuevo a partir de `previous` recalculando solo lo que cambió en el feed:
+        se ubican en su celda los labels agregados o modificados y se rearman las veredas cuyos
+        obstáculos cambiaron (con las que comparten su id); el resto se reutiliza.
+        Retorna None si hay que recalcular todo: cambió la extensión de la cuadrícula, hay label_id
+        repetidos, cambió demasiado o los labels sin cambios cambiaron de orden.
+        """
+        old = previous.feed
+        if old is None or old.grid is None or old.grid != self._default_grid(obstacles, old.grid.level):
+            return None
+        diff = diff_labels(old.obstacles, obstacles)
+        if diff is None or diff.changed > self.INCREMENTAL_MAX_CHANGED * len(obstacles):
+            return None
+        # Los obstáculos de cada vereda van en el orden del feed
+        if np.any(np.diff(diff.kept_new) < 0):
+            return None
         
-        return ObstaclesResponse(
+        assignment = np.full(len(obstacles), -1, dtype=np.int64)
+        assignment[diff.kept_new] = old.assignment[diff.kept_old]
+        fresh = diff.added[obstacles.affects_accessibility[diff.added]]
+        assignment[fresh] = old.grid.positions(obstacles.lat[fresh], obstacles.lng[fresh])
+        scores = self._score_sidewalks(obstacles, old.sidewalk_geometries, assignment)
+        
+        affected = self._affected_sidewalks(scores, old.assignment[diff.removed], assignment[diff.added])
+        sidewalks = list(previous.response.sidewalks)
+        rebuilt = await self._collect(
+            self._iter_sidewalk_accessibility(obstacles, old.sidewalk_geometries, scores, affected.tolist())
+        )
+        for position, sidewalk in zip(affected.tolist(), rebuilt):
+            sidewalks[position] = sidewalk
+        
+        changed = {old.sidewalk_geometries[position]["id"] for position in affected.tolist()}
+        logger.info("Snapshot de obstáculos de '%s' recalculado por diferencias: %d labels, %d veredas",
+                    city, diff.changed, len(changed))
+        response = ObstaclesResponse(
             city=city,
             total_obstacles=len(obstacles),
-            sidewalks=sidewalks_accessibility,
-            last_updated=datetime.utcnow().isoformat()
+            sidewalks=sidewalks,
+            last_updated=datetime.utcnow().isoformat(),
+            data_version=version
         )
+        feed = ScoredFeed(obstacles, old.sidewalk_geometries, None, assignment, old.grid)
+        return ObstaclesSnapshot(
+            response=response, version=version, feed=feed, geometry_levels=previous.geometry_levels,
+            previous_version=previous.version, changed_sidewalk_ids=changed
+        )
+    
+    @staticmethod
+    def _affected_sidewalks(scores: "SidewalkScores", *assignments: np.ndarray) -> np.ndarray:
+        """Posiciones de las veredas de los grupos a los que llega o de los que sale algún obstáculo"""
+        groups = np.asarray(scores.groups, dtype=np.int64)
+        touched = np.concatenate(assignments)
+        touched_groups = np.unique(groups[touched[touched >= 0]])
+        return np.flatnonzero(np.isin(groups, touched_groups[touched_groups >= 0]))
+    
+    def add_snapshot_listener(self, listener: Callable[[str, ObstaclesSnapshot], Any]):
+        """Registrar una función que se llama con (ciudad, snapshot) cada vez que se publica uno nuevo"""
+        self._snapshot_listeners.append(listener)
+    
+    async def _refresh_quietly(self, city: str):
+        try:
+            await self.refresh_snapshot(city)
+        except Exception:
+            logger.exception("No se pudo refrescar el snapshot de obstáculos de '%s'", city)
     
-    def _generate_default_sidewalk_grid(self, obstacles: List[Obstacle]) -> List[Dict[str, Any]]:
+    async def run_background_refresh(self, interval_seconds: Optional[float] = None):
+        """Tarea de fondo: refrescar periódicamente los snapshots de todas las ciudades"""
+        interval = interval_seconds or self.SNAPSHOT_REFRESH_SECONDS
+        while True:
+            for city in self.SIDEWALK_APIS:
+                await self._refresh_quietly(city)
+            await asyncio.sleep(interval)
+    
+    def start_background_refresh(self, interval_seconds: Optional[float] = None):
+        """Lanzar la tarea de refresco periódico (idempotente)"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.run_background_refresh(interval_seconds))
+    
+    async def _build_obstacles_response_async(
+        self,
+        city: str,
+        obstacles: ObstacleStore,
+        sidewalk_geometries: Optional[List[Dict[str, Any]]],
+        data_version: Optional[str] = None
+    ) -> ObstaclesResponse:
         """
-        Generar cuadrícula de veredas cuando no se proporcionan geometrías reales
-        Divide el área en celdas de aproximadamente 100x100 metros
+        Construir la respuesta completa (asociación y scoring) sin bloquear el event
+        loop: la asociación se hace en el pool de procesos y la cuadrícula y los modelos
+        de cada vereda se arman por bloques, cediendo el control entre uno y otro.
         """
-        if not obstacles:
-            return []
-        
-        # Encontrar bounding box de los obstáculos
-        lats = [obs.position.lat for obs in obstacles]
-        lngs = [obs.position.lng for obs in obstacles]
-        
-        min_lat, max_lat = min(lats), max(lats)
-        min_lng, max_lng = min(lngs), max(lngs)
+        feed = await self._score_feed_async(obstacles, sidewalk_geometries)
+        return await self._build_response_async(city, feed, data_version)
+    
+    async def _score_feed_async(self, obstacles: ObstacleStore,
+                                sidewalk_geometries: Optional[List[Dict[str, Any]]] = None,
+                                grid_level: int = 0) -> ScoredFeed:
+        """
+        Veredas y la asociación de los obstáculos. Sin geometrías se usa la cuadrícula
+        por defecto del nivel `grid_level` y cada obstáculo va a su celda.
+        """
+        if not sidewalk_geometries:
+            grid = self._default_grid(obstacles, grid_level)
+            cells = await self._collect(grid.iter_cells()) if grid is not None else []
+            return ScoredFeed(obstacles, cells, None, self._bucket_obstacles(obstacles, grid), grid)
         
-        # Crear celdas de aproximadamente 100x100 metros
-        # 1 grado ≈ 111km, entonces 0.001 grados ≈ 111 metros
-        cell_size = 0.001  # aproximadamente 100 metros
+        lines = CoordinateColumn.from_lists([sw["geometry"].coordinates for sw in sidewalk_geometries])
+        assignment = np.full(len(obstacles), -1, dtype=np.int64)
+        candidates = np.flatnonzero(obstacles.affects_accessibility)
+        assignment[candidates] = await self._associate_points_async(
+            obstacles.lat[candidates], obstacles.lng[candidates], lines
+        )
+        return ScoredFeed(obstacles, sidewalk_geometries, lines, assignment, None)
+    
+    async def grid_level_snapshot(self, snapshot: ObstaclesSnapshot, level: int) -> ObstaclesSnapshot:
+        """
+        El snapshot con la cuadrícula de nivel `level` (0: el mismo). Los niveles más
+        gruesos se calculan la primera vez que se piden para cada versión.
+        """
+        feed = snapshot.feed
+        if not level or feed is None or feed.grid is None:
+            return snapshot
+        coarse = snapshot.grid_levels.get(level)
+        if coarse is None:
+            coarse_feed = await self._score_feed_async(feed.obstacles, grid_level=level)
+            response = await self._build_response_async(snapshot.response.city, coarse_feed, snapshot.version)
+            coarse = ObstaclesSnapshot(response=response, version=snapshot.version, feed=coarse_feed)
+            snapshot.grid_levels[level] = coarse
+        return coarse
+    
+    async def _build_response_async(self, city: str, feed: ScoredFeed,
+                                     data_version: Optional[str] = None) -> ObstaclesResponse:
+        """Scoring de todas las veredas y sus modelos, por bloques"""
+        scores = self._score_sidewalks(feed.obstacles, feed.sidewalk_geometries, feed.assignment)
+        sidewalks_accessibility = await self._collect(
+            self._iter_sidewalk_accessibility(feed.obstacles, feed.sidewalk_geometries, scores)
+        )
         
-        sidewalks = []
-        lat = min_lat
-        cell_id = 0
+        return ObstaclesResponse(
+            city=city,
+            total_obstacles=len(feed.obstacles),
+            sidewalks=sidewalks_accessibility,
+            last_updated=datetime.utcnow().isoformat(),
+            data_version=data_version
+        )
+    
+    async def _collect(self, items: Iterable[Any]) -> List[Any]:
+        """Consumir `items` en una lista, cediendo el event loop cada YIELD_EVERY elementos"""
+        result = []
+        for item in items:
+            result.append(item)
+            if len(result) % self.YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        return result
+    
+    def _iter_sidewalk_accessibility(
+        self,
+        obstacles: ObstacleStore,
+        sidewalk_geometries: List[Dict[str, Any]],
+        scores: "SidewalkScores",
+        positions: Optional[Iterable[int]] = None
+    ) -> Iterator[SidewalkAccessibility]:
+        """
+        Armar cada vereda (o solo las de `positions`) a medida que se consume. Los
+        modelos Obstacle se construyen aquí, solo para los obstáculos asociados a la vereda.
+        """
+        for position in range(len(sidewalk_geometries)) if positions is None else positions:
+            sidewalk = sidewalk_geometries[position]
+            group = scores.groups[position]
+            if group >= 0:
+                obs_list = obstacles.obstacles(scores.obstacle_positions(group))
+                score = scores.scores[group]
+                breakdown = scores.severity_breakdown(group)
+            else:
+                obs_list, score, breakdown = [], 100.0, self._get_severity_breakdown([])
+            
+            yield SidewalkAccessibility(
+                sidewalk_id=sidewalk["id"],
+                geometry=sidewalk["geometry"],
+                position=Coordinate(lat=scores.center_lats[position], lng=scores.center_lngs[position]),
+                accessibility_score=score,
+                obstacle_count=len(obs_list),
+                obstacles=obs_list,
+                severity_breakdown=breakdown
+            )
+    
+    async def open_sidewalk_stream(self, city: str, simplify_tolerance: Optional[float] = None,
+                                   precision: Optional[int] = None, grid_level: int = 0) -> SidewalkStream:
+        """
+        Preparar el envío vereda por vereda de /obstacles.
         
-        while lat < max_lat:
-            lng = min_lng
-            while lng < max_lng:
-                # Crear línea de vereda (celda)
-                coords = [
-                    [lng, lat],
-                    [lng + cell_size, lat],
-                    [lng + cell_size, lat + cell_size],
-                    [lng, lat + cell_size],
-                    [lng, lat]
-                ]
-                
-                sidewalks.append({
-                    "id": f"sidewalk_{cell_id}",
-                    "geometry": GeoJSONLineString(
-                        type="LineString",
-                        coordinates=coords
-                    )
-                })
-                
-                cell_id += 1
-                lng += cell_size
-            lat += cell_size
+        Si la ciudad ya tiene snapshot se recorren sus veredas sin serializar el
+        documento completo; si no, se descarga el feed, se asocian los obstáculos y
+        cada vereda se puntúa recién cuando el cliente la consume. Los errores
+        (ciudad desconocida, feed caído) se producen aquí, antes de empezar a enviar.
+        """
+        city = city.lower()
+        if city in self._snapshots or grid_level:
+            snapshot = await self.get_snapshot(city)
+            sidewalks = (await self.grid_level_snapshot(snapshot, grid_level)).iter_sidewalks(
+                simplify_tolerance, precision
+            )
+            return SidewalkStream(snapshot.version, sidewalks, snapshot.age())
         
-        return sidewalks
+        entry = await self.fetch_feed(city)
+        obstacles = entry.payload
+        feed = await self._score_feed_async(obstacles)
+        scores = self._score_sidewalks(obstacles, feed.sidewalk_geometries, feed.assignment)
+        sidewalks = self._iter_sidewalk_accessibility(obstacles, feed.sidewalk_geometries, scores)
+        if simplify_level(simplify_tolerance) is not None or precision is not None:
+            # Sin snapshot no hay niveles precalculados: se simplifica al enviar
+            tolerance = simplify_level(simplify_tolerance)
+            sidewalks = (
+                sidewalk.model_copy(update={"geometry": GeoJSONLineString(
+                    coordinates=shape_line(sidewalk.geometry.coordinates, tolerance, precision)
+                )})
+                for sidewalk in sidewalks
+            )
+        return SidewalkStream(entry.version, sidewalks)
+    
+    def _default_grid(self, obstacles: ObstacleStore, level: int = 0) -> Optional[SidewalkGrid]:
+        """Celdas de la cuadrícula global que cubren los obstáculos (None si no hay)"""
+        return SidewalkGrid.covering(obstacles.lat, obstacles.lng, level)
+    
+    def _bucket_obstacles(self, obstacles: ObstacleStore, grid: Optional[SidewalkGrid]) -> np.ndarray:
+        """Celda de la cuadrícula de cada obstáculo que afecta la accesibilidad (-1 los demás)"""
+        assignment = np.full(len(obstacles), -1, dtype=np.int64)
+        if grid is not None:
+            candidates = np.flatnonzero(obstacles.affects_accessibility)
+            assignment[candidates] = grid.positions(obstacles.lat[candidates], obstacles.lng[candidates])
+        return assignment
@@ -0,0 +1,246 @@
+"""
+Representación columnar de los labels del feed labelClusters.
+
+Cada label ocupa unas decenas de bytes repartidos en arrays de NumPy paralelos
+(posición, tipo, severidad, votos, parámetros de la imagen) y los textos se
+guardan una sola vez en un pool de strings. Los modelos `Obstacle` se construyen
+solo cuando hacen falta, para las veredas que se devuelven en detalle.
+"""
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.models import Coordinate, Obstacle, ObstacleType, SeverityLevel
+from app.services.json_stream import FeatureStreamParser
+
+# Códigos de tipo y severidad: posición en el enum
+OBSTACLE_TYPES: List[ObstacleType] = list(ObstacleType)
+SEVERITY_LEVELS: List[SeverityLevel] = list(SeverityLevel)
+_TYPE_CODES = {obstacle_type: code for code, obstacle_type in enumerate(OBSTACLE_TYPES)}
+_SEVERITY_CODES = {severity: code for code, severity in enumerate(SEVERITY_LEVELS)}
+
+# Valor que representa None en las columnas enteras (en las de punto flotante es NaN)
+INT_NULL = np.iinfo(np.int32).min
+LONG_NULL = np.iinfo(np.int64).min
+
+# (nombre, tipo de array) de las columnas numéricas opcionales
+_INT_FIELDS = ("label_type_id", "severity_value", "zoom", "canvas_x", "canvas_y",
+               "canvas_width", "canvas_height", "agree_count", "disagree_count", "notsure_count")
+_FLOAT_FIELDS = ("photographer_heading", "heading", "pitch")
+_STRING_FIELDS = ("description", "gsv_panorama_id", "tags")
+
+# Clasificación de un label: (label_type_id, severity_value) -> (tipo, severidad, afecta)
+Classifier = Callable[[Optional[int], Optional[int]], Tuple[ObstacleType, SeverityLevel, bool]]
+
+
+class ObstacleStore:
+    """Labels del feed en columnas; `obstacle(i)` materializa el modelo del label i"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], strings: List[Any]):
+        self.columns = columns
+        self.strings = strings
+        self.lat = columns["lat"]
+        self.lng = columns["lng"]
+        self.obstacle_type = columns["obstacle_type"]
+        self.severity = columns["severity"]
+        self.affects_accessibility = columns["affects_accessibility"]
+        self.severity_value = columns["severity_value"]
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados por las columnas (sin contar el pool de strings)"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def obstacle(self, index: int) -> Obstacle:
+        """Modelo Obstacle del label en la posición `index`"""
+        return self.obstacles([index])[0]
+
+    def obstacles(self, indices: Iterable[int]) -> List[Obstacle]:
+        """Modelos Obstacle de varios labels, en el orden pedido"""
+        indices = np.asarray(list(indices), dtype=np.int64)
+        if not len(indices):
+            return []
+        rows = {name: column[indices].tolist() for name, column in self.columns.items()}
+        label_ids = [None if v == LONG_NULL else v for v in rows["label_id"]]
+        ints = {name: [None if v == INT_NULL else v for v in rows[name]] for name in _INT_FIELDS}
+        floats = {name: [None if v != v else v for v in rows[name]] for name in _FLOAT_FIELDS}
+        strings = {name: [None if v < 0 else self.strings[v] for v in rows[name]] for name in _STRING_FIELDS}
+        temporary = [None if v < 0 else bool(v) for v in rows["temporary"]]
+
+        result = []
+        for i in range(len(indices)):
+            result.append(Obstacle(
+                id=f"obs_{label_ids[i]}",
+                position=Coordinate(lat=rows["lat"][i], lng=rows["lng"][i]),
+                obstacle_type=OBSTACLE_TYPES[rows["obstacle_type"][i]],
+                severity=SEVERITY_LEVELS[rows["severity"][i]],
+                description=strings["description"][i],
+                affects_accessibility=rows["affects_accessibility"][i],
+                label_id=label_ids[i],
+                gsv_panorama_id=strings["gsv_panorama_id"][i],
+                label_type_id=ints["label_type_id"][i],
+                photographer_heading=floats["photographer_heading"][i],
+                heading=floats["heading"][i],
+                pitch=floats["pitch"][i],
+                zoom=ints["zoom"][i],
+                canvas_x=ints["canvas_x"][i],
+                canvas_y=ints["canvas_y"][i],
+                canvas_width=ints["canvas_width"][i],
+                canvas_height=ints["canvas_height"][i],
+                severity_value=ints["severity_value"][i],
+                temporary=temporary[i],
+                tags=strings["tags"][i],
+                agree_count=ints["agree_count"][i],
+                disagree_count=ints["disagree_count"][i],
+                notsure_count=ints["notsure_count"][i]
+            ))
+        return result
+
+
+class LabelDiff:
+    """
+    Cambios entre dos versiones del feed, por label_id. Los labels modificados
+    cuentan como quitados del feed anterior y agregados al nuevo.
+    """
+
+    def __init__(self, kept_old: np.ndarray, kept_new: np.ndarray,
+                 removed: np.ndarray, added: np.ndarray, modified: int):
+        # Posiciones (anterior, nueva) de los labels sin cambios, en pares
+        self.kept_old = kept_old
+        self.kept_new = kept_new
+        # Posiciones en el feed anterior que ya no están igual y en el nuevo que cambiaron o son nuevas
+        self.removed = removed
+        self.added = added
+        self.modified = modified
+
+    @property
+    def changed(self) -> int:
+        """Labels agregados, quitados o modificados"""
+        return len(self.removed) + len(self.added) - self.modified
+
+
+def _resolved_strings(store: ObstacleStore, refs: np.ndarray) -> np.ndarray:
+    pool = np.array(store.strings + [None], dtype=object)
+    return pool[np.where(refs >= 0, refs, len(store.strings))]
+
+
+def diff_labels(old: ObstacleStore, new: ObstacleStore) -> Optional[LabelDiff]:
+    """
+    Labels agregados, quitados y modificados de `new` respecto de `old`. Los labels
+    sin label_id no se pueden emparejar y cuentan como quitados/agregados. Retorna
+    None si algún label_id se repite en uno de los feeds.
+    """
+    old_ids, new_ids = old.columns["label_id"], new.columns["label_id"]
+    old_valid = np.flatnonzero(old_ids != LONG_NULL)
+    new_valid = np.flatnonzero(new_ids != LONG_NULL)
+    if len(np.unique(old_ids[old_valid])) != len(old_valid) or len(np.unique(new_ids[new_valid])) != len(new_valid):
+        return None
+
+    _, old_index, new_index = np.intersect1d(old_ids[old_valid], new_ids[new_valid],
+                                             assume_unique=True, return_indices=True)
+    old_common, new_common = old_valid[old_index], new_valid[new_index]
+    same = np.ones(len(old_common), dtype=bool)
+    for name, column in new.columns.items():
+        before, after = old.columns[name][old_common], column[new_common]
+        if name in _STRING_FIELDS:
+            same &= _resolved_strings(old, before) == _resolved_strings(new, after)
+        elif name in _FLOAT_FIELDS or name in ("lat", "lng"):
+            same &= (before == after) | (np.isnan(before) & np.isnan(after))
+        else:
+            same &= before == after
+
+    kept_old, kept_new = old_common[same], new_common[same]
+    removed = np.setdiff1d(np.arange(len(old)), kept_old, assume_unique=True)
+    added = np.setdiff1d(np.arange(len(new)), kept_new, assume_unique=True)
+    order = np.argsort(kept_old)
+    return LabelDiff(kept_old[order], kept_new[order], removed, added, int(len(same) - same.sum()))
+
+
+class ObstacleStoreBuilder:
+    """Acumula labels de a uno (en arrays compactos) y produce un ObstacleStore"""
+
+    def __init__(self, classify: Classifier):
+        self.classify = classify
+        self._lat = array("d")
+        self._lng = array("d")
+        self._label_id = array("q")
+        self._type = array("b")
+        self._severity = array("b")
+        self._affects = array("b")
+        self._temporary = array("b")
+        self._ints = {name: array("i") for name in _INT_FIELDS}
+        self._floats = {name: array("d") for name in _FLOAT_FIELDS}
+        self._string_refs = {name: array("i") for name in _STRING_FIELDS}
+        self._strings: List[Any] = []
+        self._string_ids: Dict[Any, int] = {}
+
+    def append(self, feature: Dict[str, Any]):
+        """Agregar una feature del feed (mismos valores por defecto que el modelo Obstacle)"""
+        props = feature.get("properties", {})
+        geometry = feature.get("geometry", {})
+        coordinates = geometry.get("coordinates", [0, 0])
+        self._lat.append(float(coordinates[1] if len(coordinates) > 1 else 0))
+        self._lng.append(float(coordinates[0] if len(coordinates) > 0 else 0))
+
+        label_id = props.get("label_id")
+        self._label_id.append(LONG_NULL if label_id is None else int(label_id))
+
+        obstacle_type, severity, affects = self.classify(props.get("label_type_id"), props.get("severity"))
+        self._type.append(_TYPE_CODES[obstacle_type])
+        self._severity.append(_SEVERITY_CODES[severity])
+        self._affects.append(affects)
+
+        temporary = props.get("temporary")
+        self._temporary.append(-1 if temporary is None else int(bool(temporary)))
+
+        for name, column in self._ints.items():
+            value = props.get("severity" if name == "severity_value" else name)
+            column.append(INT_NULL if value is None else int(value))
+        for name, column in self._floats.items():
+            value = props.get(name)
+            column.append(float("nan") if value is None else float(value))
+        for name, column in self._string_refs.items():
+            column.append(self._intern(props.get(name)))
+
+    def _intern(self, value: Any) -> int:
+        if value is None:
+            return -1
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def build(self) -> ObstacleStore:
+        columns = {
+            "lat": np.frombuffer(self._lat, dtype=np.float64),
+            "lng": np.frombuffer(self._lng, dtype=np.float64),
+            "label_id": np.frombuffer(self._label_id, dtype=np.int64),
+            "obstacle_type": np.frombuffer(self._type, dtype=np.int8),
+            "severity": np.frombuffer(self._severity, dtype=np.int8),
+            "affects_accessibility": np.frombuffer(self._affects, dtype=np.int8).astype(bool),
+            "temporary": np.frombuffer(self._temporary, dtype=np.int8),
+        }
+        for name, column in self._ints.items():
+            columns[name] = np.frombuffer(column, dtype=np.int32)
+        for name, column in self._floats.items():
+            columns[name] = np.frombuffer(column, dtype=np.float64)
+        for name, column in self._string_refs.items():
+            columns[name] = np.frombuffer(column, dtype=np.int32)
+        return ObstacleStore(columns, self._strings)
+
+
+class ObstacleStoreParser(FeatureStreamParser):
+    """Parser incremental del feed que va llenando un ObstacleStore"""
+
+    def __init__(self, classify: Classifier):
+        self.builder = ObstacleStoreBuilder(classify)
+        super().__init__(transform=self.builder.append)
+
+    def close(self) -> ObstacleStore:
+        super().close()
+        return self.builder.build()
@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple, Union
+
+from fastapi import Request, Response
+
+try:  # brotli está en requirements.txt; si no está instalado solo se ofrece gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class EncodedResponse:
+    """Cuerpo JSON ya serializado con sus variantes comprimidas y ETag"""
+
+    def __init__(self, body: bytes, media_type: str = "application/json",
+                 headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        self.media_type = media_type
+        # Encabezados que dependen del cuerpo (p. ej. X-Next-Cursor) y se guardan con él
+        self.headers = headers or {}
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self._variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        """Cuerpo para un Content-Encoding dado (se comprime una sola vez)"""
+        if encoding == "identity":
+            return self.body
+        if encoding not in self._variants:
+            if encoding == "br":
+                self._variants[encoding] = brotli.compress(self.body, quality=5)
+            else:
+                self._variants[encoding] = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._variants[encoding]
+
+    def has_variant(self, encoding: str) -> bool:
+        """Si el cuerpo para `encoding` ya está disponible sin comprimir"""
+        return encoding == "identity" or encoding in self._variants
+
+    def variant_etag(self, encoding: str) -> str:
+        """ETag fuerte por representación (cada codificación tiene la suya)"""
+        if encoding == "identity":
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas JSON pre-serializadas.
+
+    La clave debe incluir todo lo que determina el cuerpo: endpoint, ciudad,
+    parámetros normalizados y versión de los datos. Así una nueva versión de
+    datos produce claves nuevas y las antiguas salen por LRU.
+
+    Se puede usar desde threads (p. ej. teselas generadas fuera del event loop).
+    """
+
+    # Por debajo de este tamaño no vale la pena comprimir
+    MIN_COMPRESS_BYTES = 1024
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, EncodedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Union[bytes, Tuple[bytes, Dict[str, str]]]],
+                     media_type: str = "application/json") -> EncodedResponse:
+        """
+        Obtener la respuesta codificada de `key`, serializándola solo si falta.
+        `build` entrega el cuerpo o (cuerpo, encabezados que van con ese cuerpo).
+        """
+        encoded = self.lookup(key)
+        if encoded is None:
+            encoded = self.store(key, build(), media_type)
+        return encoded
+
+    def lookup(self, key: Hashable) -> Optional[EncodedResponse]:
+        """Respuesta codificada de `key` si está en caché"""
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+            return encoded
+
+    def store(self, key: Hashable, built: Union[bytes, Tuple[bytes, Dict[str, str]]],
+              media_type: str = "application/json") -> EncodedResponse:
+        """Guardar un cuerpo ya construido (o cuerpo y encabezados) bajo `key`"""
+        body, headers = built if isinstance(built, tuple) else (built, None)
+        encoded = EncodedResponse(body, media_type, headers)
+        with self._lock:
+            self._entries[key] = encoded
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return encoded
+
+    def respond(self, request: Request, encoded: EncodedResponse,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Construir la respuesta HTTP negociando codificación y respetando If-None-Match.
+        Si la variante negociada aún no está comprimida se comprime aquí; desde el event
+        loop conviene prepararla antes en un thread (`negotiate_encoding` + `variant`).
+        """
+        encoding = self.negotiate_encoding(request, encoded)
+        etag = encoded.variant_etag(encoding)
+        response_headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        response_headers.update(encoded.headers)
+        response_headers.update(headers or {})
+
+        if self._matches(request.headers.get("if-none-match"), encoded):
+            return Response(status_code=304, headers=response_headers)
+
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(
+            content=encoded.variant(encoding),
+            media_type=encoded.media_type,
+            headers=response_headers
+        )
+
+    def clear(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._entries.clear()
+
+    def negotiate_encoding(self, request: Request, encoded: EncodedResponse) -> str:
+        """Content-Encoding que se usará para `encoded` según Accept-Encoding"""
+        if len(encoded.body) < self.MIN_COMPRESS_BYTES:
+            return "identity"
+
+        accepted = set()
+        for part in request.headers.get("accept-encoding", "").split(","):
+            name, _, params = part.strip().partition(";")
+            if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+                continue
+            accepted.add(name.strip().lower())
+
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return "identity"
+
+    def _matches(self, if_none_match: Optional[str], encoded: EncodedResponse) -> bool:
+        if not if_none_match:
+            return False
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in candidates:
+            return True
+        # Cualquier variante del mismo cuerpo es válida para revalidar
+        return any(encoded.variant_etag(e) in candidates for e in ("identity", "gzip", "br"))
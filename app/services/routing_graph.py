@@ -0,0 +1,526 @@
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.models import ObstacleType, SidewalkSegment, StreetAxis
+from app.services.geodesy import haversine_distance, haversine_distances, project_to_segments
+from app.services.spatial_index import build_linestrings, radius_to_bbox
+
+# Penalización de score por obstáculo según severidad (misma escala que las rutas)
+SEVERITY_SCORE_PENALTY = {"bajo": 5, "medio": 15, "alto": 30, "critico": 50}
+
+
+class SnapPoint:
+    """Proyección de una coordenada sobre la arista más cercana del grafo"""
+
+    def __init__(self, edge: int, fraction: float, lat: float, lng: float, distance: float):
+        self.edge = edge
+        self.fraction = fraction  # 0 = nodo u, 1 = nodo v
+        self.lat = lat
+        self.lng = lng
+        self.distance = distance
+
+
+class PathResult:
+    """Resultado de una búsqueda: aristas recorridas y puntos de la ruta"""
+
+    def __init__(self, cost: float, edges: List[int], points: List[Tuple[float, float]],
+                 edge_fractions: List[float], settled: int):
+        self.cost = cost
+        self.edges = edges
+        self.points = points  # [(lat, lng), ...] con un punto más que aristas
+        self.edge_fractions = edge_fractions  # fracción recorrida de cada arista
+        self.settled = settled  # nodos cerrados durante la búsqueda
+
+
+class SidewalkGraph:
+    """
+    Grafo de conectividad peatonal construido a partir de las veredas.
+
+    - Nodos: vértices de las veredas y cruces entre veredas (dos veredas que se
+      intersectan comparten nodo). Los extremos sueltos se conectan con nodos de
+      otras veredas a menos de `CONNECT_METERS` (cruces peatonales).
+    - Aristas: tramos rectos entre nodos consecutivos de una misma vereda, más las
+      aristas de cruce (sin vereda asociada).
+
+    El costo de una arista depende del perfil de la consulta (`edge_costs`), por lo
+    que el grafo se construye una sola vez por ciudad y se reutiliza.
+    """
+
+    # Distancia máxima para conectar extremos de veredas que no se tocan
+    CONNECT_METERS = 20.0
+    # Cuánto encarece una vereda inaccesible (score 0) con accessibility_priority=1
+    ACCESSIBILITY_WEIGHT = 3.0
+    # Costo extra (metros equivalentes) por cada obstáculo de un tipo a evitar
+    AVOID_PENALTY_METERS = 500.0
+    # Penalización de score por obstáculo a evitar (como en el cálculo de rutas)
+    AVOID_SCORE_PENALTY = 20.0
+    # Score de las aristas de cruce
+    CROSSING_SCORE = 100.0
+    # Velocidad promedio caminando (m/s)
+    WALKING_SPEED_MPS = 1.4
+    # Arrays numéricos que definen el grafo (lo que se guarda en un snapshot)
+    ARRAY_FIELDS = ("node_lats", "node_lngs", "edge_u", "edge_v", "edge_length", "edge_sidewalk",
+                    "sidewalk_scores", "sidewalk_penalty", "obstacle_edge", "obstacle_sidewalk")
+
+    def __init__(self):
+        self.node_lats = np.array([], dtype=np.float64)
+        self.node_lngs = np.array([], dtype=np.float64)
+        self.edge_u = np.array([], dtype=np.int64)
+        self.edge_v = np.array([], dtype=np.int64)
+        self.edge_length = np.array([], dtype=np.float64)
+        self.edge_sidewalk = np.array([], dtype=np.int64)  # -1 = cruce
+        self.sidewalk_ids: List[str] = []
+        self.sidewalk_scores = np.array([], dtype=np.float64)
+        self.sidewalk_penalty = np.array([], dtype=np.float64)
+        self.obstacle_edge = np.array([], dtype=np.int64)
+        self.obstacle_sidewalk = np.array([], dtype=np.int64)
+        self.obstacle_types: List[str] = []
+        self._adjacency: Optional[List[List[Tuple[int, int]]]] = None
+        self._edge_tree: Optional[STRtree] = None
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_lats)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_u)
+
+    @property
+    def adjacency(self) -> List[List[Tuple[int, int]]]:
+        """Listas de adyacencia (se arman en el primer uso si el grafo viene de arrays)"""
+        if self._adjacency is None:
+            self.build_adjacency()
+        return self._adjacency
+
+    @property
+    def edge_tree(self) -> STRtree:
+        """Índice espacial de las aristas para `snap` (se arma en el primer uso)"""
+        if self._edge_tree is None:
+            self._edge_tree = STRtree(shapely.linestrings(np.stack([
+                np.column_stack([self.node_lngs[self.edge_u], self.node_lats[self.edge_u]]),
+                np.column_stack([self.node_lngs[self.edge_v], self.node_lats[self.edge_v]])
+            ], axis=1)))
+        return self._edge_tree
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], sidewalk_ids: Sequence[str],
+                    obstacle_types: List[str]) -> "SidewalkGraph":
+        """Grafo a partir de arrays ya calculados (ver `ARRAY_FIELDS`), p. ej. mapeados desde un snapshot"""
+        graph = cls()
+        for name in cls.ARRAY_FIELDS:
+            setattr(graph, name, arrays[name])
+        graph.sidewalk_ids = sidewalk_ids
+        graph.obstacle_types = obstacle_types
+        return graph
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays numéricos del grafo (sin ids de veredas ni tipos de obstáculo)"""
+        return {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+
+    @classmethod
+    def from_streets(cls, streets: Sequence[StreetAxis]) -> "SidewalkGraph":
+        """Construir el grafo a partir de las veredas de una red de calles"""
+        sidewalks = []
+        for street in streets:
+            for segment in (street.sidewalk_west, street.sidewalk_east,
+                            street.sidewalk_north, street.sidewalk_south):
+                if segment and len(segment.geometry.coordinates) >= 2:
+                    sidewalks.append(segment)
+        return cls.from_sidewalks(sidewalks)
+
+    @classmethod
+    def from_sidewalks(cls, sidewalks: Sequence[SidewalkSegment]) -> "SidewalkGraph":
+        """Construir el grafo a partir de una lista de segmentos de vereda"""
+        graph = cls()
+        graph.sidewalk_ids = [s.id for s in sidewalks]
+        graph.sidewalk_scores = np.array([s.accessibility_score for s in sidewalks], dtype=np.float64)
+        graph.sidewalk_penalty = np.array([
+            sum(SEVERITY_SCORE_PENALTY[o.severity.value] for o in s.obstacles) for s in sidewalks
+        ], dtype=np.float64)
+
+        lines = build_linestrings([s.geometry.coordinates for s in sidewalks])
+        coords, owner = graph._collect_split_points(sidewalks, lines)
+
+        # Nodos: puntos únicos (redondeados a 1e-7°), numerados por orden de aparición
+        nodes = np.array([], dtype=np.int64)
+        if len(coords):
+            _, first, inverse = np.unique(np.round(coords, 7), axis=0, return_index=True, return_inverse=True)
+            appearance = np.argsort(first)
+            rank = np.empty(len(first), dtype=np.int64)
+            rank[appearance] = np.arange(len(first))
+            nodes = rank[inverse.ravel()]
+            graph.node_lngs = coords[first[appearance], 0]
+            graph.node_lats = coords[first[appearance], 1]
+
+        # Aristas entre puntos consecutivos de una misma vereda
+        consecutive = (owner[1:] == owner[:-1]) & (nodes[1:] != nodes[:-1])
+        edge_u = [nodes[:-1][consecutive]]
+        edge_v = [nodes[1:][consecutive]]
+        edge_sidewalk = [owner[:-1][consecutive]]
+
+        # Conectar extremos sueltos con el nodo más cercano de otra vereda
+        bounds = np.searchsorted(owner, np.arange(len(sidewalks) + 1))
+        endpoints = np.column_stack((nodes[bounds[:-1]], nodes[bounds[1:] - 1])).ravel() if len(sidewalks) else nodes
+        crossings = graph._crossing_pairs(endpoints, edge_u[0], edge_v[0], edge_sidewalk[0])
+        edge_u.append(crossings[:, 0])
+        edge_v.append(crossings[:, 1])
+        edge_sidewalk.append(np.full(len(crossings), -1, dtype=np.int64))
+
+        graph.edge_u = np.concatenate(edge_u).astype(np.int64)
+        graph.edge_v = np.concatenate(edge_v).astype(np.int64)
+        graph.edge_sidewalk = np.concatenate(edge_sidewalk).astype(np.int64)
+        graph.edge_length = haversine_distances(
+            graph.node_lats[graph.edge_u], graph.node_lngs[graph.edge_u],
+            graph.node_lats[graph.edge_v], graph.node_lngs[graph.edge_v]
+        ) if len(graph.edge_u) else np.array([], dtype=np.float64)
+
+        graph._assign_obstacles(sidewalks)
+        graph.build_adjacency()
+        return graph
+
+    def _collect_split_points(self, sidewalks: Sequence[SidewalkSegment], lines) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vértices de cada vereda más sus cruces con otras veredas, ordenados a lo largo
+        de la línea: (coordenadas [lng, lat], vereda de cada punto) agrupados por vereda.
+        """
+        if not len(sidewalks):
+            return np.empty((0, 2)), np.array([], dtype=np.int64)
+
+        # Vértices: posición a lo largo de la línea = largo acumulado (plano, como shapely)
+        vertex_coords, vertex_owner = shapely.get_coordinates(lines, return_index=True)
+        steps = np.hypot(*np.diff(vertex_coords, axis=0, prepend=vertex_coords[:1]).T)
+        steps[np.concatenate(([True], vertex_owner[1:] != vertex_owner[:-1]))] = 0.0
+        cumulative = np.cumsum(steps)
+        line_start = np.concatenate(([0.0], cumulative))[np.searchsorted(vertex_owner, vertex_owner)]
+        vertex_along = cumulative - line_start
+
+        # Cruces entre veredas: cada punto se agrega a las dos líneas involucradas
+        cross_coords = np.empty((0, 2))
+        cross_owner = np.array([], dtype=np.int64)
+        if len(sidewalks) > 1:
+            tree = STRtree(lines)
+            left, right = tree.query(lines, predicate="intersects")
+            pairs = left < right
+            left, right = left[pairs], right[pairs]
+            coords, owners = shapely.get_coordinates(
+                shapely.intersection(lines[left], lines[right]), return_index=True
+            )
+            cross_coords = np.concatenate([coords, coords])
+            cross_owner = np.concatenate([left[owners], right[owners]])
+        cross_along = shapely.line_locate_point(
+            lines[cross_owner], shapely.points(cross_coords)
+        ) if len(cross_owner) else np.array([])
+
+        coords = np.concatenate([vertex_coords, cross_coords])
+        owner = np.concatenate([vertex_owner, cross_owner])
+        along = np.concatenate([vertex_along, cross_along])
+        order = np.lexsort((along, owner))
+        return coords[order], owner[order]
+
+    def _crossing_pairs(self, endpoints: np.ndarray, edge_u: np.ndarray, edge_v: np.ndarray,
+                        edge_sidewalk: np.ndarray) -> np.ndarray:
+        """
+        Pares (extremo, nodo cercano de otra vereda) a unir con aristas de cruce,
+        como array (K, 2) ordenado. Un candidato no puede compartir vereda con el extremo.
+        """
+        if not self.node_count or not len(endpoints):
+            return np.empty((0, 2), dtype=np.int64)
+
+        # Veredas de cada nodo, como claves nodo * V + vereda ordenadas
+        sidewalk_count = int(edge_sidewalk.max()) + 1 if len(edge_sidewalk) else 1
+        memberships = np.unique(np.concatenate([edge_u, edge_v]) * sidewalk_count
+                                + np.concatenate([edge_sidewalk, edge_sidewalk]))
+        member_nodes = memberships // sidewalk_count
+        member_offsets = np.searchsorted(member_nodes, np.arange(self.node_count + 1))
+
+        # Candidatos: nodos dentro del bbox del radio de cada extremo, salvo el propio
+        tree = STRtree(shapely.points(self.node_lngs, self.node_lats))
+        lats, lngs = self.node_lats[endpoints], self.node_lngs[endpoints]
+        boxes = shapely.box(*radius_to_bbox(lats, lngs, self.CONNECT_METERS))
+        which, candidates = tree.query(boxes)
+        keep = candidates != endpoints[which]
+        which, candidates = which[keep], candidates[keep]
+
+        # Descartar candidatos que comparten alguna vereda con el extremo
+        owners = endpoints[which]
+        counts = member_offsets[owners + 1] - member_offsets[owners]
+        expanded = np.repeat(np.arange(len(which)), counts)
+        starts = np.repeat(member_offsets[owners], counts)
+        offsets = np.arange(len(expanded)) - np.repeat(np.cumsum(counts) - counts, counts)
+        own_sidewalks = memberships[starts + offsets] % sidewalk_count
+        shared = np.isin(candidates[expanded] * sidewalk_count + own_sidewalks, memberships)
+        keep = np.bincount(expanded[shared], minlength=len(which)) == 0
+        which, candidates = which[keep], candidates[keep]
+
+        # El más cercano de cada extremo, si está a menos de CONNECT_METERS
+        distances = haversine_distances(lats[which], lngs[which],
+                                        self.node_lats[candidates], self.node_lngs[candidates])
+        order = np.lexsort((distances, which))
+        first = np.concatenate(([True], which[order][1:] != which[order][:-1])) if len(order) else order.astype(bool)
+        nearest = order[first]
+        nearest = nearest[distances[nearest] <= self.CONNECT_METERS]
+        pairs = np.sort(np.column_stack((endpoints[which[nearest]], candidates[nearest])), axis=1)
+        return np.unique(pairs, axis=0).reshape(-1, 2)
+
+    def _assign_obstacles(self, sidewalks: Sequence[SidewalkSegment]):
+        """Ubicar cada obstáculo de una vereda en su arista más cercana"""
+        edges_by_sidewalk: Dict[int, List[int]] = {}
+        for edge, position in enumerate(self.edge_sidewalk.tolist()):
+            if position >= 0:
+                edges_by_sidewalk.setdefault(position, []).append(edge)
+
+        obstacle_edge, obstacle_sidewalk, obstacle_types = [], [], []
+        for position, sidewalk in enumerate(sidewalks):
+            edges = edges_by_sidewalk.get(position)
+            if not edges:
+                continue
+            u, v = self.edge_u[edges], self.edge_v[edges]
+            for obstacle in sidewalk.obstacles:
+                distances, _, _ = project_to_segments(
+                    obstacle.position.lat, obstacle.position.lng,
+                    self.node_lats[u], self.node_lngs[u], self.node_lats[v], self.node_lngs[v]
+                )
+                obstacle_edge.append(edges[int(np.argmin(distances))])
+                obstacle_sidewalk.append(position)
+                obstacle_types.append(obstacle.obstacle_type.value)
+
+        self.obstacle_edge = np.asarray(obstacle_edge, dtype=np.int64)
+        self.obstacle_sidewalk = np.asarray(obstacle_sidewalk, dtype=np.int64)
+        self.obstacle_types = obstacle_types
+
+    def build_adjacency(self):
+        """Listas de adyacencia (grafo no dirigido) a partir de los arrays de aristas"""
+        adjacency: List[List[Tuple[int, int]]] = [[] for _ in range(self.node_count)]
+        for edge, (u, v) in enumerate(zip(self.edge_u.tolist(), self.edge_v.tolist())):
+            adjacency[u].append((v, edge))
+            adjacency[v].append((u, edge))
+        self._adjacency = adjacency
+        self._edge_tree = None
+
+    def edge_scores(self, avoid_obstacles: Sequence[ObstacleType] = ()) -> np.ndarray:
+        """Score efectivo de cada arista: score de la vereda menos penalización por obstáculos"""
+        penalty = self.sidewalk_penalty.copy()
+        if avoid_obstacles and len(self.obstacle_sidewalk):
+            avoided = np.isin(self.obstacle_types, [t.value for t in avoid_obstacles])
+            np.add.at(penalty, self.obstacle_sidewalk[avoided], self.AVOID_SCORE_PENALTY)
+        sidewalk_scores = np.clip(self.sidewalk_scores - penalty, 0.0, 100.0)
+        scores = np.full(self.edge_count, self.CROSSING_SCORE)
+        on_sidewalk = self.edge_sidewalk >= 0
+        scores[on_sidewalk] = sidewalk_scores[self.edge_sidewalk[on_sidewalk]]
+        return scores
+
+    def edge_costs(self, accessibility_priority: float,
+                   avoid_obstacles: Sequence[ObstacleType] = ()) -> np.ndarray:
+        """
+        Costo de cada arista para un perfil. Siempre >= largo de la arista, por lo que
+        la distancia de Haversine es una heurística admisible.
+        """
+        scores = self.edge_scores(avoid_obstacles)
+        costs = self.edge_length * (1 + accessibility_priority * self.ACCESSIBILITY_WEIGHT * (100 - scores) / 100)
+        if avoid_obstacles and len(self.obstacle_edge):
+            avoided = np.isin(self.obstacle_types, [t.value for t in avoid_obstacles])
+            np.add.at(costs, self.obstacle_edge[avoided], self.AVOID_PENALTY_METERS)
+        return costs
+
+    def edge_times(self, avoid_obstacles: Sequence[ObstacleType] = ()) -> np.ndarray:
+        """Tiempo estimado (segundos) para recorrer cada arista según su accesibilidad"""
+        scores = self.edge_scores(avoid_obstacles)
+        return self.edge_length / (self.WALKING_SPEED_MPS * (0.5 + 0.5 * scores / 100))
+
+    def snap(self, lat: float, lng: float) -> Optional[SnapPoint]:
+        """Proyectar una coordenada sobre la arista más cercana"""
+        if not self.edge_count:
+            return None
+
+        # Buscar en radios crecientes; si no hay nada cerca, revisar todas las aristas
+        candidates = np.array([], dtype=np.int64)
+        for radius in (50.0, 250.0, 1000.0, 5000.0):
+            candidates = self.edge_tree.query(shapely.box(*radius_to_bbox(lat, lng, radius)))
+            if len(candidates):
+                break
+        if not len(candidates):
+            candidates = np.arange(self.edge_count)
+        candidates = np.sort(candidates)
+
+        u, v = self.edge_u[candidates], self.edge_v[candidates]
+        distances, proj_lats, proj_lngs = project_to_segments(
+            lat, lng, self.node_lats[u], self.node_lngs[u], self.node_lats[v], self.node_lngs[v]
+        )
+        best = int(np.argmin(distances))
+        edge = int(candidates[best])
+        length = self.edge_length[edge]
+        fraction = haversine_distance(self.node_lats[u[best]], self.node_lngs[u[best]],
+                                      float(proj_lats[best]), float(proj_lngs[best])) / length if length else 0.0
+        return SnapPoint(edge, min(max(fraction, 0.0), 1.0), float(proj_lats[best]),
+                         float(proj_lngs[best]), float(distances[best]))
+
+    def shortest_path(self, start: SnapPoint, end: SnapPoint, costs: np.ndarray,
+                      heuristic=None) -> Optional[PathResult]:
+        """
+        A* entre dos puntos proyectados sobre aristas.
+
+        `heuristic(node)` debe ser una cota inferior del costo hasta `end`; por defecto
+        se usa la distancia de Haversine al punto de destino.
+        """
+        if heuristic is None:
+            target_lat, target_lng = end.lat, end.lng
+            node_lats, node_lngs = self.node_lats, self.node_lngs
+
+            def heuristic(node: int) -> float:
+                return haversine_distance(node_lats[node], node_lngs[node], target_lat, target_lng)
+
+        edge_cost = costs.tolist()
+        adjacency = self.adjacency
+        target = -1  # nodo virtual de llegada
+
+        # Fuentes: extremos de la arista de inicio con el costo parcial hasta ellos
+        s_cost = edge_cost[start.edge]
+        sources = {int(self.edge_u[start.edge]): start.fraction * s_cost,
+                   int(self.edge_v[start.edge]): (1 - start.fraction) * s_cost}
+        e_cost = edge_cost[end.edge]
+        e_u, e_v = int(self.edge_u[end.edge]), int(self.edge_v[end.edge])
+        finals = {e_u: end.fraction * e_cost, e_v: (1 - end.fraction) * e_cost}
+
+        best: Optional[Tuple[float, List[int], List[float]]] = None
+        if start.edge == end.edge:
+            direct = abs(start.fraction - end.fraction) * s_cost
+            best = (direct, [start.edge], [abs(start.fraction - end.fraction)])
+
+        g: Dict[int, float] = {}
+        parent: Dict[int, Tuple[int, int]] = {}
+        heap: List[Tuple[float, float, int]] = []
+        for node, cost in sources.items():
+            if cost < g.get(node, float("inf")):
+                g[node] = cost
+                parent[node] = (-2, start.edge)  # -2 = nodo inicial
+                heapq.heappush(heap, (cost + heuristic(node), cost, node))
+
+        closed = set()
+        settled = 0
+        target_cost = float("inf")
+        target_parent = None
+        while heap:
+            f, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in closed or cost > g.get(node, float("inf")):
+                continue
+            if best is not None and f >= best[0]:
+                break
+            closed.add(node)
+            settled += 1
+
+            if node in finals:
+                total = cost + finals[node]
+                if total < target_cost:
+                    target_cost = total
+                    target_parent = node
+                    heapq.heappush(heap, (total, total, target))
+
+            for neighbor, edge in adjacency[node]:
+                new_cost = cost + edge_cost[edge]
+                if new_cost < g.get(neighbor, float("inf")):
+                    g[neighbor] = new_cost
+                    parent[neighbor] = (node, edge)
+                    heapq.heappush(heap, (new_cost + heuristic(neighbor), new_cost, neighbor))
+
+        if target_parent is not None and (best is None or target_cost < best[0]):
+            return self._reconstruct(start, end, target_parent, target_cost, parent, settled)
+        if best is not None:
+            cost, edges, fractions = best
+            return PathResult(cost, edges, [(start.lat, start.lng), (end.lat, end.lng)], fractions, settled)
+        return None
+
+    def one_to_many(self, start: SnapPoint, targets: Sequence[SnapPoint], costs: np.ndarray,
+                    times: np.ndarray) -> List[Optional[Tuple[float, float, float]]]:
+        """
+        Dijkstra desde `start` hasta todos los `targets` en una sola búsqueda.
+        Retorna por destino (costo, distancia_m, tiempo_s) de la ruta de menor costo,
+        o None si no es alcanzable.
+        """
+        edge_cost = costs.tolist()
+        edge_length = self.edge_length.tolist()
+        edge_time = times.tolist()
+        adjacency = self.adjacency
+
+        # Nodos que hay que cerrar: extremos de las aristas de destino
+        pending = set()
+        for target in targets:
+            pending.add(int(self.edge_u[target.edge]))
+            pending.add(int(self.edge_v[target.edge]))
+
+        g: Dict[int, Tuple[float, float, float]] = {}
+        heap: List[Tuple[float, float, float, int]] = []
+        for node, share in ((int(self.edge_u[start.edge]), start.fraction),
+                            (int(self.edge_v[start.edge]), 1 - start.fraction)):
+            label = (share * edge_cost[start.edge], share * edge_length[start.edge], share * edge_time[start.edge])
+            if label[0] < g.get(node, (float("inf"),))[0]:
+                g[node] = label
+                heapq.heappush(heap, (*label, node))
+
+        closed = set()
+        while heap and pending:
+            cost, distance, time, node = heapq.heappop(heap)
+            if node in closed or cost > g[node][0]:
+                continue
+            closed.add(node)
+            pending.discard(node)
+            for neighbor, edge in adjacency[node]:
+                new_cost = cost + edge_cost[edge]
+                if new_cost < g.get(neighbor, (float("inf"),))[0]:
+                    label = (new_cost, distance + edge_length[edge], time + edge_time[edge])
+                    g[neighbor] = label
+                    heapq.heappush(heap, (*label, neighbor))
+
+        results: List[Optional[Tuple[float, float, float]]] = []
+        for target in targets:
+            best = None
+            edge = target.edge
+            for node, share in ((int(self.edge_u[edge]), target.fraction),
+                                (int(self.edge_v[edge]), 1 - target.fraction)):
+                if node in closed:
+                    cost, distance, time = g[node]
+                    candidate = (cost + share * edge_cost[edge], distance + share * edge_length[edge],
+                                 time + share * edge_time[edge])
+                    if best is None or candidate[0] < best[0]:
+                        best = candidate
+            if edge == start.edge:
+                share = abs(start.fraction - target.fraction)
+                direct = (share * edge_cost[edge], share * edge_length[edge], share * edge_time[edge])
+                if best is None or direct[0] < best[0]:
+                    best = direct
+            results.append(best)
+        return results
+
+    def _reconstruct(self, start: SnapPoint, end: SnapPoint, last: int, cost: float,
+                     parent: Dict[int, Tuple[int, int]], settled: int) -> PathResult:
+        nodes = [last]
+        edges: List[int] = []
+        node = last
+        while parent[node][0] != -2:
+            previous, edge = parent[node]
+            edges.append(edge)
+            nodes.append(previous)
+            node = previous
+        nodes.reverse()
+        edges.reverse()
+
+        first = nodes[0]
+        start_fraction = start.fraction if first == self.edge_u[start.edge] else 1 - start.fraction
+        end_fraction = end.fraction if last == self.edge_u[end.edge] else 1 - end.fraction
+
+        points = [(start.lat, start.lng)]
+        points += [(float(self.node_lats[n]), float(self.node_lngs[n])) for n in nodes]
+        points.append((end.lat, end.lng))
+        return PathResult(
+            cost,
+            [start.edge] + edges + [end.edge],
+            points,
+            [start_fraction] + [1.0] * len(edges) + [end_fraction],
+            settled
+        )
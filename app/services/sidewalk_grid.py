@@ -0,0 +1,109 @@
+"""
+Cuadrícula global fija de veredas por defecto (cuando no hay geometrías reales).
+
+Las celdas están ancladas al origen de coordenadas, no a los obstáculos del feed:
+la celda de nivel 0 de un punto es (floor(lat * CELLS_PER_DEGREE),
+floor(lng * CELLS_PER_DEGREE)), de ~100 m de lado, y su id depende solo de esa
+fila y columna. Un label nuevo fuera de la extensión anterior agrega celdas pero
+no renumera las demás, y las esquinas se calculan desde los enteros (sin acumular
+sumas de flotantes).
+
+Los niveles más gruesos (para vistas alejadas) agrupan 2^nivel x 2^nivel celdas
+de nivel 0: la fila y columna del nivel k son las de nivel 0 desplazadas k bits,
+así que cada celda gruesa contiene exactamente a sus celdas finas. Ubicar un punto
+en su celda es aritmética entera, sin búsqueda espacial.
+"""
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.models import GeoJSONLineString
+
+# Celdas de nivel 0 por grado (0.001° ≈ 111 m de latitud)
+CELLS_PER_DEGREE = 1000
+# Niveles de resolución: el nivel k tiene celdas de 2^k celdas de nivel 0 por lado
+GRID_LEVELS = 6
+
+
+def _cell_index(values: np.ndarray) -> np.ndarray:
+    """
+    Índice de celda de nivel 0 de cada coordenada: el i con i / CELLS_PER_DEGREE <= v
+    < (i + 1) / CELLS_PER_DEGREE, con los mismos bordes que `iter_cells`. floor(v * 1000)
+    solo no alcanza: el redondeo del producto deja algunos puntos justo en un borde en
+    la celda vecina (1.001 * 1000 = 1000.9999999999999).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    index = np.floor(values * CELLS_PER_DEGREE).astype(np.int64)
+    index += (index + 1) / CELLS_PER_DEGREE <= values
+    index -= index / CELLS_PER_DEGREE > values
+    return index
+
+
+def cell_keys(lats: np.ndarray, lngs: np.ndarray, level: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Fila y columna enteras de la celda de cada punto en el nivel dado"""
+    rows, columns = _cell_index(lats), _cell_index(lngs)
+    # Desplazamiento aritmético: redondea hacia -inf también con coordenadas negativas
+    return rows >> level, columns >> level
+
+
+class SidewalkGrid:
+    """
+    Rectángulo de celdas de un nivel que cubre un conjunto de puntos. Las posiciones
+    de las celdas van por filas (sur a norte) y, dentro de cada fila, de oeste a este.
+    """
+
+    def __init__(self, level: int, min_row: int, min_column: int, rows: int, columns: int):
+        self.level = level
+        self.min_row = min_row
+        self.min_column = min_column
+        self.rows = rows
+        self.columns = columns
+
+    @classmethod
+    def covering(cls, lats: np.ndarray, lngs: np.ndarray, level: int = 0) -> Optional["SidewalkGrid"]:
+        """Celdas del nivel que cubren todos los puntos (None si no hay puntos)"""
+        if not len(lats):
+            return None
+        rows, columns = cell_keys(lats, lngs, level)
+        min_row, min_column = int(rows.min()), int(columns.min())
+        return cls(level, min_row, min_column, int(rows.max()) - min_row + 1, int(columns.max()) - min_column + 1)
+
+    @property
+    def key(self) -> Tuple[int, int, int, int, int]:
+        return self.level, self.min_row, self.min_column, self.rows, self.columns
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SidewalkGrid) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __len__(self) -> int:
+        return self.rows * self.columns
+
+    def positions(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Posición de la celda de cada punto (-1 si queda fuera de la cuadrícula)"""
+        rows, columns = cell_keys(lats, lngs, self.level)
+        rows -= self.min_row
+        columns -= self.min_column
+        inside = (rows >= 0) & (rows < self.rows) & (columns >= 0) & (columns < self.columns)
+        return np.where(inside, rows * self.columns + columns, -1)
+
+    def cell_id(self, row: int, column: int) -> str:
+        """Id estable de una celda: depende solo del nivel, la fila y la columna"""
+        return f"sidewalk_{self.level}_{row}_{column}"
+
+    def iter_cells(self) -> Iterator[Dict[str, Any]]:
+        """Celdas como veredas {"id", "geometry"} (contorno cerrado), en orden de posición"""
+        side = 1 << self.level
+        for row in range(self.min_row, self.min_row + self.rows):
+            south, north = row * side / CELLS_PER_DEGREE, (row + 1) * side / CELLS_PER_DEGREE
+            for column in range(self.min_column, self.min_column + self.columns):
+                west, east = column * side / CELLS_PER_DEGREE, (column + 1) * side / CELLS_PER_DEGREE
+                yield {
+                    "id": self.cell_id(row, column),
+                    "geometry": GeoJSONLineString(
+                        type="LineString",
+                        coordinates=[[west, south], [east, south], [east, north], [west, north], [west, south]]
+                    )
+                }
@@ -0,0 +1,131 @@
+"""
+Simplificación de geometrías por nivel de zoom y cuantización de coordenadas.
+
+Las geometrías se simplifican con Douglas–Peucker (shapely, conservando la
+topología) una sola vez por cada nivel de tolerancia de `SIMPLIFY_LEVELS_METERS`;
+una petición usa el nivel precalculado más grande que no supere la tolerancia
+pedida, así que nunca se simplifica más de lo solicitado.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+from app.services.spatial_index import CoordinateColumn, build_linestrings
+
+# Tolerancias precalculadas (metros)
+SIMPLIFY_LEVELS_METERS = (1.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+# Metros por grado de latitud (la tolerancia se aplica en grados)
+METERS_PER_DEGREE = 111_320.0
+
+
+def simplify_level(tolerance_meters: Optional[float]) -> Optional[float]:
+    """Nivel precalculado para una tolerancia pedida (None: sin simplificar)"""
+    if not tolerance_meters:
+        return None
+    candidates = [level for level in SIMPLIFY_LEVELS_METERS if level <= tolerance_meters]
+    return candidates[-1] if candidates else None
+
+
+def quantize_line(coords: List[List[float]], precision: Optional[int], min_points: int = 2) -> List[List[float]]:
+    """
+    Redondear las coordenadas a `precision` decimales y quitar los vértices
+    consecutivos que quedan repetidos (si la línea conserva `min_points`).
+    """
+    if precision is None or not len(coords):
+        return coords
+    rounded = np.round(np.asarray(coords, dtype=np.float64), precision)
+    keep = np.concatenate(([True], np.any(rounded[1:] != rounded[:-1], axis=1)))
+    if keep.sum() >= min_points:
+        rounded = rounded[keep]
+    return rounded.tolist()
+
+
+def quantize_polygon(rings: List[List[List[float]]], precision: Optional[int]) -> List[List[List[float]]]:
+    """Cuantizar cada anillo de un polígono (un anillo cerrado necesita 4 vértices)"""
+    if precision is None:
+        return rings
+    return [quantize_line(ring, precision, min_points=4) for ring in rings]
+
+
+def shape_line(coords: List[List[float]], tolerance_meters: Optional[float] = None,
+               precision: Optional[int] = None) -> List[List[float]]:
+    """Simplificar (sin precálculo) y cuantizar una línea"""
+    if tolerance_meters and len(coords) > 2:
+        line = shapely.simplify(shapely.LineString(coords), tolerance_meters / METERS_PER_DEGREE,
+                                preserve_topology=True)
+        coords = shapely.get_coordinates(line).tolist()
+    return quantize_line(coords, precision)
+
+
+class GeometryLevels:
+    """
+    Versiones simplificadas de un conjunto de geometrías (líneas o polígonos),
+    precalculadas para cada nivel de tolerancia y alineadas por posición.
+    """
+
+    def __init__(self, geometries: Sequence[Any], kind: str = "line",
+                 levels: Sequence[float] = SIMPLIFY_LEVELS_METERS,
+                 precomputed: Optional[Dict[float, Tuple[np.ndarray, np.ndarray]]] = None):
+        self.kind = kind
+        # Una CoordinateColumn (p. ej. de un snapshot) se conserva tal cual
+        self.original = geometries if isinstance(geometries, CoordinateColumn) else list(geometries)
+        self._levels: Dict[float, Any] = {}
+        if precomputed is not None:
+            # Niveles de líneas ya calculados (ver `line_levels`)
+            self._levels.update(precomputed)
+            return
+        if not len(self.original):
+            return
+
+        if kind == "polygon":
+            shapes = np.array([shapely.Polygon(rings[0], rings[1:]) for rings in self.original], dtype=object)
+        else:
+            shapes = build_linestrings(self.original)
+
+        for level in levels:
+            simplified = shapely.simplify(shapes, level / METERS_PER_DEGREE, preserve_topology=True)
+            if kind == "polygon":
+                self._levels[level] = [
+                    self._polygon_coordinates(shape, original)
+                    for shape, original in zip(simplified.tolist(), self.original)
+                ]
+            else:
+                self._levels[level] = self._line_coordinates(simplified)
+
+    def line_levels(self) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        """(vértices, límites) de cada nivel de un conjunto de líneas, para guardarlos"""
+        if self.kind != "line":
+            raise ValueError("Solo los niveles de líneas se guardan como arrays")
+        return dict(self._levels)
+
+    def _line_coordinates(self, lines: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vértices de todas las líneas en un solo array más los límites de cada una;
+        las listas se arman solo para las líneas que se piden.
+        """
+        coords, owners = shapely.get_coordinates(lines, return_index=True)
+        return coords, np.searchsorted(owners, np.arange(len(lines) + 1))
+
+    def _polygon_coordinates(self, shape, original):
+        if shape.is_empty:
+            return original
+        rings = [shape.exterior] + list(shape.interiors)
+        return [shapely.get_coordinates(ring).tolist() for ring in rings]
+
+    def coordinates(self, position: int, tolerance_meters: Optional[float] = None,
+                    precision: Optional[int] = None) -> Any:
+        """Coordenadas de la geometría `position` simplificadas y cuantizadas"""
+        level = simplify_level(tolerance_meters)
+        coords = self.original[position]
+        if level in self._levels and self.kind == "polygon":
+            coords = self._levels[level][position]
+        elif level in self._levels:
+            vertices, bounds = self._levels[level]
+            start, end = bounds[position], bounds[position + 1]
+            # Si la simplificada quedó vacía se usa la original
+            if start < end:
+                coords = vertices[start:end].tolist()
+        if self.kind == "polygon":
+            return quantize_polygon(coords, precision)
+        return quantize_line(coords, precision)
@@ -0,0 +1,191 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.services.geodesy import EARTH_RADIUS_METERS
+
+
+class CoordinateColumn:
+    """
+    Coordenadas de muchas líneas en un solo array de vértices (N, 2) más los
+    límites de cada línea, como en un snapshot mapeado en memoria. `column[i]`
+    entrega la lista [[lng, lat], ...] de la línea i.
+    """
+
+    def __init__(self, vertices: np.ndarray, offsets: np.ndarray):
+        self.vertices = vertices
+        self.offsets = offsets
+
+    @classmethod
+    def from_lists(cls, lines: Sequence[List[List[float]]]) -> "CoordinateColumn":
+        counts = np.fromiter((len(coords) for coords in lines), dtype=np.int64, count=len(lines))
+        vertices = np.asarray([c for coords in lines for c in coords], dtype=np.float64).reshape(-1, 2)
+        return cls(vertices, np.concatenate(([0], np.cumsum(counts))))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> List[List[float]]:
+        return self.vertices[self.offsets[position]:self.offsets[position + 1]].tolist()
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def take(self, positions: np.ndarray) -> "CoordinateColumn":
+        """Nueva columna con solo las líneas `positions`, en ese orden"""
+        positions = np.asarray(positions, dtype=np.int64)
+        counts = self.counts()[positions]
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        vertex_index = np.repeat(self.offsets[positions] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return CoordinateColumn(self.vertices[vertex_index], offsets)
+
+
+class LineIndex:
+    """
+    Índice espacial (STRtree) sobre las envolventes de un conjunto de líneas.
+
+    Las posiciones devueltas por las consultas corresponden al orden original
+    de `lines`, de modo que quien consulta puede conservar sus propios ids.
+    Las líneas con menos de dos vértices no se indexan.
+    """
+
+    def __init__(self, lines: Sequence[List[List[float]]]):
+        if isinstance(lines, CoordinateColumn):
+            positions, envelopes = self._column_envelopes(lines)
+        else:
+            positions = []
+            envelopes = []
+            for position, coords in enumerate(lines):
+                if len(coords) < 2:
+                    continue
+                lngs = [c[0] for c in coords]
+                lats = [c[1] for c in coords]
+                positions.append(position)
+                envelopes.append((min(lngs), min(lats), max(lngs), max(lats)))
+
+        self.size = len(lines)
+        self._lines = lines
+        self._geometries = None
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.envelopes = np.asarray(envelopes, dtype=np.float64).reshape(-1, 4)
+        self.tree = STRtree(shapely.box(
+            self.envelopes[:, 0], self.envelopes[:, 1],
+            self.envelopes[:, 2], self.envelopes[:, 3]
+        ))
+
+    @staticmethod
+    def _column_envelopes(column: CoordinateColumn) -> Tuple[np.ndarray, np.ndarray]:
+        """Envolventes de todas las líneas de una CoordinateColumn de una vez"""
+        positions = np.flatnonzero(column.counts() >= 2)
+        if not len(positions):
+            return positions, np.empty((0, 4))
+        # reduceat con pares (inicio, fin): los tramos pares son las líneas
+        bounds = np.column_stack((column.offsets[positions], column.offsets[positions + 1])).ravel()
+        if bounds[-1] == len(column.vertices):
+            bounds = bounds[:-1]
+        mins = np.minimum.reduceat(column.vertices, bounds, axis=0)[::2]
+        maxs = np.maximum.reduceat(column.vertices, bounds, axis=0)[::2]
+        return positions, np.column_stack((mins, maxs))
+
+    def query_bbox(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> List[int]:
+        """Posiciones (ordenadas) de las líneas cuya envolvente intersecta el bbox"""
+        if not len(self.positions):
+            return []
+        hits = self.tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat))
+        return sorted(self.positions[hits].tolist())
+
+    def query_intersects(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> List[int]:
+        """
+        Posiciones (ordenadas) de las líneas que intersectan el bbox (bordes incluidos).
+        El índice entrega los candidatos por envolvente y luego se prueba la
+        intersección exacta, así que también se incluyen líneas que cruzan el
+        bbox sin tener ningún vértice dentro.
+        """
+        if not len(self.positions):
+            return []
+        box = shapely.box(min_lng, min_lat, max_lng, max_lat)
+        hits = self.tree.query(box)
+        hits = hits[shapely.intersects(self.geometries[hits], box)]
+        return sorted(self.positions[hits].tolist())
+
+    @property
+    def geometries(self) -> np.ndarray:
+        """LineStrings indexadas, en el orden del árbol (se construyen en el primer uso)"""
+        if self._geometries is None:
+            if isinstance(self._lines, CoordinateColumn):
+                self._geometries = build_linestrings(self._lines, self.positions)
+            else:
+                self._geometries = build_linestrings([self._lines[position] for position in self.positions.tolist()])
+        return self._geometries
+
+    def query_radius(self, lat: float, lng: float, radius_meters: float) -> List[int]:
+        """
+        Posiciones (ordenadas) de las líneas que podrían tener algún punto a menos
+        de `radius_meters` del punto dado. El conjunto es conservador: puede incluir
+        líneas más lejanas, pero nunca omite una que esté dentro del radio.
+        """
+        min_lng, min_lat, max_lng, max_lat = radius_to_bbox(lat, lng, radius_meters)
+        return self.query_bbox(min_lng, min_lat, max_lng, max_lat)
+
+    def query_radius_many(self, lats, lngs, radius_meters: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Versión por lotes de `query_radius` para N puntos.
+        Retorna dos arrays paralelos (índice_de_punto, posición_de_línea).
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if not len(self.positions) or not len(lats):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty
+
+        min_lng, min_lat, max_lng, max_lat = radius_to_bbox(lats, lngs, radius_meters)
+        points, hits = self.tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat))
+        return points.astype(np.int64), self.positions[hits]
+
+
+def build_linestrings(lines: Sequence[List[List[float]]], positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    LineStrings de shapely para listas de coordenadas [lng, lat], construidas en
+    bloque desde un solo array de vértices (las de menos de dos vértices quedan vacías).
+    Con una CoordinateColumn se puede pedir solo un subconjunto (`positions`).
+    """
+    if isinstance(lines, CoordinateColumn):
+        positions = np.arange(len(lines)) if positions is None else np.asarray(positions, dtype=np.int64)
+        counts = lines.counts()[positions]
+        starts = lines.offsets[positions]
+        valid = np.flatnonzero(counts >= 2)
+        result = np.array([shapely.LineString()] * len(positions), dtype=object)
+        if len(valid):
+            vertex_index = np.repeat(starts[valid] - np.cumsum(counts[valid]) + counts[valid], counts[valid])
+            vertex_index += np.arange(len(vertex_index))
+            result[valid] = shapely.linestrings(lines.vertices[vertex_index],
+                                                indices=np.repeat(np.arange(len(valid)), counts[valid]))
+        return result
+
+    counts = np.fromiter((len(coords) for coords in lines), dtype=np.int64, count=len(lines))
+    result = np.array([shapely.LineString()] * len(lines), dtype=object)
+    valid = np.flatnonzero(counts >= 2)
+    if len(valid):
+        selected = [lines[position] for position in valid.tolist()]
+        vertices = np.asarray([c for coords in selected for c in coords], dtype=np.float64).reshape(-1, 2)
+        result[valid] = shapely.linestrings(vertices, indices=np.repeat(np.arange(len(valid)), counts[valid]))
+    return result
+
+
+def radius_to_bbox(lat, lng, radius_meters: float):
+    """
+    Bounding box [min_lng, min_lat, max_lng, max_lat] que contiene todos los puntos
+    a distancia de Haversine <= radius_meters de (lat, lng).
+    Acepta escalares o arrays de coordenadas.
+    """
+    delta_lat = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    # La longitud se escala con la latitud más alejada del ecuador dentro del radio
+    max_abs_lat = np.minimum(np.abs(lat) + delta_lat, 89.0)
+    delta_lng = delta_lat / np.cos(np.radians(max_abs_lat))
+    # Margen pequeño para absorber la curvatura y el redondeo
+    delta_lat *= 1.01
+    delta_lng = delta_lng * 1.01
+    return [lng - delta_lng, lat - delta_lat, lng + delta_lng, lat + delta_lat]
@@ -0,0 +1,298 @@
+"""
+Mapbox Vector Tiles (MVT 2.1) del mapa de calor de accesibilidad.
+
+Las veredas del snapshot ya puntuado se proyectan una vez a coordenadas Web
+Mercator normalizadas (0..1) y se indexan; cada tesela toma solo las veredas que
+la tocan, las recorta al área de la tesela (más un margen), las simplifica con
+una tolerancia de un píxel en pantalla y cuantiza a la grilla de la tesela.
+
+El codificador protobuf es mínimo y propio: solo escribe los mensajes del
+esquema vector_tile.proto que se usan aquí (capas de líneas con atributos).
+"""
+import struct
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.models import SidewalkAccessibility
+from app.services.response_cache import EncodedResponse, ResponseCache
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_ZOOM = 22
+MAX_LATITUDE = 85.05112878
+
+# Tipos de geometría y comandos de MVT
+_LINESTRING = 2
+_MOVE_TO = 1
+_LINE_TO = 2
+
+
+def lng_lat_to_world(lngs, lats) -> Tuple[np.ndarray, np.ndarray]:
+    """Longitud/latitud a Web Mercator normalizado: x e y en [0, 1], y hacia el sur"""
+    lngs = np.asarray(lngs, dtype=np.float64)
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    x = (lngs + 180.0) / 360.0
+    y = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lats) / 2)) / (2 * np.pi)
+    return x, y
+
+
+def tiles_covering(bounds: Sequence[float], zoom: int) -> Iterator[Tuple[int, int]]:
+    """Teselas (x, y) de un zoom que cubren bounds = (min_x, min_y, max_x, max_y) en coordenadas mundo"""
+    scale = 2 ** zoom
+    min_x, min_y, max_x, max_y = bounds
+    for x in range(max(int(min_x * scale), 0), min(int(max_x * scale), scale - 1) + 1):
+        for y in range(max(int(min_y * scale), 0), min(int(max_y * scale), scale - 1) + 1):
+            yield x, y
+
+
+class TileSource:
+    """Veredas puntuadas de un snapshot, proyectadas e indexadas para generar teselas"""
+
+    def __init__(self, sidewalks: List[SidewalkAccessibility]):
+        lines = [s.geometry.coordinates for s in sidewalks if len(s.geometry.coordinates) >= 2]
+        kept = [s for s in sidewalks if len(s.geometry.coordinates) >= 2]
+        counts = np.array([len(coords) for coords in lines], dtype=np.int64)
+        vertices = np.asarray([c for coords in lines for c in coords], dtype=np.float64).reshape(-1, 2)
+
+        self.ids = [s.sidewalk_id for s in kept]
+        self.scores = [s.accessibility_score for s in kept]
+        self.obstacle_counts = [s.obstacle_count for s in kept]
+        self.world_x, self.world_y = lng_lat_to_world(vertices[:, 0], vertices[:, 1])
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        owners = np.repeat(np.arange(len(kept)), counts)
+        self.envelopes = np.empty((len(kept), 4))
+        for column, (values, reducer) in enumerate(((self.world_x, np.minimum), (self.world_y, np.minimum),
+                                                    (self.world_x, np.maximum), (self.world_y, np.maximum))):
+            start = np.full(len(kept), np.inf if reducer is np.minimum else -np.inf)
+            reducer.at(start, owners, values)
+            self.envelopes[:, column] = start
+        self.tree = STRtree(shapely.box(*self.envelopes.T)) if len(kept) else None
+
+    @property
+    def bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Extensión de los datos en coordenadas mundo (None si no hay veredas)"""
+        if not len(self.envelopes):
+            return None
+        return (float(self.envelopes[:, 0].min()), float(self.envelopes[:, 1].min()),
+                float(self.envelopes[:, 2].max()), float(self.envelopes[:, 3].max()))
+
+    def candidates(self, z: int, x: int, y: int, extent: int = 4096, buffer: int = 64) -> np.ndarray:
+        """Posiciones (ordenadas) de las veredas cuya envolvente toca la tesela más su margen"""
+        if self.tree is None:
+            return np.array([], dtype=np.int64)
+        scale = 2 ** z
+        margin = buffer / extent / scale
+        box = shapely.box(x / scale - margin, y / scale - margin,
+                          (x + 1) / scale + margin, (y + 1) / scale + margin)
+        return np.sort(self.tree.query(box))
+
+    def render(self, z: int, x: int, y: int, extent: int = 4096, buffer: int = 64,
+               layer_name: str = "sidewalks") -> bytes:
+        """Tesela z/x/y codificada como MVT (una capa de líneas)"""
+        candidates = self.candidates(z, x, y, extent, buffer)
+        features = self._clip_and_simplify(candidates, z, x, y, extent, buffer)
+
+        layer = _LayerEncoder(layer_name, extent)
+        for position, parts in features:
+            layer.add_line(
+                parts,
+                {
+                    "sidewalk_id": self.ids[position],
+                    "accessibility_score": float(self.scores[position]),
+                    "obstacle_count": int(self.obstacle_counts[position])
+                }
+            )
+        return _message_field(3, layer.encode())
+
+    def _clip_and_simplify(self, candidates: np.ndarray, z: int, x: int, y: int,
+                           extent: int, buffer: int) -> List[Tuple[int, List[np.ndarray]]]:
+        if not len(candidates):
+            return []
+        scale = 2 ** z
+        starts, ends = self.offsets[candidates], self.offsets[candidates + 1]
+        vertex_index = np.concatenate([np.arange(s, e) for s, e in zip(starts.tolist(), ends.tolist())])
+        line_index = np.repeat(np.arange(len(candidates)), ends - starts)
+
+        # Coordenadas de la tesela (0..extent), recorte con margen y simplificación de 1 px
+        coords = np.column_stack((
+            (self.world_x[vertex_index] * scale - x) * extent,
+            (self.world_y[vertex_index] * scale - y) * extent
+        ))
+        lines = shapely.linestrings(coords, indices=line_index)
+        lines = shapely.clip_by_rect(lines, -buffer, -buffer, extent + buffer, extent + buffer)
+        lines = shapely.simplify(lines, extent / 256, preserve_topology=False)
+
+        parts, part_owner = shapely.get_parts(lines, return_index=True)
+        part_coords, coord_owner = shapely.get_coordinates(parts, return_index=True)
+        quantized = np.round(part_coords).astype(np.int64)
+
+        features: Dict[int, List[np.ndarray]] = {}
+        boundaries = np.searchsorted(coord_owner, np.arange(len(parts) + 1))
+        for part in range(len(parts)):
+            points = quantized[boundaries[part]:boundaries[part + 1]]
+            if len(points) > 1:
+                # Quitar vértices repetidos tras cuantizar
+                keep = np.concatenate(([True], np.any(points[1:] != points[:-1], axis=1)))
+                points = points[keep]
+            if len(points) >= 2:
+                features.setdefault(int(candidates[part_owner[part]]), []).append(points)
+        return sorted(features.items())
+
+
+class VectorTileService:
+    """
+    Teselas MVT por ciudad generadas desde el snapshot puntuado de /obstacles,
+    con caché LRU de teselas ya codificadas (gzip/brotli y ETag vía ResponseCache).
+    Generar teselas es trabajo pesado y síncrono: desde el event loop se llama en
+    un thread (la caché admite acceso concurrente).
+    """
+
+    # Teselas codificadas en memoria
+    TILE_CACHE_ENTRIES = 4096
+    # Zoom máximo que se pregenera al publicar un snapshot nuevo
+    PREGENERATE_MAX_ZOOM = 12
+
+    def __init__(self, cache_entries: int = TILE_CACHE_ENTRIES):
+        self.cache = ResponseCache(max_entries=cache_entries)
+        self._sources: Dict[str, Tuple[str, TileSource]] = {}
+
+    def source(self, city: str, version: str, sidewalks: List[SidewalkAccessibility]) -> TileSource:
+        """Fuente de teselas de la ciudad para una versión de los datos (se arma una vez)"""
+        current = self._sources.get(city)
+        if current is None or current[0] != version:
+            current = (version, TileSource(sidewalks))
+            self._sources[city] = current
+        return current[1]
+
+    @staticmethod
+    def tile_key(city: str, version: str, z: int, x: int, y: int) -> Tuple:
+        """Clave en caché de una tesela (ValueError si está fuera de rango)"""
+        if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            raise ValueError(f"Tesela {z}/{x}/{y} fuera de rango")
+        return "tile", city, version, z, x, y
+
+    def get_tile(self, city: str, version: str, sidewalks: List[SidewalkAccessibility],
+                 z: int, x: int, y: int) -> EncodedResponse:
+        """Tesela codificada (desde la caché si ya se generó para esta versión)"""
+        key = self.tile_key(city, version, z, x, y)
+        return self.cache.get_or_build(
+            key, lambda: self.source(city, version, sidewalks).render(z, x, y), media_type=MVT_MEDIA_TYPE
+        )
+
+    def pregenerate(self, city: str, version: str, sidewalks: List[SidewalkAccessibility],
+                    max_zoom: Optional[int] = None, previous_version: Optional[str] = None,
+                    changed_ids: Optional[Set[str]] = None) -> int:
+        """
+        Generar y cachear las teselas con datos hasta `max_zoom`; retorna cuántas.
+
+        Con `previous_version` y `changed_ids` (snapshot recalculado por diferencias,
+        mismas geometrías) las teselas que no tocan ninguna vereda cambiada se copian
+        de la versión anterior si siguen en caché, en vez de volver a generarse.
+        """
+        max_zoom = self.PREGENERATE_MAX_ZOOM if max_zoom is None else max_zoom
+        source = self.source(city, version, sidewalks)
+        if source.bounds is None:
+            return 0
+        changed = None
+        if previous_version is not None and changed_ids is not None:
+            changed = np.fromiter((sidewalk_id in changed_ids for sidewalk_id in source.ids),
+                                  dtype=bool, count=len(source.ids))
+        generated = 0
+        for z in range(max_zoom + 1):
+            for x, y in tiles_covering(source.bounds, z):
+                generated += 1
+                if changed is not None and self.cache.lookup(self.tile_key(city, version, z, x, y)) is None \
+                        and not changed[source.candidates(z, x, y)].any():
+                    previous = self.cache.lookup(self.tile_key(city, previous_version, z, x, y))
+                    if previous is not None:
+                        self.cache.store(self.tile_key(city, version, z, x, y), previous.body, MVT_MEDIA_TYPE)
+                        continue
+                self.get_tile(city, version, sidewalks, z, x, y)
+        return generated
+
+
+# --- Codificación protobuf (vector_tile.proto) ---
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _message_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed_field(field: int, values: List[int]) -> bytes:
+    return _message_field(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    """Mensaje Value de MVT"""
+    if isinstance(value, str):
+        return _message_field(1, value.encode())
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value))
+    return _key(3, 1) + struct.pack("<d", value)
+
+
+class _LayerEncoder:
+    """Acumula features de una capa con sus diccionarios de claves y valores"""
+
+    def __init__(self, name: str, extent: int):
+        self.name = name
+        self.extent = extent
+        self.features: List[bytes] = []
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, object], int] = {}
+
+    def add_line(self, parts: List[np.ndarray], attributes: Dict[str, object]):
+        tags = []
+        for key, value in attributes.items():
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault((type(value), value), len(self.values)))
+
+        commands = []
+        cursor_x = cursor_y = 0
+        for points in parts:
+            deltas = np.diff(points, axis=0, prepend=[[cursor_x, cursor_y]]).tolist()
+            cursor_x, cursor_y = points[-1].tolist()
+            commands.append((1 << 3) | _MOVE_TO)
+            commands.extend((_zigzag(deltas[0][0]), _zigzag(deltas[0][1])))
+            commands.append(((len(deltas) - 1) << 3) | _LINE_TO)
+            for dx, dy in deltas[1:]:
+                commands.extend((_zigzag(dx), _zigzag(dy)))
+
+        feature = (
+            _packed_field(2, tags)
+            + _key(3, 0) + _varint(_LINESTRING)
+            + _packed_field(4, commands)
+        )
+        self.features.append(feature)
+
+    def encode(self) -> bytes:
+        layer = [_key(15, 0) + _varint(2), _message_field(1, self.name.encode())]
+        layer.extend(_message_field(2, feature) for feature in self.features)
+        layer.extend(_message_field(3, key.encode()) for key in self.keys)
+        layer.extend(_message_field(4, _encode_value(value)) for _, value in self.values)
+        layer.append(_key(5, 0) + _varint(self.extent))
+        return b"".join(layer)
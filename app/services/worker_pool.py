@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+# Módulos que el forkserver importa una sola vez, así cada proceso nuevo arranca sin reimportarlos
+PRELOAD_MODULES = ["app.services.geo_service", "app.services.obstacle_association"]
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Pool de procesos compartido para trabajo CPU intensivo (rutas, scoring).
+
+    Los procesos se inician con `forkserver` (o `spawn` donde no existe), nunca con
+    `fork`: el pool se crea en el primer uso, cuando el proceso ya tiene threads
+    (event loop, pools de los endpoints, cliente HTTP) y un fork copiaría los locks
+    que otro thread tuviera tomados. Cada proceso arranca sin la memoria del padre
+    y ejecuta `initializer(*initargs())` para armar su estado; `initargs` se evalúa
+    una vez, al crear el pool, así todos los procesos reciben el mismo.
+
+    Con un solo proceso, o donde el sistema no permite crearlos (p. ej. entornos
+    serverless sin /dev/shm ni sem_open), `available` es False y `map`/`map_async`
+    ejecutan las tareas en el proceso actual.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 initializer: Optional[Callable[..., None]] = None,
+                 initargs: Optional[Callable[[], Tuple[Any, ...]]] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._unavailable = False
+
+    @property
+    def available(self) -> bool:
+        """Si hay procesos a los que repartir trabajo (crea el pool si hace falta)"""
+        if self.max_workers <= 1 or self._unavailable:
+            return False
+        try:
+            self.executor
+        except (OSError, NotImplementedError, ImportError) as e:
+            logger.warning("No se pudo crear el pool de procesos (%s); se calcula en el proceso actual", e)
+            self._unavailable = True
+            return False
+        return True
+
+    @property
+    def executor(self) -> Executor:
+        """Executor subyacente (se crea en el primer uso)"""
+        if self._executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if context.get_start_method() == "forkserver":
+                context.set_forkserver_preload(PRELOAD_MODULES)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context, initializer=self.initializer,
+                initargs=self.initargs() if self.initargs is not None else ()
+            )
+        return self._executor
+
+    def start(self):
+        """Iniciar todos los procesos ya (con su initializer), sin esperar a que terminen de arrancar"""
+        if not self.available:
+            return
+        for _ in range(self.max_workers):
+            self.executor.submit(int)
+
+    def map(self, fn: Callable[..., Any], tasks: Iterable[Sequence[Any]]) -> List[Any]:
+        """Ejecutar fn(*task) para cada tarea en los procesos y devolver los resultados en orden"""
+        if not self.available:
+            return [fn(*task) for task in tasks]
+        futures = [self.executor.submit(fn, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+    async def map_async(self, fn: Callable[..., Any], tasks: Iterable[Sequence[Any]]) -> List[Any]:
+        """Como `map`, pero esperando los resultados sin bloquear el event loop"""
+        if not self.available:
+            return await asyncio.to_thread(self.map, fn, list(tasks))
+        futures = [asyncio.wrap_future(self.executor.submit(fn, *task)) for task in tasks]
+        return list(await asyncio.gather(*futures))
+
+    def shutdown(self, wait: bool = True):
+        """
+        Terminar los procesos del pool. Con `wait` espera a que salgan: desde el event
+        loop usar `await asyncio.to_thread(pool.shutdown)`
+        """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def chunked(items: Sequence[Any], chunks: int) -> List[Sequence[Any]]:
+    """Dividir `items` en a lo más `chunks` bloques contiguos de tamaño similar"""
+    if not items:
+        return []
+    chunks = max(1, min(chunks, len(items)))
+    size, extra = divmod(len(items), chunks)
+    result, start = [], 0
+    for index in range(chunks):
+        end = start + size + (1 if index < extra else 0)
+        result.append(items[start:end])
+        start = end
+    return result
@@ -0,0 +1,63 @@
+"""
+Throughput de rutas: una petición por par vs lote (/routes:batch) vs matriz (/matrix).
+
+Uso: python -m benchmarks.bench_batch [procesos]
+"""
+import os
+import random
+import sys
+import time
+
+from app.models import Coordinate, MatrixRequest, RouteRequest
+from app.services.geo_service import GeoService
+from benchmarks.synthetic import BLOCK_DEGREES, grid_city
+
+BLOCKS = 40
+POINTS = 15  # matriz de 15 x 15 = 225 pares
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    service = GeoService()
+    service.add_city("bench", service.cities["santiago"].polygon, grid_city(BLOCKS))
+
+    rng = random.Random(1)
+    span = BLOCKS * BLOCK_DEGREES
+    points = [Coordinate(lat=-33.45 + rng.random() * span, lng=-70.65 + rng.random() * span) for _ in range(POINTS)]
+    requests = [
+        RouteRequest(start={"coordinate": a}, end={"coordinate": b})
+        for a in points for b in points
+    ]
+
+    started = time.perf_counter()
+    for request in requests:
+        service.calculate_optimal_route("bench", request)
+    loop = time.perf_counter() - started
+
+    started = time.perf_counter()
+    service.calculate_routes_batch("bench", requests, workers=1)
+    batch_serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    service.calculate_routes_batch("bench", requests, workers=workers)
+    batch_parallel = time.perf_counter() - started
+
+    started = time.perf_counter()
+    service.calculate_matrix("bench", MatrixRequest(origins=points, destinations=points), workers=1)
+    matrix_serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    service.calculate_matrix("bench", MatrixRequest(origins=points, destinations=points), workers=workers)
+    matrix_parallel = time.perf_counter() - started
+    service.worker_pool.shutdown()
+
+    pairs = len(requests)
+    print(f"grafo: {service.cities['bench'].graph.node_count} nodos, {pairs} pares, {workers} procesos")
+    for name, elapsed in (("una petición por par", loop), ("lote, 1 proceso", batch_serial),
+                          (f"lote, {workers} procesos", batch_parallel), ("matriz, 1 proceso", matrix_serial),
+                          (f"matriz, {workers} procesos", matrix_parallel)):
+        print(f"{name:<24} {elapsed:>7.2f} s {pairs / elapsed:>9.1f} pares/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Consultas por bbox (vista del mapa) sobre calles y veredas: recorrido lineal de
+todos los vértices vs índice espacial + intersección exacta.
+
+Uso: python -m benchmarks.bench_bbox
+"""
+import random
+import time
+
+from app.services.geo_service import GeoService
+from benchmarks.synthetic import BLOCK_DEGREES, grid_city
+
+QUERIES = 200
+VIEWPORT_BLOCKS = 5  # vista de ~550 m de lado
+
+
+def linear_sidewalks(streets, bbox):
+    """Filtro anterior: alguna vereda con un vértice dentro del bbox"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return [
+        segment
+        for street in streets
+        for segment in (street.sidewalk_west, street.sidewalk_east,
+                        street.sidewalk_north, street.sidewalk_south)
+        if segment and any(min_lng <= c[0] <= max_lng and min_lat <= c[1] <= max_lat
+                           for c in segment.geometry.coordinates)
+    ]
+
+
+def main():
+    service = GeoService()
+    rng = random.Random(0)
+    print(f"{'cuadras':>8} {'veredas':>8} {'lineal ms':>10} {'índice ms':>10}")
+    for blocks in (20, 50, 100):
+        streets = grid_city(blocks)
+        service.add_city("bench", service.cities["santiago"].polygon, streets)
+
+        origin_lat, origin_lng = streets[0].geometry.coordinates[0][1], streets[0].geometry.coordinates[0][0]
+        size = VIEWPORT_BLOCKS * BLOCK_DEGREES
+        bboxes = []
+        for _ in range(QUERIES):
+            lng = origin_lng + rng.random() * (blocks * BLOCK_DEGREES - size)
+            lat = origin_lat + rng.random() * (blocks * BLOCK_DEGREES - size)
+            bboxes.append([lng, lat, lng + size, lat + size])
+
+        start = time.perf_counter()
+        for bbox in bboxes:
+            linear_sidewalks(streets, bbox)
+        linear = (time.perf_counter() - start) / QUERIES * 1000
+
+        start = time.perf_counter()
+        for bbox in bboxes:
+            service.get_sidewalk_segments("bench", bbox=bbox)
+        indexed = (time.perf_counter() - start) / QUERIES * 1000
+
+        print(f"{blocks:>8} {len(service.cities['bench'].sidewalk_entries):>8} {linear:>10.2f} {indexed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Carga de una ciudad desde GeoJSON: lectura (parseo incremental + reproyección),
+armado de modelos (asociación de veredas a calles y lados) e índices de CityData.
+
+Genera en un directorio temporal una ciudad en cuadrícula con una calle por
+cuadra y veredas densas (un vértice cada ~5 m) hasta el tamaño pedido en MB.
+
+Uso: python -m benchmarks.bench_city_load [MB ...]
+"""
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from app.services.city_data import CityData
+from app.services.city_loader import build_city_polygon, build_streets, read_features
+
+BLOCK_DEGREES = 0.001
+SIDEWALK_OFFSET = 0.00005
+VERTICES_PER_BLOCK = 22
+# Bytes aproximados por cuadra (dos ejes y cuatro veredas)
+BYTES_PER_BLOCK = 4300
+
+
+def write_city(directory: str, blocks: int, origin_lat: float = -33.45, origin_lng: float = -70.65):
+    """Escribir polygon/streets/sidewalks.geojson de una cuadrícula de `blocks` x `blocks`"""
+    span = blocks * BLOCK_DEGREES
+    polygon = {"type": "FeatureCollection", "features": [{
+        "type": "Feature", "properties": {"city_name": "Bench"},
+        "geometry": {"type": "Polygon", "coordinates": [[
+            [origin_lng, origin_lat], [origin_lng + span, origin_lat], [origin_lng + span, origin_lat + span],
+            [origin_lng, origin_lat + span], [origin_lng, origin_lat]
+        ]]}
+    }]}
+    with open(os.path.join(directory, "polygon.geojson"), "w") as f:
+        json.dump(polygon, f)
+
+    def dense(lng1, lat1, lng2, lat2):
+        return [[round(lng1 + (lng2 - lng1) * k / VERTICES_PER_BLOCK, 7),
+                 round(lat1 + (lat2 - lat1) * k / VERTICES_PER_BLOCK, 7)] for k in range(VERTICES_PER_BLOCK + 1)]
+
+    with open(os.path.join(directory, "streets.geojson"), "w") as streets, \
+            open(os.path.join(directory, "sidewalks.geojson"), "w") as sidewalks:
+        streets.write('{"type": "FeatureCollection", "features": [\n')
+        sidewalks.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for i in range(blocks + 1):
+            for k in range(blocks):
+                for orientation in ("norte_sur", "este_oeste"):
+                    if orientation == "norte_sur":
+                        a = (origin_lng + i * BLOCK_DEGREES, origin_lat + k * BLOCK_DEGREES)
+                        b = (a[0], a[1] + BLOCK_DEGREES)
+                        shifts = {"poniente": (-SIDEWALK_OFFSET, 0), "oriente": (SIDEWALK_OFFSET, 0)}
+                    else:
+                        a = (origin_lng + k * BLOCK_DEGREES, origin_lat + i * BLOCK_DEGREES)
+                        b = (a[0] + BLOCK_DEGREES, a[1])
+                        shifts = {"sur": (0, -SIDEWALK_OFFSET), "norte": (0, SIDEWALK_OFFSET)}
+                    street_id = f"{orientation}_{i}_{k}"
+                    separator = "" if first else ",\n"
+                    first = False
+                    streets.write(separator + json.dumps({
+                        "type": "Feature",
+                        "properties": {"id": street_id, "name": f"Calle {orientation} {i}"},
+                        "geometry": {"type": "LineString", "coordinates": [list(a), list(b)]}
+                    }))
+                    for n, (side, (dx, dy)) in enumerate(shifts.items()):
+                        # La mitad de las veredas sin street_id ni lado: se derivan de la geometría
+                        props = {"id": f"{street_id}_{side}", "surface_type": "concrete"}
+                        if (i + k + n) % 2:
+                            props.update(street_id=street_id, side=side)
+                        sidewalks.write(separator if n == 0 else ",\n")
+                        sidewalks.write(json.dumps({
+                            "type": "Feature", "properties": props,
+                            "geometry": {"type": "LineString",
+                                         "coordinates": dense(a[0] + dx, a[1] + dy, b[0] + dx, b[1] + dy)}
+                        }))
+        streets.write("\n]}\n")
+        sidewalks.write("\n]}\n")
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [10.0, 50.0]
+    print(f"{'MB':>7} {'calles':>8} {'veredas':>8} {'lectura s':>10} {'modelos s':>10} "
+          f"{'índices s':>10} {'total s':>8} {'RSS MiB':>8}")
+    for size in sizes:
+        blocks = max(int((size * 1e6 / BYTES_PER_BLOCK) ** 0.5), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            write_city(directory, blocks)
+            megabytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 1e6
+
+            start = time.perf_counter()
+            tables = {layer: read_features(os.path.join(directory, f"{layer}.geojson"))
+                      for layer in ("polygon", "streets", "sidewalks")}
+            read = time.perf_counter()
+            polygon = build_city_polygon(tables["polygon"], "bench")
+            streets = build_streets("bench", tables["streets"], tables["sidewalks"])
+            built = time.perf_counter()
+            data = CityData(polygon, streets, version="bench")
+            indexed = time.perf_counter()
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{megabytes:>7.0f} {len(streets):>8} {len(data.sidewalk_entries):>8} {read - start:>10.2f} "
+              f"{built - read:>10.2f} {indexed - built:>10.2f} {indexed - start:>8.2f} {rss:>8.0f}")
+        del tables, streets, data
+
+
+if __name__ == "__main__":
+    main()
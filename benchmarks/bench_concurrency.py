@@ -0,0 +1,138 @@
+"""
+Latencia bajo tráfico mixto: llamadas síncronas a GeoService dentro del event loop
+(como antes) vs en los pools por endpoint de app/routers/geo_router.py.
+
+Sobre la ciudad sintética de benchmarks/bench_city_load.py llegan a ritmo fijo
+peticiones livianas (/cities y una página de /streets ya en caché) mezcladas con
+rutas largas y consultas de veredas por bbox sin caché. Al final, una ráfaga de
+rutas muestra el rechazo con 503 + Retry-After cuando la cola se llena.
+
+Uso: python -m benchmarks.bench_concurrency [segundos]
+"""
+import asyncio
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.services.geo_service import GeoService
+from benchmarks.bench_city_load import BLOCK_DEGREES, write_city
+
+# Módulo del router (app.routers exporta el APIRouter con el mismo nombre)
+geo_router = importlib.import_module("app.routers.geo_router")
+
+BLOCKS = 60
+ORIGIN_LAT, ORIGIN_LNG = -33.45, -70.65
+# Peticiones por segundo de cada clase
+RATES = {"liviana": 40.0, "ruta": 2.0, "bbox": 4.0}
+BURST = 80
+
+
+async def inline(endpoint, fn, *args, **kwargs):
+    """Comportamiento anterior: la llamada corre en el event loop"""
+    return fn(*args, **kwargs)
+
+
+def random_point(rng):
+    span = BLOCKS * BLOCK_DEGREES
+    return {"lat": ORIGIN_LAT + rng.uniform(0.05, 0.95) * span, "lng": ORIGIN_LNG + rng.uniform(0.05, 0.95) * span}
+
+
+def request_factory(kind, rng):
+    if kind == "liviana":
+        path = rng.choice(["/api/v1/cities", "/api/v1/cities/bench/streets?limit=20"])
+        return lambda client: client.get(path)
+    if kind == "ruta":
+        body = {"start": {"coordinate": random_point(rng)}, "end": {"coordinate": random_point(rng)}}
+        return lambda client: client.post("/api/v1/cities/bench/route", json=body)
+    point = random_point(rng)
+    # bbox distinto en cada petición: no hay caché que la resuelva
+    bbox = f"{point['lng'] - 0.01},{point['lat'] - 0.01},{point['lng'] + 0.01},{point['lat'] + 0.01}"
+    return lambda client: client.get(f"/api/v1/cities/bench/sidewalks?bbox={bbox}")
+
+
+async def mixed_load(client, seconds, seed=0):
+    """Latencias (s) y códigos por clase con llegadas de Poisson a los ritmos de RATES"""
+    rng = random.Random(seed)
+    results = {kind: [] for kind in RATES}
+
+    async def timed(kind, send, arrival):
+        # Desde la llegada programada: con el loop bloqueado la tarea ni siquiera empieza
+        response = await send(client)
+        results[kind].append((time.perf_counter() - arrival, response.status_code))
+
+    arrivals = sorted(
+        (t, kind)
+        for kind, rate in RATES.items()
+        for t in np.cumsum([rng.expovariate(rate) for _ in range(int(rate * seconds * 2))])
+        if t < seconds
+    )
+    tasks = []
+    start = time.perf_counter()
+    for at, kind in arrivals:
+        delay = at - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(timed(kind, request_factory(kind, rng), start + at)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+async def burst(client):
+    """Códigos de BURST rutas lanzadas a la vez, y el Retry-After de los rechazos"""
+    rng = random.Random(1)
+    sends = [request_factory("ruta", rng) for _ in range(BURST)]
+    responses = await asyncio.gather(*(send(client) for send in sends))
+    rejected = [r for r in responses if r.status_code == 503]
+    return len(responses) - len(rejected), len(rejected), {r.headers.get("retry-after") for r in rejected}
+
+
+async def run(seconds):
+    app = FastAPI()
+    app.include_router(geo_router.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.get("/api/v1/cities/bench/streets?limit=20")
+        print(f"{'modo':>10} {'clase':>8} {'n':>5} {'p50 ms':>8} {'p99 ms':>8} {'503':>5}")
+        for mode in ("en loop", "pools"):
+            geo_router.run_limited = inline if mode == "en loop" else limited
+            results = await mixed_load(client, seconds)
+            for kind, samples in results.items():
+                assert all(status in (200, 503) for _, status in samples), f"{kind}: respuestas con error"
+                latencies = np.array([latency for latency, _ in samples]) * 1000
+                rejected = sum(1 for _, status in samples if status == 503)
+                print(f"{mode:>10} {kind:>8} {len(samples):>5} {np.percentile(latencies, 50):>8.1f} "
+                      f"{np.percentile(latencies, 99):>8.1f} {rejected:>5}")
+
+        accepted, rejected, retry_after = await burst(client)
+        print(f"\nráfaga de {BURST} rutas: {accepted} atendidas, {rejected} rechazadas con 503 "
+              f"(Retry-After {', '.join(sorted(retry_after)) or '-'})")
+
+
+limited = geo_router.run_limited
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "bench"))
+        write_city(os.path.join(directory, "bench"), BLOCKS, ORIGIN_LAT, ORIGIN_LNG)
+        geo_router.geo_service = GeoService(directory)
+    # Como al iniciar la aplicación
+    geo_router.geo_service.worker_pool.start()
+    try:
+        asyncio.run(run(seconds))
+    finally:
+        geo_router.geo_service.worker_pool.shutdown()
+        for limiter in geo_router.limiters.values():
+            limiter.shutdown()
+
+
+if __name__ == "__main__":
+    main()
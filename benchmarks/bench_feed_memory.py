@@ -0,0 +1,112 @@
+"""
+Memoria y tiempo al descargar un feed labelClusters grande:
+- completo: cuerpo completo + response.json() + un modelo Obstacle por label
+- incremental: parseo a medida que llegan los bytes + un modelo por label
+- columnar: parseo incremental hacia un ObstacleStore (modelos solo bajo demanda)
+
+El feed se sirve localmente (httpx.MockTransport) generándolo por trozos, así
+que la memoria medida es solo la del lado que consume.
+
+Uso: python -m benchmarks.bench_feed_memory [features]
+"""
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict
+
+import httpx
+
+from app.models import Coordinate, Obstacle
+from app.services.feed_cache import FeedCache
+from app.services.json_stream import FeatureStreamParser
+from app.services.obstacle_service import ObstacleService
+from benchmarks.synthetic import iter_label_features
+
+CHUNK_FEATURES = 200
+
+
+def parse_obstacle(service: ObstacleService, feature: Dict[str, Any]) -> Obstacle:
+    """Modelo Obstacle de una feature del feed (el camino por diccionario de antes del store)"""
+    props = feature.get("properties", {})
+    coordinates = feature.get("geometry", {}).get("coordinates", [0, 0])
+    label_id = props.get("label_id")
+    label_type_id = props.get("label_type_id")
+    severity_value = props.get("severity")
+    obstacle_type, severity, affects_accessibility = service._classify_label(label_type_id, severity_value)
+    return Obstacle(
+        id=f"obs_{label_id}",
+        position=Coordinate(lat=coordinates[1] if len(coordinates) > 1 else 0,
+                            lng=coordinates[0] if len(coordinates) > 0 else 0),
+        obstacle_type=obstacle_type,
+        severity=severity,
+        affects_accessibility=affects_accessibility,
+        label_id=label_id,
+        label_type_id=label_type_id,
+        severity_value=severity_value,
+        **{name: props.get(name) for name in (
+            "description", "gsv_panorama_id", "photographer_heading", "heading", "pitch", "zoom",
+            "canvas_x", "canvas_y", "canvas_width", "canvas_height", "temporary", "tags",
+            "agree_count", "disagree_count", "notsure_count"
+        )}
+    )
+
+
+class BufferedParser:
+    """Comportamiento anterior: acumular el cuerpo, decodificarlo entero y luego convertir"""
+
+    def __init__(self, transform):
+        self.transform = transform
+        self.chunks = []
+
+    def feed(self, chunk: bytes):
+        self.chunks.append(chunk)
+
+    def close(self):
+        data = json.loads(b"".join(self.chunks))
+        return [self.transform(feature) for feature in data["features"]]
+
+
+def feed_transport(count: int) -> httpx.MockTransport:
+    async def body():
+        yield b'{"type": "FeatureCollection", "features": ['
+        chunk = []
+        for index, feature in enumerate(iter_label_features(count)):
+            chunk.append(("," if index else "") + json.dumps(feature))
+            if len(chunk) == CHUNK_FEATURES:
+                yield "".join(chunk).encode()
+                chunk = []
+        yield ("".join(chunk) + "]}").encode()
+
+    return httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+
+
+async def measure(count: int, mode: str):
+    service = ObstacleService(FeedCache(transport=feed_transport(count)))
+    if mode == "completo":
+        service._feed_parser = lambda: BufferedParser(lambda feature: parse_obstacle(service, feature))
+    elif mode == "incremental":
+        service._feed_parser = lambda: FeatureStreamParser(transform=lambda feature: parse_obstacle(service, feature))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    entry = await service.fetch_feed("santiago")
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await service.aclose()
+    return len(entry.payload), elapsed, peak / 2 ** 20, current / 2 ** 20
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{'modo':<14} {'obstáculos':>10} {'tiempo s':>9} {'pico MiB':>9} {'final MiB':>10} {'bytes/label':>12}")
+    for mode in ("completo", "incremental", "columnar"):
+        parsed, elapsed, peak, current = asyncio.run(measure(count, mode))
+        per_label = current * 2 ** 20 / max(parsed, 1)
+        print(f"{mode:<14} {parsed:>10} {elapsed:>9.2f} {peak:>9.1f} {current:>10.1f} {per_label:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Recálculo del snapshot de /obstacles cuando cambia una fracción del feed: todo de
+nuevo vs por diferencias de label_id (solo se asocian los labels nuevos o
+modificados y se rearman las veredas afectadas), y pregeneración de teselas
+copiando de la versión anterior las que no tocan veredas cambiadas.
+
+Cada recálculo por diferencias se verifica contra el recálculo completo. Los
+cambios (bajas, altas y modificaciones de severidad o votos) conservan la
+extensión del feed, así la cuadrícula por defecto no cambia.
+
+Uso: python -m benchmarks.bench_incremental [labels]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from app.services.feed_cache import FeedEntry
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder, diff_labels
+from app.services.vector_tiles import VectorTileService
+from app.services.worker_pool import WorkerPool
+from benchmarks.synthetic import iter_label_features
+
+SPAN_DEGREES = 0.15
+CHANGE_FRACTIONS = (0.001, 0.01, 0.1)
+TILE_MAX_ZOOM = 14
+
+
+def changed_features(features, fraction, seed=0):
+    """Copia del feed con `fraction` de los labels dados de baja, agregados o modificados"""
+    rng = random.Random(seed)
+    lats = [f["geometry"]["coordinates"][1] for f in features]
+    lngs = [f["geometry"]["coordinates"][0] for f in features]
+    min_lat, max_lat, min_lng, max_lng = min(lats), max(lats), min(lngs), max(lngs)
+    result = []
+    next_id = len(features)
+    for feature in features:
+        lng, lat = feature["geometry"]["coordinates"]
+        # Los extremos se conservan para no cambiar la extensión del feed
+        extreme = lat in (min_lat, max_lat) or lng in (min_lng, max_lng)
+        roll = rng.random()
+        if roll < fraction / 3 and not extreme:
+            continue
+        if roll < 2 * fraction / 3:
+            properties = dict(feature["properties"], agree_count=feature["properties"].get("agree_count", 0) + 1,
+                              severity=rng.choice([1, 2, 3, 4, 5]))
+            feature = dict(feature, properties=properties)
+        result.append(feature)
+        if roll > 1 - fraction / 3:
+            result.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [rng.uniform(min_lng, max_lng),
+                                                              rng.uniform(min_lat, max_lat)]},
+                "properties": {"label_id": next_id, "label_type_id": rng.choice([1, 3, 4]),
+                               "severity": rng.choice([3, 4, 5])}
+            })
+            next_id += 1
+    return result
+
+
+def build_store(service, features):
+    builder = ObstacleStoreBuilder(service._classify_label)
+    for feature in features:
+        builder.append(feature)
+    return builder.build()
+
+
+async def rebuild(service, entries, versions):
+    """Snapshots publicados al pasar por las versiones dadas, y duración del último recálculo"""
+    snapshots = []
+    for version in versions:
+        async def fetch(city, entry=entries[version]):
+            return entry
+        service.fetch_feed = fetch
+        start = time.perf_counter()
+        snapshots.append(await service._rebuild_snapshot("bench"))
+        elapsed = time.perf_counter() - start
+    return snapshots, elapsed
+
+
+def pregenerate_tiles(previous, snapshot, carry_over):
+    """Duración de pregenerar las teselas de `snapshot` con las de `previous` ya en caché, y (teselas, generadas)"""
+    tiles = VectorTileService(cache_entries=1_000_000)
+    tiles.pregenerate("bench", previous.version, previous.response.sidewalks, TILE_MAX_ZOOM)
+    source = tiles.source("bench", snapshot.version, snapshot.response.sidewalks)
+    rendered = 0
+    render = source.render
+
+    def counted(*args, **kwargs):
+        nonlocal rendered
+        rendered += 1
+        return render(*args, **kwargs)
+
+    source.render = counted
+    start = time.perf_counter()
+    if carry_over:
+        total = tiles.pregenerate("bench", snapshot.version, snapshot.response.sidewalks, TILE_MAX_ZOOM,
+                                  previous_version=previous.version, changed_ids=snapshot.changed_sidewalk_ids)
+    else:
+        total = tiles.pregenerate("bench", snapshot.version, snapshot.response.sidewalks, TILE_MAX_ZOOM)
+    return time.perf_counter() - start, (total, rendered)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    pool = WorkerPool(1)
+    service = ObstacleService(worker_pool=pool)
+    features = list(iter_label_features(count, span=SPAN_DEGREES))
+    entries = {"base": FeedEntry(build_store(service, features), "base")}
+    print(f"{count} labels")
+    print(f"{'cambio':>7} {'labels':>7} {'veredas':>8} {'completo s':>11} {'diferencias s':>14} "
+          f"{'teselas':>8} {'copiadas':>9} {'completo s':>11} {'copia s':>8}")
+
+    for fraction in CHANGE_FRACTIONS:
+        version = f"{fraction:g}"
+        entries[version] = FeedEntry(build_store(service, changed_features(features, fraction)), version)
+
+        # Sin snapshot anterior: recálculo completo
+        (expected,), full_time = asyncio.run(rebuild(ObstacleService(worker_pool=pool), entries, [version]))
+        (previous, snapshot), incremental_time = asyncio.run(
+            rebuild(ObstacleService(worker_pool=pool), entries, ["base", version])
+        )
+        assert snapshot.changed_sidewalk_ids is not None
+        assert snapshot.response.model_dump(exclude={"last_updated"}) == \
+            expected.response.model_dump(exclude={"last_updated"})
+
+        full_tiles, _ = pregenerate_tiles(previous, snapshot, carry_over=False)
+        copy_tiles, (total, rendered) = pregenerate_tiles(previous, snapshot, carry_over=True)
+        diff = diff_labels(entries["base"].payload, entries[version].payload)
+        print(f"{fraction:>7.1%} {diff.changed:>7} {len(snapshot.changed_sidewalk_ids):>8} {full_time:>11.2f} "
+              f"{incremental_time:>14.2f} {total:>8} {total - rendered:>9} {full_tiles:>11.2f} {copy_tiles:>8.2f}")
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
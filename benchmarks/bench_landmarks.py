@@ -0,0 +1,64 @@
+"""
+Consultas A* con y sin preprocesamiento ALT (landmarks).
+
+Uso: python -m benchmarks.bench_landmarks
+"""
+import os
+import random
+import tempfile
+import time
+
+from app.services.landmarks import LandmarkIndex
+from app.services.routing_graph import SidewalkGraph
+from benchmarks.synthetic import BLOCK_DEGREES, grid_city
+
+QUERIES = 50
+PRIORITY = 1.0
+
+
+def run(graph, queries, costs, index=None):
+    latencies, settled, total_cost = [], 0, 0.0
+    for a, b in queries:
+        started = time.perf_counter()
+        heuristic = index.heuristic(graph, b, costs, PRIORITY) if index else None
+        path = graph.shortest_path(a, b, costs, heuristic)
+        latencies.append((time.perf_counter() - started) * 1000)
+        settled += path.settled
+        total_cost += path.cost
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], settled // len(queries), total_cost
+
+
+def main():
+    print(f"{'cuadras':>8} {'nodos':>8} {'prep_s':>7} {'load_ms':>8} | {'A* p50':>8} {'p99':>8} {'settled':>8} | "
+          f"{'ALT p50':>8} {'p99':>8} {'settled':>8}")
+    for blocks in (20, 40, 80):
+        graph = SidewalkGraph.from_streets(grid_city(blocks))
+        started = time.perf_counter()
+        index = LandmarkIndex.build(graph)
+        prep = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "city.landmarks.npz")
+            index.save(path)
+            started = time.perf_counter()
+            index = LandmarkIndex.load(path, graph)
+            load = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(1)
+        span = blocks * BLOCK_DEGREES
+        queries = [
+            (graph.snap(-33.45 + rng.random() * span, -70.65 + rng.random() * span),
+             graph.snap(-33.45 + rng.random() * span, -70.65 + rng.random() * span))
+            for _ in range(QUERIES)
+        ]
+        costs = graph.edge_costs(PRIORITY)
+        plain = run(graph, queries, costs)
+        alt = run(graph, queries, costs, index)
+        assert abs(plain[3] - alt[3]) <= 1e-6 * plain[3], "ALT debe dar el mismo costo óptimo"
+        print(f"{blocks:>8} {graph.node_count:>8} {prep:>7.2f} {load:>8.1f} | {plain[0]:>8.2f} {plain[1]:>8.2f} "
+              f"{plain[2]:>8} | {alt[0]:>8.2f} {alt[1]:>8.2f} {alt[2]:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Construcción de /obstacles fuera del event loop: asociación de obstáculos a
+geometrías de veredas explícitas en el pool de procesos según la cantidad de
+procesos (las celdas de la cuadrícula por defecto hacen de veredas), y latencia
+del event loop mientras se arma la respuesta, con la cuadrícula por defecto (el
+recálculo del snapshot) y con las geometrías explícitas.
+
+La latencia se mide con una tarea que duerme TICK_SECONDS en bucle, como haría
+un /health: el retraso sobre lo pedido es lo que esperaría una petición
+que llega durante el recálculo.
+
+Uso: python -m benchmarks.bench_obstacle_offload [labels]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.services.obstacle_association import associate_points
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder
+from app.services.sidewalk_grid import SidewalkGrid
+from app.services.spatial_index import CoordinateColumn
+from app.services.worker_pool import WorkerPool
+from benchmarks.synthetic import iter_label_features
+
+SPAN_DEGREES = 0.15
+TICK_SECONDS = 0.005
+MAX_DISTANCE_METERS = 50.0
+
+
+async def measure_loop(build):
+    """Duración de `build()` y retrasos (s) de una tarea periódica que corre en paralelo"""
+    delays = []
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            delays.append(time.perf_counter() - start - TICK_SECONDS)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await build()
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    return elapsed, np.array(delays)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cpus = os.cpu_count() or 1
+    service = ObstacleService(worker_pool=WorkerPool(1))
+    builder = ObstacleStoreBuilder(service._classify_label)
+    for feature in iter_label_features(count, span=SPAN_DEGREES):
+        builder.append(feature)
+    store = builder.build()
+    geometries = list(SidewalkGrid.covering(store.lat, store.lng).iter_cells())
+    candidates = np.flatnonzero(store.affects_accessibility)
+    lats, lngs = store.lat[candidates], store.lng[candidates]
+    lines = CoordinateColumn.from_lists([sw["geometry"].coordinates for sw in geometries])
+
+    start = time.perf_counter()
+    expected = associate_points(lats, lngs, lines, MAX_DISTANCE_METERS)
+    serial = time.perf_counter() - start
+    print(f"{count} labels, {len(geometries)} veredas, {cpus} CPU")
+    print(f"{'procesos':>9} {'asociación ms':>14} {'aceleración':>12}")
+    print(f"{'en línea':>9} {serial * 1000:>14.0f} {1.0:>12.2f}")
+    for workers in sorted({1, *(w for w in (2, 4, 8) if w <= cpus)}):
+        service.worker_pool.shutdown()
+        service.worker_pool = WorkerPool(workers)
+        # Primera llamada para crear los procesos fuera de la medición
+        asyncio.run(service._associate_points_async(lats, lngs, lines, MAX_DISTANCE_METERS))
+        start = time.perf_counter()
+        assignment = asyncio.run(service._associate_points_async(lats, lngs, lines, MAX_DISTANCE_METERS))
+        elapsed = time.perf_counter() - start
+        assert np.array_equal(assignment, expected)
+        print(f"{workers:>9} {elapsed * 1000:>14.0f} {serial / elapsed:>12.2f}")
+
+    async def default_grid():
+        feed = await service._score_feed_async(store)
+        await service._build_response_async("bench", feed, "v")
+
+    async def explicit_geometries():
+        await service._build_obstacles_response_async("bench", store, geometries, "v")
+
+    print()
+    print(f"{'recálculo':>11} {'total s':>8} {'ticks':>6} {'retraso p50 ms':>15} "
+          f"{'p99 ms':>7} {'máx ms':>7}")
+    for name, build in (("cuadrícula", default_grid), ("geometrías", explicit_geometries)):
+        elapsed, delays = asyncio.run(measure_loop(build))
+        print(f"{name:>11} {elapsed:>8.2f} {len(delays):>6} {np.percentile(delays, 50) * 1000:>15.1f} "
+              f"{np.percentile(delays, 99) * 1000:>7.1f} {delays.max() * 1000:>7.1f}")
+    service.worker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
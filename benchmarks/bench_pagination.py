@@ -0,0 +1,59 @@
+"""
+Veredas de una ciudad grande: lista completa serializada (como antes, sin límite)
+vs páginas de `limit` elementos en orden de Hilbert, siguiendo el cursor.
+
+Usa la ciudad sintética de benchmarks/bench_city_load.py.
+
+Uso: python -m benchmarks.bench_pagination [cuadras]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.models import SidewalkSegment
+from app.services.geo_service import GeoService
+from benchmarks.bench_city_load import BLOCK_DEGREES, write_city
+
+LIMIT = 100
+ORIGIN_LAT, ORIGIN_LNG = -33.45, -70.65
+PAGES = 50
+
+sidewalks_json = TypeAdapter(List[SidewalkSegment])
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "bench"))
+        write_city(os.path.join(directory, "bench"), blocks, ORIGIN_LAT, ORIGIN_LNG)
+        service = GeoService(directory)
+
+    start = time.perf_counter()
+    body = sidewalks_json.dump_json(service.get_sidewalk_segments("bench"))
+    full = time.perf_counter() - start
+    print(f"{len(service.cities['bench'].sidewalk_entries)} veredas")
+    print(f"lista completa:        {full * 1000:>8.1f} ms  {len(body) / 1e6:>6.1f} MB")
+
+    # Cuarto suroeste de la ciudad
+    span = blocks * BLOCK_DEGREES / 2
+    bbox = [ORIGIN_LNG, ORIGIN_LAT, ORIGIN_LNG + span, ORIGIN_LAT + span]
+    for label, kwargs in (("página", {}), ("página en bbox", {"bbox": bbox})):
+        cursor, times, size = None, [], 0
+        for _ in range(PAGES):
+            start = time.perf_counter()
+            items, cursor = service.get_sidewalk_page("bench", limit=LIMIT, cursor=cursor, **kwargs)
+            size = max(size, len(sidewalks_json.dump_json(items)))
+            times.append(time.perf_counter() - start)
+            if cursor is None:
+                break
+        times.sort()
+        print(f"{label + f' ({LIMIT})':<22} {times[len(times) // 2] * 1000:>8.1f} ms  {size / 1e6:>6.3f} MB"
+              f"  (mediana de {len(times)} páginas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Asociación de obstáculos en serie vs particionada por teselas con halo
+(app/services/obstacle_association.py) según procesos y lado de tesela, por el
+camino de las geometrías de veredas explícitas (`_associate_points_async`). Las
+celdas de la cuadrícula por defecto hacen de veredas.
+
+Cada configuración se verifica contra la asignación en serie (1 proceso). La columna
+"partición ms" es el trabajo del padre (teselas, halo y veredas de cada parte).
+
+Uso: python -m benchmarks.bench_partitioned_association [labels] [procesos máx.]
+"""
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.services.obstacle_association import associate_points, partition
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder
+from app.services.sidewalk_grid import SidewalkGrid
+from app.services.spatial_index import CoordinateColumn
+from app.services.worker_pool import WorkerPool
+from benchmarks.synthetic import iter_label_features
+
+SPAN_DEGREES = 0.15
+TILE_SIZES = (0.005, 0.01, 0.03)
+MAX_DISTANCE_METERS = 50.0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(os.cpu_count() or 1, 2)
+    service = ObstacleService()
+    builder = ObstacleStoreBuilder(service._classify_label)
+    for feature in iter_label_features(count, span=SPAN_DEGREES):
+        builder.append(feature)
+    store = builder.build()
+    geometries = list(SidewalkGrid.covering(store.lat, store.lng).iter_cells())
+    candidates = np.flatnonzero(store.affects_accessibility)
+    lats, lngs = store.lat[candidates], store.lng[candidates]
+    lines = CoordinateColumn.from_lists([sw["geometry"].coordinates for sw in geometries])
+
+    start = time.perf_counter()
+    expected = associate_points(lats, lngs, lines, MAX_DISTANCE_METERS)
+    serial = time.perf_counter() - start
+    print(f"{count} labels ({len(candidates)} asociables), {len(geometries)} veredas, {os.cpu_count()} CPU")
+    print(f"{'procesos':>9} {'tesela °':>9} {'partes':>7} {'partición ms':>13} {'total ms':>9} {'aceleración':>12}")
+    print(f"{1:>9} {'serie':>9} {1:>7} {0:>13} {serial * 1000:>9.0f} {1.0:>12.2f}")
+
+    for workers in sorted({w for w in (2, 4, 8, max_workers) if w <= max_workers}):
+        service.worker_pool.shutdown()
+        service.worker_pool = WorkerPool(workers)
+        for tile_degrees in TILE_SIZES:
+            start = time.perf_counter()
+            parts = partition(lats, lngs, lines, MAX_DISTANCE_METERS,
+                              workers * service.PARTS_PER_WORKER, tile_degrees)
+            partition_time = time.perf_counter() - start
+
+            def associate():
+                return asyncio.run(service._associate_points_async(
+                    lats, lngs, lines, MAX_DISTANCE_METERS, workers, tile_degrees
+                ))
+
+            # Primera llamada para crear los procesos fuera de la medición
+            associate()
+            start = time.perf_counter()
+            assignment = associate()
+            elapsed = time.perf_counter() - start
+            assert np.array_equal(assignment, expected)
+            print(f"{workers:>9} {tile_degrees:>9} {len(parts):>7} {partition_time * 1000:>13.0f} "
+                  f"{elapsed * 1000:>9.0f} {serial / elapsed:>12.2f}")
+    service.worker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Latencia de rutas A* según el tamaño del grafo.
+
+Uso: python -m benchmarks.bench_routing
+"""
+import random
+import time
+
+from app.services.routing_graph import SidewalkGraph
+from benchmarks.synthetic import BLOCK_DEGREES, grid_city
+
+QUERIES = 50
+
+
+def main():
+    print(f"{'cuadras':>8} {'nodos':>8} {'aristas':>8} {'build_s':>8} {'p50_ms':>8} {'p99_ms':>8} {'settled':>8}")
+    for blocks in (10, 20, 40, 80):
+        streets = grid_city(blocks)
+        started = time.perf_counter()
+        graph = SidewalkGraph.from_streets(streets)
+        build = time.perf_counter() - started
+
+        rng = random.Random(1)
+        span = blocks * BLOCK_DEGREES
+        costs = graph.edge_costs(1.0)
+        latencies, settled = [], []
+        for _ in range(QUERIES):
+            a = graph.snap(-33.45 + rng.random() * span, -70.65 + rng.random() * span)
+            b = graph.snap(-33.45 + rng.random() * span, -70.65 + rng.random() * span)
+            started = time.perf_counter()
+            path = graph.shortest_path(a, b, costs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            settled.append(path.settled if path else 0)
+
+        latencies.sort()
+        print(f"{blocks:>8} {graph.node_count:>8} {graph.edge_count:>8} {build:>8.2f} "
+              f"{latencies[len(latencies) // 2]:>8.2f} {latencies[int(len(latencies) * 0.99)]:>8.2f} "
+              f"{sum(settled) // len(settled):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Scoring de veredas: funciones por vereda (score sumando pesos obstáculo por obstáculo,
+_get_severity_breakdown y centro con sumas) vs scoring por lotes con np.bincount.
+
+Uso: python -m benchmarks.bench_scoring [labels]
+"""
+import sys
+import time
+
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder
+from benchmarks.synthetic import iter_label_features
+
+SPAN_DEGREES = 0.15  # cuadrícula por defecto de ~150 x 150 celdas
+
+
+def accessibility_score(service, obstacles):
+    """Score 0-100 de una vereda: cada obstáculo resta hasta 10 puntos según su severidad"""
+    if not obstacles:
+        return 100.0
+    total_penalty = 0.0
+    for obs in obstacles:
+        total_penalty += service.SEVERITY_WEIGHTS.get(obs.severity_value or 3, 0.6) * 10
+    return round(max(0.0, 100.0 - total_penalty), 2)
+
+
+def per_sidewalk(service, geometries, sidewalk_obstacles):
+    results = []
+    for sidewalk in geometries:
+        obs_list = sidewalk_obstacles.get(sidewalk["id"], [])
+        coords = sidewalk["geometry"].coordinates
+        results.append((
+            accessibility_score(service, obs_list),
+            service._get_severity_breakdown(obs_list),
+            len(obs_list),
+            sum(c[1] for c in coords) / len(coords),
+            sum(c[0] for c in coords) / len(coords)
+        ))
+    return results
+
+
+def batch(service, store, geometries, assignment):
+    scores = service._score_sidewalks(store, geometries, assignment)
+    results = []
+    for position in range(len(geometries)):
+        group = scores.groups[position]
+        results.append((
+            scores.scores[group],
+            scores.severity_breakdown(group),
+            scores.obstacle_counts[group],
+            scores.center_lats[position],
+            scores.center_lngs[position]
+        ))
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    service = ObstacleService()
+    builder = ObstacleStoreBuilder(service._classify_label)
+    for feature in iter_label_features(count, span=SPAN_DEGREES):
+        builder.append(feature)
+    store = builder.build()
+    # Veredas y asignación del recálculo del snapshot: cuadrícula por defecto, cada obstáculo a su celda
+    grid = service._default_grid(store)
+    geometries = list(grid.iter_cells())
+    assignment = service._bucket_obstacles(store, grid)
+
+    # Los modelos por vereda se arman fuera de la medición (ambos caminos los necesitan)
+    sidewalk_obstacles = {sw["id"]: [] for sw in geometries}
+    for obstacle, position in zip(store.obstacles(range(len(store))), assignment.tolist()):
+        if position >= 0:
+            sidewalk_obstacles[geometries[position]["id"]].append(obstacle)
+
+    start = time.perf_counter()
+    expected = per_sidewalk(service, geometries, sidewalk_obstacles)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    service._score_sidewalks(store, geometries, assignment)
+    reduce_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = batch(service, store, geometries, assignment)
+    batch_time = time.perf_counter() - start
+
+    assert results == expected, "el scoring por lotes no coincide con el de referencia"
+    print(f"{len(geometries)} veredas, {int((assignment >= 0).sum())} obstáculos asociados")
+    print(f"por vereda: {loop_time * 1000:8.1f} ms")
+    print(f"por lotes:  {batch_time * 1000:8.1f} ms  ({loop_time / batch_time:.1f}x, "
+          f"{reduce_time * 1000:.1f} ms en las reducciones)")
+
+
+if __name__ == "__main__":
+    main()
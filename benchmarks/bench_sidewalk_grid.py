@@ -0,0 +1,96 @@
+"""
+Cuadrícula de veredas por defecto: la anterior, anclada al bbox de los obstáculos
+(celdas acumulando flotantes y asociación por búsqueda de la vereda más cercana),
+vs la cuadrícula global fija de app/services/sidewalk_grid.py (cada obstáculo va
+directo a su celda), y los niveles más gruesos.
+
+La columna "ids estables" es la fracción de ids de celda que conservan su
+geometría al agregar un solo label fuera de la extensión del feed.
+
+Uso: python -m benchmarks.bench_sidewalk_grid [labels]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.models import GeoJSONLineString
+from app.services.obstacle_association import associate_points
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder
+from app.services.sidewalk_grid import GRID_LEVELS, SidewalkGrid
+from app.services.spatial_index import CoordinateColumn
+from benchmarks.synthetic import iter_label_features
+
+SPAN_DEGREES = 0.15
+CELL_SIZE = 0.001
+# Label agregado al sur y al oeste de todos los demás
+OUTLIER = {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-70.7, -33.5]},
+           "properties": {"label_id": -1, "label_type_id": 3, "severity": 4}}
+
+
+def legacy_grid(lats, lngs):
+    """Celdas como las generaba la versión anterior: desde el mínimo, sumando CELL_SIZE"""
+    min_lat, max_lat, min_lng, max_lng = lats.min(), lats.max(), lngs.min(), lngs.max()
+    cells = []
+    lat = min_lat
+    while lat < max_lat:
+        lng = min_lng
+        while lng < max_lng:
+            coords = [[lng, lat], [lng + CELL_SIZE, lat], [lng + CELL_SIZE, lat + CELL_SIZE],
+                      [lng, lat + CELL_SIZE], [lng, lat]]
+            cells.append((f"sidewalk_{len(cells)}", GeoJSONLineString(type="LineString", coordinates=coords)))
+            lng += CELL_SIZE
+        lat += CELL_SIZE
+    return [(cell_id, geometry.coordinates) for cell_id, geometry in cells]
+
+
+def stable_fraction(before, after):
+    geometries = dict(after)
+    return sum(1 for cell_id, coords in before if geometries.get(cell_id) == coords) / len(before)
+
+
+def build_store(service, features):
+    builder = ObstacleStoreBuilder(service._classify_label)
+    for feature in features:
+        builder.append(feature)
+    return builder.build()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    service = ObstacleService()
+    features = list(iter_label_features(count, span=SPAN_DEGREES))
+    store = build_store(service, features)
+    moved = build_store(service, features + [OUTLIER])
+    candidates = np.flatnonzero(store.affects_accessibility)
+    lats, lngs = store.lat[candidates], store.lng[candidates]
+    print(f"{count} labels ({len(candidates)} asociables)")
+    print(f"{'cuadrícula':>12} {'celdas':>8} {'celdas ms':>10} {'asignación ms':>14} {'ids estables':>13}")
+
+    start = time.perf_counter()
+    cells = legacy_grid(store.lat, store.lng)
+    cells_time = time.perf_counter() - start
+    start = time.perf_counter()
+    associate_points(lats, lngs, CoordinateColumn.from_lists([coords for _, coords in cells]), 50.0)
+    assign_time = time.perf_counter() - start
+    stable = stable_fraction(cells, legacy_grid(moved.lat, moved.lng))
+    print(f"{'anterior':>12} {len(cells):>8} {cells_time * 1000:>10.0f} {assign_time * 1000:>14.0f} {stable:>13.1%}")
+
+    for level in range(GRID_LEVELS):
+        start = time.perf_counter()
+        grid = SidewalkGrid.covering(store.lat, store.lng, level)
+        cells = [(cell["id"], cell["geometry"].coordinates) for cell in grid.iter_cells()]
+        cells_time = time.perf_counter() - start
+        start = time.perf_counter()
+        positions = grid.positions(lats, lngs)
+        assign_time = time.perf_counter() - start
+        assert (positions >= 0).all()
+        moved_grid = SidewalkGrid.covering(moved.lat, moved.lng, level)
+        stable = stable_fraction(cells, [(cell["id"], cell["geometry"].coordinates) for cell in moved_grid.iter_cells()])
+        print(f"{f'fija nivel {level}':>12} {len(cells):>8} {cells_time * 1000:>10.0f} "
+              f"{assign_time * 1000:>14.1f} {stable:>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
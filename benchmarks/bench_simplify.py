@@ -0,0 +1,72 @@
+"""
+Tamaño y tiempo de serialización de /sidewalks según simplify_tolerance y precision,
+sobre veredas densas (un vértice cada ~2 m con ruido de digitalización).
+
+Uso: python -m benchmarks.bench_simplify
+"""
+import random
+import time
+
+from pydantic import TypeAdapter
+
+from app.models import GeoJSONLineString, SidewalkSegment
+from app.services.city_data import SIDEWALK_FIELDS
+from app.services.geo_service import GeoService
+from app.services.simplification import GeometryLevels
+from benchmarks.synthetic import grid_city
+
+BLOCKS = 10
+VERTEX_SPACING_DEGREES = 0.00002  # ~2 m
+NOISE_DEGREES = 0.000003          # ~0.3 m
+REPEAT = 5
+
+
+def densify(coords, rng):
+    """Reemplazar una vereda recta por una con vértices densos y ruido"""
+    dense = []
+    for (lng1, lat1), (lng2, lat2) in zip(coords[:-1], coords[1:]):
+        steps = max(int(max(abs(lng2 - lng1), abs(lat2 - lat1)) / VERTEX_SPACING_DEGREES), 1)
+        for k in range(steps):
+            t = k / steps
+            dense.append([lng1 + (lng2 - lng1) * t + rng.uniform(-NOISE_DEGREES, NOISE_DEGREES),
+                          lat1 + (lat2 - lat1) * t + rng.uniform(-NOISE_DEGREES, NOISE_DEGREES)])
+    dense.append(list(coords[-1]))
+    return dense
+
+
+def main():
+    rng = random.Random(0)
+    streets = []
+    for street in grid_city(BLOCKS):
+        update = {}
+        for field in SIDEWALK_FIELDS:
+            segment = getattr(street, field)
+            if segment:
+                geometry = GeoJSONLineString(coordinates=densify(segment.geometry.coordinates, rng))
+                update[field] = segment.model_copy(update={"geometry": geometry})
+        streets.append(street.model_copy(update=update))
+
+    service = GeoService()
+    data = service.add_city("bench", service.cities["santiago"].polygon, streets)
+    start = time.perf_counter()
+    GeometryLevels([segment.geometry.coordinates for _, segment in data.sidewalk_entries])
+    levels_time = time.perf_counter() - start
+
+    adapter = TypeAdapter(list[SidewalkSegment])
+    vertices = sum(len(s.geometry.coordinates) for _, s in data.sidewalk_entries)
+    print(f"{len(data.sidewalk_entries)} veredas, {vertices} vértices; "
+          f"niveles precalculados en {levels_time * 1000:.0f} ms")
+    print(f"{'tolerancia':>10} {'precisión':>9} {'KiB':>8} {'ms':>8}")
+    for tolerance, precision in ((None, None), (None, 6), (None, 5), (5, 6), (10, 5), (25, 5), (100, 4)):
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            body = adapter.dump_json(service.get_sidewalk_segments(
+                "bench", simplify_tolerance=tolerance, precision=precision
+            ))
+        elapsed = (time.perf_counter() - start) / REPEAT
+        print(f"{str(tolerance or '-'):>10} {str(precision if precision is not None else '-'):>9} "
+              f"{len(body) / 1024:>8.0f} {elapsed * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
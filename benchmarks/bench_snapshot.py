@@ -0,0 +1,75 @@
+"""
+Arranque de un worker: procesar la ciudad desde GeoJSON vs abrir su snapshot
+binario (ver app/services/city_snapshot.py), más la latencia de la primera
+consulta por bbox y de la primera ruta en cada caso.
+
+Usa la misma ciudad sintética que benchmarks/bench_city_load.py.
+
+Uso: python -m benchmarks.bench_snapshot [MB ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app.models import RouteRequest
+from app.services.city_snapshot import save_snapshot, snapshot_path
+from app.services.geo_service import GeoService
+from benchmarks.bench_city_load import BLOCK_DEGREES, BYTES_PER_BLOCK, write_city
+
+ORIGIN_LAT, ORIGIN_LNG = -33.45, -70.65
+
+
+def first_queries(service: GeoService, blocks: int):
+    """Tiempos (s) de la primera consulta por bbox y de la primera ruta"""
+    center_lat = ORIGIN_LAT + blocks * BLOCK_DEGREES / 2
+    center_lng = ORIGIN_LNG + blocks * BLOCK_DEGREES / 2
+    bbox = [center_lng - 0.002, center_lat - 0.002, center_lng + 0.002, center_lat + 0.002]
+    start = time.perf_counter()
+    service.get_sidewalk_segments("bench", bbox=bbox)
+    bbox_time = time.perf_counter() - start
+
+    request = RouteRequest(
+        start={"coordinate": {"lat": center_lat - 0.003, "lng": center_lng - 0.003}},
+        end={"coordinate": {"lat": center_lat + 0.003, "lng": center_lng + 0.003}}
+    )
+    start = time.perf_counter()
+    service.calculate_optimal_route("bench", request)
+    return bbox_time, time.perf_counter() - start
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [4.0, 16.0]
+    print(f"{'MB':>5} {'fuente':>9} {'arranque ms':>12} {'bbox ms':>8} {'ruta ms':>8} {'archivo MB':>11}")
+    for size in sizes:
+        blocks = max(int((size * 1e6 / BYTES_PER_BLOCK) ** 0.5), 2)
+        with tempfile.TemporaryDirectory() as directory:
+            data_dir = os.path.join(directory, "data")
+            snapshot_dir = os.path.join(directory, "snapshots")
+            os.makedirs(os.path.join(data_dir, "bench"))
+            os.makedirs(snapshot_dir)
+            write_city(os.path.join(data_dir, "bench"), blocks, ORIGIN_LAT, ORIGIN_LNG)
+            source_mb = sum(entry.stat().st_size for entry in os.scandir(os.path.join(data_dir, "bench"))) / 1e6
+
+            start = time.perf_counter()
+            service = GeoService(data_dir)
+            startup = time.perf_counter() - start
+            bbox_time, route_time = first_queries(service, blocks)
+            print(f"{source_mb:>5.0f} {'geojson':>9} {startup * 1000:>12.0f} {bbox_time * 1000:>8.1f} "
+                  f"{route_time * 1000:>8.1f} {source_mb:>11.1f}")
+
+            path = snapshot_path(snapshot_dir, "bench")
+            save_snapshot(service.cities["bench"], path)
+            del service
+
+            start = time.perf_counter()
+            service = GeoService(snapshot_dir=snapshot_dir)
+            startup = time.perf_counter() - start
+            bbox_time, route_time = first_queries(service, blocks)
+            print(f"{source_mb:>5.0f} {'snapshot':>9} {startup * 1000:>12.0f} {bbox_time * 1000:>8.1f} "
+                  f"{route_time * 1000:>8.1f} {os.path.getsize(path) / 1e6:>11.1f}")
+            del service
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Veredas de una calle por id y filtro de veredas por nombre de calle: recorrido
+lineal de la red (como antes) vs diccionario por id e índice de trigramas.
+
+Usa la ciudad sintética de benchmarks/bench_city_load.py (una calle por cuadra,
+así que cada nombre se repite en muchas calles).
+
+Uso: python -m benchmarks.bench_street_lookup
+"""
+import os
+import random
+import tempfile
+import time
+
+from app.services.geo_service import GeoService
+from benchmarks.bench_city_load import write_city
+
+QUERIES = 200
+
+
+def linear_street_sidewalks(streets, street_id):
+    """Búsqueda anterior: recorrer las calles hasta encontrar el id"""
+    street = next((s for s in streets if s.id == street_id), None)
+    return [s for s in (street.sidewalk_west, street.sidewalk_east,
+                        street.sidewalk_north, street.sidewalk_south) if s]
+
+
+def linear_named(streets, street_name):
+    """Filtro anterior: pasar a minúsculas el nombre de cada calle en cada consulta"""
+    return [
+        segment
+        for street in streets if street_name.lower() in street.name.lower()
+        for segment in (street.sidewalk_west, street.sidewalk_east,
+                        street.sidewalk_north, street.sidewalk_south) if segment
+    ]
+
+
+def timed(fn, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        fn(argument)
+    return (time.perf_counter() - start) / len(arguments) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'calles':>8} {'id lineal ms':>13} {'id dict ms':>11} {'nombre lineal ms':>17} {'nombre índice ms':>17}")
+    for blocks in (15, 40, 80):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "bench"))
+            write_city(os.path.join(directory, "bench"), blocks)
+            service = GeoService(directory)
+        streets = service.cities["bench"].streets
+        ids = [rng.choice(streets).id for _ in range(QUERIES)]
+        # Nombre completo de una calle en otra grafía ("calle NORTE_SUR 12"): calza con sus cuadras
+        names = [rng.choice(streets).name.upper().replace("CALLE", "calle") for _ in range(QUERIES)]
+
+        print(f"{len(streets):>8} "
+              f"{timed(lambda street_id: linear_street_sidewalks(streets, street_id), ids):>13.3f} "
+              f"{timed(lambda street_id: service.get_street_sidewalk_segments('bench', street_id), ids):>11.3f} "
+              f"{timed(lambda name: linear_named(streets, name), names):>17.3f} "
+              f"{timed(lambda name: service.get_sidewalk_segments('bench', street_name=name), names):>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Preprocesamiento offline de datos para la API
+
+Uso:
+    python precompute.py landmarks <directorio>   # Landmarks ALT para rutas
+    python precompute.py snapshot <directorio>    # Snapshots binarios de las ciudades
+"""
+
+import os
+import sys
+
+from app.services.city_snapshot import save_snapshot, snapshot_path
+from app.services.geo_service import GeoService
+from app.services.landmarks import LandmarkIndex, landmarks_path
+
+
+def build_landmarks(output_dir: str):
+    """Calcular y guardar los landmarks de todas las ciudades"""
+    os.makedirs(output_dir, exist_ok=True)
+    service = GeoService()
+    for city, data in service.cities.items():
+        path = landmarks_path(output_dir, city)
+        LandmarkIndex.build(data.graph).save(path)
+        print(f"{city}: {data.graph.node_count} nodos -> {path}")
+
+
+def build_snapshots(output_dir: str):
+    """Guardar el snapshot de todas las ciudades (DEEPCITY_DATA_DIR o datos mock)"""
+    os.makedirs(output_dir, exist_ok=True)
+    service = GeoService()
+    for city, data in service.cities.items():
+        path = snapshot_path(output_dir, city)
+        save_snapshot(data, path)
+        print(f"{city}: {len(data.streets)} calles, {len(data.sidewalk_entries)} veredas -> {path}")
+
+
+if __name__ == "__main__":
+    commands = {"landmarks": build_landmarks, "snapshot": build_snapshots}
+    if len(sys.argv) < 3 or sys.argv[1] not in commands:
+        print(__doc__)
+        sys.exit(1)
+
+    commands[sys.argv[1]](sys.argv[2])
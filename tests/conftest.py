@@ -0,0 +1,37 @@
+"""Fixtures comunes: feeds sintéticos en ObstacleStore y un ObstacleService sin red"""
+import asyncio
+
+import pytest
+
+from app.services.feed_cache import FeedEntry
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import ObstacleStoreBuilder
+from app.services.worker_pool import WorkerPool
+
+
+@pytest.fixture
+def service():
+    service = ObstacleService(worker_pool=WorkerPool(1))
+    yield service
+    service.worker_pool.shutdown()
+
+
+@pytest.fixture
+def build_store(service):
+    def build(features):
+        builder = ObstacleStoreBuilder(service._classify_label)
+        for feature in features:
+            builder.append(feature)
+        return builder.build()
+    return build
+
+
+@pytest.fixture
+def publish():
+    """publish(service, store, version): snapshot publicado al recibir esa versión del feed"""
+    def run(service, store, version):
+        async def fetch(city):
+            return FeedEntry(store, version)
+        service.fetch_feed = fetch
+        return asyncio.run(service._rebuild_snapshot("test"))
+    return run
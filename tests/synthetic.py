@@ -0,0 +1,111 @@
+"""
+Datos sintéticos de los tests: features de labelClusters y ciudades en cuadrícula.
+
+Son independientes de benchmarks/synthetic.py (mismo formato) para que los tests
+no dependan del código de los benchmarks.
+"""
+import random
+from typing import Any, Dict, Iterator, List
+
+from app.models import (
+    Coordinate, GeoJSONLineString, Obstacle, ObstacleType, SeverityLevel,
+    SidewalkSegment, StreetAxis
+)
+
+# Separación entre calles (~110 m) y desplazamiento de las veredas respecto al eje
+BLOCK_DEGREES = 0.001
+SIDEWALK_OFFSET = 0.00005
+
+
+def label(label_id, lat, lng, label_type_id=3, severity=4, **properties) -> Dict[str, Any]:
+    """Feature de labelClusters con las propiedades dadas"""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lng, lat]},
+        "properties": {"label_id": label_id, "label_type_id": label_type_id, "severity": severity, **properties}
+    }
+
+
+def iter_label_features(count: int, min_lat: float = -33.46, min_lng: float = -70.66,
+                        span: float = 0.05, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """Features aleatorias con el formato de labelClusters, generadas de a una"""
+    rng = random.Random(seed)
+    for label_id in range(count):
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [min_lng + rng.random() * span, min_lat + rng.random() * span]
+            },
+            "properties": {
+                "label_id": label_id,
+                "label_type_id": rng.choice([1, 2, 3, 4, 5, 6, 7, 9, 10]),
+                "severity": rng.choice([None, 1, 2, 3, 4, 5]),
+                "gsv_panorama_id": f"pano_{rng.randint(0, count // 4 + 1)}",
+                "agree_count": rng.randint(0, 5),
+                "disagree_count": rng.randint(0, 2),
+                "notsure_count": rng.randint(0, 1)
+            }
+        }
+
+
+def synthetic_features(count: int, span: float = 0.02, seed: int = 0) -> List[Dict[str, Any]]:
+    """Features sintéticas (cada llamada entrega copias nuevas, se pueden modificar)"""
+    return list(iter_label_features(count, span=span, seed=seed))
+
+
+def grid_city(blocks: int, origin_lat: float = -33.45, origin_lng: float = -70.65,
+              seed: int = 0) -> List[StreetAxis]:
+    """Ciudad en cuadrícula de `blocks` x `blocks` manzanas, con veredas a ambos lados"""
+    rng = random.Random(seed)
+    span = blocks * BLOCK_DEGREES
+    streets = []
+    severities = list(SeverityLevel)
+    for i in range(blocks + 1):
+        for orientation in ("norte_sur", "este_oeste"):
+            offset = i * BLOCK_DEGREES
+            if orientation == "norte_sur":
+                axis = [[origin_lng + offset, origin_lat], [origin_lng + offset, origin_lat + span]]
+                sides = {"sidewalk_west": -SIDEWALK_OFFSET, "sidewalk_east": SIDEWALK_OFFSET}
+            else:
+                axis = [[origin_lng, origin_lat + offset], [origin_lng + span, origin_lat + offset]]
+                sides = {"sidewalk_south": -SIDEWALK_OFFSET, "sidewalk_north": SIDEWALK_OFFSET}
+
+            street_id = f"{orientation}_{i}"
+            sidewalks = {}
+            for field, shift in sides.items():
+                coords = []
+                for k in range(blocks + 1):
+                    if orientation == "norte_sur":
+                        coords.append([axis[0][0] + shift, origin_lat + k * BLOCK_DEGREES])
+                    else:
+                        coords.append([origin_lng + k * BLOCK_DEGREES, axis[0][1] + shift])
+                obstacles = [
+                    Obstacle(
+                        id=f"obs_{street_id}_{field}_{n}",
+                        position=Coordinate(lat=coords[0][1], lng=coords[0][0]),
+                        obstacle_type=rng.choice([ObstacleType.POLE, ObstacleType.TREE, ObstacleType.STEP]),
+                        severity=rng.choice(severities)
+                    )
+                    for n in range(rng.randint(0, 2))
+                ]
+                sidewalks[field] = SidewalkSegment(
+                    id=f"{street_id}_{field}",
+                    street_name=f"Calle {street_id}",
+                    side=field.split("_")[1],
+                    start_intersection="-",
+                    end_intersection="-",
+                    geometry=GeoJSONLineString(coordinates=coords),
+                    length_meters=span * 111000,
+                    accessibility_score=rng.uniform(40, 100),
+                    obstacles=obstacles
+                )
+            streets.append(StreetAxis(
+                id=street_id,
+                name=f"Calle {street_id}",
+                geometry=GeoJSONLineString(coordinates=axis),
+                orientation=orientation,
+                intersections=[],
+                **sidewalks
+            ))
+    return streets
@@ -0,0 +1,115 @@
+"""Asociación en serie y particionada por teselas con halo contra la búsqueda exhaustiva"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.geodesy import PolylineSet
+from app.services.obstacle_association import associate_part, associate_points, partition
+from app.services.obstacle_service import ObstacleService
+from app.services.spatial_index import CoordinateColumn
+from app.services.worker_pool import WorkerPool
+
+MAX_DISTANCE = 50.0
+MIN_LAT, MIN_LNG, SPAN = -33.46, -70.66, 0.01
+
+
+def brute_force(lats, lngs, lines, max_distance=MAX_DISTANCE):
+    """Vereda más cercana por punto comparando contra todas (empates: menor posición)"""
+    if not len(lines):
+        return np.full(len(lats), -1)
+    distances = PolylineSet(lines).distance_matrix(lats, lngs)
+    nearest = np.argmin(distances, axis=1)
+    return np.where(distances[np.arange(len(lats)), nearest] <= max_distance, nearest, -1)
+
+
+def random_lines(rng, count, tile_degrees=0.002):
+    """
+    Veredas cortas y largas, muchas cruzando bordes de tesela; algunas duplicadas
+    (misma geometría en otra posición) y algunas sin segmentos
+    """
+    lines = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1 and lines:
+            lines.append(list(lines[int(rng.integers(0, len(lines)))]))
+            continue
+        if roll < 0.15:
+            lines.append([] if roll < 0.12 else [[MIN_LNG + rng.random() * SPAN, MIN_LAT + rng.random() * SPAN]])
+            continue
+        # Centrada en un borde de tesela (o al azar) y de largo variable
+        lat = MIN_LAT + rng.random() * SPAN
+        lng = np.round((MIN_LNG + rng.random() * SPAN) / tile_degrees) * tile_degrees if roll < 0.5 \
+            else MIN_LNG + rng.random() * SPAN
+        length = 0.004 if roll > 0.95 else 0.0005
+        lines.append([[lng - rng.uniform(0, length), lat - rng.uniform(0, length)],
+                      [lng + rng.uniform(0, length), lat + rng.uniform(0, length)],
+                      [lng + rng.uniform(0, length), lat - rng.uniform(0, length)]])
+    return lines
+
+
+def random_points(rng, count, tile_degrees=0.002):
+    """Puntos al azar y pegados a los bordes de tesela (a menos de un halo)"""
+    lats = MIN_LAT + rng.random(count) * SPAN
+    lngs = MIN_LNG + rng.random(count) * SPAN
+    edge = rng.random(count) < 0.5
+    lngs[edge] = np.round(lngs[edge] / tile_degrees) * tile_degrees + rng.uniform(-0.0004, 0.0004, edge.sum())
+    lats[edge[::-1]] = np.round(lats[edge[::-1]] / tile_degrees) * tile_degrees
+    return lats, lngs
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_serial_association_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    lines = random_lines(rng, 200)
+    lats, lngs = random_points(rng, 1500)
+    expected = brute_force(lats, lngs, lines)
+    np.testing.assert_array_equal(associate_points(lats, lngs, lines, MAX_DISTANCE), expected)
+    np.testing.assert_array_equal(
+        associate_points(lats, lngs, CoordinateColumn.from_lists(lines), MAX_DISTANCE), expected
+    )
+
+
+@pytest.mark.parametrize("tile_degrees", [0.001, 0.002, 0.005])
+@pytest.mark.parametrize("parts", [1, 3, 8, 64])
+def test_partitioned_association_matches_brute_force(tile_degrees, parts):
+    rng = np.random.default_rng(int(tile_degrees * 1e4) + parts)
+    lines = CoordinateColumn.from_lists(random_lines(rng, 200, tile_degrees))
+    lats, lngs = random_points(rng, 1500, tile_degrees)
+    expected = brute_force(lats, lngs, [lines[i] for i in range(len(lines))])
+
+    result = np.full(len(lats), -2)
+    for points, sidewalks in partition(lats, lngs, lines, MAX_DISTANCE, parts, tile_degrees):
+        assert (result[points] == -2).all(), "un punto quedó en dos partes"
+        assert np.all(np.diff(sidewalks) > 0)
+        result[points] = associate_part(lats[points], lngs[points], lines.take(sidewalks), sidewalks, MAX_DISTANCE)
+    # Cada punto en exactamente una parte, con la misma vereda que en la búsqueda exhaustiva
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_partition_edge_cases():
+    lines = CoordinateColumn.from_lists([[[MIN_LNG, MIN_LAT], [MIN_LNG + 0.001, MIN_LAT]]])
+    assert partition(np.array([]), np.array([]), lines, MAX_DISTANCE, 4) == []
+
+    # Sin veredas: las partes no llevan ninguna y todo queda sin asociar
+    empty = CoordinateColumn.from_lists([])
+    lats, lngs = np.array([MIN_LAT, MIN_LAT + 0.005]), np.array([MIN_LNG, MIN_LNG + 0.005])
+    for points, sidewalks in partition(lats, lngs, empty, MAX_DISTANCE, 4):
+        assert len(sidewalks) == 0
+        np.testing.assert_array_equal(associate_part(lats[points], lngs[points], empty, sidewalks, MAX_DISTANCE), -1)
+
+
+def test_association_in_worker_pool_matches_serial():
+    rng = np.random.default_rng(7)
+    lines = CoordinateColumn.from_lists(random_lines(rng, 300))
+    lats, lngs = random_points(rng, 3000)
+    expected = associate_points(lats, lngs, lines, MAX_DISTANCE)
+
+    service = ObstacleService(worker_pool=WorkerPool(2))
+    service.PARALLEL_MIN_OBSTACLES = 0
+    try:
+        for tile_degrees in (0.001, 0.005):
+            result = asyncio.run(service._associate_points_async(lats, lngs, lines, MAX_DISTANCE, 2, tile_degrees))
+            np.testing.assert_array_equal(result, expected)
+    finally:
+        service.worker_pool.shutdown()
@@ -0,0 +1,109 @@
+"""Snapshot de ciudad: guardado y abierto con mmap responde igual que la ciudad construida"""
+import random
+
+import pytest
+
+from app.models import Coordinate, MatrixRequest, RouteRequest
+from app.services import city_snapshot
+from app.services.city_snapshot import open_snapshot, save_snapshot
+from app.services.geo_service import GeoService
+from tests.synthetic import BLOCK_DEGREES, grid_city
+
+BLOCKS = 6
+ORIGIN_LAT, ORIGIN_LNG = -33.45, -70.65
+SPAN = BLOCKS * BLOCK_DEGREES
+BBOX = [ORIGIN_LNG + 0.2 * SPAN, ORIGIN_LAT + 0.3 * SPAN, ORIGIN_LNG + 0.6 * SPAN, ORIGIN_LAT + 0.7 * SPAN]
+
+
+@pytest.fixture(scope="module")
+def services(tmp_path_factory):
+    built = GeoService()
+    data = built.add_city("grid", built.cities["santiago"].polygon, grid_city(BLOCKS))
+    path = str(tmp_path_factory.mktemp("snapshots") / "grid.snapshot")
+    save_snapshot(data, path)
+    return built, GeoService.from_cities({"grid": open_snapshot(path)}, {})
+
+
+def dump(items):
+    return [item.model_dump() for item in items]
+
+
+def test_version_and_polygon(services):
+    built, opened = services
+    assert opened.get_data_version("grid") == built.get_data_version("grid")
+    for tolerance, precision in [(None, None), (50, 5)]:
+        assert opened.get_city_polygon("grid", tolerance, precision) == built.get_city_polygon("grid", tolerance, precision)
+
+
+@pytest.mark.parametrize("bbox", [None, BBOX])
+@pytest.mark.parametrize("tolerance,precision", [(None, None), (10, 5)])
+def test_street_pages(services, bbox, tolerance, precision):
+    built, opened = services
+    cursors = {}
+    for name, service in (("built", built), ("opened", opened)):
+        pages, cursor = [], None
+        while True:
+            page, cursor = service.get_street_page("grid", bbox, 4, cursor, tolerance, precision)
+            pages.append(dump(page))
+            if cursor is None:
+                break
+        cursors[name] = pages
+    assert cursors["opened"] == cursors["built"]
+    assert dump(opened.get_street_network("grid", bbox)) == dump(built.get_street_network("grid", bbox))
+
+
+@pytest.mark.parametrize("street_name,min_score,bbox", [
+    (None, 0, None),
+    ("norte_sur", 0, None),
+    (None, 60, BBOX),
+    ("este_oeste_3", 50, BBOX)
+])
+def test_sidewalk_pages(services, street_name, min_score, bbox):
+    built, opened = services
+    kwargs = dict(street_name=street_name, min_accessibility_score=min_score, bbox=bbox, limit=5)
+    expected, cursor = [], None
+    while True:
+        page, next_cursor = built.get_sidewalk_page("grid", cursor=cursor, **kwargs)
+        assert opened.get_sidewalk_page("grid", cursor=cursor, **kwargs) == (page, next_cursor)
+        expected.extend(page)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    assert expected
+    assert dump(opened.get_sidewalk_segments("grid", street_name, min_score, bbox, 10, 5)) == \
+        dump(built.get_sidewalk_segments("grid", street_name, min_score, bbox, 10, 5))
+
+
+def test_street_sidewalks(services):
+    built, opened = services
+    for street_id in ("norte_sur_0", "este_oeste_3", f"norte_sur_{BLOCKS}"):
+        assert dump(opened.get_street_sidewalk_segments("grid", street_id)) == \
+            dump(built.get_street_sidewalk_segments("grid", street_id))
+    with pytest.raises(ValueError):
+        opened.get_street_sidewalk_segments("grid", "no_existe")
+
+
+def test_routes_and_matrix(services):
+    built, opened = services
+    rng = random.Random(0)
+    points = [Coordinate(lat=ORIGIN_LAT + rng.random() * SPAN, lng=ORIGIN_LNG + rng.random() * SPAN) for _ in range(8)]
+    for start, end in zip(points[::2], points[1::2]):
+        for priority in (0.0, 1.0):
+            request = RouteRequest(start={"coordinate": start}, end={"coordinate": end}, accessibility_priority=priority)
+            assert opened.calculate_optimal_route("grid", request).model_dump(exclude={"route_id"}) == \
+                built.calculate_optimal_route("grid", request).model_dump(exclude={"route_id"})
+    matrix = MatrixRequest(origins=points[:4], destinations=points[4:])
+    assert opened.calculate_matrix("grid", matrix, workers=1) == built.calculate_matrix("grid", matrix, workers=1)
+
+
+def test_rejects_other_files(services, tmp_path, monkeypatch):
+    built, _ = services
+    other = tmp_path / "otro.snapshot"
+    other.write_bytes(b"no es un snapshot" * 10)
+    assert open_snapshot(str(other)) is None
+
+    path = str(tmp_path / "viejo.snapshot")
+    monkeypatch.setattr(city_snapshot, "FORMAT_VERSION", city_snapshot.FORMAT_VERSION - 1)
+    save_snapshot(built.cities["grid"], path)
+    monkeypatch.undo()
+    assert open_snapshot(path) is None
@@ -0,0 +1,295 @@
+"""
+FeedCache: expiración, revalidación condicional y single-flight contra un upstream
+simulado; y los snapshots de ObstacleService sobre esa caché (stale-while-revalidate)
+"""
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+from app.services.feed_cache import FeedCache
+from app.services.obstacle_service import ObstacleService
+from app.services.worker_pool import WorkerPool
+from tests.synthetic import synthetic_features
+
+URL = "https://feed.test/labelClusters"
+ETAG = '"v1"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 00:00:00 GMT"
+
+
+class Upstream:
+    """Feed remoto simulado: cuenta las peticiones y guarda sus encabezados"""
+
+    def __init__(self, features=1, etag=ETAG, last_modified=LAST_MODIFIED, delay=0.0):
+        self.features = features
+        self.etag = etag
+        self.last_modified = last_modified
+        self.delay = delay
+        self.requests = []
+        # Si hay compuerta, las respuestas esperan a que se abra; `status` simula una caída
+        self.gate = None
+        self.status = 200
+
+    def payload(self):
+        return [{"id": i} for i in range(self.features)]
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.status != 200:
+            return httpx.Response(self.status)
+        if self.etag and request.headers.get("if-none-match") == self.etag:
+            return httpx.Response(304)
+        body = json.dumps({"type": "FeatureCollection", "features": self.payload()})
+        headers = {}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return httpx.Response(200, content=body.encode(), headers=headers)
+
+
+def make_cache(upstream, ttl_seconds=300.0):
+    return FeedCache(ttl_seconds=ttl_seconds, transport=httpx.MockTransport(upstream))
+
+
+def expire(cache, key="city"):
+    cache.peek(key).fetched_at -= cache.ttl_seconds + 1
+
+
+def test_fresh_entry_is_served_without_upstream_call():
+    async def scenario():
+        upstream = Upstream()
+        cache = make_cache(upstream)
+        first = await cache.get("city", URL)
+        second = await cache.get("city", URL)
+        await cache.aclose()
+        return upstream, first, second
+
+    upstream, first, second = asyncio.run(scenario())
+    assert len(upstream.requests) == 1
+    assert second is first
+    assert first.payload == [{"id": 0}]
+    assert first.etag == ETAG and first.last_modified == LAST_MODIFIED
+    # La primera descarga no lleva validadores
+    assert "if-none-match" not in upstream.requests[0].headers
+    assert "if-modified-since" not in upstream.requests[0].headers
+
+
+def test_expired_entry_is_revalidated_and_304_keeps_payload():
+    async def scenario():
+        upstream = Upstream()
+        cache = make_cache(upstream)
+        first = await cache.get("city", URL)
+        expire(cache)
+        second = await cache.get("city", URL)
+        await cache.aclose()
+        return upstream, first, second
+
+    upstream, first, second = asyncio.run(scenario())
+    assert len(upstream.requests) == 2
+    revalidation = upstream.requests[1].headers
+    assert revalidation["if-none-match"] == ETAG
+    assert revalidation["if-modified-since"] == LAST_MODIFIED
+    # 304: misma entrada (mismo payload y versión), renovada
+    assert second is first
+    assert second.age() < 1
+
+
+def test_expired_entry_with_changed_feed_is_replaced():
+    async def scenario():
+        upstream = Upstream(features=1)
+        cache = make_cache(upstream)
+        first = await cache.get("city", URL)
+        upstream.etag, upstream.features = '"v2"', 3
+        expire(cache)
+        second = await cache.get("city", URL)
+        await cache.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second is not first
+    assert len(second.payload) == 3
+    assert second.version != first.version
+    assert second.etag == '"v2"'
+
+
+def test_only_last_modified_is_sent_when_there_is_no_etag():
+    async def scenario():
+        upstream = Upstream(etag=None)
+        cache = make_cache(upstream)
+        await cache.get("city", URL)
+        expire(cache)
+        await cache.get("city", URL)
+        await cache.aclose()
+        return upstream
+
+    upstream = asyncio.run(scenario())
+    headers = upstream.requests[1].headers
+    assert "if-none-match" not in headers
+    assert headers["if-modified-since"] == LAST_MODIFIED
+
+
+def test_concurrent_misses_share_one_download():
+    async def scenario():
+        upstream = Upstream(delay=0.05)
+        cache = make_cache(upstream)
+        entries = await asyncio.gather(*(cache.get("city", URL) for _ in range(10)))
+        other = await cache.get("other", URL)
+        await cache.aclose()
+        return upstream, entries, other
+
+    upstream, entries, other = asyncio.run(scenario())
+    # Una descarga para las 10 peticiones concurrentes y otra para la otra clave
+    assert len(upstream.requests) == 2
+    assert all(entry is entries[0] for entry in entries)
+    assert other is not entries[0]
+
+
+def test_concurrent_revalidations_share_one_request():
+    async def scenario():
+        upstream = Upstream(delay=0.05)
+        cache = make_cache(upstream)
+        await cache.get("city", URL)
+        expire(cache)
+        await asyncio.gather(*(cache.get("city", URL) for _ in range(5)))
+        await cache.aclose()
+        return upstream
+
+    assert len(asyncio.run(scenario()).requests) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_download():
+    async def scenario():
+        upstream = Upstream(delay=0.05)
+        cache = make_cache(upstream)
+        impatient = asyncio.ensure_future(cache.get("city", URL))
+        patient = asyncio.ensure_future(cache.get("city", URL))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        entry = await patient
+        await cache.aclose()
+        return upstream, entry
+
+    upstream, entry = asyncio.run(scenario())
+    assert len(upstream.requests) == 1
+    assert entry.payload == [{"id": 0}]
+
+
+def test_upstream_error_is_raised_and_not_cached():
+    async def scenario():
+        calls = []
+
+        def failing(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        cache = FeedCache(transport=httpx.MockTransport(failing))
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await cache.get("city", URL)
+        await cache.aclose()
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.peek("city") is None
+
+
+class LabelUpstream(Upstream):
+    """Upstream con features de labelClusters (`features` labels sintéticos)"""
+
+    def payload(self):
+        return synthetic_features(self.features, seed=self.features)
+
+
+def obstacle_service(upstream):
+    return ObstacleService(make_cache(upstream), worker_pool=WorkerPool(1))
+
+
+def expire_snapshot(service, city="santiago"):
+    """Vencer el snapshot de la ciudad y su feed en caché"""
+    service._snapshots[city].built_at -= service.SNAPSHOT_REFRESH_SECONDS + 1
+    expire(service.feed_cache, city)
+
+
+async def settle(service, city="santiago"):
+    """Esperar a que termine el refresco en segundo plano (si hay uno)"""
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        if city not in service._refreshing:
+            return
+
+
+def test_stale_snapshot_is_served_while_exactly_one_refresh_runs():
+    async def scenario():
+        upstream = LabelUpstream(features=200)
+        service = obstacle_service(upstream)
+        first = await service.get_snapshot("santiago")
+        upstream.features, upstream.etag = 300, '"v2"'
+        upstream.gate = asyncio.Event()
+        expire_snapshot(service)
+
+        # Con el upstream detenido, todas las peticiones reciben al instante el snapshot anterior
+        served = await asyncio.wait_for(
+            asyncio.gather(*(service.get_snapshot("santiago") for _ in range(20))), timeout=1
+        )
+        await asyncio.sleep(0.05)
+        refreshes_while_blocked = len(upstream.requests) - 1
+        served_while_blocked = await service.get_snapshot("santiago")
+
+        upstream.gate.set()
+        await settle(service)
+        refreshed = await service.get_snapshot("santiago")
+        await service.aclose()
+        return upstream, first, served, refreshes_while_blocked, served_while_blocked, refreshed
+
+    upstream, first, served, refreshes, served_while_blocked, refreshed = asyncio.run(scenario())
+    assert all(snapshot is first for snapshot in served) and served_while_blocked is first
+    assert refreshes == 1
+    # El refresco terminado se publica de una vez y sin otra descarga
+    assert len(upstream.requests) == 2
+    assert refreshed is not first and refreshed.version != first.version
+    assert refreshed.response.total_obstacles == 300 and first.response.total_obstacles == 200
+
+
+def test_failed_refresh_keeps_serving_the_last_good_snapshot(caplog):
+    async def scenario():
+        upstream = LabelUpstream(features=200)
+        service = obstacle_service(upstream)
+        first = await service.get_snapshot("santiago")
+        good_entry = service.feed_cache.peek("santiago")
+        upstream.status = 503
+        expire_snapshot(service)
+
+        results = []
+        for _ in range(2):
+            # Cada petición con el snapshot vencido dispara un intento; ninguno lo reemplaza
+            results.append(await service.get_snapshot("santiago"))
+            await settle(service)
+        with pytest.raises(httpx.HTTPStatusError):
+            await service.refresh_snapshot("santiago")
+        still = await service.get_snapshot("santiago")
+        failed_requests = len(upstream.requests)
+        entry_after_failures = service.feed_cache.peek("santiago")
+
+        # Cuando el upstream vuelve, el siguiente refresco publica el feed nuevo
+        upstream.status, upstream.features, upstream.etag = 200, 250, '"v3"'
+        await service.get_snapshot("santiago")
+        await settle(service)
+        recovered = await service.get_snapshot("santiago")
+        await service.aclose()
+        return first, results, still, failed_requests, good_entry, entry_after_failures, recovered
+
+    with caplog.at_level(logging.ERROR, logger="app.services.obstacle_service"):
+        first, results, still, failed_requests, good_entry, entry, recovered = asyncio.run(scenario())
+    assert all(snapshot is first for snapshot in results) and still is first
+    assert failed_requests == 1 + 3
+    assert entry is good_entry
+    assert sum("No se pudo refrescar" in record.message for record in caplog.records) == 2
+    assert recovered is not first and recovered.response.total_obstacles == 250
@@ -0,0 +1,145 @@
+"""Kernels vectorizados de geodesy.py contra los cálculos escalares, punto por punto"""
+import math
+
+import numpy as np
+import pytest
+
+from app.services.geodesy import (
+    EARTH_RADIUS_METERS, PolylineSet, haversine_distance, haversine_distances, haversine_matrix,
+    project_to_segments
+)
+from app.services.spatial_index import CoordinateColumn
+
+
+def scalar_projection(lat, lng, a_lat, a_lng, b_lat, b_lng):
+    """Proyección de un punto sobre un segmento, de a un segmento (referencia)"""
+    scale_y = math.pi / 180 * EARTH_RADIUS_METERS
+    scale_x = scale_y * math.cos(math.radians(lat))
+    ax, ay = (a_lng - lng) * scale_x, (a_lat - lat) * scale_y
+    dx, dy = (b_lng - a_lng) * scale_x, (b_lat - a_lat) * scale_y
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else min(max(-(ax * dx + ay * dy) / length_sq, 0.0), 1.0)
+    return math.hypot(ax + t * dx, ay + t * dy), a_lat + t * (b_lat - a_lat), a_lng + t * (b_lng - a_lng)
+
+
+def scalar_polyline_distance(lat, lng, coords):
+    if len(coords) < 2:
+        return math.inf
+    return min(
+        scalar_projection(lat, lng, a[1], a[0], b[1], b[0])[0]
+        for a, b in zip(coords[:-1], coords[1:])
+    )
+
+
+def random_points(rng, n, lat=-33.45, lng=-70.65, span=0.05):
+    return lat + rng.uniform(-span, span, n), lng + rng.uniform(-span, span, n)
+
+
+def random_lines(rng, n, lat=-33.45, lng=-70.65, span=0.05):
+    """Polilíneas de 0 a 6 vértices, con segmentos degenerados (vértices repetidos)"""
+    lines = []
+    for _ in range(n):
+        start = [lng + rng.uniform(-span, span), lat + rng.uniform(-span, span)]
+        coords = [start]
+        for _ in range(int(rng.integers(0, 6))):
+            if rng.random() < 0.2:
+                coords.append(list(coords[-1]))
+            else:
+                coords.append([coords[-1][0] + rng.uniform(-0.002, 0.002), coords[-1][1] + rng.uniform(-0.002, 0.002)])
+        lines.append(coords if rng.random() > 0.05 else [])
+    return lines
+
+
+@pytest.mark.parametrize("lng", [-70.65, 179.99, -179.99])
+def test_haversine_distances_match_scalar(lng):
+    rng = np.random.default_rng(1)
+    lat1, lng1 = random_points(rng, 500, lng=lng, span=0.5)
+    lat2, lng2 = random_points(rng, 500, lng=lng, span=0.5)
+    # Los puntos pueden quedar a ambos lados del antimeridiano: llevar a [-180, 180)
+    lng1, lng2 = (lng1 + 180) % 360 - 180, (lng2 + 180) % 360 - 180
+    expected = [haversine_distance(*args) for args in zip(lat1, lng1, lat2, lng2)]
+    np.testing.assert_allclose(haversine_distances(lat1, lng1, lat2, lng2), expected, rtol=1e-12, atol=1e-6)
+    np.testing.assert_allclose(
+        haversine_matrix(lat1[:20], lng1[:20], lat2[:30], lng2[:30]),
+        [[haversine_distance(a, b, c, d) for c, d in zip(lat2[:30], lng2[:30])] for a, b in zip(lat1[:20], lng1[:20])],
+        rtol=1e-12, atol=1e-6
+    )
+
+
+def test_haversine_across_antimeridian_is_short():
+    distance = haversine_distances(0.0, 179.9995, 0.0, -179.9995)
+    assert distance == pytest.approx(haversine_distance(0.0, 179.9995, 0.0, -179.9995))
+    assert distance == pytest.approx(111.19, rel=1e-3)
+
+
+def test_haversine_identical_points_is_zero():
+    assert haversine_distances(np.array([-33.4]), np.array([-70.6]), -33.4, -70.6)[0] == 0.0
+
+
+@pytest.mark.parametrize("lng", [-70.65, 179.95, -179.95])
+def test_project_to_segments_matches_scalar(lng):
+    rng = np.random.default_rng(2)
+    lats, lngs = random_points(rng, 400, lng=lng)
+    a_lats, a_lngs = random_points(rng, 400, lng=lng)
+    b_lats, b_lngs = a_lats + rng.uniform(-0.003, 0.003, 400), a_lngs + rng.uniform(-0.003, 0.003, 400)
+    # Una de cada cinco es degenerada (A == B)
+    b_lats[::5], b_lngs[::5] = a_lats[::5], a_lngs[::5]
+
+    distances, proj_lats, proj_lngs = project_to_segments(lats, lngs, a_lats, a_lngs, b_lats, b_lngs)
+    expected = np.array([scalar_projection(*args) for args in zip(lats, lngs, a_lats, a_lngs, b_lats, b_lngs)])
+    np.testing.assert_allclose(distances, expected[:, 0], rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(proj_lats, expected[:, 1], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(proj_lngs, expected[:, 2], rtol=0, atol=1e-12)
+
+    # Degenerados: el punto proyectado es A y la distancia, la de A (~ Haversine a esta escala)
+    np.testing.assert_array_equal(proj_lats[::5], a_lats[::5])
+    np.testing.assert_allclose(
+        distances[::5],
+        [haversine_distance(*args) for args in zip(lats[::5], lngs[::5], a_lats[::5], a_lngs[::5])],
+        rtol=5e-3
+    )
+
+
+def test_project_to_segments_broadcasts_one_point_over_segments():
+    rng = np.random.default_rng(3)
+    a_lats, a_lngs = random_points(rng, 50)
+    b_lats, b_lngs = random_points(rng, 50)
+    distances, _, _ = project_to_segments(-33.45, -70.65, a_lats, a_lngs, b_lats, b_lngs)
+    expected = [scalar_projection(-33.45, -70.65, *args)[0] for args in zip(a_lats, a_lngs, b_lats, b_lngs)]
+    np.testing.assert_allclose(distances, expected, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize("column", [False, True])
+@pytest.mark.parametrize("lng", [-70.65, 179.95])
+def test_polyline_set_matches_scalar(column, lng):
+    rng = np.random.default_rng(4)
+    lines = random_lines(rng, 60, lng=lng)
+    lats, lngs = random_points(rng, 40, lng=lng)
+    polylines = PolylineSet(CoordinateColumn.from_lists(lines) if column else lines)
+
+    expected = np.array([[scalar_polyline_distance(lat, lng_, coords) for coords in lines]
+                         for lat, lng_ in zip(lats, lngs)])
+    matrix = polylines.distance_matrix(lats, lngs)
+    assert matrix.shape == (40, 60)
+    np.testing.assert_array_equal(np.isinf(matrix), np.isinf(expected))
+    finite = np.isfinite(expected)
+    np.testing.assert_allclose(matrix[finite], expected[finite], rtol=1e-9, atol=1e-6)
+
+    pairs = rng.integers(0, 60, 200)
+    points = rng.integers(0, 40, 200)
+    np.testing.assert_allclose(
+        polylines.pair_distances(lats[points], lngs[points], pairs), matrix[points, pairs], rtol=1e-12
+    )
+
+
+def test_polyline_set_same_segments_from_lists_and_column():
+    lines = random_lines(np.random.default_rng(5), 80)
+    from_lists, from_column = PolylineSet(lines), PolylineSet(CoordinateColumn.from_lists(lines))
+    np.testing.assert_array_equal(from_lists.segment_counts, from_column.segment_counts)
+    np.testing.assert_array_equal(from_lists.a_lats, from_column.a_lats)
+    np.testing.assert_array_equal(from_lists.b_lngs, from_column.b_lngs)
+
+
+def test_polyline_set_without_segments():
+    polylines = PolylineSet([[], [[-70.6, -33.4]]])
+    assert np.isinf(polylines.distance_matrix(np.array([-33.4]), np.array([-70.6]))).all()
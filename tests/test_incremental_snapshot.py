@@ -0,0 +1,146 @@
+"""Recálculo del snapshot de /obstacles por diferencias de label_id vs recálculo completo"""
+import copy
+
+import numpy as np
+import pytest
+
+from app.services.obstacle_service import ObstacleService
+from app.services.obstacle_store import diff_labels
+from app.services.sidewalk_grid import SidewalkGrid, cell_keys
+from app.services.worker_pool import WorkerPool
+from tests.synthetic import label, synthetic_features
+
+# Labels fijos en las esquinas: mantienen la extensión de la cuadrícula entre versiones
+MIN_LAT, MIN_LNG = -33.46, -70.66
+ANCHORS = [label(-1, MIN_LAT + 1e-6, MIN_LNG + 1e-6), label(-2, MIN_LAT + 0.0199, MIN_LNG + 0.0199)]
+
+
+def dump(snapshot):
+    return snapshot.response.model_dump(exclude={"last_updated"})
+
+
+def sidewalks_by_id(snapshot):
+    return {sidewalk.sidewalk_id: sidewalk.model_dump() for sidewalk in snapshot.response.sidewalks}
+
+
+@pytest.fixture
+def base_features():
+    return synthetic_features(3000) + ANCHORS
+
+
+@pytest.fixture
+def full_rebuild(build_store, publish):
+    """Snapshot calculado desde cero (servicio sin snapshot anterior)"""
+    def run(features, version="v2"):
+        service = ObstacleService(worker_pool=WorkerPool(1))
+        try:
+            return publish(service, build_store(features), version)
+        finally:
+            service.worker_pool.shutdown()
+    return run
+
+
+@pytest.fixture
+def rebuild_after(service, build_store, publish, base_features):
+    """(anterior, nuevo): snapshots publicados al pasar de base_features a `features`"""
+    def run(features):
+        previous = publish(service, build_store(base_features), "v1")
+        return previous, publish(service, build_store(features), "v2")
+    return run
+
+
+def cells_of(features):
+    """Ids de las celdas de nivel 0 que contienen las features"""
+    lats = np.array([f["geometry"]["coordinates"][1] for f in features])
+    lngs = np.array([f["geometry"]["coordinates"][0] for f in features])
+    return {SidewalkGrid.covering(lats[i:i + 1], lngs[i:i + 1]).cell_id(*map(int, cell_keys(lats[i], lngs[i])))
+            for i in range(len(features))}
+
+
+def test_added_removed_and_modified_labels_match_full_rebuild(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features)
+    removed = [features.pop(100), features.pop(500)]
+    features[10]["properties"]["severity"] = 1
+    features[20]["properties"]["agree_count"] += 3
+    before_move = dict(features[30], geometry=dict(features[30]["geometry"]))
+    features[30]["geometry"]["coordinates"] = [MIN_LNG + 0.0105, MIN_LAT + 0.0105]
+    added = [label(10_000, MIN_LAT + 0.0051, MIN_LNG + 0.0052), label(10_001, MIN_LAT + 0.0151, MIN_LNG + 0.0033, 1, 5)]
+    features += added
+
+    previous, snapshot = rebuild_after(features)
+    assert snapshot.previous_version == "v1"
+    assert snapshot.changed_sidewalk_ids is not None
+    assert dump(snapshot) == dump(full_rebuild(features))
+
+    # Las veredas que cambian están todas marcadas, y solo se marcan las de los labels tocados
+    before, after = sidewalks_by_id(previous), sidewalks_by_id(snapshot)
+    differing = {sidewalk_id for sidewalk_id in after if after[sidewalk_id] != before.get(sidewalk_id)}
+    touched = cells_of(removed + added + [features[10], features[20], features[30], before_move])
+    assert differing <= snapshot.changed_sidewalk_ids <= touched
+    assert differing
+
+
+def test_single_modified_label_changes_only_its_sidewalk(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features)
+    target = next(f for f in features if f["properties"]["label_type_id"] in (1, 3, 4))
+    target["properties"]["severity"] = 5 if target["properties"]["severity"] != 5 else 1
+
+    _, snapshot = rebuild_after(features)
+    assert snapshot.changed_sidewalk_ids == cells_of([target])
+    assert dump(snapshot) == dump(full_rebuild(features))
+
+
+def test_unchanged_feed_with_new_version_changes_nothing(base_features, rebuild_after, full_rebuild):
+    previous, snapshot = rebuild_after(copy.deepcopy(base_features))
+    assert snapshot.changed_sidewalk_ids == set()
+    assert dump(snapshot) == dump(full_rebuild(base_features))
+
+
+def assert_full_rebuild(snapshot, features, full_rebuild):
+    assert snapshot.changed_sidewalk_ids is None
+    assert snapshot.previous_version is None
+    assert dump(snapshot) == dump(full_rebuild(features))
+
+
+def test_grid_extent_change_falls_back(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features) + [label(10_000, MIN_LAT - 0.01, MIN_LNG - 0.01)]
+    _, snapshot = rebuild_after(features)
+    assert_full_rebuild(snapshot, features, full_rebuild)
+
+
+def test_duplicate_label_id_falls_back(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features)
+    features.append(label(features[0]["properties"]["label_id"], MIN_LAT + 0.01, MIN_LNG + 0.01))
+    _, snapshot = rebuild_after(features)
+    assert_full_rebuild(snapshot, features, full_rebuild)
+
+
+def test_too_many_changes_fall_back(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features)
+    for feature in features[:int(len(features) * 0.6)]:
+        feature["properties"]["agree_count"] += 1
+    _, snapshot = rebuild_after(features)
+    assert_full_rebuild(snapshot, features, full_rebuild)
+
+
+def test_reordered_labels_fall_back(base_features, rebuild_after, full_rebuild):
+    features = copy.deepcopy(base_features)
+    features[0], features[1] = features[1], features[0]
+    _, snapshot = rebuild_after(features)
+    assert_full_rebuild(snapshot, features, full_rebuild)
+
+
+def test_diff_labels(build_store):
+    old = [label(1, -33.4, -70.6), label(2, -33.4, -70.6), label(3, -33.4, -70.6), label(None, -33.4, -70.6)]
+    new = [label(1, -33.4, -70.6), label(3, -33.4, -70.6, severity=1), label(4, -33.4, -70.6),
+           label(None, -33.4, -70.6)]
+    diff = diff_labels(build_store(old), build_store(new))
+    # 1 sin cambios; 2 quitado; 3 modificado; 4 agregado; los sin label_id no se emparejan
+    np.testing.assert_array_equal(diff.kept_old, [0])
+    np.testing.assert_array_equal(diff.kept_new, [0])
+    np.testing.assert_array_equal(diff.removed, [1, 2, 3])
+    np.testing.assert_array_equal(diff.added, [1, 2, 3])
+    assert diff.modified == 1
+    assert diff.changed == 5
+
+    assert diff_labels(build_store(old + [label(2, -33.5, -70.5)]), build_store(new)) is None
@@ -0,0 +1,124 @@
+"""FeatureStreamParser por trozos arbitrarios contra json.loads del cuerpo completo"""
+import json
+import random
+
+import pytest
+
+from app.services.json_stream import FeatureStreamParser
+from tests.synthetic import synthetic_features
+
+
+def feature(label_id, **properties):
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-70.65, -33.45]},
+            "properties": {"label_id": label_id, **properties}}
+
+
+# Números, escapes y UTF-8 de varios bytes en distintas posiciones del cuerpo
+TRICKY = [
+    feature(1, severity=-12345.678e-3, count=10 ** 20, ratio=0.5, flag=True, missing=None),
+    feature(2, name='Calle "Ñuñoa" \\ éè \n\t', emoji="🦽 vereda", escaped="Añ😀"),
+    feature(3, tags=[], nested={"a": [1, {"b": []}]}, empty="")
+]
+
+
+def parse(body: bytes, chunks):
+    parser = FeatureStreamParser()
+    position = 0
+    for size in chunks:
+        parser.feed(body[position:position + size])
+        position += size
+    parser.feed(body[position:])
+    return parser.close(), parser.members
+
+
+def one_byte(body):
+    return [1] * len(body)
+
+
+def random_sizes(body, seed):
+    rng = random.Random(seed)
+    sizes, total = [], 0
+    while total < len(body):
+        sizes.append(rng.randint(0, 17))
+        total += sizes[-1]
+    return sizes
+
+
+BODIES = {
+    "collection": {"type": "FeatureCollection", "name": "labels", "features": TRICKY + synthetic_features(20),
+                   "crs": {"type": "name", "properties": {"name": "EPSG:4326"}}, "total": 123456789},
+    "features_first": {"features": TRICKY, "type": "FeatureCollection"},
+    "empty_features": {"type": "FeatureCollection", "features": []},
+    "list": TRICKY + synthetic_features(5),
+    "empty_list": []
+}
+
+
+@pytest.mark.parametrize("name", sorted(BODIES))
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("splitter", ["one_byte", "random_0", "random_1", "random_2"])
+def test_chunks_match_json_loads(name, indent, splitter):
+    body = json.dumps(BODIES[name], indent=indent, ensure_ascii=False).encode()
+    expected = json.loads(body)
+    sizes = one_byte(body) if splitter == "one_byte" else random_sizes(body, int(splitter[-1]))
+    items, members = parse(body, sizes)
+    if isinstance(expected, list):
+        assert items == expected
+        assert members == {}
+    else:
+        assert items == expected["features"]
+        assert members == {key: value for key, value in expected.items() if key != "features"}
+
+
+def test_every_split_of_a_multibyte_and_escape_body():
+    body = json.dumps({"features": [feature(7, name="añ\"\\é🦽", n=-1.5e10)]}, ensure_ascii=False).encode()
+    expected = json.loads(body)["features"]
+    for cut in range(len(body) + 1):
+        assert parse(body, [cut])[0] == expected
+
+
+def test_number_split_at_chunk_end_is_not_truncated():
+    parser = FeatureStreamParser()
+    parser.feed(b"[12")
+    parser.feed(b"34, 5")
+    parser.feed(b"6]")
+    assert parser.close() == [1234, 56]
+
+
+def test_transform_drops_none():
+    parser = FeatureStreamParser(transform=lambda f: f["properties"]["label_id"] if f["properties"]["label_id"] != 2 else None)
+    parser.feed(json.dumps({"features": TRICKY}).encode())
+    assert parser.close() == [1, 3]
+
+
+@pytest.mark.parametrize("body", [
+    b'{"type": "FeatureCollection", "features": [{"a": 1}',
+    b'{"features": [{"a": 1}]',
+    b'[{"a": 1}, {"a": ',
+    b'[{"a": "sin cerrar',
+    b'{"features": [1, 2',
+    b'[',
+    b''
+])
+def test_truncated_bodies_raise(body):
+    # También cortados en trozos de un byte
+    for chunks in ([len(body)], one_byte(body)):
+        with pytest.raises(ValueError):
+            parse(body, chunks)
+
+
+@pytest.mark.parametrize("body", [
+    b'{"features": [1 2]}',
+    b'{"features": [1,, 2]}',
+    b'{"features" [1]}',
+    b'{features: [1]}',
+    b'{"features": [1]} extra',
+    b'[1] [2]',
+    b'"features"',
+    b'{"features": [tru]}',
+    b'{"features": ["\xff"]}'
+])
+def test_invalid_bodies_raise(body):
+    for chunks in ([len(body)], one_byte(body)):
+        with pytest.raises(ValueError):
+            parse(body, chunks)
@@ -0,0 +1,107 @@
+"""Heurística ALT: admisible, mismos costos que A* sin landmarks y formato en disco"""
+import random
+
+import numpy as np
+import pytest
+
+from app.models import GeoJSONLineString, ObstacleType, SidewalkSegment
+from app.services.landmarks import FORMAT_VERSION, LandmarkIndex, dijkstra_all
+from app.services.routing_graph import SidewalkGraph
+from tests.synthetic import BLOCK_DEGREES, grid_city
+
+BLOCKS = 6
+SPAN = BLOCKS * BLOCK_DEGREES
+
+
+def city_sidewalks(blocks=BLOCKS):
+    sidewalks = []
+    for street in grid_city(blocks):
+        sidewalks += [s for s in (street.sidewalk_west, street.sidewalk_east,
+                                  street.sidewalk_north, street.sidewalk_south) if s]
+    return sidewalks
+
+
+@pytest.fixture(scope="module")
+def graph():
+    """Cuadrícula más una vereda aislada (nodos inalcanzables desde los landmarks)"""
+    isolated = SidewalkSegment(
+        id="aislada", street_name="aislada", side="norte", start_intersection="-", end_intersection="-",
+        geometry=GeoJSONLineString(coordinates=[[-70.60, -33.40], [-70.599, -33.40]]),
+        length_meters=0.0, accessibility_score=50.0
+    )
+    return SidewalkGraph.from_sidewalks(city_sidewalks() + [isolated])
+
+
+@pytest.fixture(scope="module")
+def index(graph):
+    return LandmarkIndex.build(graph, num_landmarks=4)
+
+
+def random_points(graph, count, seed=0):
+    rng = random.Random(seed)
+    return [graph.snap(-33.45 + rng.random() * SPAN, -70.65 + rng.random() * SPAN) for _ in range(count)]
+
+
+@pytest.mark.parametrize("priority,avoid", [(0.0, []), (0.5, []), (1.0, [ObstacleType.POLE]), (0.7, [])])
+def test_alt_gives_same_costs_as_plain_astar(graph, index, priority, avoid):
+    costs = graph.edge_costs(priority, avoid)
+    points = random_points(graph, 20, seed=int(priority * 10))
+    for start, end in zip(points[::2], points[1::2]):
+        plain = graph.shortest_path(start, end, costs)
+        alt = graph.shortest_path(start, end, costs, index.heuristic(graph, end, costs, priority))
+        assert alt.cost == pytest.approx(plain.cost, rel=1e-9)
+        assert alt.settled <= plain.settled
+
+
+@pytest.mark.parametrize("priority", [0.0, 0.5, 1.0])
+def test_heuristic_never_exceeds_true_distance(graph, index, priority):
+    costs = graph.edge_costs(priority)
+    for end in random_points(graph, 5, seed=3):
+        heuristic = index.heuristic(graph, end, costs, priority)
+        # Distancia real al punto: por el extremo u o v de su arista (grafo no dirigido)
+        from_u = dijkstra_all(graph, int(graph.edge_u[end.edge]), costs.tolist())
+        from_v = dijkstra_all(graph, int(graph.edge_v[end.edge]), costs.tolist())
+        true = np.minimum(from_u + end.fraction * costs[end.edge], from_v + (1 - end.fraction) * costs[end.edge])
+        estimates = np.array([heuristic(node) for node in range(graph.node_count)])
+        assert np.all(np.isfinite(estimates))
+        reachable = np.isfinite(true)
+        assert not reachable.all()
+        assert np.all(estimates[reachable] <= true[reachable] + 1e-6)
+
+
+def test_no_profile_below_priority_returns_none(graph, index):
+    trimmed = LandmarkIndex([0.5, 1.0], index.landmarks, index.distances[1:], index.signature)
+    end = random_points(graph, 1)[0]
+    assert trimmed.heuristic(graph, end, graph.edge_costs(0.2), 0.2) is None
+
+
+def test_save_load_roundtrip(graph, index, tmp_path):
+    path = str(tmp_path / "city.landmarks.npz")
+    index.save(path)
+    loaded = LandmarkIndex.load(path, graph)
+    assert loaded.profiles == index.profiles
+    assert loaded.signature == index.signature
+    np.testing.assert_array_equal(loaded.landmarks, index.landmarks)
+    np.testing.assert_array_equal(loaded.distances, index.distances)
+    assert loaded.distances.dtype == np.float32
+
+    costs = graph.edge_costs(1.0)
+    end = random_points(graph, 1, seed=5)[0]
+    original, reloaded = index.heuristic(graph, end, costs, 1.0), loaded.heuristic(graph, end, costs, 1.0)
+    assert [original(node) for node in range(graph.node_count)] == [reloaded(node) for node in range(graph.node_count)]
+
+
+def test_load_rejects_other_graph(index, tmp_path):
+    path = str(tmp_path / "city.landmarks.npz")
+    index.save(path)
+    other = SidewalkGraph.from_sidewalks(city_sidewalks(BLOCKS - 1))
+    assert LandmarkIndex.load(path, other) is None
+    # Sin grafo no hay con qué comparar la firma
+    assert LandmarkIndex.load(path) is not None
+
+
+def test_load_rejects_other_format(graph, index, tmp_path):
+    path = str(tmp_path / "city.landmarks.npz")
+    np.savez(path, format_version=np.int64(FORMAT_VERSION + 1), profiles=np.asarray(index.profiles),
+             landmarks=index.landmarks, distances=index.distances, signature=np.asarray(index.signature))
+    assert LandmarkIndex.load(path, graph) is None
@@ -0,0 +1,100 @@
+"""Búsqueda de calles por nombre: trigramas contra un recorrido de todos los nombres"""
+import random
+
+import numpy as np
+import pytest
+
+from app.services.geo_service import GeoService
+from app.services.name_index import NameIndex, normalize_name
+from tests.synthetic import grid_city
+
+WORDS = ["Avenida", "Ñuñoa", "Pajaritos", "José Miguel", "Carrera", "O'Higgins", "Alameda", "Los Leones",
+         "PEÑALOLÉN", "Irarrázaval", "Manuel Montt", "Vicuña Mackenna", "Güemes", "Écija", "a", "Av. 10"]
+QUERIES = ["", "a", "A", "ñ", "n", "av", "AV", "Av.", "nu", "ñuñ", "nunoa", "ÑUÑOA", "Nuñoa", "pajar", "JOSE",
+           "josé miguel", "irarrazaval", "IRARRÁZAVAL", "leon", "lén", "gue", "güe", "ecija", "O'H", "10",
+           "enida ñu", "mackenna", "zzz", "aa", "x", " ", "montt manuel"]
+
+
+def random_names(count, seed=0):
+    rng = random.Random(seed)
+    names = []
+    for _ in range(count):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        names.append(rng.choice([name, name.upper(), name.lower(), name.title()]))
+    return names
+
+
+def scan(names, query):
+    """Referencia: recorrer todos los nombres comparando sin mayúsculas ni tildes"""
+    needle = normalize_name(query)
+    return [position for position, name in enumerate(names) if needle in normalize_name(name)]
+
+
+@pytest.fixture(scope="module")
+def names():
+    return random_names(500)
+
+
+@pytest.fixture(scope="module")
+def index(names):
+    return NameIndex.from_names(names)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_a_full_scan(index, names, query):
+    assert index.search(query).tolist() == scan(names, query)
+
+
+def test_random_substrings_match_a_full_scan(index, names):
+    rng = random.Random(1)
+    for _ in range(300):
+        name = rng.choice(names)
+        start = rng.randrange(len(name))
+        query = name[start:start + rng.randint(1, 8)]
+        query = rng.choice([query, query.upper(), query.lower(), normalize_name(query)])
+        assert index.search(query).tolist() == scan(names, query)
+
+
+def test_accent_and_case_folding():
+    index = NameIndex.from_names(["Ñuñoa", "NUNOA", "Peñalolén", "Avenida Irarrázaval", "Straße", "ﬁn"])
+    assert index.search("nunoa").tolist() == index.search("ÑUÑOA").tolist() == [0, 1]
+    assert index.search("PENALOLEN").tolist() == [2]
+    assert index.search("irarrazaval").tolist() == index.search("IRARRÁZAVAL").tolist() == [3]
+    assert index.search("STRASSE").tolist() == [4]
+    assert index.search("fin").tolist() == [5]
+    # Los nombres iguales al normalizar se guardan una sola vez
+    assert index.names == ["nunoa", "penalolen", "avenida irarrazaval", "strasse", "fin"]
+    assert index.codes.tolist() == [0, 0, 1, 2, 3, 4]
+
+
+def test_short_queries_check_every_distinct_name():
+    index = NameIndex.from_names(["Av", "Pasaje B", "Calle Ñ", "Avenida", "av"])
+    assert index.search("").tolist() == [0, 1, 2, 3, 4]
+    assert index.search("AV").tolist() == [0, 3, 4]
+    assert index.search("ñ").tolist() == index.search("N").tolist() == [2, 3]
+    assert index.search(" b").tolist() == [1]
+    assert index.search("q").tolist() == []
+
+
+def test_no_matches_and_empty_index():
+    index = NameIndex.from_names(["Alameda"])
+    assert index.search("alamedas").tolist() == []
+    assert index.search("xyz").tolist() == []
+    empty = NameIndex.from_names([])
+    assert empty.search("").tolist() == empty.search("ala").tolist() == []
+
+
+def test_index_from_stored_names_and_codes(index, names):
+    # Como al abrir un snapshot: nombres distintos y códigos ya calculados
+    stored = NameIndex(list(index.names), np.array(index.codes))
+    for query in QUERIES:
+        assert stored.search(query).tolist() == scan(names, query)
+
+
+@pytest.mark.parametrize("query", ["calle", "CALLE NORTE", "norte_sur_1", "este_oeste", "sur_", "zz", "e"])
+def test_sidewalk_filter_matches_a_full_scan(query):
+    service = GeoService()
+    service.add_city("grid", service.cities["santiago"].polygon, grid_city(6))
+    expected = {segment.id for street, segment in service.cities["grid"].sidewalk_entries
+                if normalize_name(query) in normalize_name(street.name)}
+    assert {segment.id for segment in service.get_sidewalk_segments("grid", street_name=query)} == expected
@@ -0,0 +1,113 @@
+"""ObstacleStoreBuilder/Parser contra el parseo por diccionario a modelos Obstacle"""
+import json
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+
+from app.models import Coordinate, Obstacle, ObstacleType, SeverityLevel
+from app.services.obstacle_store import ObstacleStoreParser
+from tests.synthetic import label, synthetic_features
+
+# Los códigos de las columnas son la posición en el enum
+OBSTACLE_TYPES_BY_CODE = list(ObstacleType)
+SEVERITY_BY_CODE = list(SeverityLevel)
+
+
+def parse_obstacle(service, feature: Dict[str, Any]) -> Obstacle:
+    """Referencia: el parseo por diccionario que el servicio usaba antes del ObstacleStore"""
+    props = feature.get("properties", {})
+    geometry = feature.get("geometry", {})
+    coordinates = geometry.get("coordinates", [0, 0])
+    label_id = props.get("label_id")
+    lat = coordinates[1] if len(coordinates) > 1 else 0
+    lng = coordinates[0] if len(coordinates) > 0 else 0
+    label_type_id = props.get("label_type_id")
+    severity_value = props.get("severity")
+    obstacle_type, severity, affects_accessibility = service._classify_label(label_type_id, severity_value)
+    return Obstacle(
+        id=f"obs_{label_id}",
+        position=Coordinate(lat=lat, lng=lng),
+        obstacle_type=obstacle_type,
+        severity=severity,
+        description=props.get("description"),
+        affects_accessibility=affects_accessibility,
+        label_id=label_id,
+        gsv_panorama_id=props.get("gsv_panorama_id"),
+        label_type_id=label_type_id,
+        photographer_heading=props.get("photographer_heading"),
+        heading=props.get("heading"),
+        pitch=props.get("pitch"),
+        zoom=props.get("zoom"),
+        canvas_x=props.get("canvas_x"),
+        canvas_y=props.get("canvas_y"),
+        canvas_width=props.get("canvas_width"),
+        canvas_height=props.get("canvas_height"),
+        severity_value=severity_value,
+        temporary=props.get("temporary"),
+        tags=props.get("tags"),
+        agree_count=props.get("agree_count"),
+        disagree_count=props.get("disagree_count"),
+        notsure_count=props.get("notsure_count")
+    )
+
+
+def mixed_feed():
+    """Labels de tipos conocidos y desconocidos, con campos faltantes o nulos"""
+    features = synthetic_features(40, seed=3)
+    features += [
+        label(1001, -33.45, -70.65, label_type_id=8, severity=2),
+        label(1002, -33.45, -70.65, label_type_id=99, severity=5, temporary=True, tags="a,b"),
+        label(1003, -33.451, -70.651, label_type_id=None, severity=None, description="sin tipo"),
+        label(1004, -33.452, -70.652, label_type_id=3, severity=0, temporary=False),
+        label(1005, -33.453, -70.653, label_type_id=2, severity=3, heading=12.5, pitch=-3.25, zoom=2,
+              photographer_heading=181.0, canvas_x=10, canvas_y=20, canvas_width=720, canvas_height=480,
+              gsv_panorama_id="pano_x", agree_count=4, disagree_count=0, notsure_count=1),
+        # Sin label_id, sin propiedades, sin geometría o con coordenadas incompletas
+        label(None, -33.454, -70.654, label_type_id=5, severity=4),
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-70.655, -33.455]}},
+        {"type": "Feature", "properties": {"label_id": 1006, "label_type_id": 4, "severity": 1}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-70.656]},
+         "properties": {"label_id": 1007, "label_type_id": 10}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": []}, "properties": {"label_id": 1008}},
+        # Repetido (mismo pool de strings)
+        label(1009, -33.45, -70.65, label_type_id=99, severity=5, temporary=True, tags="a,b")
+    ]
+    return features
+
+
+@pytest.fixture
+def expected(service):
+    return [parse_obstacle(service, feature) for feature in mixed_feed()]
+
+
+def test_builder_matches_dict_parsing(build_store, expected):
+    store = build_store(mixed_feed())
+    assert len(store) == len(expected)
+    obstacles = store.obstacles(range(len(store)))
+    assert [o.model_dump() for o in obstacles] == [o.model_dump() for o in expected]
+    assert [store.obstacle(i) for i in (0, len(store) - 1)] == [expected[0], expected[-1]]
+
+
+def test_columns_match_dict_parsing(build_store, expected):
+    store = build_store(mixed_feed())
+    assert [OBSTACLE_TYPES_BY_CODE[code] for code in store.obstacle_type.tolist()] == \
+        [o.obstacle_type for o in expected]
+    assert [SEVERITY_BY_CODE[code] for code in store.severity.tolist()] == [o.severity for o in expected]
+    assert store.affects_accessibility.tolist() == [o.affects_accessibility for o in expected]
+    assert np.array_equal(store.lat, [o.position.lat for o in expected])
+    assert np.array_equal(store.lng, [o.position.lng for o in expected])
+    assert [o.label_id for o in store.obstacles(range(len(store)))] == [o.label_id for o in expected]
+    # Tipos desconocidos o ausentes quedan como OTHER; severidad ausente o 0 como LOW
+    assert expected[40].obstacle_type is expected[41].obstacle_type is expected[42].obstacle_type is ObstacleType.OTHER
+    assert expected[42].severity is expected[43].severity is SeverityLevel.LOW
+
+
+@pytest.mark.parametrize("chunk_size", [1, 13, 1 << 20])
+def test_stream_parser_matches_dict_parsing(service, expected, chunk_size):
+    body = json.dumps({"type": "FeatureCollection", "features": mixed_feed()}).encode()
+    parser = ObstacleStoreParser(service._classify_label)
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start:start + chunk_size])
+    store = parser.close()
+    assert [o.model_dump() for o in store.obstacles(range(len(store)))] == [o.model_dump() for o in expected]
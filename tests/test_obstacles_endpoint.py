@@ -0,0 +1,176 @@
+"""/obstacles: serialización por bloques, compresión fuera del event loop y streaming NDJSON / GeoJSON-seq"""
+import asyncio
+import json
+import sys
+import threading
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.geo_router  # noqa: F401 (el paquete exporta el router con el mismo nombre)
+from app.services.feed_cache import FeedEntry
+from app.services.obstacle_service import ObstaclesSnapshot, SidewalkStream
+from app.services.response_cache import EncodedResponse, ResponseCache
+from tests.synthetic import synthetic_features
+from tests.test_response_cache import BODY, request
+
+geo_router = sys.modules["app.routers.geo_router"]
+
+
+@pytest.fixture
+def snapshot(service, build_store, publish, monkeypatch):
+    # Bloques pequeños para que la respuesta se arme con varios
+    monkeypatch.setattr(ObstaclesSnapshot, "JSON_CHUNK_SIZE", 7)
+    return publish(service, build_store(synthetic_features(500)), "v1")
+
+
+@pytest.mark.parametrize("simplify_tolerance,precision", [(None, None), (10, 5)])
+def test_response_json_matches_model_dump(snapshot, simplify_tolerance, precision):
+    expected = snapshot.shaped_response(simplify_tolerance, precision).model_dump_json()
+    assert len(snapshot.response.sidewalks) > 7
+    assert json.loads(snapshot.response_json(simplify_tolerance, precision)) == json.loads(expected)
+
+
+def test_response_json_without_sidewalks(snapshot):
+    empty = ObstaclesSnapshot(snapshot.response.model_copy(update={"sidewalks": []}), "v0")
+    assert json.loads(empty.response_json()) == json.loads(empty.response.model_dump_json())
+
+
+@pytest.mark.parametrize("endpoint", ["obstacles", "streets", "sidewalks", "tiles"])
+def test_first_compression_runs_in_endpoint_pool(monkeypatch, endpoint):
+    threads = []
+    compress = EncodedResponse.variant
+
+    def variant(self, encoding):
+        threads.append(threading.current_thread())
+        return compress(self, encoding)
+
+    monkeypatch.setattr(EncodedResponse, "variant", variant)
+    cache = ResponseCache()
+    encoded = cache.store("key", BODY)
+
+    async def respond_twice():
+        first = await geo_router.respond_cached(endpoint, request(accept_encoding="gzip"), encoded, cache)
+        second = await geo_router.respond_cached(endpoint, request(accept_encoding="gzip"), encoded, cache)
+        return first, second
+
+    first, second = asyncio.run(respond_twice())
+    assert first.body == second.body == encoded.variant("gzip")
+    # La compresión (primera llamada) fue en un thread del pool; después solo se lee la variante
+    assert threads[0] is not threading.main_thread()
+    assert encoded.has_variant("gzip")
+
+
+@pytest.fixture
+def published(service, snapshot, monkeypatch):
+    """Servicio del router con el snapshot de la ciudad 'test' ya publicado"""
+    monkeypatch.setattr(geo_router, "obstacle_service", service)
+    return snapshot
+
+
+def get(path, **headers):
+    app = FastAPI()
+    app.include_router(geo_router.router)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(run())
+
+
+def records(response, record_separator):
+    """Features de una respuesta en streaming, verificando el marco de cada registro"""
+    body = response.content
+    assert body.endswith(b"\n")
+    lines = body[:-1].split(b"\n")
+    features = []
+    for line in lines:
+        if record_separator:
+            # RFC 8142: cada registro empieza con RS y no hay otro RS dentro
+            assert line.startswith(b"\x1e") and b"\x1e" not in line[1:]
+            line = line[1:]
+        else:
+            assert b"\x1e" not in line
+        features.append(json.loads(line))
+    return features
+
+
+def expected_features(snapshot):
+    return [json.loads(json.dumps(SidewalkStream.feature(sidewalk))) for sidewalk in snapshot.response.sidewalks]
+
+
+@pytest.mark.parametrize("output_format,media_type,record_separator", [
+    ("ndjson", "application/x-ndjson", False),
+    ("geojson-seq", "application/geo+json-seq", True)
+])
+def test_stream_framing(published, monkeypatch, output_format, media_type, record_separator):
+    # Bloques pequeños para que la respuesta llegue en varios trozos
+    monkeypatch.setattr(SidewalkStream, "CHUNK_SIZE", 3)
+    response = get(f"/api/v1/cities/test/obstacles?format={output_format}")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+    assert response.headers["x-data-version"] == published.version
+    features = records(response, record_separator)
+    assert len(features) == len(published.response.sidewalks) > 3
+    assert features == expected_features(published)
+    assert all(feature["type"] == "Feature" and feature["id"] == feature["properties"]["sidewalk_id"]
+               for feature in features)
+
+
+def test_stream_without_snapshot_matches_snapshot_stream(service, build_store, published):
+    # Ciudad sin snapshot: se puntúa al enviar; mismas Features que desde el snapshot
+    store = build_store(synthetic_features(500))
+
+    async def fetch(city):
+        return FeedEntry(store, "v1")
+
+    service.fetch_feed = fetch
+    service._snapshots.clear()
+    assert records(get("/api/v1/cities/test/obstacles?format=ndjson"), False) == expected_features(published)
+
+
+@pytest.mark.parametrize("accept,expected", [
+    ("application/x-ndjson", "ndjson"),
+    ("application/geo+json-seq", "geojson-seq"),
+    ("application/json;q=0.5, application/geo+json-seq", "geojson-seq"),
+    ("APPLICATION/X-NDJSON; charset=utf-8", "ndjson"),
+    ("application/x-ndjson;q=0, application/json", None),
+    ("application/x-ndjson; q=0.0", None),
+    ("application/geo+json", None),
+    ("application/json", None),
+    ("*/*", None),
+    ("", None)
+])
+def test_stream_format_from_accept(accept, expected):
+    assert geo_router.stream_format(accept) == expected
+
+
+@pytest.mark.parametrize("accept,media_type", [
+    ("application/x-ndjson", "application/x-ndjson"),
+    ("application/geo+json-seq", "application/geo+json-seq"),
+    ("application/x-ndjson;q=0", "application/json"),
+    ("application/json", "application/json")
+])
+def test_accept_negotiation(published, accept, media_type):
+    response = get("/api/v1/cities/test/obstacles", accept=accept)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+    if media_type == "application/json":
+        assert response.json()["data_version"] == published.version
+    else:
+        records(response, media_type == "application/geo+json-seq")
+
+
+def test_format_parameter_wins_over_accept(published):
+    response = get("/api/v1/cities/test/obstacles?format=geojson-seq", accept="application/x-ndjson")
+    assert response.headers["content-type"].startswith("application/geo+json-seq")
+    assert len(records(response, True)) == len(published.response.sidewalks)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "json", "NDJSON", "geojson"])
+def test_unsupported_format_is_rejected(published, output_format):
+    response = get(f"/api/v1/cities/test/obstacles?format={output_format}")
+    assert response.status_code == 400
+    assert "ndjson" in response.json()["detail"]
@@ -0,0 +1,130 @@
+"""Paginación de /streets y /sidewalks siguiendo X-Next-Cursor, con y sin filtros"""
+import asyncio
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.geo_router  # noqa: F401 (el paquete exporta el router con el mismo nombre)
+from app.services.geo_service import GeoService
+from tests.synthetic import BLOCK_DEGREES, grid_city
+
+geo_router = sys.modules["app.routers.geo_router"]
+
+BLOCKS = 8
+ORIGIN_LAT, ORIGIN_LNG = -33.45, -70.65
+SPAN = BLOCKS * BLOCK_DEGREES
+BBOX = ",".join(str(value) for value in (ORIGIN_LNG + 0.15 * SPAN, ORIGIN_LAT + 0.25 * SPAN,
+                                          ORIGIN_LNG + 0.7 * SPAN, ORIGIN_LAT + 0.8 * SPAN))
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = GeoService()
+    service.add_city("grid", service.cities["santiago"].polygon, grid_city(BLOCKS))
+    monkeypatch.setattr(geo_router, "geo_service", service)
+    return service
+
+
+def get_all(*paths):
+    app = FastAPI()
+    app.include_router(geo_router.router)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [await client.get(path) for path in paths]
+
+    return asyncio.run(run())
+
+
+def walk(path, limit):
+    """Elementos de todas las páginas y el cursor recibido en cada una"""
+    items, cursors, cursor = [], [], None
+    while True:
+        url = f"{path}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+        response, = get_all(url)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        items.extend(page)
+        cursor = response.headers.get("x-next-cursor")
+        cursors.append(cursor)
+        if cursor is None:
+            return items, cursors
+        assert len(page) == limit
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    f"bbox={BBOX}",
+    "min_accessibility_score=65",
+    "street_name=norte_sur",
+    f"street_name=calle&min_accessibility_score=55&bbox={BBOX}"
+])
+@pytest.mark.parametrize("limit", [1, 4, 7])
+def test_sidewalk_pages_concatenate_to_unpaged(service, query, limit):
+    path = f"/api/v1/cities/grid/sidewalks?{query}"
+    unpaged, = get_all(path)
+    expected = unpaged.json()
+    assert expected and "x-next-cursor" not in unpaged.headers
+
+    items, cursors = walk(path, limit)
+    assert [item["id"] for item in items] == [item["id"] for item in expected]
+    assert items == expected
+    assert len({item["id"] for item in items}) == len(items)
+    # Sin página vacía al final: la última trae lo que quede
+    assert len(cursors) == -(-len(expected) // limit)
+
+
+@pytest.mark.parametrize("query", ["", f"bbox={BBOX}"])
+@pytest.mark.parametrize("limit", [1, 5])
+def test_street_pages_concatenate_to_unpaged(service, query, limit):
+    path = f"/api/v1/cities/grid/streets?{query}"
+    unpaged, = get_all(f"{path}&limit=100000")
+    expected = unpaged.json()
+    assert expected
+
+    items, _ = walk(path, limit)
+    assert items == expected
+    assert len({item["id"] for item in items}) == len(items)
+
+
+def test_filters_match_the_service(service):
+    # Lo que se pagina es el mismo filtro que aplica el servicio sin página
+    response, = get_all(f"/api/v1/cities/grid/sidewalks?min_accessibility_score=65&bbox={BBOX}")
+    bbox = [float(value) for value in BBOX.split(",")]
+    expected = service.get_sidewalk_segments("grid", min_accessibility_score=65, bbox=bbox)
+    assert {item["id"] for item in response.json()} == {segment.id for segment in expected}
+    assert all(item["accessibility_score"] >= 65 for item in response.json())
+
+
+def test_cursor_from_an_older_data_version_is_rejected(service):
+    streets, sidewalks = get_all("/api/v1/cities/grid/streets?limit=3", "/api/v1/cities/grid/sidewalks?limit=3")
+    old_street_cursor, old_sidewalk_cursor = streets.headers["x-next-cursor"], sidewalks.headers["x-next-cursor"]
+
+    # Recargar la ciudad con otros datos cambia la versión
+    old_version = service.get_data_version("grid")
+    service.add_city("grid", service.cities["santiago"].polygon, grid_city(BLOCKS, seed=1))
+    assert service.get_data_version("grid") != old_version
+
+    stale_streets, stale_sidewalks = get_all(
+        f"/api/v1/cities/grid/streets?limit=3&cursor={old_street_cursor}",
+        f"/api/v1/cities/grid/sidewalks?limit=3&cursor={old_sidewalk_cursor}"
+    )
+    assert stale_streets.status_code == stale_sidewalks.status_code == 400
+    assert "versión" in stale_sidewalks.json()["detail"]
+    with pytest.raises(ValueError):
+        service.get_sidewalk_page("grid", limit=3, cursor=old_sidewalk_cursor)
+
+    # Con la versión nueva se vuelve a paginar desde el principio
+    fresh, = get_all("/api/v1/cities/grid/sidewalks?limit=3")
+    resumed, = get_all(f"/api/v1/cities/grid/sidewalks?limit=3&cursor={fresh.headers['x-next-cursor']}")
+    assert resumed.status_code == 200
+
+
+@pytest.mark.parametrize("cursor", ["no-es-un-cursor", "MTIz", "LTEuMi4"])
+def test_invalid_cursors_are_rejected(service, cursor):
+    streets, sidewalks = get_all(f"/api/v1/cities/grid/streets?cursor={cursor}",
+                                 f"/api/v1/cities/grid/sidewalks?cursor={cursor}")
+    assert streets.status_code == sidewalks.status_code == 400
@@ -0,0 +1,68 @@
+"""Negociación de Content-Encoding y ETag de ResponseCache, con y sin brotli instalado"""
+import gzip
+import json
+
+import brotli
+import pytest
+from starlette.requests import Request
+
+from app.services import response_cache as response_cache_module
+from app.services.response_cache import ResponseCache
+
+BODY = json.dumps({"sidewalks": [{"id": f"sidewalk_{i}", "score": 100.0} for i in range(200)]}).encode()
+
+
+def request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+@pytest.fixture
+def encoded():
+    return ResponseCache().store("key", BODY)
+
+
+def test_brotli_preferred_when_installed(encoded):
+    response = ResponseCache().respond(request(accept_encoding="gzip, br"), encoded)
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == encoded.etag[:-1] + '-br"'
+    assert brotli.decompress(response.body) == BODY
+
+
+def test_gzip_without_brotli(monkeypatch, encoded):
+    monkeypatch.setattr(response_cache_module, "brotli", None)
+    response = ResponseCache().respond(request(accept_encoding="gzip, br"), encoded)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == encoded.etag[:-1] + '-gzip"'
+    assert gzip.decompress(response.body) == BODY
+
+
+@pytest.mark.parametrize("accept_encoding", ["br", "gzip;q=0, br;q=0", ""])
+def test_identity_when_nothing_usable(monkeypatch, encoded, accept_encoding):
+    monkeypatch.setattr(response_cache_module, "brotli", None)
+    response = ResponseCache().respond(request(accept_encoding=accept_encoding), encoded)
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == encoded.etag
+    assert response.body == BODY
+
+
+def test_small_bodies_are_not_compressed():
+    encoded = ResponseCache().store("key", b'{"ok": true}')
+    response = ResponseCache().respond(request(accept_encoding="gzip, br"), encoded)
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("installed", [True, False])
+def test_any_variant_etag_revalidates(monkeypatch, encoded, installed):
+    if not installed:
+        monkeypatch.setattr(response_cache_module, "brotli", None)
+    # Un ETag br guardado por el cliente sigue valiendo aunque ahora se sirva gzip
+    response = ResponseCache().respond(
+        request(accept_encoding="gzip, br", if_none_match=encoded.variant_etag("br")), encoded
+    )
+    assert response.status_code == 304
+    assert response.body == b""
@@ -0,0 +1,111 @@
+"""Grafo de veredas: construcción, proyección y A* sobre una red armada a mano"""
+import pytest
+
+from app.models import GeoJSONLineString, SidewalkSegment
+from app.services.geodesy import haversine_distance
+from app.services.landmarks import dijkstra_all
+from app.services.routing_graph import SidewalkGraph
+
+LAT, LNG = -33.45, -70.65
+STEP = 0.001  # ~110 m
+
+
+def sidewalk(sidewalk_id, coords, score=100.0):
+    return SidewalkSegment(
+        id=sidewalk_id, street_name=sidewalk_id, side="norte", start_intersection="-", end_intersection="-",
+        geometry=GeoJSONLineString(coordinates=coords), length_meters=0.0, accessibility_score=score
+    )
+
+
+@pytest.fixture(scope="module")
+def network():
+    """
+    Dos veredas que se cruzan en (LAT, LNG) sin vértice en el cruce, una que termina
+    a ~11 m de un vértice de la horizontal (cruce peatonal) y una aislada a ~1 km
+    """
+    return SidewalkGraph.from_sidewalks([
+        sidewalk("horizontal", [[LNG - STEP, LAT], [LNG + STEP / 2, LAT], [LNG + STEP, LAT]]),
+        sidewalk("vertical", [[LNG, LAT - STEP], [LNG, LAT + STEP]], score=40.0),
+        sidewalk("cercana", [[LNG + STEP / 2, LAT + 0.0001], [LNG + STEP / 2, LAT + STEP]]),
+        sidewalk("aislada", [[LNG + 10 * STEP, LAT], [LNG + 11 * STEP, LAT]])
+    ])
+
+
+def node_at(graph, lat, lng):
+    matches = [n for n in range(graph.node_count)
+               if abs(graph.node_lats[n] - lat) < 1e-9 and abs(graph.node_lngs[n] - lng) < 1e-9]
+    assert len(matches) == 1
+    return matches[0]
+
+
+def test_intersection_splits_both_sidewalks(network):
+    center = node_at(network, LAT, LNG)
+    sidewalks = sorted(network.sidewalk_ids[network.edge_sidewalk[edge]] for _, edge in network.adjacency[center])
+    assert sidewalks == ["horizontal", "horizontal", "vertical", "vertical"]
+
+
+def test_loose_endpoint_gets_crossing_edge(network):
+    crossings = [edge for edge in range(network.edge_count) if network.edge_sidewalk[edge] == -1]
+    assert len(crossings) == 1
+    ends = {int(network.edge_u[crossings[0]]), int(network.edge_v[crossings[0]])}
+    assert node_at(network, LAT + 0.0001, LNG + STEP / 2) in ends
+    assert node_at(network, LAT, LNG + STEP / 2) in ends
+    assert network.edge_length[crossings[0]] <= SidewalkGraph.CONNECT_METERS
+
+
+def test_snap_projects_onto_nearest_edge(network):
+    point = network.snap(LAT + 0.00002, LNG - STEP / 2)
+    assert network.sidewalk_ids[network.edge_sidewalk[point.edge]] == "horizontal"
+    assert point.lat == pytest.approx(LAT)
+    assert point.lng == pytest.approx(LNG - STEP / 2)
+    assert point.distance == pytest.approx(haversine_distance(LAT + 0.00002, LNG, LAT, LNG), rel=1e-3)
+    assert 0.0 <= point.fraction <= 1.0
+
+
+@pytest.mark.parametrize("priority", [0.0, 1.0])
+def test_costs_match_dijkstra(network, priority):
+    costs = network.edge_costs(priority)
+    start = network.snap(LAT, LNG - STEP)
+    for lat, lng in [(LAT + STEP, LNG), (LAT - STEP, LNG), (LAT + STEP, LNG + STEP / 2), (LAT, LNG + STEP)]:
+        end = network.snap(lat, lng)
+        assert end.fraction in (0.0, 1.0)
+        target = network.edge_u[end.edge] if end.fraction == 0.0 else network.edge_v[end.edge]
+        source = network.edge_u[start.edge] if start.fraction == 0.0 else network.edge_v[start.edge]
+        expected = dijkstra_all(network, int(source), costs.tolist())[target]
+        assert network.shortest_path(start, end, costs).cost == pytest.approx(expected)
+
+
+def test_same_edge_goes_straight(network):
+    costs = network.edge_costs(0.0)
+    start = network.snap(LAT, LNG - 0.0008)
+    end = network.snap(LAT, LNG - 0.0002)
+    assert start.edge == end.edge
+    path = network.shortest_path(start, end, costs)
+    assert path.edges == [start.edge]
+    assert path.cost == pytest.approx(abs(start.fraction - end.fraction) * costs[start.edge])
+    assert path.points == [(start.lat, start.lng), (end.lat, end.lng)]
+
+
+def test_reconstructed_points_start_and_end_at_snaps(network):
+    costs = network.edge_costs(0.5)
+    start = network.snap(LAT - 0.0007, LNG)
+    end = network.snap(LAT + 0.0005, LNG + STEP / 2)
+    path = network.shortest_path(start, end, costs)
+    assert path.points[0] == (start.lat, start.lng)
+    assert path.points[-1] == (end.lat, end.lng)
+    assert len(path.points) == len(path.edges) + 1
+    assert path.edges[0] == start.edge and path.edges[-1] == end.edge
+    # Costo = fracciones recorridas de cada arista
+    assert path.cost == pytest.approx(sum(f * costs[e] for e, f in zip(path.edges, path.edge_fractions)))
+    # Puntos intermedios consecutivos unidos por la arista correspondiente
+    for (lat_a, lng_a), (lat_b, lng_b), edge in zip(path.points[1:-2], path.points[2:-1], path.edges[1:-1]):
+        ends = {(network.node_lats[n], network.node_lngs[n]) for n in (network.edge_u[edge], network.edge_v[edge])}
+        assert ends == {(lat_a, lng_a), (lat_b, lng_b)}
+
+
+def test_unreachable_destination_returns_none(network):
+    costs = network.edge_costs(0.0)
+    start = network.snap(LAT, LNG - STEP / 2)
+    end = network.snap(LAT, LNG + 10.5 * STEP)
+    assert network.sidewalk_ids[network.edge_sidewalk[end.edge]] == "aislada"
+    assert network.shortest_path(start, end, costs) is None
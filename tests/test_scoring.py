@@ -0,0 +1,101 @@
+"""Scoring por lotes (`_score_sidewalks`) contra el scoring por vereda con modelos Obstacle"""
+import numpy as np
+import pytest
+
+from app.models import GeoJSONLineString
+from tests.synthetic import synthetic_features
+
+
+def sidewalk(sidewalk_id, coordinates):
+    return {"id": sidewalk_id, "geometry": GeoJSONLineString(type="LineString", coordinates=coordinates)}
+
+
+def random_sidewalks(rng, count):
+    """Veredas con ids repetidos, ids vacíos y líneas de 1 a 4 vértices"""
+    sidewalks = []
+    for position in range(count):
+        roll = rng.random()
+        sidewalk_id = "" if roll < 0.1 else f"sw_{int(rng.integers(0, 10))}" if roll < 0.4 else f"sw_{position}"
+        start = [-70.66 + rng.random() * 0.02, -33.46 + rng.random() * 0.02]
+        coordinates = [start] + [[start[0] + rng.uniform(-0.001, 0.001), start[1] + rng.uniform(-0.001, 0.001)]
+                                 for _ in range(int(rng.integers(0, 4)))]
+        sidewalks.append(sidewalk(sidewalk_id, coordinates))
+    return sidewalks
+
+
+def accessibility_score(service, obstacles):
+    """Referencia: score 0-100 sumando la penalización obstáculo por obstáculo"""
+    if not obstacles:
+        return 100.0
+    total_penalty = 0.0
+    for obs in obstacles:
+        total_penalty += service.SEVERITY_WEIGHTS.get(obs.severity_value or 3, 0.6) * 10
+    return round(max(0.0, 100.0 - total_penalty), 2)
+
+
+def expected_scores(service, store, sidewalks, assignment):
+    """
+    Referencia por vereda: obstáculos agrupados por id como en la asociación por
+    diccionario (las veredas con el mismo id los comparten; sin id, ninguno)
+    """
+    by_id = {}
+    for position in np.flatnonzero(assignment >= 0).tolist():
+        sidewalk_id = sidewalks[assignment[position]]["id"]
+        if sidewalk_id:
+            by_id.setdefault(sidewalk_id, []).append(position)
+    result = []
+    for sw in sidewalks:
+        obstacles = store.obstacles(by_id.get(sw["id"], [])) if sw["id"] else []
+        coordinates = np.asarray(sw["geometry"].coordinates)
+        result.append((
+            accessibility_score(service, obstacles),
+            service._get_severity_breakdown(obstacles),
+            [obstacle.model_dump() for obstacle in obstacles],
+            coordinates[:, 1].mean(), coordinates[:, 0].mean()
+        ))
+    return result
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_scores_match_per_sidewalk_scores(service, build_store, seed):
+    rng = np.random.default_rng(seed)
+    store = build_store(synthetic_features(2000, seed=seed))
+    sidewalks = random_sidewalks(rng, 300)
+    # Asignación arbitraria: incluye obstáculos sin vereda y veredas sin id
+    assignment = np.where(rng.random(len(store)) < 0.2, -1, rng.integers(0, len(sidewalks), len(store)))
+    assignment[~store.affects_accessibility] = -1
+
+    scores = service._score_sidewalks(store, sidewalks, assignment)
+    expected = expected_scores(service, store, sidewalks, assignment)
+    for position, (score, breakdown, obstacles, center_lat, center_lng) in enumerate(expected):
+        group = scores.groups[position]
+        if not sidewalks[position]["id"]:
+            assert group == -1
+            continue
+        assert scores.scores[group] == score
+        assert scores.severity_breakdown(group) == breakdown
+        assert scores.obstacle_counts[group] == len(obstacles)
+        assert [o.model_dump() for o in store.obstacles(scores.obstacle_positions(group))] == obstacles
+        assert scores.center_lats[position] == pytest.approx(center_lat, abs=1e-12)
+        assert scores.center_lngs[position] == pytest.approx(center_lng, abs=1e-12)
+
+
+def test_sidewalks_with_same_id_share_group_and_empty_ids_get_nothing(service, build_store):
+    store = build_store(synthetic_features(50))
+    sidewalks = [sidewalk("a", [[-70.6, -33.4], [-70.5, -33.4]]), sidewalk("", [[-70.6, -33.4], [-70.5, -33.4]]),
+                 sidewalk("a", [[-70.6, -33.5], [-70.5, -33.5]]), sidewalk("b", [[-70.6, -33.5], [-70.5, -33.5]])]
+    affecting = np.flatnonzero(store.affects_accessibility)
+    assignment = np.full(len(store), -1)
+    assignment[affecting[:3]] = [0, 2, 1]
+
+    scores = service._score_sidewalks(store, sidewalks, assignment)
+    assert scores.groups == [0, -1, 0, 3]
+    np.testing.assert_array_equal(scores.obstacle_positions(0), affecting[:2])
+    assert scores.obstacle_counts[3] == 0 and scores.scores[3] == 100.0
+
+
+def test_no_sidewalks_or_obstacles(service, build_store):
+    store = build_store([])
+    scores = service._score_sidewalks(store, [sidewalk("a", [[-70.6, -33.4], [-70.5, -33.4]])],
+                                      np.array([], dtype=np.int64))
+    assert scores.scores == [100.0] and scores.obstacle_counts == [0]
@@ -0,0 +1,103 @@
+"""Cuadrícula global de veredas: celdas, ids y niveles"""
+import numpy as np
+import pytest
+
+from app.services.sidewalk_grid import CELLS_PER_DEGREE, GRID_LEVELS, SidewalkGrid, cell_keys
+
+LEVELS = list(range(GRID_LEVELS))
+
+
+def bounds(cell):
+    """(oeste, sur, este, norte) del contorno de una celda de iter_cells"""
+    coordinates = np.asarray(cell["geometry"].coordinates)
+    return (*coordinates.min(axis=0), *coordinates.max(axis=0))
+
+
+def test_cell_keys_round_towards_south_west_with_negative_coordinates():
+    lats = np.array([0.0005, -0.0005, -33.4567, 33.4567, -0.0])
+    lngs = np.array([0.0005, -0.0005, -70.6543, 70.6543, 0.0])
+    rows, columns = cell_keys(lats, lngs)
+    assert rows.tolist() == [0, -1, -33457, 33456, 0]
+    assert columns.tolist() == [0, -1, -70655, 70654, 0]
+    # En niveles gruesos también hacia -inf, no hacia cero
+    assert cell_keys(np.array([-0.0005]), np.array([-0.0005]), 3)[0].tolist() == [-1]
+    assert cell_keys(np.array([-0.0085]), np.array([0.0085]), 3)[0].tolist() == [-2]
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_points_on_edges_belong_to_the_cell_to_their_north_east(level):
+    # Todas las filas de estos rangos, incluidas las que floor(v * 1000) ubicaba mal (1.001, -2.023)
+    side = 1 << level
+    keys = np.concatenate([np.arange(-3000, 3000), np.arange(-71000, -70000), np.arange(65000, 66000)]) // side
+    edges = keys * side / CELLS_PER_DEGREE
+    rows, columns = cell_keys(edges, edges, level)
+    assert np.array_equal(rows, keys) and np.array_equal(columns, keys)
+    # Justo antes del borde, la celda anterior
+    rows, columns = cell_keys(np.nextafter(edges, -np.inf), np.nextafter(edges, -np.inf), level)
+    assert np.array_equal(rows, keys - 1) and np.array_equal(columns, keys - 1)
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_cells_contain_their_points(level):
+    rng = np.random.default_rng(level)
+    lats, lngs = rng.uniform(-33.48, -33.42, 2000), rng.uniform(-70.70, -70.60, 2000)
+    # Algunos puntos exactamente en esquinas de celdas de nivel 0
+    lats[:50] = np.round(lats[:50], 3)
+    lngs[:50] = np.round(lngs[:50], 3)
+    grid = SidewalkGrid.covering(lats, lngs, level)
+    cells = list(grid.iter_cells())
+    positions = grid.positions(lats, lngs)
+    assert len(cells) == len(grid) and (positions >= 0).all()
+    for position, lat, lng in zip(positions.tolist(), lats, lngs):
+        west, south, east, north = bounds(cells[position])
+        assert west <= lng < east and south <= lat < north
+
+
+def test_positions_and_ids_follow_rows_then_columns():
+    grid = SidewalkGrid(1, -16726, -35330, 3, 4)
+    cells = list(grid.iter_cells())
+    assert [cell["id"] for cell in cells[:5]] == [
+        "sidewalk_1_-16726_-35330", "sidewalk_1_-16726_-35329", "sidewalk_1_-16726_-35328",
+        "sidewalk_1_-16726_-35327", "sidewalk_1_-16725_-35330"
+    ]
+    # Contorno cerrado, esquinas calculadas desde los enteros
+    assert cells[0]["geometry"].coordinates[0] == cells[0]["geometry"].coordinates[-1]
+    assert bounds(cells[0]) == (-35330 * 2 / CELLS_PER_DEGREE, -16726 * 2 / CELLS_PER_DEGREE,
+                                -35329 * 2 / CELLS_PER_DEGREE, -16725 * 2 / CELLS_PER_DEGREE)
+    west, south = bounds(cells[0])[:2]
+    lats = np.array([south, south, south + 0.005, south - 0.001])
+    lngs = np.array([west, west + 0.002, west + 0.007, west])
+    assert grid.positions(lats, lngs).tolist() == [0, 1, 2 * 4 + 3, -1]
+
+
+def test_ids_do_not_depend_on_the_covered_extent():
+    lats, lngs = np.array([-33.4501, -33.4402]), np.array([-70.6503, -70.6404])
+    small = {cell["id"]: bounds(cell) for cell in SidewalkGrid.covering(lats, lngs).iter_cells()}
+    larger = {cell["id"]: bounds(cell) for cell in SidewalkGrid.covering(
+        np.append(lats, -33.47), np.append(lngs, -70.67)).iter_cells()}
+    assert small.items() <= larger.items()
+
+
+@pytest.mark.parametrize("level", LEVELS[1:])
+def test_parent_cells_contain_exactly_their_children(level):
+    rng = np.random.default_rng(level)
+    lats, lngs = rng.uniform(-33.5, -33.4, 500), rng.uniform(-70.7, -70.6, 500)
+    for coarse in range(level + 1):
+        # La celda de nivel k es la de nivel j < k desplazada k - j bits
+        for fine in range(coarse):
+            fine_rows, fine_columns = cell_keys(lats, lngs, fine)
+            coarse_rows, coarse_columns = cell_keys(lats, lngs, coarse)
+            assert np.array_equal(fine_rows >> (coarse - fine), coarse_rows)
+            assert np.array_equal(fine_columns >> (coarse - fine), coarse_columns)
+
+    parent = SidewalkGrid.covering(lats[:1], lngs[:1], level)
+    (parent_cell,) = parent.iter_cells()
+    child_row, child_column = parent.min_row << level, parent.min_column << level
+    children = SidewalkGrid(0, child_row, child_column, 1 << level, 1 << level)
+    child_bounds = np.array([bounds(cell) for cell in children.iter_cells()])
+    # Los hijos cubren la celda gruesa sin salirse de ella, y comparten sus bordes exteriores
+    assert (child_bounds[:, 0].min(), child_bounds[:, 1].min(),
+            child_bounds[:, 2].max(), child_bounds[:, 3].max()) == bounds(parent_cell)
+    centers_lat = (child_bounds[:, 1] + child_bounds[:, 3]) / 2
+    centers_lng = (child_bounds[:, 0] + child_bounds[:, 2]) / 2
+    assert (parent.positions(centers_lat, centers_lng) == 0).all()
@@ -0,0 +1,130 @@
+"""Simplificación por niveles y cuantización de coordenadas"""
+import numpy as np
+import pytest
+import shapely
+
+from app.services.simplification import (
+    METERS_PER_DEGREE, SIMPLIFY_LEVELS_METERS, GeometryLevels, quantize_line, quantize_polygon,
+    shape_line, simplify_level
+)
+from app.services.spatial_index import CoordinateColumn
+
+LEVELS = [None, *SIMPLIFY_LEVELS_METERS]
+
+
+def wiggly_lines(count=30, seed=0):
+    """Líneas de 2 a 200 vértices con ruido de hasta ~30 m alrededor de un recorrido"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for _ in range(count):
+        n = int(rng.integers(2, 200))
+        lngs = -70.65 + np.linspace(0, rng.uniform(0.001, 0.02), n)
+        lats = -33.45 + np.cumsum(rng.normal(0, 0.0001, n))
+        lines.append(np.column_stack((lngs, lats)).tolist())
+    return lines
+
+
+@pytest.fixture(scope="module")
+def lines():
+    return wiggly_lines()
+
+
+@pytest.fixture(scope="module", params=["listas", "columna"])
+def levels(request, lines):
+    return GeometryLevels(lines if request.param == "listas" else CoordinateColumn.from_lists(lines))
+
+
+def test_vertex_counts_do_not_grow_with_the_level(levels, lines):
+    for position, original in enumerate(lines):
+        counts = [len(levels.coordinates(position, level)) for level in LEVELS]
+        assert counts[0] == len(original)
+        assert counts == sorted(counts, reverse=True)
+        assert counts[-1] >= 2
+    # Con ruido de decenas de metros los niveles gruesos sí reducen
+    total = [sum(len(levels.coordinates(p, level)) for p in range(len(lines))) for level in LEVELS]
+    assert total[-1] < total[2] < total[0]
+
+
+def test_endpoints_are_preserved(levels, lines):
+    for position, original in enumerate(lines):
+        for level in LEVELS:
+            coords = levels.coordinates(position, level)
+            assert coords[0] == original[0] and coords[-1] == original[-1]
+            assert shape_line(original, level)[0] == original[0]
+            assert shape_line(original, level)[-1] == original[-1]
+
+
+def test_simplified_lines_stay_within_the_tolerance(levels, lines):
+    for position, original in enumerate(lines):
+        for level in SIMPLIFY_LEVELS_METERS:
+            simplified = shapely.LineString(levels.coordinates(position, level))
+            assert shapely.hausdorff_distance(simplified, shapely.LineString(original)) <= \
+                level / METERS_PER_DEGREE * (1 + 1e-9)
+
+
+def test_precomputed_levels_match_and_shape_line_matches(levels, lines):
+    stored = GeometryLevels(CoordinateColumn.from_lists(lines), precomputed=levels.line_levels())
+    for position, original in enumerate(lines):
+        for level in LEVELS:
+            assert stored.coordinates(position, level, 5) == levels.coordinates(position, level, 5)
+            assert shape_line(original, level) == levels.coordinates(position, level)
+
+
+@pytest.mark.parametrize("tolerance,expected", [
+    (None, None), (0, None), (0.5, None), (1, 1.0), (7, 5.0), (10, 10.0), (99.9, 50.0), (1000, 100.0)
+])
+def test_simplify_level_never_exceeds_the_tolerance(tolerance, expected):
+    assert simplify_level(tolerance) == expected
+
+
+def test_precision_rounds_and_drops_repeated_vertices():
+    coords = [[-70.123456, -33.987654], [-70.123459, -33.987651], [-70.1235, -33.9877], [-70.2, -33.9]]
+    assert quantize_line(coords, 4) == [[-70.1235, -33.9877], [-70.2, -33.9]]
+    assert quantize_line(coords, 6) == [[-70.123456, -33.987654], [-70.123459, -33.987651],
+                                        [-70.1235, -33.9877], [-70.2, -33.9]]
+    assert quantize_line(coords, 0) == [[-70.0, -34.0]] * 4
+    assert quantize_line(coords, None) is coords
+    for precision in range(8):
+        rounded = np.asarray(quantize_line(coords, precision))
+        assert np.array_equal(rounded, np.round(rounded, precision))
+
+
+def test_quantized_lines_keep_two_and_rings_four_vertices():
+    # Si al quitar repetidos quedaría una línea (o anillo) inválida, se conservan todos
+    line = [[-70.65001, -33.45001], [-70.65002, -33.45002]]
+    assert quantize_line(line, 3) == [[-70.65, -33.45], [-70.65, -33.45]]
+    ring = [[0.00001, 0.00001], [0.00002, 0.00001], [0.00002, 0.00002], [0.00001, 0.00001]]
+    assert quantize_polygon([ring], 3) == [[[0.0, 0.0]] * 4]
+    square = [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.0, 0.0]]
+    assert quantize_polygon([square], 2) == [square]
+
+
+def test_zero_length_two_point_and_single_point_lines():
+    zero = [[-70.65, -33.45], [-70.65, -33.45]]
+    two = [[-70.65, -33.45], [-70.64, -33.44]]
+    closed = [[-70.65, -33.45], [-70.64, -33.44], [-70.65, -33.45]]
+    single = [[-70.65, -33.45]]
+    levels = GeometryLevels([zero, two, closed, single, []])
+    for level in LEVELS:
+        assert levels.coordinates(0, level) == zero
+        assert levels.coordinates(1, level) == two
+        assert levels.coordinates(3, level) == single
+        assert levels.coordinates(4, level) == []
+        # Al redondear los dos vértices coinciden, pero la línea conserva los dos
+        assert levels.coordinates(1, level, 1) == [[-70.6, -33.4], [-70.6, -33.4]]
+        assert shape_line(zero, level) == zero and shape_line(two, level) == two
+        # Línea cerrada: el inicio y el final (el mismo punto) se conservan
+        coords = levels.coordinates(2, level)
+        assert coords[0] == coords[-1] == closed[0] and len(coords) >= 2
+
+
+def test_polygon_levels():
+    angles = np.linspace(0, 2 * np.pi, 400)
+    ring = np.column_stack((-70.65 + 0.01 * np.cos(angles), -33.45 + 0.01 * np.sin(angles))).tolist()
+    ring[-1] = ring[0]
+    levels = GeometryLevels([[ring]], kind="polygon")
+    counts = [len(levels.coordinates(0, level)[0]) for level in LEVELS]
+    assert counts == sorted(counts, reverse=True) and counts[-1] < counts[0]
+    for level in LEVELS:
+        exterior = levels.coordinates(0, level, 4)[0]
+        assert exterior[0] == exterior[-1] and len(exterior) >= 4
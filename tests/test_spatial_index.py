@@ -0,0 +1,93 @@
+"""Consultas por bbox: intersección exacta, no solo vértices dentro ni envolventes"""
+import pytest
+
+from app.models import GeoJSONLineString, SidewalkSegment, StreetAxis
+from app.services.geo_service import GeoService
+from app.services.spatial_index import CoordinateColumn, LineIndex
+
+MIN_LNG, MIN_LAT, MAX_LNG, MAX_LAT = -70.65, -33.45, -70.64, -33.44
+BBOX = [MIN_LNG, MIN_LAT, MAX_LNG, MAX_LAT]
+
+LINES = {
+    # Un solo tramo que atraviesa el bbox de lado a lado, sin vértices dentro
+    "cruza": [[-70.66, -33.445], [-70.63, -33.445]],
+    # Diagonal cuya envolvente se superpone con el bbox pero que pasa por fuera de la esquina
+    "diagonal_afuera": [[-70.655, -33.443], [-70.647, -33.435]],
+    # En L alrededor de la esquina inferior derecha: envolvente encima del bbox, línea afuera
+    "ele_afuera": [[-70.645, -33.455], [-70.635, -33.455], [-70.635, -33.445]],
+    "adentro": [[-70.648, -33.448], [-70.646, -33.446]],
+    # Toca el borde superior (los bordes cuentan)
+    "toca_borde": [[-70.645, -33.44], [-70.645, -33.43]],
+    "lejos": [[-70.60, -33.40], [-70.59, -33.39]],
+    # Un solo vértice: no se indexa
+    "punto": [[-70.645, -33.445]],
+    # Entra por la izquierda y sale por abajo, con vértices solo fuera
+    "corta_esquina": [[-70.652, -33.441], [-70.648, -33.452]]
+}
+NAMES = list(LINES)
+INTERSECTING = ["cruza", "adentro", "toca_borde", "corta_esquina"]
+ENVELOPE_ONLY = ["diagonal_afuera", "ele_afuera"]
+
+
+def positions(names):
+    return sorted(NAMES.index(name) for name in names)
+
+
+@pytest.fixture(params=["listas", "columna"])
+def index(request):
+    lines = list(LINES.values())
+    return LineIndex(lines if request.param == "listas" else CoordinateColumn.from_lists(lines))
+
+
+def test_query_intersects_is_exact(index):
+    assert index.query_intersects(*BBOX) == positions(INTERSECTING)
+
+
+def test_query_bbox_only_uses_envelopes(index):
+    # Los falsos positivos por envolvente son justamente los que filtra query_intersects
+    assert index.query_bbox(*BBOX) == positions(INTERSECTING + ENVELOPE_ONLY)
+
+
+def test_unindexed_and_empty():
+    index = LineIndex([LINES["punto"], []])
+    assert index.query_intersects(*BBOX) == index.query_bbox(*BBOX) == []
+    assert LineIndex([]).query_intersects(*BBOX) == []
+
+
+def street(name, coords):
+    sidewalk = SidewalkSegment(
+        id=f"{name}_vereda", street_name=name, side="norte", start_intersection="-", end_intersection="-",
+        geometry=GeoJSONLineString(coordinates=coords), length_meters=100.0, accessibility_score=80.0
+    )
+    return StreetAxis(id=name, name=name, geometry=GeoJSONLineString(coordinates=coords),
+                      orientation="este_oeste", intersections=[], sidewalk_north=sidewalk)
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = GeoService()
+    service.add_city("bbox", service.cities["santiago"].polygon,
+                     [street(name, coords) for name, coords in LINES.items() if len(coords) >= 2])
+    return service
+
+
+def test_street_network_in_bbox(service):
+    assert {street.id for street in service.get_street_network("bbox", BBOX, limit=None)} == set(INTERSECTING)
+
+
+def test_street_page_in_bbox(service):
+    seen, cursor = [], None
+    while True:
+        page, cursor = service.get_street_page("bbox", BBOX, limit=1, cursor=cursor)
+        seen.extend(street.id for street in page)
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(INTERSECTING)
+
+
+def test_sidewalks_in_bbox(service):
+    segments = service.get_sidewalk_segments("bbox", bbox=BBOX)
+    assert {segment.id for segment in segments} == {f"{name}_vereda" for name in INTERSECTING}
+    page, _ = service.get_sidewalk_page("bbox", street_name="cruza", bbox=BBOX, limit=10)
+    assert [segment.id for segment in page] == ["cruza_vereda"]
+    assert service.get_sidewalk_page("bbox", street_name="diagonal", bbox=BBOX, limit=10) == ([], None)
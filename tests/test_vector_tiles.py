@@ -0,0 +1,187 @@
+"""Teselas MVT: decodificación protobuf mínima del resultado de TileSource.render"""
+import asyncio
+import math
+import struct
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.geo_router  # noqa: F401 (el paquete exporta el router con el mismo nombre)
+from app.models import Coordinate, GeoJSONLineString, SidewalkAccessibility
+from app.services.vector_tiles import TileSource, VectorTileService
+
+geo_router = sys.modules["app.routers.geo_router"]
+
+Z, X, Y = 14, 4976, 9809
+EXTENT, BUFFER = 4096, 64
+
+
+def read_varint(data, position):
+    value, shift = 0, 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def decode(data):
+    """Campos de un mensaje protobuf como [(número, valor)]; los de largo variable quedan en bytes"""
+    fields, position = [], 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            value, position = struct.unpack("<d", data[position:position + 8])[0], position + 8
+        elif wire_type == 2:
+            length, position = read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        else:
+            raise AssertionError(f"tipo de campo inesperado {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def packed(data):
+    values, position = [], 0
+    while position < len(data):
+        value, position = read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    (field, value), = decode(data)
+    return {1: lambda v: v.decode(), 3: float, 6: unzigzag, 7: bool}[field](value)
+
+
+def decode_geometry(commands):
+    """Partes de una línea en coordenadas de la tesela, más los comandos (id, cantidad) leídos"""
+    parts, seen, position, cursor = [], [], 0, (0, 0)
+    while position < len(commands):
+        command, count = commands[position] & 7, commands[position] >> 3
+        position += 1
+        seen.append((command, count))
+        for _ in range(count):
+            cursor = (cursor[0] + unzigzag(commands[position]), cursor[1] + unzigzag(commands[position + 1]))
+            position += 2
+            if command == 1:
+                parts.append([cursor])
+            else:
+                parts[-1].append(cursor)
+    return parts, seen
+
+
+def decode_tile(data):
+    (field, layer_bytes), = decode(data)
+    assert field == 3
+    layer = decode(layer_bytes)
+    keys = [value.decode() for field, value in layer if field == 3]
+    values = [decode_value(value) for field, value in layer if field == 4]
+    features = []
+    for field, feature_bytes in layer:
+        if field != 2:
+            continue
+        feature = dict(decode(feature_bytes))
+        tags = packed(feature[2])
+        features.append({
+            "type": feature[3],
+            "attributes": {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])},
+            "geometry": decode_geometry(packed(feature[4]))
+        })
+    header = {field: value for field, value in layer if field in (1, 5, 15)}
+    return header, keys, values, features
+
+
+def tile_to_lng_lat(px, py):
+    """Inversa de la proyección: píxel de la tesela Z/X/Y a [lng, lat]"""
+    world_x, world_y = (X + px / EXTENT) / 2 ** Z, (Y + py / EXTENT) / 2 ** Z
+    return [world_x * 360 - 180, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * world_y))))]
+
+
+def sidewalk(sidewalk_id, pixels, score, obstacle_count):
+    coordinates = [tile_to_lng_lat(px, py) for px, py in pixels]
+    return SidewalkAccessibility(
+        sidewalk_id=sidewalk_id, geometry=GeoJSONLineString(coordinates=coordinates),
+        position=Coordinate(lat=coordinates[0][1], lng=coordinates[0][0]),
+        accessibility_score=score, obstacle_count=obstacle_count, obstacles=[]
+    )
+
+
+@pytest.fixture(scope="module")
+def tile():
+    return decode_tile(TileSource([
+        sidewalk("cruza", [(1000, 2000), (6000, 2000)], 80.0, 2),
+        sidewalk("vuelve", [(3000, 500), (5000, 500), (5000, 900), (3000, 900)], 80.0, 2),
+        sidewalk("adentro", [(100, 100), (100, 300), (400, 300)], 55.5, 0),
+        sidewalk("lejos", [(9000, 100), (9500, 100)], 10.0, 1)
+    ]).render(Z, X, Y, EXTENT, BUFFER))
+
+
+def test_layer_header(tile):
+    header, _, _, features = tile
+    assert header == {15: 2, 1: b"sidewalks", 5: EXTENT}
+    assert [feature["type"] for feature in features] == [2, 2, 2]
+
+
+def test_keys_and_values_are_deduplicated(tile):
+    _, keys, values, features = tile
+    assert keys == ["sidewalk_id", "accessibility_score", "obstacle_count"]
+    assert sorted(map(repr, values)) == sorted(map(repr, ["cruza", 80.0, 2, "vuelve", "adentro", 55.5, 0]))
+    assert [feature["attributes"] for feature in features] == [
+        {"sidewalk_id": "cruza", "accessibility_score": 80.0, "obstacle_count": 2},
+        {"sidewalk_id": "vuelve", "accessibility_score": 80.0, "obstacle_count": 2},
+        {"sidewalk_id": "adentro", "accessibility_score": 55.5, "obstacle_count": 0}
+    ]
+
+
+def test_clipped_line_commands(tile):
+    _, _, _, features = tile
+    edge = EXTENT + BUFFER
+    # Recortada en el borde derecho más el margen
+    assert features[0]["geometry"] == ([[(1000, 2000), (edge, 2000)]], [(1, 1), (2, 1)])
+    # Sale y vuelve a entrar: dos partes, la segunda relativa al final de la primera
+    parts, commands = features[1]["geometry"]
+    assert commands == [(1, 1), (2, 1), (1, 1), (2, 1)]
+    assert parts == [[(3000, 500), (edge, 500)], [(edge, 900), (3000, 900)]]
+    # El cursor vuelve a (0, 0) en cada feature
+    assert features[2]["geometry"] == ([[(100, 100), (100, 300), (400, 300)]], [(1, 1), (2, 2)])
+
+
+def test_command_deltas_are_zigzag_encoded():
+    # El primer MoveTo de (100, 100) y el LineTo a (100, 300): (+100, +100), (0, +200)
+    data = TileSource([sidewalk("s", [(100, 100), (100, 300)], 50.0, 0)]).render(Z, X, Y, EXTENT, BUFFER)
+    layer = dict((field, value) for field, value in decode(decode(data)[0][1]) if field == 2)
+    commands = packed(dict(decode(layer[2]))[4])
+    assert commands == [(1 << 3) | 1, 200, 200, (1 << 3) | 2, 0, 400]
+
+
+def test_empty_tile_has_only_the_layer_header():
+    header, keys, values, features = decode_tile(TileSource([]).render(Z, X, Y))
+    assert header == {15: 2, 1: b"sidewalks", 5: EXTENT}
+    assert keys == values == features == []
+
+
+@pytest.mark.parametrize("z,x,y", [(-1, 0, 0), (23, 0, 0), (2, 4, 0), (2, 0, 4), (0, -1, 0)])
+def test_out_of_range_tiles_are_rejected(z, x, y):
+    with pytest.raises(ValueError):
+        VectorTileService().get_tile("ciudad", "v1", [], z, x, y)
+
+    app = FastAPI()
+    app.include_router(geo_router.router)
+
+    async def get():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(f"/api/v1/cities/santiago/tiles/{z}/{x}/{y}.mvt")
+
+    assert asyncio.run(get()).status_code == 400
@@ -0,0 +1,88 @@
+"""Pool de procesos: sin fork, con el estado del GeoService armado por el initializer"""
+import asyncio
+import random
+
+from app.models import Coordinate, MatrixRequest, RouteRequest
+from app.services import worker_pool as worker_pool_module
+from app.services.geo_service import GeoService
+from app.services.worker_pool import WorkerPool
+from tests.synthetic import BLOCK_DEGREES, grid_city
+
+BLOCKS = 6
+
+
+def requests(count, seed=0):
+    rng = random.Random(seed)
+    span = BLOCKS * BLOCK_DEGREES
+    points = [Coordinate(lat=-33.45 + rng.random() * span, lng=-70.65 + rng.random() * span)
+              for _ in range(2 * count)]
+    return [RouteRequest(start={"coordinate": a}, end={"coordinate": b}) for a, b in zip(points[::2], points[1::2])]
+
+
+def make_service(workers=2):
+    service = GeoService()
+    service.worker_pool.max_workers = workers
+    # Ciudad agregada después de cargar: los procesos la reciben del initializer, no de un fork
+    service.add_city("grid", service.cities["santiago"].polygon, grid_city(BLOCKS))
+    return service
+
+
+def test_pool_does_not_fork():
+    service = make_service()
+    try:
+        assert service.worker_pool.executor._mp_context.get_start_method() != "fork"
+    finally:
+        service.worker_pool.shutdown()
+
+
+def test_batch_and_matrix_in_pool_match_serial():
+    service = make_service()
+    batch = requests(2 * service.PARALLEL_MIN_TASKS, seed=1)
+    points = [request.start.coordinate for request in batch[:service.PARALLEL_MIN_TASKS]]
+    matrix = MatrixRequest(origins=points, destinations=points[:4])
+    try:
+        serial = service.calculate_routes_batch("grid", batch, workers=1)
+        pooled = service.calculate_routes_batch("grid", batch, workers=2)
+        assert [item.model_dump(exclude={"route": {"route_id"}}) for item in pooled] == \
+            [item.model_dump(exclude={"route": {"route_id"}}) for item in serial]
+        assert service.calculate_matrix("grid", matrix, workers=2) == service.calculate_matrix("grid", matrix, workers=1)
+    finally:
+        service.worker_pool.shutdown()
+
+
+def test_single_worker_runs_in_process():
+    pool = WorkerPool(1)
+    # Una lambda no se puede enviar a otro proceso: solo funciona si se ejecuta aquí
+    assert not pool.available
+    assert pool.map(lambda x: x * 2, [(1,), (2,)]) == [2, 4]
+    assert asyncio.run(pool.map_async(lambda x: x + 1, [(1,), (2,)])) == [2, 3]
+    pool.start()
+    assert pool._executor is None
+
+
+def test_falls_back_when_processes_cannot_be_created(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise OSError(38, "Function not implemented")
+
+    monkeypatch.setattr(worker_pool_module, "ProcessPoolExecutor", unavailable)
+    service = make_service()
+    batch = requests(service.PARALLEL_MIN_TASKS, seed=2)
+    points = [request.start.coordinate for request in batch]
+    matrix = MatrixRequest(origins=points, destinations=points[:3])
+    service.worker_pool.start()
+    assert not service.worker_pool.available
+    assert [item.model_dump(exclude={"route": {"route_id"}}) for item in service.calculate_routes_batch("grid", batch)] == \
+        [item.model_dump(exclude={"route": {"route_id"}}) for item in service.calculate_routes_batch("grid", batch, workers=1)]
+    assert service.calculate_matrix("grid", matrix) == service.calculate_matrix("grid", matrix, workers=1)
+
+
+def test_shutdown_without_waiting():
+    service = make_service()
+    service.worker_pool.start()
+    service.worker_pool.shutdown(wait=False)
+    assert service.worker_pool._executor is None
+    # Se puede volver a usar: el pool se crea de nuevo en el siguiente uso
+    try:
+        assert service.worker_pool.map(abs, [(-1,), (-2,)]) == [1, 2]
+    finally:
+        service.worker_pool.shutdown()